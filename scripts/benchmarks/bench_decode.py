@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# Бенчмарк декодирования NDJSON k6: строк/сек до и после предфильтрации.
+#   python scripts/benchmarks/bench_decode.py [file.json] [--lines 3000000]
+# Без файла генерируется синтетический вывод k6 во временный каталог.
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from k6report.decode import BACKENDS, get_backend, iter_points
+
+REPORT_METRICS = ('http_reqs', 'http_req_duration', 'http_req_failed')
+
+# Метрики одной итерации в порядке, в котором их пишет k6
+ITERATION_METRICS = (
+    'http_reqs', 'http_req_duration', 'http_req_blocked', 'http_req_connecting',
+    'http_req_tls_handshaking', 'http_req_sending', 'http_req_waiting',
+    'http_req_receiving', 'http_req_failed', 'data_sent', 'data_received',
+    'request_duration', 'response_time', 'success_rate', 'iteration_duration',
+)
+
+
+def write_sample(path, lines):
+    """Пишет NDJSON в формате k6 (компактный JSON, одна точка на строку)."""
+    tags = {
+        'endpoint': 'get_posts', 'expected_response': 'true', 'group': '',
+        'method': 'GET', 'name': 'https://jsonplaceholder.typicode.com/posts',
+        'proto': 'HTTP/2.0', 'scenario': 'default', 'status': '200',
+        'tls_version': 'tls1.3', 'url': 'https://jsonplaceholder.typicode.com/posts',
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        for name in ITERATION_METRICS:
+            f.write(json.dumps({'type': 'Metric', 'data': {'name': name, 'type': 'trend'}, 'metric': name},
+                               separators=(',', ':')) + '\n')
+        written = len(ITERATION_METRICS)
+        i = 0
+        while written < lines:
+            timestamp = f"2024-05-01T12:{(i // 600) % 60:02d}:{(i // 10) % 60:02d}.{i % 1000:03d}123456+03:00"
+            for name in ITERATION_METRICS:
+                value = 1 if name == 'http_reqs' else (i % 50 == 0) if name == 'http_req_failed' else (i % 997) * 0.37
+                f.write(json.dumps({'metric': name, 'type': 'Point',
+                                    'data': {'time': timestamp, 'value': value, 'tags': tags}},
+                                   separators=(',', ':')) + '\n')
+            written += len(ITERATION_METRICS)
+            i += 1
+
+
+def baseline(path):
+    """Прежний путь: текстовый режим и json.loads для каждой строки."""
+    points = 0
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            data = json.loads(line)
+            if data.get('type') == 'Point' and data.get('metric') in REPORT_METRICS:
+                points += 1
+    return points
+
+
+def fast_path(path, backend):
+    return sum(1 for _ in iter_points(path, REPORT_METRICS, backend=backend))
+
+
+def measure(label, func, total_lines):
+    started = time.perf_counter()
+    points = func()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<32} {elapsed:8.2f}s {total_lines / elapsed:14,.0f} lines/s  ({points:,} points)")
+    return points
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк декодирования NDJSON k6')
+    parser.add_argument('file', nargs='?')
+    parser.add_argument('--lines', type=int, default=3_000_000)
+    args = parser.parse_args()
+
+    tmp_dir = None
+    path = args.file
+    if not path:
+        tmp_dir = tempfile.TemporaryDirectory()
+        path = os.path.join(tmp_dir.name, 'bench.json')
+        print(f"Генерация {args.lines:,} строк...")
+        write_sample(path, args.lines)
+
+    with open(path, 'rb') as f:
+        total_lines = sum(1 for _ in f)
+    print(f"Файл: {path} ({os.path.getsize(path) / 2**20:.0f} MiB, {total_lines:,} строк)")
+
+    expected = measure('before: json.loads every line', lambda: baseline(path), total_lines)
+    for name in BACKENDS:
+        try:
+            get_backend(name)
+        except ImportError:
+            print(f"{'after: prefilter + ' + name:<32} (не установлен)")
+            continue
+        points = measure(f'after: prefilter + {name}', lambda: fast_path(path, name), total_lines)
+        assert points == expected, f"{name}: {points} != {expected}"
+
+    if tmp_dir:
+        tmp_dir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# Бенчмарк конвейера отчетности на синтетических прогонах 1M/10M/100M строк.
+#   python scripts/benchmarks/bench_pipeline.py [--sizes 1M,10M,100M] [--output pipeline-benchmark.json]
+# Каждая стадия (ingest, потоковая агрегация, HTML, Telegram) запускается
+# отдельным процессом; пишутся время, строк/с и пиковая RSS процесса
+# (os.wait4). Результат дописывается в JSON вместе с коммитом, чтобы
+# сравнивать цифры между коммитами. Размеры, которым не хватает места
+# на диске, пропускаются с пометкой в результатах.
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from generate_results import DEFAULT_ERROR_RATIO, DEFAULT_RPS, generate
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+K6REPORT = os.path.join(SCRIPTS_DIR, 'k6report')
+
+# Байт на строку синтетического вывода (с запасом) - для проверки места на диске
+BYTES_PER_LINE = 300
+
+AGGREGATE_CODE = ("import sys; sys.path.insert(0, sys.argv[1]); from k6report.parallel import aggregate_file; "
+                  "aggregate_file(sys.argv[2], None, int(sys.argv[3]))")
+
+
+def parse_size(text):
+    """'10M' -> 10_000_000, '500k' -> 500_000."""
+    multipliers = {'k': 10**3, 'm': 10**6, 'g': 10**9}
+    text = text.strip().lower()
+    if text[-1] in multipliers:
+        return int(float(text[:-1]) * multipliers[text[-1]])
+    return int(text)
+
+
+def run_stage(command):
+    """Запускает стадию; время, пиковая RSS (МБ) и код выхода процесса."""
+    started = time.perf_counter()
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+    _, status, usage = os.wait4(process.pid, 0)
+    elapsed = time.perf_counter() - started
+    process.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss: КБ в Linux, байты в macOS
+    peak_rss = usage.ru_maxrss / (2**20 if sys.platform == 'darwin' else 2**10)
+    return elapsed, peak_rss, process.returncode
+
+
+def git_commit():
+    try:
+        sha = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=SCRIPTS_DIR, capture_output=True, text=True,
+                             check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=SCRIPTS_DIR,
+                                    capture_output=True, text=True).stdout.strip())
+        return sha, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def bench_size(lines, work_dir, workers, regenerate, error_ratio, rps):
+    results_dir = os.path.join(work_dir, f"lines-{lines}")
+    path = os.path.join(results_dir, 'load-synthetic.json')
+    os.makedirs(results_dir, exist_ok=True)
+    result = {'lines': lines}
+
+    if regenerate or not os.path.exists(path):
+        needed = lines * BYTES_PER_LINE * 2  # файл + колоночный кеш
+        free = shutil.disk_usage(results_dir).free
+        if needed > free:
+            result['skipped'] = f"нужно ~{needed / 2**30:.1f} ГиБ, свободно {free / 2**30:.1f} ГиБ"
+            print(f"{lines:>13,} строк: пропуск ({result['skipped']})")
+            return result
+        started = time.perf_counter()
+        generate(path, lines, rps=rps, error_ratio=error_ratio, seed=lines)
+        result['generate_s'] = round(time.perf_counter() - started, 3)
+    result['bytes'] = os.path.getsize(path)
+
+    # холодный ingest: без сводки и колоночного кеша
+    shutil.rmtree(os.path.join(results_dir, '.k6cache'), ignore_errors=True)
+    for filename in os.listdir(results_dir):
+        if filename != 'load-synthetic.json' and not os.path.isdir(os.path.join(results_dir, filename)):
+            os.remove(os.path.join(results_dir, filename))
+
+    stages = (
+        ('ingest', [sys.executable, K6REPORT, 'ingest', results_dir, '--workers', str(workers)]),
+        ('aggregate', [sys.executable, '-c', AGGREGATE_CODE, SCRIPTS_DIR, path, str(workers)]),
+        ('html', [sys.executable, K6REPORT, 'html', results_dir]),
+        ('telegram', [sys.executable, K6REPORT, 'telegram', results_dir]),
+    )
+    result['stages'] = {}
+    for name, command in stages:
+        elapsed, peak_rss, exit_code = run_stage(command)
+        result['stages'][name] = {
+            'wall_s': round(elapsed, 3),
+            'lines_per_s': round(lines / elapsed),
+            'peak_rss_mb': round(peak_rss, 1),
+            'exit_code': exit_code,
+        }
+        status = "" if exit_code == 0 else f"  код выхода {exit_code}"
+        print(f"{lines:>13,} строк  {name:<10} {elapsed:9.2f}s {lines / elapsed:14,.0f} lines/s "
+              f"{peak_rss:9.0f} MiB RSS{status}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк конвейера отчетности k6')
+    parser.add_argument('--sizes', default='1M,10M,100M', help="Размеры входа в строках через запятую")
+    parser.add_argument('--work-dir', default=None,
+                        help="Каталог для синтетических файлов (сохраняются между запусками)")
+    parser.add_argument('--regenerate', action='store_true', help="Пересоздать синтетические файлы")
+    parser.add_argument('--workers', type=int, default=1, help="--workers для ingest и агрегации (0 - все ядра)")
+    parser.add_argument('--rps', type=int, default=DEFAULT_RPS)
+    parser.add_argument('--error-ratio', type=float, default=DEFAULT_ERROR_RATIO)
+    parser.add_argument('--output', default='pipeline-benchmark.json',
+                        help="JSON с результатами; новый запуск дописывается в runs")
+    args = parser.parse_args()
+
+    work_dir = args.work_dir or os.path.join(os.environ.get('TMPDIR', '/tmp'), 'k6report-bench')
+    commit, dirty = git_commit()
+    run = {
+        'timestamp': datetime.now().isoformat(),
+        'commit': commit,
+        'dirty': dirty,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'workers': args.workers,
+        'results': [bench_size(parse_size(size), work_dir, args.workers, args.regenerate, args.error_ratio, args.rps)
+                    for size in args.sizes.split(',') if size],
+    }
+
+    history = {'runs': []}
+    if os.path.exists(args.output):
+        with open(args.output, encoding='utf-8') as f:
+            history = json.load(f)
+    history['runs'].append(run)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(history, f, indent=2, ensure_ascii=False)
+    print(f"Результаты: {args.output} (запусков: {len(history['runs'])})")
+
+    if any(stage['exit_code'] for result in run['results'] for stage in result.get('stages', {}).values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# Бенчмарк запуска единой точки входа k6report: время до результата для
+# --help и команд, которые читают только сводку k6-summary.json.
+#   python scripts/benchmarks/bench_startup.py [--runs 5] [--limit 1.0]
+# Падает (код 1), если медиана превышает лимит или --help/summary
+# импортируют тяжелые библиотеки отрисовки и таблиц.
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_decode import write_sample
+
+K6REPORT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'k6report')
+
+# Эти библиотеки не должны импортироваться без отрисовки
+HEAVY_MODULES = ('plotly', 'matplotlib', 'pandas')
+
+
+def run(args):
+    started = time.perf_counter()
+    subprocess.run([sys.executable, K6REPORT, *args], check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - started
+
+
+def imported_heavy_modules(args):
+    """Тяжелые модули, импортированные командой (по -X importtime)."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', K6REPORT, *args], check=True,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    modules = {line.rsplit('|', 1)[-1].strip() for line in result.stderr.splitlines() if '|' in line}
+    return sorted(module for module in modules if module.split('.')[0] in HEAVY_MODULES)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк запуска k6report')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--limit', type=float, default=1.0, help="Лимит медианы, с")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as results_dir:
+        write_sample(os.path.join(results_dir, 'load-bench.json'), 50_000)
+        run(['ingest', results_dir])  # сводка строится один раз, дальше команды читают ее
+
+        # (аргументы, проверять ли лимит и отсутствие тяжелых импортов)
+        commands = (
+            (['--help'], True),
+            (['summary', results_dir], True),
+            (['compare', results_dir, '--no-history'], True),
+            (['html', '--help'], True),
+            (['telegram', '--help'], True),
+            (['ingest', results_dir], False),
+        )
+        failures = []
+        for command, checked in commands:
+            timings = [run(command) for _ in range(args.runs)]
+            median = statistics.median(timings)
+            heavy = imported_heavy_modules(command) if checked else []
+            label = 'k6report ' + ' '.join(arg if arg != results_dir else '<results>' for arg in command)
+            print(f"{label:<44} {median * 1000:8.0f} ms (min {min(timings) * 1000:.0f} ms)"
+                  + (f"  импортирует: {', '.join(heavy[:3])}" if heavy else ""))
+            if checked and median > args.limit:
+                failures.append(f"{label}: {median:.2f}s > {args.limit:.2f}s")
+            if heavy:
+                failures.append(f"{label}: импортирует {', '.join(heavy[:3])}")
+
+    if failures:
+        print("\n".join(["❌ Медленный запуск:"] + failures))
+        sys.exit(1)
+    print(f"✅ Все проверенные команды быстрее {args.limit:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# Генератор синтетического вывода k6 (--out json) для бенчмарков.
+#   python scripts/benchmarks/generate_results.py results/load-synthetic.json --rps 500 --duration 600
+#   python scripts/benchmarks/generate_results.py big.json --lines 10000000 --error-ratio 0.02
+# Схема как у k6: строки Metric при первом появлении метрики, затем Point.
+# Запрос дает набор http_req_* и кастомных метрик tests/libs/utils.js
+# (request_duration, response_time, success_rate, errors, ...) с тегами
+# эндпоинтов сценариев; раз в секунду - gauge vus/vus_max. Время запроса
+# сдвигается на случайный jitter, поэтому строки идут не строго по времени,
+# как при записи из нескольких VU. --drift имитирует утечку: задержка
+# растет линейно (доля в час) начиная с --drift-start секунды.
+
+import argparse
+import calendar
+import gzip
+import json
+import math
+import os
+import random
+import time
+
+# (тег endpoint, метод, путь, медиана задержки мс) - как в сценариях load/stress/volume
+ENDPOINTS = (
+    ('get_posts', 'GET', '/posts', 180.0),
+    ('get_single_post', 'GET', '/posts/{id}', 90.0),
+    ('get_comments', 'GET', '/comments?postId={id}', 120.0),
+    ('create_post', 'POST', '/posts', 250.0),
+)
+BASE_URL = 'https://jsonplaceholder.typicode.com'
+
+# Метрики и их типы в порядке записи k6 для одного запроса
+REQUEST_METRICS = (
+    ('http_reqs', 'counter'), ('http_req_duration', 'trend'), ('http_req_blocked', 'trend'),
+    ('http_req_connecting', 'trend'), ('http_req_tls_handshaking', 'trend'), ('http_req_sending', 'trend'),
+    ('http_req_waiting', 'trend'), ('http_req_receiving', 'trend'), ('http_req_failed', 'rate'),
+    ('data_sent', 'counter'), ('data_received', 'counter'),
+)
+CUSTOM_METRICS = (
+    ('active_users', 'gauge'), ('request_duration', 'trend'), ('response_time', 'trend'),
+    ('throughput', 'rate'), ('checks', 'rate'), ('success_rate', 'rate'), ('errors', 'counter'),
+    ('error_rate', 'rate'),
+)
+ITERATION_METRICS = (('iterations', 'counter'), ('iteration_duration', 'trend'))
+GAUGE_METRICS = (('vus', 'gauge'), ('vus_max', 'gauge'))
+
+DEFAULT_RPS = 200
+DEFAULT_DURATION = 300
+DEFAULT_ERROR_RATIO = 0.01
+DEFAULT_JITTER_MS = 50.0
+DEFAULT_VUS = 50
+DEFAULT_START = '2024-05-01T12:00:00'
+DEFAULT_UTC_OFFSET = '+03:00'
+
+
+def _metric_line(name, metric_type):
+    return json.dumps({'type': 'Metric', 'data': {'name': name, 'type': metric_type, 'contains': 'default',
+                                                  'thresholds': [], 'submetrics': None}, 'metric': name},
+                      separators=(',', ':')) + '\n'
+
+
+def _tags_json(tags):
+    return json.dumps(tags, separators=(',', ':'))
+
+
+class SyntheticRun:
+    """
+    Потоковый генератор строк одного прогона. Строки собираются из
+    заранее сериализованных кусков (теги, метрики), без json.dumps на точку.
+    """
+
+    def __init__(self, rps=DEFAULT_RPS, error_ratio=DEFAULT_ERROR_RATIO, jitter_ms=DEFAULT_JITTER_MS,
+                 vus=DEFAULT_VUS, start=DEFAULT_START, utc_offset=DEFAULT_UTC_OFFSET, scenario='default', seed=None,
+                 drift=0.0, drift_start=0):
+        self.rps = rps
+        self.drift = drift
+        self.drift_start = drift_start
+        self.error_ratio = error_ratio
+        self.jitter_ns = int(jitter_ms * 1e6)
+        self.vus = vus
+        self.utc_offset = utc_offset
+        sign = -1 if utc_offset.startswith('-') else 1
+        hours, minutes = utc_offset.lstrip('+-').split(':')
+        self.offset_s = sign * (int(hours) * 3600 + int(minutes) * 60)
+        self.random = random.Random(seed)
+        # start - местное время в поясе utc_offset
+        self.start_s = calendar.timegm(time.strptime(start, '%Y-%m-%dT%H:%M:%S')) - self.offset_s
+        self._prefixes = {}
+
+        self.http_tags = {}
+        self.custom_tags = {}
+        self.check_tags = {}
+        for endpoint, method, path, _ in ENDPOINTS:
+            for status in ('200', '201', '500'):
+                url = BASE_URL + path.replace('{id}', '1')
+                tags = {'expected_response': 'true' if status != '500' else 'false', 'group': '',
+                        'method': method, 'name': BASE_URL + path.split('?')[0], 'proto': 'HTTP/2.0',
+                        'scenario': scenario, 'status': status, 'tls_version': 'tls1.3', 'url': url}
+                self.http_tags[endpoint, status] = _tags_json(tags)
+            self.custom_tags[endpoint] = _tags_json({'endpoint': endpoint, 'group': '', 'scenario': scenario})
+            for check in ('status is 200', 'response time < 2s'):
+                self.check_tags[endpoint, check] = _tags_json(
+                    {'check': f"{endpoint} {check}", 'group': '', 'scenario': scenario})
+        self.plain_tags = _tags_json({'group': '', 'scenario': scenario})
+        self.gauge_tags = '{}'
+
+    def header(self):
+        """Строки Metric всех метрик (k6 пишет их перед первой точкой метрики)."""
+        return [_metric_line(name, metric_type)
+                for name, metric_type in REQUEST_METRICS + CUSTOM_METRICS + ITERATION_METRICS + GAUGE_METRICS]
+
+    def _timestamp(self, ns):
+        seconds, fraction = divmod(ns, 1_000_000_000)
+        prefix = self._prefixes.get(seconds)
+        if prefix is None:
+            if len(self._prefixes) > 4096:
+                self._prefixes.clear()
+            prefix = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(seconds + self.offset_s))
+            self._prefixes[seconds] = prefix
+        return f"{prefix}.{fraction:09d}{self.utc_offset}"
+
+    def second(self, index):
+        """Строки одной секунды теста: gauge VU и rps запросов."""
+        rnd = self.random
+        base_ns = (self.start_s + index) * 1_000_000_000
+        stamp = self._timestamp(base_ns)
+        lines = [f'{{"metric":"{name}","type":"Point","data":{{"time":"{stamp}","value":{self.vus},'
+                 f'"tags":{self.gauge_tags}}}}}\n' for name, _ in GAUGE_METRICS]
+        point = '{{"metric":"{}","type":"Point","data":{{"time":"{}","value":{},"tags":{}}}}}\n'.format
+        slowdown = 1 + self.drift * max(0, index - self.drift_start) / 3600
+        for i in range(self.rps):
+            endpoint, method, _, median = ENDPOINTS[rnd.randrange(len(ENDPOINTS))]
+            offset = i * 1_000_000_000 // self.rps + rnd.randint(-self.jitter_ns, self.jitter_ns)
+            stamp = self._timestamp(max(base_ns + offset, 0))
+            failed = rnd.random() < self.error_ratio
+            status = '500' if failed else ('201' if method == 'POST' else '200')
+            # логнормальная задержка с хвостом; у ошибок хвост тяжелее
+            duration = round(median * slowdown * math.exp(rnd.gauss(0, 0.45 if not failed else 0.9)), 3)
+            waiting = round(duration * 0.92, 3)
+            http = self.http_tags[endpoint, status]
+            custom = self.custom_tags[endpoint]
+            lines.append(point('http_reqs', stamp, 1, http))
+            lines.append(point('http_req_duration', stamp, duration, http))
+            lines.append(point('http_req_blocked', stamp, round(rnd.random() * 0.05, 4), http))
+            lines.append(point('http_req_connecting', stamp, 0, http))
+            lines.append(point('http_req_tls_handshaking', stamp, 0, http))
+            lines.append(point('http_req_sending', stamp, round(duration * 0.01, 4), http))
+            lines.append(point('http_req_waiting', stamp, waiting, http))
+            lines.append(point('http_req_receiving', stamp, round(duration - waiting, 4), http))
+            lines.append(point('http_req_failed', stamp, int(failed), http))
+            lines.append(point('data_sent', stamp, 120 if method == 'GET' else 480, http))
+            lines.append(point('data_received', stamp, 6800 if endpoint == 'get_posts' else 900, http))
+            lines.append(point('active_users', stamp, 1, self.plain_tags))
+            lines.append(point('request_duration', stamp, round(duration + 0.5, 3), custom))
+            lines.append(point('response_time', stamp, duration, self.plain_tags))
+            lines.append(point('throughput', stamp, 1, self.plain_tags))
+            lines.append(point('checks', stamp, int(not failed), self.check_tags[endpoint, 'status is 200']))
+            lines.append(point('checks', stamp, int(duration < 2000), self.check_tags[endpoint, 'response time < 2s']))
+            lines.append(point('success_rate', stamp, int(not failed), custom))
+            if failed:
+                lines.append(point('errors', stamp, 1, custom))
+            lines.append(point('error_rate', stamp, int(failed), self.plain_tags))
+            lines.append(point('iterations', stamp, 1, self.plain_tags))
+            lines.append(point('iteration_duration', stamp, round(duration + 1000.0, 3), self.plain_tags))
+        return lines
+
+
+def generate(path, lines=None, duration=DEFAULT_DURATION, **options):
+    """
+    Пишет синтетический прогон в path (.gz - сжатый).
+    lines задает размер файла в строках (длительность подбирается), иначе - duration секунд.
+    Returns:
+        int: Число записанных строк.
+    """
+    run = SyntheticRun(**options)
+    opener = (lambda: gzip.open(path, 'wt', encoding='utf-8', compresslevel=1)) if path.endswith('.gz') \
+        else (lambda: open(path, 'w', encoding='utf-8', buffering=2**20))
+    written = 0
+    with opener() as f:
+        header = run.header()
+        f.writelines(header)
+        written += len(header)
+        second = 0
+        while (written < lines) if lines else (second < duration):
+            chunk = run.second(second)
+            if lines and written + len(chunk) > lines:
+                chunk = chunk[:lines - written]
+            f.writelines(chunk)
+            written += len(chunk)
+            second += 1
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Синтетический NDJSON-вывод k6 для бенчмарков')
+    parser.add_argument('output', help="Путь файла (.json или .json.gz)")
+    parser.add_argument('--lines', type=int, default=None, help="Размер в строках (вместо --duration)")
+    parser.add_argument('--duration', type=int, default=DEFAULT_DURATION, help="Длительность теста, с")
+    parser.add_argument('--rps', type=int, default=DEFAULT_RPS, help="Запросов в секунду")
+    parser.add_argument('--error-ratio', type=float, default=DEFAULT_ERROR_RATIO, help="Доля неуспешных запросов")
+    parser.add_argument('--jitter-ms', type=float, default=DEFAULT_JITTER_MS,
+                        help="Разброс времени точек, мс (строки идут не по порядку времени)")
+    parser.add_argument('--vus', type=int, default=DEFAULT_VUS)
+    parser.add_argument('--start', default=DEFAULT_START, help="Начало теста (время в поясе --utc-offset)")
+    parser.add_argument('--utc-offset', default=DEFAULT_UTC_OFFSET)
+    parser.add_argument('--scenario', default='default')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--drift', type=float, default=0.0, help="Рост задержки за час (0.5 = +50%% в час)")
+    parser.add_argument('--drift-start', type=int, default=0, help="С какой секунды теста растет задержка")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    written = generate(args.output, args.lines, args.duration, rps=args.rps, error_ratio=args.error_ratio,
+                       jitter_ms=args.jitter_ms, vus=args.vus, start=args.start, utc_offset=args.utc_offset, scenario=args.scenario,
+                       seed=args.seed, drift=args.drift, drift_start=args.drift_start)
+    elapsed = time.perf_counter() - started
+    print(f"{args.output}: {written:,} строк, {os.path.getsize(args.output) / 2**20:.0f} MiB "
+          f"за {elapsed:.1f}s ({written / elapsed:,.0f} строк/с)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# Канареечный анализ прогона tests/scenarios/canary-test.js: распределения
+# задержек и доли ошибок control и canary сравниваются целиком, итог -
+# вердикт pass/fail (код выхода 1 при fail) для CI.
+
+import argparse
+import json
+import os
+import sys
+
+from k6report.cache import load_columns
+from k6report.canary import (
+    DEFAULT_ALPHA,
+    DEFAULT_CANARY,
+    DEFAULT_CONTROL,
+    DEFAULT_ITERATIONS,
+    DEFAULT_MAX_ERROR_INCREASE,
+    DEFAULT_QUANTILES,
+    DEFAULT_TAG,
+    DEFAULT_TOLERANCE,
+    analyze_canary,
+)
+from k6report.decode import strip_result_suffix
+
+
+def print_report(report):
+    print(f"\n Канареечный анализ {report['metric']} по тегу {report['tag']} "
+          f"({report['control']}: {report['samples']['control']:,}, {report['canary']}: {report['samples']['canary']:,})")
+    print("-" * 50)
+    for name, stats in report.get('quantiles', {}).items():
+        relative = stats['relative_delta']
+        low, high = stats['ci']
+        status = "❌" if stats['regression'] else "✅" if relative is not None else "⚠️"
+        change = f"{relative * 100:+.1f}%" if relative is not None else "n/a"
+        if low is not None:
+            change += f" [{low * 100:+.1f}%, {high * 100:+.1f}%]"
+        print(f"  {name}: {status} {stats['control']:.2f} → {stats['canary']:.2f} ({change})")
+    if 'ks' in report:
+        print(f"  KS: D={report['ks']['statistic']:.4f}, p={report['ks']['p_value']:.3g}")
+        print(f"  Mann-Whitney: p={report['mann_whitney']['p_value']:.3g}, "
+              f"P(canary медленнее)={report['mann_whitney']['canary_slower_probability']:.3f}")
+    if 'errors' in report:
+        errors = report['errors']
+        print(f"  Ошибки: {errors['control'] * 100:.2f}% → {errors['canary'] * 100:.2f}% (p={errors['p_value']:.3g})")
+    for reason in report['reasons']:
+        print(f"  - {reason}")
+    icon = {'pass': "✅", 'fail': "❌"}.get(report['verdict'], "⚠️")
+    print(f"\n{icon} Вердикт: {report['verdict']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Сравнение распределений control и canary в одном прогоне k6",
+        epilog="Example: python canary-analysis.py results/canary-abc123.json --tolerance 0.1")
+    parser.add_argument('result_file', help="NDJSON-результат k6 (--out json)")
+    parser.add_argument('--tag', default=DEFAULT_TAG, help="Тег, разделяющий трафик")
+    parser.add_argument('--control', default=DEFAULT_CONTROL, help="Значение тега стабильной версии")
+    parser.add_argument('--canary', default=DEFAULT_CANARY, help="Значение тега новой версии")
+    parser.add_argument('--metric', default='http_req_duration', help="Метрика задержки")
+    parser.add_argument('--error-metric', default='http_req_failed', help="Rate-метрика ошибок")
+    parser.add_argument('--quantiles', default=','.join(f"{q:g}" for q in DEFAULT_QUANTILES),
+                        help="Сравниваемые квантили через запятую")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="Допустимый относительный рост квантиля (0.1 = +10%%)")
+    parser.add_argument('--max-error-increase', type=float, default=DEFAULT_MAX_ERROR_INCREASE,
+                        help="Допустимый рост доли ошибок (0.01 = +1 п.п.)")
+    parser.add_argument('--alpha', type=float, default=DEFAULT_ALPHA, help="Уровень значимости")
+    parser.add_argument('--iterations', type=int, default=DEFAULT_ITERATIONS, help="Повторов bootstrap")
+    parser.add_argument('--seed', type=int, default=None, help="Seed bootstrap для воспроизводимости")
+    parser.add_argument('--no-cache', action='store_true', help="Не использовать колоночный кеш .k6cache")
+    parser.add_argument('--output', default=None,
+                        help="JSON отчета (по умолчанию canary-analysis-<прогон>.json рядом с результатом)")
+    args = parser.parse_args()
+
+    columns = load_columns(args.result_file, use_cache=not args.no_cache)
+    report = analyze_canary(
+        columns, args.tag, args.control, args.canary, args.metric, args.error_metric,
+        quantiles=[float(q) for q in args.quantiles.split(',') if q],
+        tolerance=args.tolerance, max_error_increase=args.max_error_increase,
+        alpha=args.alpha, iterations=args.iterations, seed=args.seed)
+    print_report(report)
+
+    output = args.output or os.path.join(
+        os.path.dirname(args.result_file),
+        f"canary-analysis-{strip_result_suffix(os.path.basename(args.result_file))}.json")
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f" Отчет сохранен: {output}")
+
+    if report['verdict'] == 'fail':
+        sys.exit(1)
+    if report['verdict'] == 'inconclusive':
+        sys.exit(2)
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# Проверка порогов k6 по сводке k6-summary.json без перезапуска k6 и без
+# разбора сырых точек: пороги сценариев (options.thresholds), бюджеты
+# PerformanceBudget и новые бюджеты из JSON. Для CI: код выхода 1, если
+# нарушен порог уровня critical (с --fail-on-warning - и warning).
+
+import argparse
+import json
+import os
+import sys
+
+from k6report.ingest import THRESHOLD_RESULTS_FILENAME, ensure_summary
+from k6report.thresholds import DEFAULT_BUDGET_FILE, DEFAULT_SCENARIOS_DIR, evaluate_summary, load_budgets
+
+
+def format_value(value):
+    return f"{value:,.4g}" if abs(value) < 1 else f"{value:,.2f}"
+
+
+def print_report(report):
+    for test in report['tests']:
+        print(f"\n Пороги {test['test']} ({test['file']}):")
+        if not test['thresholds']:
+            print("  порогов нет")
+        for result in test['thresholds']:
+            if result['ok'] is None:
+                icon, value = "➖", "нет данных"
+            else:
+                icon = "✅" if result['ok'] else ("❌" if result['level'] == 'critical' else "⚠️")
+                value = ("≈" if result['approximate'] else "") + format_value(result['value'])
+            level = f" [{result['level']}{', ' + result['budget'] if result['budget'] else ''}]" \
+                if result['level'] != 'critical' or result['budget'] else ""
+            print(f"  {icon} {result['metric']} {result['threshold']}{level}: {value}")
+    icon = {'pass': "✅", 'warn': "⚠️"}.get(report['verdict'], "❌")
+    print(f"\n{icon} Итог: {report['verdict']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Проверка порогов k6 и бюджетов по сводке результатов",
+        epilog="Example: python check-thresholds.py results/ --budgets budgets.json --tests smoke,load")
+    parser.add_argument('results_dir', help="Каталог с результатами k6 (сводка строится, если ее нет)")
+    parser.add_argument('--budgets', default=None,
+                        help="JSON с порогами в форме options.thresholds k6 или "
+                             "{\"thresholds\": {...}, \"tests\": {\"<тест>\": {...}}}; объект порога может задать level")
+    parser.add_argument('--scenarios', default=DEFAULT_SCENARIOS_DIR,
+                        help="Каталог сценариев, откуда берутся пороги <тест>-test.js")
+    parser.add_argument('--no-scenario', action='store_true', help="Не брать пороги из сценариев")
+    parser.add_argument('--performance-budget', nargs='?', const=DEFAULT_BUDGET_FILE, default=None, metavar='FILE',
+                        help="Добавить бюджеты PerformanceBudget (warning/critical) из performance-budget.js")
+    parser.add_argument('--tests', default=None, help="Проверять только эти тесты (через запятую: smoke,load)")
+    parser.add_argument('--exact', action='store_true',
+                        help="Точные процентили по колоночному кешу вместо скетча (как в k6)")
+    parser.add_argument('--fail-on-warning', action='store_true', help="Код выхода 1 и при нарушении warning")
+    parser.add_argument('--output', default=None,
+                        help=f"JSON с результатом (по умолчанию <results_dir>/{THRESHOLD_RESULTS_FILENAME})")
+    args = parser.parse_args()
+
+    summary = ensure_summary(args.results_dir)
+    report = evaluate_summary(
+        summary, args.results_dir, exact=args.exact,
+        tests=set(args.tests.split(',')) if args.tests else None,
+        scenarios_dir=None if args.no_scenario else args.scenarios,
+        budget_file=args.performance_budget,
+        budgets=load_budgets(args.budgets) if args.budgets else None)
+    print_report(report)
+
+    output = args.output or os.path.join(args.results_dir, THRESHOLD_RESULTS_FILENAME)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f" Результат сохранен: {output}")
+
+    if report['verdict'] == 'fail' or (args.fail_on_warning and report['verdict'] == 'warn'):
+        sys.exit(1)
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# Сжатие сырых артефактов k6 (NDJSON) в rollup <артефакт>.rollup.npz:
+# корзины 1 с / 10 с / 1 мин по метрикам и наборам тегов (k6report.rollup).
+# После сжатия сырой файл можно удалить (--delete-raw): сводка
+# k6-summary.json, а с ней HTML, Telegram, compare-results и пороги,
+# строится по rollup. Шарды распределенного прогона сжимаются в один rollup.
+
+import argparse
+import os
+
+from k6report.cache import cache_path, index_path, load_columns, warm_cache
+from k6report.decode import ROLLUP_SUFFIX, is_ndjson, strip_result_suffix
+from k6report.ingest import BREAKDOWN_TAGS, list_result_files, test_name
+from k6report.merge import group_shards
+from k6report.parallel import WORKERS_ENV, resolve_workers
+from k6report.rollup import DEFAULT_RESOLUTIONS, Rollup
+
+
+def compact_run(results_dir, run_id, filenames, tag_sets, resolutions):
+    """Rollup прогона из его файлов; проверяет, что число точек совпало с сырыми данными."""
+    rollups = []
+    expected = {}
+    for filename in filenames:
+        columns = load_columns(os.path.join(results_dir, filename))
+        rollups.append(Rollup.from_columns(columns, tag_sets, resolutions, source=filename))
+        for metric in columns.metric_names:
+            expected[metric] = expected.get(metric, 0) + len(columns.values(metric))
+    rollup = Rollup.merge(rollups) if len(rollups) > 1 else rollups[0]
+    actual = {metric: aggregator.count for metric, aggregator in rollup.aggregates().items()}
+    if actual != expected:
+        raise ValueError(f"Число точек rollup не совпало с исходными файлами: {actual} != {expected}")
+    path = os.path.join(results_dir, strip_result_suffix(run_id) + ROLLUP_SUFFIX)
+    rollup.save(path)
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Сжатие сырых результатов k6 в многоуровневые ряды (rollup)",
+        epilog="Example: python compact-results.py results/ --tag-set method,status --delete-raw")
+    parser.add_argument('results_dir', help="Каталог с NDJSON-результатами k6")
+    parser.add_argument('--tests', default=None, help="Сжимать только эти тесты (через запятую: load,soak)")
+    parser.add_argument('--resolutions', default=','.join(map(str, DEFAULT_RESOLUTIONS)),
+                        help="Разрешения в секундах, каждое кратно предыдущему")
+    parser.add_argument('--tag-set', action='append', default=[], metavar='TAGS',
+                        help="Дополнительный набор тегов через запятую (method,status); можно повторять")
+    parser.add_argument('--no-breakdown-tags', action='store_true',
+                        help=f"Без рядов по отдельным тегам ({', '.join(BREAKDOWN_TAGS)})")
+    parser.add_argument('--delete-raw', action='store_true',
+                        help="Удалить сырые файлы и их колоночный кеш после проверки rollup")
+    parser.add_argument('--workers', type=int, default=None,
+                        help=f"Число процессов для разбора (0 - по числу ядер; по умолчанию ${WORKERS_ENV} или 1)")
+    args = parser.parse_args()
+
+    tag_sets = [()] + ([] if args.no_breakdown_tags else [(tag,) for tag in BREAKDOWN_TAGS])
+    tag_sets += [tuple(tags.split(',')) for tags in args.tag_set]
+    resolutions = [int(resolution) for resolution in args.resolutions.split(',')]
+    tests = set(args.tests.split(',')) if args.tests else None
+
+    groups = [(run_id, filenames) for run_id, filenames in group_shards(list_result_files(args.results_dir))
+              if (not tests or test_name(run_id) in tests)
+              and all(is_ndjson(os.path.join(args.results_dir, filename)) for filename in filenames)]
+    warm_cache([os.path.join(args.results_dir, filename) for _, filenames in groups for filename in filenames],
+               resolve_workers(args.workers))
+
+    for run_id, filenames in groups:
+        filepaths = [os.path.join(args.results_dir, filename) for filename in filenames]
+        raw_size = sum(os.path.getsize(filepath) for filepath in filepaths)
+        path = compact_run(args.results_dir, run_id, filenames, tag_sets, resolutions)
+        size = os.path.getsize(path)
+        print(f" {run_id}: {raw_size / 2**20:.1f} МБ -> {os.path.basename(path)} {size / 2**20:.2f} МБ "
+              f"(в {raw_size / max(size, 1):.0f} раз меньше)")
+        if args.delete_raw:
+            for filepath in filepaths:
+                for stale in (cache_path(filepath), index_path(filepath), filepath):
+                    if os.path.exists(stale):
+                        os.remove(stale)
+            print(f"   сырые файлы удалены: {', '.join(filenames)}")
+    print(f"✅ Сжато прогонов: {len(groups)}")
@@ -1,44 +1,93 @@
 #!/usr/bin/env python3
+import argparse
 import json
 import sys
 import os
 from datetime import datetime
-import pandas as pd
-import matplotlib.pyplot as plt
-import numpy as np
 
-def compare_test_results(results_dir, baseline_file=None):
-    """Сравнивает результаты тестов с baseline или между собой"""
-
-    # Сбор всех результатов
+from k6report.aggregate import to_k6_summary
+from k6report.cache import load_columns
+from k6report.decode import is_ndjson, open_results, strip_result_suffix
+from k6report.history import DEFAULT_BASELINE_WINDOW, DEFAULT_HISTORY_DB, HISTORY_DB_ENV, RunStore
+from k6report.ingest import ensure_summary
+from k6report.profiling import NULL_PROFILER, Profiler, add_profile_arguments
+
+def load_test_result(filepath):
+    """
+    Baseline в формате summary-export k6.
+    NDJSON (--out json) читается через колоночный кеш и сводится к тем же полям.
+    """
+    if is_ndjson(filepath):
+        columns = load_columns(filepath)
+        return to_k6_summary(columns.aggregates(), columns.metric_types)
+    with open_results(filepath) as f:
+        return json.load(f)
+
+def compare_test_results(results_dir, baseline_file=None, history_path=None, window=DEFAULT_BASELINE_WINDOW,
+                         git_sha=None, environment=None, output_dir=None, profiler=NULL_PROFILER):
+    """
+    Сравнивает результаты тестов с baseline-файлом, со скользящим baseline
+    из истории прогонов (SQLite) или между собой. Возвращает сравнение.
+    """
+    output_dir = output_dir or results_dir
+
+    # Сбор всех результатов из сводки k6-summary.json
+    with profiler.stage('summary'):
+        summary = ensure_summary(results_dir, profiler=profiler)
     results = {}
-    for filename in os.listdir(results_dir):
-        if filename.endswith('.json'):
-            filepath = os.path.join(results_dir, filename)
-            try:
-                with open(filepath, 'r') as f:
-                    data = json.load(f)
-                    test_name = filename.replace('.json', '')
-                    results[test_name] = data
-            except:
-                continue
+    for test in summary['tests']:
+        test_name = strip_result_suffix(test['file'])
+        results[test_name] = test['k6_summary']
 
     if not results:
         print("Нет результатов для сравнения")
-        return
+        return None
 
     # Если указан baseline файл, сравниваем с ним
     if baseline_file and os.path.exists(baseline_file):
-        with open(baseline_file, 'r') as f:
-            baseline_data = json.load(f)
+        with profiler.stage('baseline'):
+            baseline_data = load_test_result(baseline_file)
 
         print(" Сравнение с baseline...")
-        generate_baseline_comparison(results, baseline_data)
-    else:
-        print(" Сравнение между тестами...")
-        generate_cross_test_comparison(results)
+        with profiler.stage('compare'):
+            return generate_baseline_comparison(results, baseline_data, output_dir)
+
+    if history_path:
+        # Прогоны записываются в историю, baseline - медиана предыдущих прогонов того же теста
+        with profiler.stage('history'), RunStore(history_path) as store:
+            recorded = store.record_summary(summary, git_sha, environment)
+            print(f" История: {history_path} (новых прогонов: {sum(added for _, added in recorded.values())})")
+            comparison = generate_history_comparison(summary, store, recorded, window, output_dir, environment)
+        if comparison:
+            return comparison
+        print(" В истории нет предыдущих прогонов этих тестов")
+
+    print(" Сравнение между тестами...")
+    with profiler.stage('compare'):
+        return generate_cross_test_comparison(results, output_dir)
+
+def compare_metrics(current_metrics, baseline_metrics):
+    """Ключевые метрики текущего прогона против baseline (оба в формате summary-export)."""
+    def value(metrics, metric, key):
+        return metrics.get(metric, {}).get('values', {}).get(key) or 0
+
+    metrics_comparison = {}
+    for name, metric, key, direction in (
+            ("response_time", 'http_req_duration', 'avg', "lower_better"),
+            ("response_time_p95", 'http_req_duration', 'p(95)', "lower_better"),
+            ("error_rate", 'http_req_failed', 'rate', "lower_better"),
+            ("throughput", 'http_reqs', 'rate', "higher_better")):
+        baseline = value(baseline_metrics, metric, key)
+        current = value(current_metrics, metric, key)
+        metrics_comparison[name] = {
+            "baseline": baseline,
+            "current": current,
+            "change_percent": calculate_percentage_change(baseline, current),
+            "status": get_performance_status(baseline, current, direction)
+        }
+    return metrics_comparison
 
-def generate_baseline_comparison(current_results, baseline_data):
+def generate_baseline_comparison(current_results, baseline_data, output_dir='.'):
     """Генерирует сравнение с baseline"""
 
     comparison = {
@@ -48,64 +97,72 @@ def generate_baseline_comparison(current_results, baseline_data):
     }
 
     for test_name, current_data in current_results.items():
-        baseline_metrics = baseline_data.get('metrics', {})
-        current_metrics = current_data.get('metrics', {})
-
-        # Сравнение ключевых метрик
-        comparison_result = {
+        comparison["results"].append({
             "test_name": test_name,
-            "metrics_comparison": {}
-        }
-
-        # Response time comparison
-        baseline_rt = baseline_metrics.get('http_req_duration', {}).get('values', {}).get('avg', 0)
-        current_rt = current_metrics.get('http_req_duration', {}).get('values', {}).get('avg', 0)
-
-        comparison_result["metrics_comparison"]["response_time"] = {
-            "baseline": baseline_rt,
-            "current": current_rt,
-            "change_percent": calculate_percentage_change(baseline_rt, current_rt),
-            "status": get_performance_status(baseline_rt, current_rt, "lower_better")
-        }
+            "metrics_comparison": compare_metrics(current_data.get('metrics', {}), baseline_data.get('metrics', {}))
+        })
 
-        # Error rate comparison
-        baseline_errors = baseline_metrics.get('http_req_failed', {}).get('values', {}).get('rate', 0)
-        current_errors = current_metrics.get('http_req_failed', {}).get('values', {}).get('rate', 0)
-
-        comparison_result["metrics_comparison"]["error_rate"] = {
-            "baseline": baseline_errors,
-            "current": current_errors,
-            "change_percent": calculate_percentage_change(baseline_errors, current_errors),
-            "status": get_performance_status(baseline_errors, current_errors, "lower_better")
-        }
-
-        # Throughput comparison
-        baseline_reqs = baseline_metrics.get('http_reqs', {}).get('values', {}).get('rate', 0)
-        current_reqs = current_metrics.get('http_reqs', {}).get('values', {}).get('rate', 0)
-
-        comparison_result["metrics_comparison"]["throughput"] = {
-            "baseline": baseline_reqs,
-            "current": current_reqs,
-            "change_percent": calculate_percentage_change(baseline_reqs, current_reqs),
-            "status": get_performance_status(baseline_reqs, current_reqs, "higher_better")
-        }
+    # Сохранение результатов сравнения
+    output_file = os.path.join(output_dir, f"baseline-comparison-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output_file, 'w') as f:
+        json.dump(comparison, f, indent=2)
 
-        comparison["results"].append(comparison_result)
+    print(f" Сравнение сохранено: {output_file}")
+    print_comparison_summary(comparison)
+    return comparison
+
+def rolling_baseline_metrics(store, test, before, window, environment=None):
+    """Baseline в формате summary-export: медианы статистик по последним window прогонам."""
+    metrics = {}
+    for metric, key, stat in (('http_req_duration', 'avg', 'avg'),
+                              ('http_req_duration', 'p(95)', 'p95'),
+                              ('http_req_failed', 'rate', 'rate'),
+                              ('http_reqs', 'rate', 'rate')):
+        value = store.rolling_baseline(test, metric, stat, window, before, environment=environment)
+        if value is not None:
+            metrics.setdefault(metric, {'values': {}})['values'][key] = value
+    return metrics
+
+def generate_history_comparison(summary, store, recorded, window=DEFAULT_BASELINE_WINDOW, output_dir='.',
+                                environment=None):
+    """Сравнивает каждый прогон со скользящей медианой предыдущих прогонов того же теста."""
+    comparison = {
+        "timestamp": datetime.now().isoformat(),
+        "comparison_type": "rolling_baseline",
+        "window": window,
+        "results": []
+    }
 
-    # Сохранение результатов сравнения
-    output_file = f"baseline-comparison-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    for test in summary['tests']:
+        run = store.run(recorded[test['file']][0])
+        history = store.metric_history(run['test'], 'http_req_duration', 'avg', window,
+                                       before=run['started_at'], environment=environment)
+        if not history:
+            continue
+        baseline_metrics = rolling_baseline_metrics(store, run['test'], run['started_at'], window, environment)
+        comparison["results"].append({
+            "test_name": strip_result_suffix(test['file']),
+            "baseline_runs": len(history),
+            "metrics_comparison": compare_metrics(test['k6_summary'].get('metrics', {}), baseline_metrics)
+        })
+
+    if not comparison["results"]:
+        return None
+
+    output_file = os.path.join(output_dir, f"baseline-comparison-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
     with open(output_file, 'w') as f:
         json.dump(comparison, f, indent=2)
 
     print(f" Сравнение сохранено: {output_file}")
     print_comparison_summary(comparison)
+    return comparison
 
-def generate_cross_test_comparison(results):
+def generate_cross_test_comparison(results, output_dir='.'):
     """Генерирует сравнение между разными тестами"""
 
     if len(results) < 2:
         print("Нужно минимум 2 теста для сравнения")
-        return
+        return None
 
     comparison = {
         "timestamp": datetime.now().isoformat(),
@@ -145,12 +202,13 @@ def generate_cross_test_comparison(results):
     }
 
     # Сохранение результатов
-    output_file = f"cross-test-comparison-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    output_file = os.path.join(output_dir, f"cross-test-comparison-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
     with open(output_file, 'w') as f:
         json.dump(comparison, f, indent=2)
 
     print(f" Сравнение сохранено: {output_file}")
     print_cross_test_summary(comparison)
+    return comparison
 
 def calculate_percentage_change(baseline, current):
     """Вычисляет процентное изменение"""
@@ -183,7 +241,8 @@ def print_comparison_summary(comparison):
     print("-" * 50)
 
     for result in comparison["results"]:
-        print(f"\n {result['test_name']}:")
+        baseline_runs = f" (baseline: медиана {result['baseline_runs']} прогонов)" if 'baseline_runs' in result else ""
+        print(f"\n {result['test_name']}{baseline_runs}:")
         for metric_name, metric_data in result["metrics_comparison"].items():
             status_icon = {
                 "improved": "✅",
@@ -207,12 +266,38 @@ def print_cross_test_summary(comparison):
     print(f" Лучшая пропускная способность: {analysis['best_throughput']}")
     print(f" Худшая пропускная способность: {analysis['worst_throughput']}")
 
+def has_regressions(comparison):
+    return any(metric["status"] == "degraded"
+               for result in (comparison or {}).get("results", [])
+               for metric in result["metrics_comparison"].values())
+
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python compare-results.py <results_directory> [baseline_file]")
+    parser = argparse.ArgumentParser(
+        description="Сравнение результатов k6 с baseline, историей прогонов или между тестами",
+        epilog="Example: python compare-results.py results/ --fail-on-regression")
+    parser.add_argument('results_dir', help="Каталог с результатами k6")
+    parser.add_argument('baseline_file', nargs='?', default=None, help="Baseline-файл (вместо истории)")
+    parser.add_argument('--history', metavar='PATH', default=os.environ.get(HISTORY_DB_ENV),
+                        help=f"SQLite-база истории (например {DEFAULT_HISTORY_DB}): прогоны записываются, "
+                             f"baseline - скользящая медиана. По умолчанию ${HISTORY_DB_ENV}, иначе история не ведется")
+    parser.add_argument('--no-history', action='store_true',
+                        help=f"Не использовать историю, даже если задан ${HISTORY_DB_ENV}")
+    parser.add_argument('--window', type=int, default=DEFAULT_BASELINE_WINDOW,
+                        help="Сколько предыдущих прогонов входит в скользящий baseline")
+    parser.add_argument('--sha', default=os.environ.get('GITHUB_SHA') or os.environ.get('CI_COMMIT_SHA'),
+                        help="Git sha прогона (по умолчанию из CI или имени файла)")
+    parser.add_argument('--environment', default=os.environ.get('NODE_ENV'), help="Окружение прогона")
+    parser.add_argument('--output-dir', default=None, help="Куда писать JSON сравнения (по умолчанию results_dir)")
+    parser.add_argument('--fail-on-regression', action='store_true', help="Код выхода 1 при деградации метрик")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    profiler = Profiler('compare', args.profile, args.cprofile)
+    comparison = compare_test_results(args.results_dir, args.baseline_file,
+                                      None if args.no_history else args.history, args.window,
+                                      args.sha, args.environment, args.output_dir, profiler)
+    profiler.print_summary()
+    profiler.write(args.results_dir)
+    if args.fail_on_regression and has_regressions(comparison):
+        print("❌ Обнаружена деградация относительно baseline")
         sys.exit(1)
-
-    results_dir = sys.argv[1]
-    baseline_file = sys.argv[2] if len(sys.argv) > 2 else None
-
-    compare_test_results(results_dir, baseline_file)
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# Поиск медленной деградации в длинных прогонах k6 (soak-test.js): поминутные
+# p95 задержки и доля ошибок проверяются CUSUM, Page-Hinkley и наклоном
+# Тейла-Сена (k6report.degradation). Шарды распределенного прогона
+# проверяются вместе: по колонкам их кеша, сведенным по времени (--stream -
+# по k-way слиянию их точек), сжатые артефакты - по уровню rollup с длиной
+# интервала.
+# Для CI: код выхода 1, если найдена деградация.
+
+import argparse
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+from k6report.cache import load_columns
+from k6report.decode import ROLLUP_SUFFIX, is_ndjson, iter_points, strip_result_suffix
+from k6report.degradation import (
+    DEFAULT_CUSUM_H,
+    DEFAULT_INTERVAL_S,
+    DEFAULT_LATENESS_S,
+    DEFAULT_MIN_VOTES,
+    DEFAULT_PH_THRESHOLD,
+    DEFAULT_SLOPE_TOLERANCE,
+    DEFAULT_SLOPE_WINDOW,
+    DEFAULT_WARMUP,
+    detect_columns,
+    detect_points,
+    detect_series,
+)
+from k6report.ingest import list_result_files, list_rollup_files, test_name
+from k6report.merge import group_shards, merged_columns, merged_points
+from k6report.rollup import Rollup
+from k6report.timestamps import TimestampParser
+
+SERIES_LABELS = {'p95': 'p95 задержки', 'error_rate': 'доля ошибок'}
+
+
+def stream_points(filepath):
+    """(метрика, значение, время нс) по точкам файла - без загрузки файла в память."""
+    parse_time = TimestampParser()
+    for name, point in iter_points(filepath, ('http_req_duration', 'http_req_failed')):
+        yield name, point['value'], parse_time(point['time'])
+
+
+def format_time(ns):
+    return datetime.fromtimestamp(ns / 1e9, timezone.utc).strftime('%Y-%m-%d %H:%M UTC')
+
+
+def print_report(name, report):
+    print(f"\n Деградация {name} (интервал {report['interval_s']} с):")
+    for series, result in report['series'].items():
+        label = SERIES_LABELS.get(series, series)
+        if result['baseline'] is None:
+            print(f"  ➖ {label}: мало интервалов ({result['intervals']}) для baseline")
+            continue
+        alarms = [detector for detector, state in result['detectors'].items() if state['alarm']]
+        growth = result['growth_per_hour']
+        trend = f", наклон {growth * 100:+.1f}%/ч" if growth is not None else ""
+        if result['degraded']:
+            print(f"  ❌ {label}: начало {format_time(result['onset'])} ({', '.join(alarms)}{trend})")
+        else:
+            suffix = f", сработал только {alarms[0]}" if alarms else ""
+            print(f"  ✅ {label}: baseline {result['baseline']['median']:.4g}{trend}{suffix}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Поиск медленной деградации и утечек в длинных прогонах k6",
+        epilog="Example: python detect-degradation.py results/ --tests soak --stream")
+    parser.add_argument('results_dir', help="Каталог с NDJSON-результатами k6")
+    parser.add_argument('--tests', default=None, help="Проверять только эти тесты (через запятую: soak)")
+    parser.add_argument('--stream', action='store_true',
+                        help="Потоковый проход по файлу с постоянной памятью вместо колоночного кеша")
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL_S, help="Длина интервала, с")
+    parser.add_argument('--warmup', type=int, default=DEFAULT_WARMUP, help="Интервалов на baseline")
+    parser.add_argument('--cusum-h', type=float, default=DEFAULT_CUSUM_H, help="Порог CUSUM (в сигмах baseline)")
+    parser.add_argument('--ph-threshold', type=float, default=DEFAULT_PH_THRESHOLD, help="Порог Page-Hinkley")
+    parser.add_argument('--slope-window', type=int, default=DEFAULT_SLOPE_WINDOW, help="Окно наклона, интервалов")
+    parser.add_argument('--slope-tolerance', type=float, default=DEFAULT_SLOPE_TOLERANCE,
+                        help="Допустимый рост за час относительно baseline (0.2 = +20%%)")
+    parser.add_argument('--min-votes', type=int, default=DEFAULT_MIN_VOTES,
+                        help="Сколько детекторов из трех должны сработать")
+    parser.add_argument('--lateness', type=float, default=DEFAULT_LATENESS_S,
+                        help="Допуск опоздания точек для --stream, с")
+    args = parser.parse_args()
+
+    options = {'warmup': args.warmup, 'cusum_h': args.cusum_h, 'ph_threshold': args.ph_threshold,
+               'slope_window': args.slope_window, 'slope_tolerance': args.slope_tolerance,
+               'min_votes': args.min_votes}
+    tests = set(args.tests.split(',')) if args.tests else None
+    degraded = []
+    groups = group_shards(list_result_files(args.results_dir))
+    groups += [(filename, [filename]) for filename in list_rollup_files(args.results_dir)]
+    for filename, shards in groups:
+        if tests and test_name(filename) not in tests:
+            continue
+        if len(shards) > 1:
+            # summary-export среди шардов в слитый прогон не входит (как в ingest_results)
+            shards = [shard for shard in shards if is_ndjson(os.path.join(args.results_dir, shard))] or shards[:1]
+        filepath = os.path.join(args.results_dir, shards[0])
+        if filepath.endswith(ROLLUP_SUFFIX):
+            rollup = Rollup.load(filepath)
+            if args.interval not in rollup.levels:
+                print(f"\n➖ {filename}: в rollup нет уровня {args.interval:g} с ({rollup.resolutions})")
+                continue
+            report = detect_series(rollup.series(resolution=args.interval, quantiles=(0.95,)),
+                                   args.interval, **options)
+        elif not is_ndjson(filepath):
+            continue
+        elif shards != [filename] and args.stream:
+            # шарды одного прогона: k-way слияние потоков точек по времени
+            points = merged_points([os.path.join(args.results_dir, shard) for shard in shards],
+                                   ('http_req_duration', 'http_req_failed'))
+            report = detect_points(points, args.interval, args.lateness, **options)
+        elif args.stream:
+            report = detect_points(stream_points(filepath), args.interval, args.lateness, **options)
+        else:
+            # шарды одного прогона: колонки кеша шардов, сведенные по времени
+            columns = merged_columns([load_columns(os.path.join(args.results_dir, shard), mmap=True)
+                                      for shard in shards]) if shards != [filename] else load_columns(filepath)
+            times = columns.times('http_reqs')
+            if not len(times):
+                continue
+            report = detect_columns(columns, int(times.min()), int(times.max()), args.interval, **options)
+        print_report(filename, report)
+
+        output = os.path.join(args.results_dir, f"degradation-{strip_result_suffix(filename)}.json")
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        if report['degraded']:
+            degraded.append(filename)
+
+    if degraded:
+        print(f"\n❌ Деградация: {', '.join(degraded)}")
+        sys.exit(1)
+    print("\n✅ Деградации не найдено")
@@ -1,152 +1,324 @@
 #!/usr/bin/env python3
 # Скрипт для генерации HTML-отчета по результатам нагрузочного тестирования k6.
-# Использует Plotly для интерактивных графиков.
+# Использует Plotly для интерактивных графиков; plotly.js встраивается в отчет.
 
+import argparse
 import json
-import sys
 import os
-from datetime import datetime
-import plotly.graph_objects as go
-from collections import defaultdict
-
-def parse_isoformat(timestamp_str):
-    """Парсит временную метку с наносекундами и таймзоной."""
-    if '.' in timestamp_str:
-        base, fractional = timestamp_str.split('.')
-        fractional = fractional[:6]  # Оставляем только микросекунды
-        timestamp_str = f"{base}.{fractional}Z" if 'Z' in timestamp_str else f"{base}.{fractional}+00:00"
-    return datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
-
-def parse_k6_ndjson(filepath):
-    metrics = defaultdict(list)
+from datetime import datetime, timezone
+from html import escape
+
+from k6report.aggregate import DEFAULT_QUANTILES, DEFAULT_RELATIVE_ACCURACY, MetricAggregator, quantile_key, to_k6_summary
+from k6report.cache import load_columns
+from k6report.decode import is_compressed
+from k6report.follow import DEFAULT_INTERVAL, follow_files
+from k6report.html import LAZY_RENDER_SCRIPT, iter_plotly_script, lazy_chart, typed_array
+from k6report.ingest import (
+    AGGREGATE_SOURCES,
+    LIVE_SNAPSHOT_FILENAME,
+    ensure_summary,
+    entry_aggregates,
+    list_result_files,
+    test_name,
+)
+from k6report.merge import shard_quantiles
+from k6report.parallel import WORKERS_ENV, aggregate_file, aggregate_files, resolve_workers
+from k6report.percentiles import DEFAULT_MEMORY_LIMIT, file_quantiles
+from k6report.profiling import NULL_PROFILER, Profiler, add_profile_arguments
+from k6report.thresholds import collect_thresholds, evaluate_entry
+from k6report.timestamps import NS_PER_SECOND
+
+# Метрики, которые нужны HTML-отчету; остальные строки файла не разбираются
+REPORT_METRICS = ('http_reqs', 'http_req_duration', 'http_req_failed')
+
+REPORT_FILENAME = 'k6-load-test-report.html'
+
+def parse_k6_ndjson(filepath, metrics=REPORT_METRICS, relative_accuracy=DEFAULT_RELATIVE_ACCURACY, workers=1):
+    """
+    Читает NDJSON-вывод k6 (--out json) одним проходом.
+    Точки не сохраняются: по каждой метрике ведется потоковый агрегат
+    (count/sum/min/max + скетч квантилей), поэтому память не зависит
+    от размера файла. Разбираются только строки метрик из metrics
+    (None - все метрики файла). При workers > 1 большой файл
+    агрегируется кусками в нескольких процессах.
+    """
+    aggregates = aggregate_file(filepath, metrics, workers, relative_accuracy)
+    return build_parsed_data(filepath, aggregates)
+
+def build_parsed_data(filepath, aggregates):
+    """Собирает test_info и агрегаты файла в формат parse_k6_ndjson."""
     test_info = {
-        'name': os.path.basename(filepath).replace('.json', '').split('-')[0],  # Убираем хэш
+        'name': test_name(filepath),  # Убираем хэш
         'start_time': None,
         'end_time': None,
         'total_requests': 0,
         'error_count': 0
     }
 
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            for line in f:
-                if not line.strip():
-                    continue
-                try:
-                    data = json.loads(line)
-                    if data.get('type') == 'Point':
-                        metric_name = data.get('metric')
-                        metrics[metric_name].append(data['data'])
-
-                        # Считаем общие метрики
-                        if metric_name == 'http_reqs':
-                            test_info['total_requests'] += 1
-                        elif metric_name == 'http_req_failed' and data['data']['value'] > 0:
-                            test_info['error_count'] += 1
-
-                        # Определяем время начала и окончания теста
-                        timestamp = data['data']['time']
-                        if not test_info['start_time'] or timestamp < test_info['start_time']:
-                            test_info['start_time'] = timestamp
-                        if not test_info['end_time'] or timestamp > test_info['end_time']:
-                            test_info['end_time'] = timestamp
-                except json.JSONDecodeError as e:
-                    print(f"Ошибка парсинга JSON: {line[:200]}... {e}")
-                    continue
-    except Exception as e:
-        print(f"Ошибка чтения файла {filepath}: {e}")
+    # Определяем время начала и окончания теста
+    for aggregator in aggregates.values():
+        if aggregator.start_time is not None and (test_info['start_time'] is None or aggregator.start_time < test_info['start_time']):
+            test_info['start_time'] = aggregator.start_time
+        if aggregator.end_time is not None and (test_info['end_time'] is None or aggregator.end_time > test_info['end_time']):
+            test_info['end_time'] = aggregator.end_time
+
+    # Считаем общие метрики
+    if 'http_reqs' in aggregates:
+        test_info['total_requests'] = aggregates['http_reqs'].count
+    if 'http_req_failed' in aggregates:
+        test_info['error_count'] = aggregates['http_req_failed'].nonzero
 
     return {
         'test_info': test_info,
-        'metrics': dict(metrics)
+        'metrics': aggregates
     }
 
-def calculate_metrics(metrics_data):
+def calculate_metrics(metrics_data, quantiles=DEFAULT_QUANTILES, exact_quantiles=None):
     """
-    Вычисляет агрегированные метрики из сырых данных.
+    Вычисляет итоговые метрики из потоковых агрегатов.
     Args:
-        metrics_data (dict): Сырые данные метрик.
+        metrics_data (dict): Агрегаты метрик (MetricAggregator) по имени.
+        quantiles (tuple): Квантили времени ответа для отчета.
+        exact_quantiles (dict): Точные квантили времени ответа (q -> значение),
+            заменяют оценки скетча.
     Returns:
-        dict: Агрегированные метрики.
+        dict: Агрегированные метрики. Процентили - оценки скетча
+        с относительной погрешностью не больше relative_accuracy (1%),
+        либо точные значения в определении k6.
     """
     result = {}
-    http_reqs = metrics_data.get('http_reqs', [])
-    if http_reqs:
-        result['http_reqs_count'] = len(http_reqs)
-
-    response_times = [point['value'] for point in metrics_data.get('http_req_duration', [])]
-    if response_times:
-        result['http_req_duration_avg'] = sum(response_times) / len(response_times)
-        result['http_req_duration_min'] = min(response_times)
-        result['http_req_duration_max'] = max(response_times)
-        if len(response_times) > 0:
-            result['http_req_duration_p95'] = sorted(response_times)[int(len(response_times) * 0.95)]
-            result['http_req_duration_p99'] = sorted(response_times)[int(len(response_times) * 0.99)]
-
-    total_requests = len(http_reqs)
-    error_requests = len([point for point in metrics_data.get('http_req_failed', []) if point['value'] > 0])
+    http_reqs = metrics_data.get('http_reqs')
+    total_requests = http_reqs.count if http_reqs else 0
+    if total_requests:
+        result['http_reqs_count'] = total_requests
+
+    durations = metrics_data.get('http_req_duration')
+    if durations and durations.count:
+        result['http_req_duration_avg'] = durations.avg
+        result['http_req_duration_min'] = durations.min
+        result['http_req_duration_max'] = durations.max
+        estimates = exact_quantiles or durations.quantiles(quantiles)
+        for q, value in estimates.items():
+            result[f'http_req_duration_{quantile_key(q)}'] = value
+
+    failed = metrics_data.get('http_req_failed')
+    error_requests = failed.nonzero if failed else 0
     result['error_rate'] = (error_requests / total_requests * 100) if total_requests > 0 else 0
 
-    if metrics_data.get('http_reqs') and len(metrics_data['http_reqs']) > 0:
-        start_time = metrics_data['http_reqs'][0]['time']
-        end_time = metrics_data['http_reqs'][-1]['time']
-        start_dt = parse_isoformat(start_time)
-        end_dt = parse_isoformat(end_time)
-        duration_seconds = (end_dt - start_dt).total_seconds()
+    if total_requests:
+        duration_seconds = (http_reqs.end_time - http_reqs.start_time) / NS_PER_SECOND
         result['requests_per_second'] = total_requests / duration_seconds if duration_seconds > 0 else 0
 
     return result
 
-def generate_html_report(results_dir):
+def calculate_endpoint_metrics(tag_breakdowns, tag='endpoint'):
+    """
+    Задержка и ошибки по значениям тега (по умолчанию endpoint).
+    Args:
+        tag_breakdowns (dict): Разбивки из сводки: метрика -> тег -> значение -> агрегат.
+    Returns:
+        dict: значение тега -> метрики; порядок - по убыванию числа запросов.
+    """
+    def breakdown(*metrics):
+        for metric in metrics:
+            groups = tag_breakdowns.get(metric, {}).get(tag)
+            if groups:
+                return metric, {value: MetricAggregator.from_dict(data) for value, data in groups.items()}
+        return None, {}
+
+    # Теги запроса есть у http_req_*; кастомные метрики utils.js тегируют endpoint сами
+    _, durations = breakdown('http_req_duration', 'request_duration')
+    failed_metric, failed = breakdown('http_req_failed', 'success_rate')
+
+    result = {}
+    for value, aggregator in durations.items():
+        row = {
+            'requests': aggregator.count,
+            'avg': aggregator.avg,
+            'max': aggregator.max,
+        }
+        for q, estimate in aggregator.quantiles((0.5, 0.95, 0.99)).items():
+            row[quantile_key(q)] = estimate
+        checks = failed.get(value)
+        if checks and checks.count:
+            errors = checks.nonzero if failed_metric == 'http_req_failed' else checks.count - checks.nonzero
+            row['errors'] = errors
+            row['error_rate'] = errors / checks.count * 100
+        result[value] = row
+    return result
+
+def generate_html_report(results_dir, workers=None, use_cache=True, exact=False,
+                         exact_memory_limit=DEFAULT_MEMORY_LIMIT, inline_plotly=True, profiler=NULL_PROFILER):
     all_test_data = []
     test_names = []  #
 
-    for filename in os.listdir(results_dir):
-        if filename.endswith('.json'):
-            filepath = os.path.join(results_dir, filename)
-            print(f"Обрабатываем файл: {filename}")
-            try:
-                parsed_data = parse_k6_ndjson(filepath)
-                calculated_metrics = calculate_metrics(parsed_data['metrics'])
-                test_data = {
-                    'name': parsed_data['test_info']['name'],
-                    'test_info': parsed_data['test_info'],
-                    'metrics': calculated_metrics,
-                    'raw_metrics': parsed_data['metrics']
-                }
-                all_test_data.append(test_data)
-                test_names.append(parsed_data['test_info']['name'])  # очищенное
-                print(f"  - Обработано записей: {parsed_data['test_info']['total_requests']}")
-                print(f"  - Ошибок: {parsed_data['test_info']['error_count']}")
-            except Exception as e:
-                print(f"Ошибка обработки файла {filename}: {e}")
-                continue
+    filenames = list_result_files(results_dir)
+    filepaths = [os.path.join(results_dir, filename) for filename in filenames]
+    print(f"Обрабатываем файлы: {', '.join(filenames)} (процессов: {resolve_workers(workers)})")
+    if use_cache:
+        # Данные берутся из сводки k6-summary.json, общей для всех отчетов
+        with profiler.stage('summary'):
+            summary = ensure_summary(results_dir, workers, profiler)
+        aggregates_by_file = {os.path.join(results_dir, test['file']): entry_aggregates(test)
+                              for test in summary['tests'] if test['source'] in AGGREGATE_SOURCES}
+        timeseries_by_file = {os.path.join(results_dir, test['file']): test.get('timeseries')
+                              for test in summary['tests']}
+        degradation_by_file = {os.path.join(results_dir, test['file']): test.get('degradation')
+                               for test in summary['tests']}
+        tags_by_file = {os.path.join(results_dir, test['file']): test.get('tags', {})
+                        for test in summary['tests']}
+        entries_by_file = {os.path.join(results_dir, test['file']): test for test in summary['tests']}
+        # шарды распределенного прогона сведены в одну запись сводки
+        filenames = [test['file'] for test in summary['tests']]
+        filepaths = [os.path.join(results_dir, filename) for filename in filenames]
+    else:
+        with profiler.stage('aggregate') as stage:
+            errors = {}
+            aggregates_by_file = aggregate_files(filepaths, REPORT_METRICS, workers, errors=errors)
+            stage.lines = sum(aggregator.count for aggregates in aggregates_by_file.values()
+                              for aggregator in aggregates.values())
+        for filepath, e in errors.items():
+            # битый файл пропускается, остальные попадают в отчет
+            print(f"Ошибка обработки файла {os.path.basename(filepath)}: {e}")
+        # временной ряд, разбивки по тегам и пороги считаются только по сводке
+        timeseries_by_file = {}
+        degradation_by_file = {}
+        tags_by_file = {}
+        entries_by_file = {}
+
+    for filename, filepath in zip(filenames, filepaths):
+        if filepath not in aggregates_by_file:
+            continue  # summary-export, а не потоковый вывод k6
+        print(f"Обрабатываем файл: {filename}")
+        try:
+            aggregates = {name: aggregator for name, aggregator in aggregates_by_file[filepath].items()
+                          if name in REPORT_METRICS}
+            parsed_data = build_parsed_data(filepath, aggregates)
+            exact_quantiles = None
+            if exact and entries_by_file.get(filepath, {}).get('source') != 'rollup':
+                # Точные процентили (у rollup только скетчи): срез memmap колоночного кеша или потоковое
+                # чтение со сбросом на диск; в памяти не больше exact_memory_limit значений
+                with profiler.stage('exact') as stage:
+                    if filepath in entries_by_file and 'shards' in entries_by_file[filepath]:
+                        exact_quantiles = shard_quantiles(results_dir, entries_by_file[filepath], 'http_req_duration',
+                                                         DEFAULT_QUANTILES, exact_memory_limit)
+                    else:
+                        columns = load_columns(filepath, mmap=True) if use_cache else None
+                        exact_quantiles = file_quantiles(filepath, 'http_req_duration', DEFAULT_QUANTILES,
+                                                         columns, exact_memory_limit)
+                    stage.lines = aggregates['http_req_duration'].count if 'http_req_duration' in aggregates else 0
+            calculated_metrics = calculate_metrics(parsed_data['metrics'], exact_quantiles=exact_quantiles)
+            thresholds = None
+            if filepath in entries_by_file:
+                # Пороги сценария теста (options.thresholds) по агрегатам сводки
+                with profiler.stage('thresholds'):
+                    thresholds = evaluate_entry(entries_by_file[filepath], collect_thresholds(test_name(filepath)),
+                                                results_dir, exact, exact_memory_limit)
+            test_data = {
+                'name': parsed_data['test_info']['name'],
+                'test_info': parsed_data['test_info'],
+                'metrics': calculated_metrics,
+                'aggregates': parsed_data['metrics'],
+                'timeseries': timeseries_by_file.get(filepath),
+                'degradation': degradation_by_file.get(filepath),
+                'endpoints': calculate_endpoint_metrics(tags_by_file.get(filepath, {})),
+                'thresholds': thresholds,
+            }
+            all_test_data.append(test_data)
+            test_names.append(parsed_data['test_info']['name'])  # очищенное
+            print(f"  - Обработано записей: {parsed_data['test_info']['total_requests']}")
+            print(f"  - Ошибок: {parsed_data['test_info']['error_count']}")
+        except Exception as e:
+            print(f"Ошибка обработки файла {filename}: {e}")
+            continue
 
     if not all_test_data:
         print("Нет данных для генерации отчета")
         return
 
-    html_content = create_html_structure(all_test_data, test_names)
-    report_path = os.path.join(results_dir, 'k6-load-test-report.html')
-    with open(report_path, 'w', encoding='utf-8') as f:
-        f.write(html_content)
-
-    print(f"✅ HTML-отчет сгенерирован: {report_path}")
+    with profiler.stage('render'):
+        report_path = write_html_report(results_dir, all_test_data, test_names, inline_plotly, profiler)
+    print(f"✅ HTML-отчет сгенерирован: {report_path} ({os.path.getsize(report_path) / 2**20:.1f} МБ)")
     print(f"📊 Обработано тестов: {len(all_test_data)}")
     for test in all_test_data:
         print(f"   - {test['name']}: {test['metrics'].get('http_reqs_count', 0)} запросов")
 
-def create_html_structure(test_data, test_names):
-    """Создает HTML-структуру отчета с тёмной темой."""
-    return f"""
+def write_html_report(results_dir, all_test_data, test_names, inline_plotly=True, profiler=NULL_PROFILER):
+    """
+    Пишет HTML-отчет потоком, кусок за куском, и атомарно подменяет файл
+    (его могут открывать во время записи). С включенным профайлером в
+    подвал отчета попадает стоимость стадий конвейера.
+    """
+    report_path = os.path.join(results_dir, REPORT_FILENAME)
+    tmp_path = f"{report_path}.tmp"
+    pipeline_timings = (lambda: profiler.pipeline_timings(results_dir)) if profiler.enabled else None
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.writelines(create_html_structure(all_test_data, test_names, inline_plotly, pipeline_timings))
+    os.replace(tmp_path, report_path)
+    return report_path
+
+def follow_html_report(results_dir, interval=DEFAULT_INTERVAL, idle_timeout=None, inline_plotly=True):
+    """
+    Режим слежения за идущим тестом: раз в interval секунд дочитывает
+    новые строки NDJSON-файлов каталога и перегенерирует HTML-отчет и
+    JSON-снимок k6-live.json. Работа пропорциональна только новым данным,
+    после перезапуска чтение продолжается с checkpoint.
+    """
+    def list_files():
+        return [os.path.join(results_dir, filename) for filename in list_result_files(results_dir)
+                if not is_compressed(filename)]
+
+    def refresh(states):
+        all_test_data = []
+        snapshot = []
+        for filepath, state in states.items():
+            if not state.aggregates:
+                continue  # пустой файл или summary-export
+            parsed_data = build_parsed_data(filepath, state.aggregates)
+            all_test_data.append({
+                'name': parsed_data['test_info']['name'],
+                'test_info': parsed_data['test_info'],
+                'metrics': calculate_metrics(parsed_data['metrics']),
+                'aggregates': parsed_data['metrics'],
+            })
+            snapshot.append({
+                'file': os.path.basename(filepath),
+                'offset': state.offset,
+                'lines': state.lines,
+                'k6_summary': to_k6_summary(state.aggregates, state.metric_types),
+            })
+        if not all_test_data:
+            print("Данных пока нет")
+            return
+        write_html_report(results_dir, all_test_data, [test['name'] for test in all_test_data], inline_plotly)
+        snapshot_path = os.path.join(results_dir, LIVE_SNAPSHOT_FILENAME)
+        with open(f"{snapshot_path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump({'generated_at': datetime.now().isoformat(), 'tests': snapshot}, f, ensure_ascii=False)
+        os.replace(f"{snapshot_path}.tmp", snapshot_path)
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] Отчет обновлен: " +
+              ", ".join(f"{test['name']} {test['metrics'].get('http_reqs_count', 0):,} запросов"
+                        for test in all_test_data))
+
+    print(f"Следим за {results_dir} (каждые {interval} с, Ctrl+C - остановить)")
+    follow_files(list_files, refresh, interval, idle_timeout, REPORT_METRICS)
+
+def create_html_structure(test_data, test_names, inline_plotly=True, pipeline_timings=None):
+    """
+    Создает HTML-структуру отчета с тёмной темой.
+    Генератор: куски отчета пишутся в файл по мере построения.
+    pipeline_timings - функция, возвращающая содержимое pipeline-timings.json;
+    вызывается в конце, чтобы подвал учел и саму отрисовку.
+    """
+    yield """
 <!DOCTYPE html>
 <html lang="ru">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>K6 Load Testing Report</title>
-    <script src="https://cdn.plot.ly/plotly-latest.min.js"></script>
-    <style>
+"""
+    yield from iter_plotly_script(inline_plotly)
+    yield f"""    <style>
         body {{
             font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
             margin: 0;
@@ -229,6 +401,9 @@ def create_html_structure(test_data, test_names):
             border-radius: 8px;
             background: #252525;
         }}
+        .lazy-chart {{
+            min-height: 450px;
+        }}
         h1, h2, h3 {{
             color: #ffffff;
         }}
@@ -244,17 +419,23 @@ def create_html_structure(test_data, test_names):
             <h2>Test Summary</h2>
             <p>Total Tests: {len(test_data)} | Test Types: {', '.join(test_names)}</p>
         </div>
-        {generate_test_sections(test_data)}
-        {generate_comparison_charts(test_data)}
-        {generate_detailed_table(test_data)}
+"""
+    yield from generate_test_sections(test_data)
+    yield from generate_comparison_charts(test_data)
+    yield from generate_detailed_table(test_data)
+    if pipeline_timings:
+        yield from generate_cost_footer(pipeline_timings())
+    yield """
     </div>
-</body>
+"""
+    yield LAZY_RENDER_SCRIPT
+    yield """</body>
 </html>
 """
 
 def generate_test_sections(test_data):
     """
-    Генерирует секции для каждого теста.
+    Генерирует секции для каждого теста (куски HTML).
     Использует очищенные имена тестов (без хэшей).
     """
     # Словарь для маппинга коротких имен в более читаемые названия
@@ -267,15 +448,14 @@ def generate_test_sections(test_data):
         'adaptive': 'Adaptive Test'
     }
 
-    sections = ""
-    for test in test_data:
+    for index, test in enumerate(test_data):
         # короткое
         short_name = test['name']
         # красивое
         display_name = test_name_mapping.get(short_name, short_name)
 
         metrics = test['metrics']
-        sections += f"""
+        yield f"""
         <div class="test-section">
             <h2>✔️ {display_name}</h2>
             <div class="metrics-grid">
@@ -296,16 +476,172 @@ def generate_test_sections(test_data):
                     <div class="metric-label">Req/Sec</div>
                 </div>
             </div>
+"""
+        yield from generate_timeseries_charts(test, index)
+        yield from generate_endpoint_table(test)
+        yield from generate_threshold_table(test)
+        yield """
         </div>
-        """
-    return sections
+"""
+
+def generate_timeseries_charts(test, index):
+    """
+    Графики по времени теста: RPS, доля ошибок и задержка p50/p95/p99.
+    Ряды уже прорежены LTTB при ingest (не более TIMESERIES_POINTS точек)
+    и встраиваются типизированными массивами: время - float64 (мс epoch),
+    значения - float32. Начало деградации (детектор при ingest) отмечается
+    вертикальной линией на графике своего ряда.
+    """
+    series = test.get('timeseries')
+    if not series:
+        return
+
+    # (id, заголовок, ось Y, линии, ряд детектора деградации)
+    charts = (
+        ('throughput', '🚀 Пропускная способность', 'Запросов/сек', (('rps', 'RPS', '#ff8c00'),), None),
+        ('errors', '⚠️ Доля ошибок', 'Ошибки (%)', (('error_rate', 'Error rate', '#f44336'),), 'error_rate'),
+        ('latency', '⏱️ Время ответа', 'Время (мс)', (('p50', 'p50', '#4caf50'),
+                                                    ('p95', 'p95', '#ff8c00'),
+                                                    ('p99', 'p99', '#f44336')), 'p95'),
+    )
+    degradation = (test.get('degradation') or {}).get('series', {})
+    for chart_id, title, y_title, lines, detected in charts:
+        traces = [{
+            'x': typed_array(series[key]['t'], 'f8'),
+            'y': typed_array(series[key]['y'], 'f4'),
+            'name': name,
+            'type': 'scattergl',
+            'mode': 'lines',
+            'line': {'color': color, 'width': 1.5},
+        } for key, name, color in lines if key in series and series[key]['t']]
+        if not traces:
+            continue
+        layout = {
+            'xaxis': {'type': 'date', 'tickfont': {'color': '#ffffff'}, 'gridcolor': '#444'},
+            'yaxis': {'title': {'text': y_title}, 'tickfont': {'color': '#ffffff'}, 'gridcolor': '#444',
+                      'rangemode': 'tozero'},
+            'plot_bgcolor': '#2d2d2d',
+            'paper_bgcolor': '#2d2d2d',
+            'font': {'color': '#ffffff'},
+            'margin': {'t': 20},
+            'hovermode': 'x unified',
+            'showlegend': len(traces) > 1,
+        }
+        result = degradation.get(detected) or {}
+        if result.get('degraded'):
+            onset_ms = result['onset'] // 1_000_000
+            layout['shapes'] = [{'type': 'line', 'xref': 'x', 'yref': 'paper', 'x0': onset_ms, 'x1': onset_ms,
+                                 'y0': 0, 'y1': 1, 'line': {'color': '#f44336', 'width': 2, 'dash': 'dash'}}]
+            layout['annotations'] = [{'x': onset_ms, 'xref': 'x', 'y': 1, 'yref': 'paper', 'yanchor': 'bottom',
+                                      'text': 'Начало деградации', 'showarrow': False,
+                                      'font': {'color': '#f44336'}}]
+            # ось графиков - мс epoch в UTC
+            title += f" — деградация с {datetime.fromtimestamp(onset_ms / 1000, timezone.utc).strftime('%H:%M')} UTC"
+        yield f"""
+            <div class="chart-container">
+                <h3>{title}</h3>
+                {lazy_chart(f"timeseries-{chart_id}-{index}", traces, layout)}
+            </div>
+"""
+
+def generate_endpoint_table(test):
+    """Таблица задержки и ошибок по эндпоинтам теста (тег endpoint)."""
+    endpoints = test.get('endpoints')
+    if not endpoints:
+        return
+    yield """
+            <div class="chart-container">
+                <h3>🔗 Эндпоинты</h3>
+                <table>
+                    <thead>
+                        <tr>
+                            <th>Endpoint</th>
+                            <th>Requests</th>
+                            <th>Avg</th>
+                            <th>p50</th>
+                            <th>p95</th>
+                            <th>p99</th>
+                            <th>Max</th>
+                            <th>Errors</th>
+                            <th>Error Rate</th>
+                        </tr>
+                    </thead>
+                    <tbody>
+"""
+    for endpoint, metrics in endpoints.items():
+        error_rate = metrics.get('error_rate')
+        status_class = 'status-success'
+        if error_rate is not None and error_rate > 5:
+            status_class = 'status-danger'
+        elif error_rate is not None and error_rate > 1:
+            status_class = 'status-warning'
+        yield f"""
+                    <tr>
+                        <td>{escape(str(endpoint))}</td>
+                        <td>{metrics['requests']:,}</td>
+                        <td>{metrics['avg']:.2f}ms</td>
+                        <td>{metrics['p50']:.2f}ms</td>
+                        <td>{metrics['p95']:.2f}ms</td>
+                        <td>{metrics['p99']:.2f}ms</td>
+                        <td>{metrics['max']:.2f}ms</td>
+                        <td>{metrics.get('errors', 0):,}</td>
+                        <td class="{status_class}">{f"{error_rate:.2f}%" if error_rate is not None else "-"}</td>
+                    </tr>
+"""
+    yield """
+                    </tbody>
+                </table>
+            </div>
+"""
+
+def generate_threshold_table(test):
+    """Таблица порогов k6 теста (из options.thresholds сценария)."""
+    report = test.get('thresholds')
+    if not report or not report['thresholds']:
+        return
+
+    yield """
+            <div class="chart-container">
+                <h3>🎯 Пороги k6</h3>
+                <table>
+                    <thead>
+                        <tr>
+                            <th>Метрика</th>
+                            <th>Порог</th>
+                            <th>Значение</th>
+                            <th>Статус</th>
+                        </tr>
+                    </thead>
+                    <tbody>
+"""
+    for result in report['thresholds']:
+        if result['ok'] is None:
+            status_class, status_text, value = '', '-', 'нет данных'
+        else:
+            status_class, status_text = ('status-success', 'PASS') if result['ok'] else \
+                ('status-danger', 'FAIL') if result['level'] == 'critical' else ('status-warning', 'WARN')
+            value = ('≈' if result['approximate'] else '') + f"{result['value']:.4g}"
+        yield f"""
+                        <tr>
+                            <td>{escape(result['metric'])}</td>
+                            <td>{escape(result['threshold'])}</td>
+                            <td>{value}</td>
+                            <td class="{status_class}">{status_text}</td>
+                        </tr>
+"""
+    yield """
+                    </tbody>
+                </table>
+            </div>
+"""
 
 def generate_comparison_charts(test_data):
     """
     Генерирует сравнительные графики
     """
     if len(test_data) < 2:
-        return "<p>Для сравнения нужно как минимум 2 теста.</p>"
+        yield "<p>Для сравнения нужно как минимум 2 теста.</p>"
+        return
 
     test_name_mapping = {
         'smoke': 'Smoke Test',
@@ -319,77 +655,77 @@ def generate_comparison_charts(test_data):
     display_names = [test_name_mapping.get(test['name'], test['name']) for test in test_data]
     avg_times = [test['metrics'].get('http_req_duration_avg', 0) for test in test_data]
 
-    chart_html = f"""
+    response_time_data = [{
+        'x': display_names,
+        'y': avg_times,
+        'type': 'bar',
+        'marker': {
+            'color': '#ff8c00',
+            'line': {'color': '#ff8c00', 'width': 1},
+            'cornerradius': 10,  # Скругление всех углов столбцов
+        },
+        'text': [f"{avg_time:.2f} ms" for avg_time in avg_times],
+        'textposition': 'auto',
+        'textfont': {'color': '#ff8c00'},
+        'hoverlabel': {'bgcolor': '#333333', 'font': {'color': '#ffffff'}},
+    }]
+    layout = {
+        'title': {'text': 'Сравнение среднего времени ответа по тестам', 'font': {'color': '#ffffff'}},
+        'xaxis': {'title': {'text': 'Тип теста', 'font': {'color': '#ffffff'}}, 'tickfont': {'color': '#ffffff'}},
+        'yaxis': {'title': {'text': 'Время (мс)', 'font': {'color': '#ffffff'}}, 'tickfont': {'color': '#ffffff'}},
+        'plot_bgcolor': '#2d2d2d',
+        'paper_bgcolor': '#2d2d2d',
+        'font': {'color': '#ffffff'},
+        'hovermode': 'closest',
+        'showlegend': False,
+    }
+    yield f"""
     <div class="chart-container">
         <h3>📈 Сравнение времени ответа</h3>
-        <div id="response-time-chart"></div>
-        <script>
-            var responseTimeData = [
-                {{
-                    x: {json.dumps(display_names)},
-                    y: {json.dumps(avg_times)},
-                    type: 'bar',
-                    marker: {{
-                        color: '#ff8c00',
-                        line: {{
-                            color: '#ff8c00',
-                            width: 1
-                        }},
-                        barcornerradius: 10  // Скругление всех углов столбцов
-                    }},
-                    text: {json.dumps([f"{{avg_times[i]:.2f}} ms" for i in range(len(avg_times))])},
-                    textposition: 'auto',
-                    textfont: {{color: '#ff8c00'}},
-                    hoverlabel: {{
-                        bgcolor: '#333333',
-                        font: {{color: '#ffffff'}}
-                    }}
-                }}
-            ];
-
-            var layout = {{
-                title: {{
-                    text: 'Сравнение среднего времени ответа по тестам',
-                    font: {{color: '#ffffff'}}
-                }},
-                xaxis: {{
-                    title: 'Тип теста',
-                    tickfont: {{color: '#ffffff'}},
-                    titlefont: {{color: '#ffffff'}}
-                }},
-                yaxis: {{
-                    title: 'Время (мс)',
-                    tickfont: {{color: '#ffffff'}},
-                    titlefont: {{color: '#ffffff'}}
-                }},
-                plot_bgcolor: '#2d2d2d',
-                paper_bgcolor: '#2d2d2d',
-                font: {{color: '#ffffff'}},
-                hovermode: 'closest',
-                showlegend: false
-            }};
-
-            Plotly.newPlot('response-time-chart', responseTimeData, layout);
-        </script>
+        {lazy_chart('response-time-chart', response_time_data, layout)}
     </div>
-    """
-    return chart_html
+"""
 
 def generate_detailed_table(test_data):
     """Генерирует детальную таблицу результатов."""
-    rows = ""
+    yield """
+    <div class="chart-container">
+        <h3>📋 Детальные результаты</h3>
+        <table>
+            <thead>
+                <tr>
+                    <th>Test Name</th>
+                    <th>Total Requests</th>
+                    <th>Avg Response</th>
+                    <th>95th Percentile</th>
+                    <th>Error Rate</th>
+                    <th>Req/Sec</th>
+                    <th>Status</th>
+                </tr>
+            </thead>
+            <tbody>
+"""
     for test in test_data:
         metrics = test['metrics']
         error_rate = metrics.get('error_rate', 0)
         status_class = 'status-success'
         status_text = 'PASS'
-        if error_rate > 5:
+        report = test.get('thresholds')
+        if report and report['thresholds']:
+            # статус - вердикт порогов сценария, как у k6
+            if report['verdict'] == 'fail':
+                status_class = 'status-danger'
+                status_text = 'FAIL'
+            elif report['verdict'] == 'warn':
+                status_class = 'status-warning'
+                status_text = 'WARN'
+        elif error_rate > 5:
             status_class = 'status-danger'
             status_text = 'FAIL'
         elif error_rate > 1:
             status_class = 'status-warning'
             status_text = 'WARN'
-        rows += f"""
+        yield f"""
             <tr>
                 <td>{test['name']}</td>
                 <td>{metrics.get('http_reqs_count', 0):,}</td>
@@ -399,32 +735,87 @@ def generate_detailed_table(test_data):
                 <td>{metrics.get('requests_per_second', 0):.1f}</td>
                 <td class="{status_class}">{status_text}</td>
             </tr>
-        """
-    return f"""
+"""
+    yield """
+            </tbody>
+        </table>
+    </div>
+"""
+
+def generate_cost_footer(timings):
+    """Подвал со стоимостью стадий конвейера (--profile): время, строк/с, пик RSS."""
+    yield """
     <div class="chart-container">
-        <h3>📋 Детальные результаты</h3>
+        <h3>⏱️ Стоимость конвейера</h3>
         <table>
             <thead>
                 <tr>
-                    <th>Test Name</th>
-                    <th>Total Requests</th>
-                    <th>Avg Response</th>
-                    <th>95th Percentile</th>
-                    <th>Error Rate</th>
-                    <th>Req/Sec</th>
-                    <th>Status</th>
+                    <th>Стадия</th>
+                    <th>Время, с</th>
+                    <th>CPU, с</th>
+                    <th>Строк/с</th>
+                    <th>Пик RSS, МБ</th>
                 </tr>
             </thead>
             <tbody>
-                {rows}
+"""
+    for command, record in timings['commands'].items():
+        yield f"""
+            <tr>
+                <th>{command}</th>
+                <th>{record['wall_s']:.2f}</th>
+                <th></th>
+                <th></th>
+                <th>{record['peak_rss_mb']:.0f}</th>
+            </tr>
+"""
+        for name, stage in record['stages'].items():
+            lines_per_s = f"{stage['lines_per_s']:,}" if stage['lines_per_s'] else ""
+            running = " (идет)" if stage.get('running') else ""
+            yield f"""
+            <tr>
+                <td>{'&nbsp;' * 4 * (name.count('/') + 1)}{name.rsplit('/', 1)[-1]}{running}</td>
+                <td>{stage['wall_s']:.3f}</td>
+                <td>{stage['cpu_s'] + stage['children_cpu_s']:.3f}</td>
+                <td>{lines_per_s}</td>
+                <td>{stage['peak_rss_mb']:.0f}</td>
+            </tr>
+"""
+    yield """
             </tbody>
         </table>
     </div>
-    """
+"""
 
 if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        generate_html_report(sys.argv[1])
+    parser = argparse.ArgumentParser(
+        description="Генерация HTML-отчета по результатам k6",
+        epilog="Example: python generate-html-report.py results/ --workers 0")
+    parser.add_argument('results_dir', help="Каталог с NDJSON-файлами k6 (--out json; .json, .json.gz, .json.zst)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help=f"Число процессов для разбора (0 - по числу ядер; по умолчанию ${WORKERS_ENV} или 1)")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Не использовать сводку и колоночный кеш (потоковый разбор с постоянной памятью)")
+    parser.add_argument('--exact', action='store_true',
+                        help="Точные процентили (как в k6) вместо оценок скетча; медленнее")
+    parser.add_argument('--exact-memory', type=int, default=DEFAULT_MEMORY_LIMIT * 8 // 2**20,
+                        help="Память под значения для --exact, МБ; сверх нее - внешний выбор по кешу или сброс на диск")
+    parser.add_argument('--follow', action='store_true',
+                        help="Следить за идущим тестом и обновлять отчет по мере записи результатов")
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL,
+                        help=f"Период обновления в режиме --follow, с (по умолчанию {DEFAULT_INTERVAL})")
+    parser.add_argument('--idle-timeout', type=float, default=None,
+                        help="Завершить --follow, если файлы не растут столько секунд")
+    parser.add_argument('--plotly-cdn', action='store_true',
+                        help="Подключить plotly.js с CDN (закрепленная версия) вместо встраивания; отчет меньше, но нужен интернет")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    if args.follow:
+        follow_html_report(args.results_dir, args.interval, args.idle_timeout, inline_plotly=not args.plotly_cdn)
     else:
-        print("Usage: python generate-html-report.py <results_directory>")
-        print("Example: python generate-html-report.py results/")
+        profiler = Profiler('html', args.profile, args.cprofile)
+        generate_html_report(args.results_dir, args.workers, use_cache=not args.no_cache, exact=args.exact,
+                             exact_memory_limit=args.exact_memory * 2**20 // 8, inline_plotly=not args.plotly_cdn,
+                             profiler=profiler)
+        profiler.print_summary()
+        profiler.write(args.results_dir)
@@ -1,9 +1,12 @@
 #!/usr/bin/env python3
+import argparse
 import json
-import sys
 import os
 from datetime import datetime
 
+from k6report.decode import strip_result_suffix
+from k6report.ingest import ensure_summary
+
 def generate_report(results_dir):
     report = {
         "timestamp": datetime.now().isoformat(),
@@ -11,19 +14,18 @@ def generate_report(results_dir):
         "results": []
     }
 
-    for filename in os.listdir(results_dir):
-        if filename.endswith('.json'):
-            filepath = os.path.join(results_dir, filename)
-            with open(filepath, 'r') as f:
-                data = json.load(f)
+    for test in ensure_summary(results_dir)['tests']:
+        data = test['k6_summary']
+        metrics = data.get('metrics', {})
+        state = data.get('state', {})
 
-            test_result = {
-                "test_name": filename.replace('.json', ''),
-                "metrics": data.get('metrics', {}),
-                "duration": data.get('state', {}).get('testRunDuration', 0),
-                "vus": data.get('state', {}).get('vus', 0)
-            }
-            report['results'].append(test_result)
+        test_result = {
+            "test_name": strip_result_suffix(test['file']),
+            "metrics": metrics,
+            "duration": state.get('testRunDurationMs', state.get('testRunDuration', 0)),
+            "vus": metrics.get('vus_max', {}).get('values', {}).get('max', state.get('vus', 0))
+        }
+        report['results'].append(test_result)
 
     # Сохранение сводного отчета
     report_path = os.path.join(results_dir, 'summary_report.json')
@@ -33,7 +35,9 @@ def generate_report(results_dir):
     print(f" Summary report generated: {report_path}")
 
 if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        generate_report(sys.argv[1])
-    else:
-        print("Please provide results directory")
\ No newline at end of file
+    parser = argparse.ArgumentParser(
+        description="Сводный отчет summary_report.json по результатам k6",
+        epilog="Example: python generate-report.py results/")
+    parser.add_argument('results_dir', help="Каталог с результатами k6")
+    args = parser.parse_args()
+    generate_report(args.results_dir)
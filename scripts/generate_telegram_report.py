@@ -1,36 +1,72 @@
 #!/usr/bin/env python3
 
+import argparse
 import os
-import json
+import sys
 from datetime import datetime
-import matplotlib.pyplot as plt
-from matplotlib.gridspec import GridSpec
-
-def count_errors_in_file(filepath):
-    error_count = 0
-    total_requests = 0
-
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            for line in f:
-                if not line.strip():
-                    continue
-                try:
-                    data = json.loads(line)
-                    if data.get('type') == 'Point':
-                        metric_name = data.get('metric')
-                        if metric_name == 'http_reqs':
-                            total_requests += 1
-                        elif metric_name == 'http_req_failed' and data['data']['value'] > 0:
-                            error_count += 1
-                except json.JSONDecodeError:
-                    continue
-    except Exception as e:
-        print(f"Error processing file {filepath}: {e}")
-
-    return error_count, total_requests
+
+from k6report.decode import is_ndjson, strip_result_suffix
+from k6report.ingest import (
+    AGGREGATE_SOURCES,
+    current_summary,
+    ingest_file,
+    list_result_files,
+    list_rollup_files,
+    test_name as base_test_name,
+)
+from k6report.profiling import NULL_PROFILER, Profiler, add_profile_arguments
+from k6report.scan import scan_counts
+from k6report.thresholds import collect_thresholds, evaluate_entry
+
+def count_errors(test):
+    """Ошибки и запросы теста из записи сводки k6-summary.json."""
+    if test['source'] in AGGREGATE_SOURCES:
+        metrics = test['metrics']
+        total_requests = metrics.get('http_reqs', {}).get('count', 0)
+        error_count = metrics.get('http_req_failed', {}).get('nonzero', 0)
+    else:
+        metrics = test['k6_summary'].get('metrics', {})
+        total_requests = metrics.get('http_reqs', {}).get('values', {}).get('count', 0)
+        error_count = metrics.get('http_req_failed', {}).get('values', {}).get('passes', 0)
+    return int(error_count), int(total_requests)
+
+def scan_tests(results_dir):
+    """
+    Записи тестов без полной сводки: для Telegram нужны только число
+    запросов и ошибок, их дает быстрый подсчет по mmap (k6report.scan).
+    """
+    tests = []
+    for filename in list_result_files(results_dir):
+        filepath = os.path.join(results_dir, filename)
+        try:
+            if not is_ndjson(filepath):
+                tests.append(ingest_file(filepath))
+                continue
+            counts = scan_counts(filepath)
+        except Exception as e:
+            # битый файл не должен ронять весь отчет
+            print(f"Error processing file {filename}: {e}")
+            continue
+        tests.append({
+            'file': filename,
+            'source': 'ndjson',
+            'metrics': {
+                'http_reqs': {'count': counts['http_reqs'][0]},
+                'http_req_failed': {'nonzero': counts['http_req_failed'][1]},
+            },
+        })
+    # сжатые артефакты без сырого файла: запись по rollup дешевая
+    for filename in list_rollup_files(results_dir):
+        try:
+            tests.append(ingest_file(os.path.join(results_dir, filename)))
+        except Exception as e:
+            print(f"Error processing file {filename}: {e}")
+    return tests
 
 def generate_modern_report(passed, failed, tests_data, output_file):
+    # matplotlib импортируется только при отрисовке: запуск скрипта и --help не платят за него
+    import matplotlib.pyplot as plt
+    from matplotlib.gridspec import GridSpec
 
     fig = plt.figure(figsize=(12, 16), facecolor='#1e1e1e')
     gs = GridSpec(3, 1, height_ratios=[0.7, 1, 1.5], hspace=0.4) # down block 3
@@ -164,7 +200,7 @@ def generate_modern_report(passed, failed, tests_data, output_file):
 
 def get_test_display_name(filename):
 
-    name_without_ext = filename.replace('.json', '')
+    name_without_ext = strip_result_suffix(filename)
 
     test_names = {
         'smoke': 'SMOKE TEST',
@@ -185,35 +221,53 @@ def get_test_display_name(filename):
     else:
         return name_without_ext.upper()
 
-def generate_telegram_report(results_dir):
+def generate_telegram_report(results_dir, profiler=NULL_PROFILER):
     """Генерация отчета для Telegram"""
     print(f"Scanning directory: {results_dir}")
 
     if not os.path.exists(results_dir):
         return None, f"Error: Directory {results_dir} not found"
 
-    json_files = [f for f in os.listdir(results_dir) if f.endswith('.json')]
-    print(f"Found JSON files: {json_files}")
+    # Готовая сводка (после ingest) или быстрый подсчет без нее
+    with profiler.stage('summary'):
+        summary = current_summary(results_dir)
+    if summary:
+        tests = summary['tests']
+    else:
+        with profiler.stage('scan') as stage:
+            tests = scan_tests(results_dir)
+            stage.lines = sum(test['metrics'].get('http_reqs', {}).get('count', 0) for test in tests)
+    print(f"Found JSON files: {[test['file'] for test in tests]}")
 
-    if not json_files:
+    if not tests:
         return None, "Error: No JSON test result files found"
 
-    total_tests = len(json_files)
+    total_tests = len(tests)
     passed_tests = 0
     failed_tests = 0
     tests_data = []
 
-    for filename in json_files:
-        filepath = os.path.join(results_dir, filename)
+    for test in tests:
+        filename = test['file']
         print(f"Processing file: {filename}")
-        error_count, total_requests = count_errors_in_file(filepath)
+        error_count, total_requests = count_errors(test)
 
         test_name = get_test_display_name(filename)
         error_rate = (error_count / total_requests * 100) if total_requests > 0 else 0
 
         print(f"Test: {test_name}, Requests: {total_requests}, Errors: {error_count}, Rate: {error_rate:.2f}%")
 
-        if error_rate == 0:
+        # По сводке тест судится порогами своего сценария, как в k6;
+        # без порогов (или при быстром подсчете) - любая ошибка считается провалом
+        thresholds = collect_thresholds(base_test_name(filename)) if summary else []
+        if thresholds:
+            report = evaluate_entry(test, thresholds, results_dir)
+            test_passed = report['verdict'] != 'fail'
+            print(f"Thresholds: {report['verdict']}")
+        else:
+            test_passed = error_rate == 0
+
+        if test_passed:
             passed_tests += 1
         else:
             failed_tests += 1
@@ -228,19 +282,26 @@ def generate_telegram_report(results_dir):
     tests_data.sort(key=lambda x: x['name'])
 
     image_file = os.path.join(results_dir, 'modern_test_report.png')
-    generate_modern_report(passed_tests, failed_tests, tests_data, image_file)
+    with profiler.stage('render'):
+        generate_modern_report(passed_tests, failed_tests, tests_data, image_file)
 
     return image_file, None
 
 if __name__ == "__main__":
-    import sys
-    if len(sys.argv) > 1:
-        image_file, error = generate_telegram_report(sys.argv[1])
-        if error:
-            print(f"ERROR: {error}")
-            sys.exit(1)
-        else:
-            print(f"IMAGE_FILE={image_file}")
+    parser = argparse.ArgumentParser(
+        description="PNG-отчет по результатам k6 для Telegram",
+        epilog="Example: python generate_telegram_report.py results/")
+    parser.add_argument('results_dir', help="Каталог с результатами k6")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    profiler = Profiler('telegram', args.profile, args.cprofile)
+    image_file, error = generate_telegram_report(args.results_dir, profiler)
+    profiler.print_summary()
+    if not error:
+        profiler.write(args.results_dir)
+    if error:
+        print(f"ERROR: {error}")
+        sys.exit(1)
     else:
-        print("Usage: python generate_telegram_report.py <results_directory>")
-        sys.exit(1)
\ No newline at end of file
+        print(f"IMAGE_FILE={image_file}")
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+# Единый шаг разбора результатов k6: читает каждый файл каталога один раз
+# и пишет сводку k6-summary.json, которую используют все генераторы отчетов
+# (generate-html-report.py, generate_telegram_report.py, compare-results.py,
+# generate-report.py). Шарды распределенного прогона (<тест>-<run>-shard<N>.json)
+# сливаются в один прогон.
+
+import argparse
+
+from k6report.ingest import SUMMARY_FILENAME, ingest_results
+from k6report.parallel import WORKERS_ENV
+from k6report.profiling import Profiler, add_profile_arguments
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Сводка результатов k6 для всех отчетов",
+        epilog="Example: python ingest-results.py results/ --workers 0")
+    parser.add_argument('results_dir', help="Каталог с результатами k6")
+    parser.add_argument('--workers', type=int, default=None,
+                        help=f"Число процессов для разбора (0 - по числу ядер; по умолчанию ${WORKERS_ENV} или 1)")
+    parser.add_argument('--output', default=None,
+                        help=f"Путь сводки (по умолчанию <results_dir>/{SUMMARY_FILENAME})")
+    parser.add_argument('--no-merge-shards', action='store_true',
+                        help="Не сливать шарды распределенного прогона (<тест>-<run>-shard<N>.json)")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    profiler = Profiler('ingest', args.profile, args.cprofile)
+    summary = ingest_results(args.results_dir, args.workers, args.output, profiler,
+                             merge_shards=not args.no_merge_shards)
+    print(f"✅ Сводка сгенерирована: {args.output or SUMMARY_FILENAME} ({len(summary['tests'])} тестов)")
+    for test in summary['tests']:
+        shards = f", шардов: {len(test['shards'])}" if 'shards' in test else ""
+        print(f"   - {test['file']}: {test.get('points', 0):,} точек ({test['source']}{shards})")
+    profiler.print_summary()
+    profiler.write(args.results_dir)
@@ -0,0 +1 @@
+# Общие модули обработки результатов k6 (--out json) для скриптов отчетности.
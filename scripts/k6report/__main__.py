@@ -0,0 +1,11 @@
+# python scripts/k6report ... или python -m k6report ... (из scripts/)
+import os
+import sys
+
+if not __package__:
+    # запуск каталога пакета: на sys.path нужен scripts/, а не сам пакет
+    sys.path[0] = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+from k6report.cli import main
+
+main()
@@ -0,0 +1,263 @@
+# Потоковая агрегация метрик k6 с постоянным потреблением памяти.
+# Вместо списков точек для каждой метрики храним count/sum/min/max
+# и логарифмический скетч квантилей (в стиле DDSketch/HDR).
+
+import math
+
+from k6report.timestamps import NS_PER_SECOND, TimestampParser
+
+# Квантили, которые попадают в отчеты
+DEFAULT_QUANTILES = (0.5, 0.9, 0.95, 0.99, 0.999)
+
+# Относительная погрешность квантилей: |оценка - истина| <= 1% от истины
+DEFAULT_RELATIVE_ACCURACY = 0.01
+
+# Значения по модулю меньше этого порога считаем нулем (время в мс, 1 нс)
+MIN_INDEXABLE_VALUE = 1e-6
+
+
+class QuantileSketch:
+    """
+    Скетч квантилей с гарантированной относительной погрешностью.
+
+    Значение v > 0 попадает в корзину ceil(log(v) / log(gamma)), где
+    gamma = (1 + a) / (1 - a). Любое значение из корзины i восстанавливается
+    с относительной ошибкой не больше a. Число корзин зависит только от
+    диапазона значений (для 1 мкс..1 ч при a=1% это около 1100), а не от
+    количества точек. Слияние - сложение счетчиков корзин, поэтому результат
+    не зависит от того, как поток был разбит на части.
+    """
+
+    def __init__(self, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.positive = {}
+        self.negative = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def _index(self, value):
+        return int(math.ceil(math.log(value) / self._log_gamma))
+
+    def _value(self, index):
+        return 2.0 * self.gamma ** index / (self.gamma + 1)
+
+    def add(self, value, weight=1):
+        if value > MIN_INDEXABLE_VALUE:
+            index = self._index(value)
+            self.positive[index] = self.positive.get(index, 0) + weight
+        elif value < -MIN_INDEXABLE_VALUE:
+            index = self._index(-value)
+            self.negative[index] = self.negative.get(index, 0) + weight
+        else:
+            self.zero_count += weight
+        self.count += weight
+
+    def merge(self, other):
+        """Добавляет к скетчу содержимое другого скетча с той же точностью."""
+        if other.gamma != self.gamma:
+            raise ValueError("Нельзя слить скетчи с разной точностью")
+        for index, count in other.positive.items():
+            self.positive[index] = self.positive.get(index, 0) + count
+        for index, count in other.negative.items():
+            self.negative[index] = self.negative.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        return self
+
+    def quantile(self, q):
+        """Оценка квантиля q (0..1); None для пустого скетча."""
+        return self.quantiles((q,))[q]
+
+    def quantiles(self, qs):
+        """Несколько квантилей за один проход по корзинам."""
+        result = {}
+        if self.count == 0:
+            return {q: None for q in qs}
+        buckets = [(-self._value(i), self.negative[i]) for i in sorted(self.negative, reverse=True)]
+        if self.zero_count:
+            buckets.append((0.0, self.zero_count))
+        buckets.extend((self._value(i), self.positive[i]) for i in sorted(self.positive))
+
+        pending = sorted(qs)
+        cumulative = 0
+        position = 0
+        for value, count in buckets:
+            cumulative += count
+            while position < len(pending) and cumulative > pending[position] * (self.count - 1):
+                result[pending[position]] = value
+                position += 1
+            if position == len(pending):
+                break
+        for q in pending[position:]:
+            result[q] = buckets[-1][0]
+        return result
+
+    def __len__(self):
+        return len(self.positive) + len(self.negative) + (1 if self.zero_count else 0)
+
+    def to_dict(self):
+        """Компактная JSON-сериализация: индексы и счетчики корзин списками."""
+        positive = sorted(self.positive.items())
+        negative = sorted(self.negative.items())
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'positive': [[i for i, _ in positive], [c for _, c in positive]],
+            'negative': [[i for i, _ in negative], [c for _, c in negative]],
+            'zero_count': self.zero_count,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['relative_accuracy'])
+        sketch.positive = dict(zip(*data['positive']))
+        sketch.negative = dict(zip(*data['negative']))
+        sketch.zero_count = data['zero_count']
+        sketch.count = sketch.zero_count + sum(sketch.positive.values()) + sum(sketch.negative.values())
+        return sketch
+
+
+class MetricAggregator:
+    """
+    Онлайн-агрегат одной метрики k6: count/sum/min/max, число ненулевых
+    значений (для Rate-метрик вроде http_req_failed), границы по времени
+    (int64 наносекунд UTC) и скетч квантилей.
+    """
+
+    def __init__(self, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+        self.nonzero = 0
+        self.start_time = None
+        self.end_time = None
+        self.last = None
+        self.sketch = QuantileSketch(relative_accuracy)
+
+    def add(self, value, timestamp=None):
+        self.count += 1
+        self.sum += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        if value != 0:
+            self.nonzero += 1
+        if timestamp is not None:
+            if self.start_time is None or timestamp < self.start_time:
+                self.start_time = timestamp
+            if self.end_time is None or timestamp >= self.end_time:
+                self.end_time = timestamp
+                self.last = value
+        self.sketch.add(value)
+
+    def merge(self, other):
+        """Сливает агрегат другой части потока (другого файла, диапазона байт)."""
+        if other.count == 0:
+            return self
+        self.count += other.count
+        self.sum += other.sum
+        self.nonzero += other.nonzero
+        if self.min is None or other.min < self.min:
+            self.min = other.min
+        if self.max is None or other.max > self.max:
+            self.max = other.max
+        if other.start_time is not None and (self.start_time is None or other.start_time < self.start_time):
+            self.start_time = other.start_time
+        if other.end_time is not None and (self.end_time is None or other.end_time >= self.end_time):
+            self.end_time = other.end_time
+            self.last = other.last
+        self.sketch.merge(other.sketch)
+        return self
+
+    @property
+    def avg(self):
+        return self.sum / self.count if self.count else 0
+
+    @property
+    def rate(self):
+        """Доля ненулевых значений - то же, что k6 показывает для Rate."""
+        return self.nonzero / self.count if self.count else 0
+
+    def quantile(self, q):
+        return self.sketch.quantile(q)
+
+    def quantiles(self, qs=DEFAULT_QUANTILES):
+        return self.sketch.quantiles(qs)
+
+    # Поля, которые переносятся в сводный артефакт как есть
+    _FIELDS = ('count', 'sum', 'min', 'max', 'nonzero', 'start_time', 'end_time', 'last')
+
+    def to_dict(self):
+        data = {field: getattr(self, field) for field in self._FIELDS}
+        data['sketch'] = self.sketch.to_dict()
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        aggregator = cls(data['sketch']['relative_accuracy'])
+        for field in cls._FIELDS:
+            setattr(aggregator, field, data[field])
+        aggregator.sketch = QuantileSketch.from_dict(data['sketch'])
+        return aggregator
+
+
+def quantile_key(q):
+    """Имя квантиля для ключей отчета: 0.95 -> 'p95', 0.999 -> 'p99.9'."""
+    return 'p' + f"{q * 100:.10g}"
+
+
+def aggregate_points(points, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+    """Сворачивает поток (имя метрики, data) в агрегаты по метрикам."""
+    aggregates = {}
+    parse_time = TimestampParser()
+    for metric_name, point in points:
+        aggregator = aggregates.get(metric_name)
+        if aggregator is None:
+            aggregator = aggregates[metric_name] = MetricAggregator(relative_accuracy)
+        aggregator.add(point['value'], parse_time(point['time']))
+    return aggregates
+
+
+def merge_aggregates(target, other):
+    """Сливает словарь агрегатов other в target (по именам метрик)."""
+    for metric_name, aggregator in other.items():
+        if metric_name in target:
+            target[metric_name].merge(aggregator)
+        else:
+            target[metric_name] = aggregator
+    return target
+
+
+def to_k6_summary(aggregates, metric_types=None, quantiles=(0.5, 0.9, 0.95)):
+    """
+    Агрегаты в формате summary-export k6 ({'metrics': {имя: {'values': ...}}}),
+    который читают compare-results.py и generate-report.py.
+    Тип метрики (trend/rate/counter/gauge) берется из объявлений Metric;
+    для неизвестных метрик выводятся поля trend.
+    """
+    metric_types = metric_types or {}
+    starts = [a.start_time for a in aggregates.values() if a.start_time is not None]
+    ends = [a.end_time for a in aggregates.values() if a.end_time is not None]
+    duration_s = (max(ends) - min(starts)) / NS_PER_SECOND if starts else 0
+
+    metrics = {}
+    for name, aggregator in aggregates.items():
+        metric_type = metric_types.get(name, 'trend')
+        if metric_type == 'rate':
+            values = {'rate': aggregator.rate, 'passes': aggregator.nonzero,
+                      'fails': aggregator.count - aggregator.nonzero}
+        elif metric_type == 'counter':
+            values = {'count': aggregator.sum,
+                      'rate': aggregator.sum / duration_s if duration_s > 0 else 0}
+        elif metric_type == 'gauge':
+            values = {'value': aggregator.last, 'min': aggregator.min, 'max': aggregator.max}
+        else:
+            values = {'avg': aggregator.avg, 'min': aggregator.min, 'max': aggregator.max}
+            for q, value in aggregator.quantiles(quantiles).items():
+                values['med' if q == 0.5 else f"p({q * 100:g})"] = value
+        metrics[name] = {'type': metric_type, 'values': values}
+
+    return {'metrics': metrics, 'state': {'testRunDurationMs': duration_s * 1000}}
@@ -0,0 +1,689 @@
+# Колоночный кеш разобранных результатов k6.
+# Каждый NDJSON-файл разбирается один раз и сохраняется в .npz:
+# время - int64 нс, значение - float64, имена метрик и значения тегов -
+# словарные коды. Строки отсортированы по (метрика, время), поэтому точки
+# одной метрики лежат непрерывным срезом. Ключ записи - путь+размер+mtime
+# (или хеш содержимого), устаревшие записи пересобираются автоматически.
+# Кеш пишется без сжатия, поэтому его можно открыть через memmap (mmap=True):
+# с диска читаются только страницы строк, к которым обратились.
+# Запись собирается кусками с ограниченной памятью: файл делится на
+# диапазоны байт, которые разбираются в пуле процессов; каждые CHUNK_ROWS
+# строк кусок сортируется и сбрасывается на диск частью (.part.npz), а части
+# сливаются в запись по одной метрике за раз k-путевым слиянием кусками
+# (в памяти не больше CHUNK_ROWS строк, сколько бы точек ни было у метрики).
+# Строки, не являющиеся точками или объявлениями метрик, отбрасываются до
+# разбора JSON.
+
+import hashlib
+import os
+import shutil
+import struct
+import tempfile
+import zipfile
+from array import array
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import numpy as np
+
+from k6report.aggregate import (
+    DEFAULT_RELATIVE_ACCURACY,
+    MIN_INDEXABLE_VALUE,
+    MetricAggregator,
+    QuantileSketch,
+)
+from k6report.decode import get_backend, iter_range, split_ranges
+from k6report.timestamps import parse_rfc3339_batch
+
+# Меняется при изменении формата файла кеша
+CACHE_VERSION = 1
+
+# Каталог кеша; по умолчанию .k6cache рядом с файлом результатов
+CACHE_DIR_ENV = 'K6REPORT_CACHE_DIR'
+DEFAULT_CACHE_DIRNAME = '.k6cache'
+
+# Ключ записи: 'stat' (путь+размер+mtime) или 'content' (хеш содержимого,
+# переживает копирование артефактов между джобами CI)
+CACHE_KEY_ENV = 'K6REPORT_CACHE_KEY'
+
+# Индекс записи кеша (битовые карты значений тегов, k6report.query) лежит рядом с ней
+INDEX_SUFFIX = '.index.npz'
+
+# Метки времени копятся строками и разбираются векторно пачками такого размера
+TIME_BATCH_SIZE = 2**16
+
+# Строк в куске разбора: столько держит в памяти один процесс до сброса части на диск
+CHUNK_ROWS = 2**19
+
+# Меньшие диапазоны байт не выгодно отдавать отдельному процессу
+MIN_RANGE_SIZE = 32 * 2**20
+
+PART_SUFFIX = '.part.npz'
+
+# Буфер копирования столбцов из временных .npy в запись кеша
+COPY_BUFFER_SIZE = 16 * 2**20
+
+# Данные столбцов в .npz выравниваются так же, как numpy выравнивает заголовок .npy;
+# отступ - запись extra zip с этим (незарегистрированным) идентификатором
+NPY_ALIGN = 64
+PADDING_EXTRA_ID = 0x6b36
+
+# Хеши содержимого для ключа 'content' по версии файла: cache_path вызывается
+# для файла несколько раз (warm_cache, load_columns, индекс), а полный хеш дорог
+_content_digests = {}
+
+
+def sketch_from_values(values, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+    """Векторная сборка QuantileSketch из массива значений."""
+    sketch = QuantileSketch(relative_accuracy)
+    positive = values[values > MIN_INDEXABLE_VALUE]
+    negative = -values[values < -MIN_INDEXABLE_VALUE]
+    for store, part in ((sketch.positive, positive), (sketch.negative, negative)):
+        if len(part):
+            indexes, counts = np.unique(np.ceil(np.log(part) / sketch._log_gamma).astype(np.int64),
+                                        return_counts=True)
+            store.update(zip(indexes.tolist(), counts.tolist()))
+    sketch.zero_count = int(len(values) - len(positive) - len(negative))
+    sketch.count = int(len(values))
+    return sketch
+
+
+def aggregate_arrays(values, times, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+    """
+    MetricAggregator по массивам значений и времени одной метрики.
+    times должны быть отсортированы (так хранятся срезы кеша).
+    """
+    aggregator = MetricAggregator(relative_accuracy)
+    if not len(values):
+        return aggregator
+    aggregator.count = int(len(values))
+    aggregator.sum = float(values.sum())
+    aggregator.min = float(values.min())
+    aggregator.max = float(values.max())
+    aggregator.nonzero = int(np.count_nonzero(values))
+    aggregator.start_time = int(times[0])
+    aggregator.end_time = int(times[-1])
+    aggregator.last = float(values[-1])
+    aggregator.sketch = sketch_from_values(values, relative_accuracy)
+    return aggregator
+
+
+def read_npz(path, mmap=False):
+    """
+    Массивы .npz по именам. С mmap=True несжатые одномерные массивы
+    отображаются в память (np.memmap) прямо из архива, остальные читаются.
+    """
+    if not mmap:
+        with np.load(path, allow_pickle=False) as data:
+            return {name: data[name] for name in data.files}
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, 'rb') as f:
+        for info in archive.infolist():
+            name = info.filename[:-len('.npy')]
+            if info.compress_type == zipfile.ZIP_STORED:
+                # локальный заголовок zip: 30 байт + имя + extra, дальше .npy
+                f.seek(info.header_offset)
+                name_length, extra_length = struct.unpack('<HH', f.read(30)[26:30])
+                f.seek(info.header_offset + 30 + name_length + extra_length)
+                version = np.lib.format.read_magic(f)
+                read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) \
+                    else np.lib.format.read_array_header_2_0
+                shape, _, dtype = read_header(f)
+                # невыровненные данные (кеш старой записи) читаются целиком: numpy считает по ним медленнее
+                if len(shape) == 1 and shape[0] > 0 and not dtype.hasobject and f.tell() % dtype.alignment == 0:
+                    arrays[name] = np.memmap(path, dtype=dtype, mode='r', offset=f.tell(), shape=shape)
+                    continue
+            with archive.open(info) as member:
+                arrays[name] = np.lib.format.read_array(member, allow_pickle=False)
+    return arrays
+
+
+def _header_arrays(metric_names, metric_types, offsets, tag_values):
+    """Массивы записи кеша, кроме столбцов строк (time, value, tag_codes_i)."""
+    arrays = {
+        'version': np.array(CACHE_VERSION),
+        'metric_names': np.array(metric_names, dtype=str),
+        'metric_type_names': np.array(list(metric_types), dtype=str),
+        'metric_type_values': np.array([t or '' for t in metric_types.values()], dtype=str),
+        'offsets': np.asarray(offsets, dtype=np.int64),
+        'tag_keys': np.array(list(tag_values), dtype=str),
+    }
+    for i, key in enumerate(tag_values):
+        arrays[f'tag_values_{i}'] = np.array(tag_values[key], dtype=str)
+    return arrays
+
+
+def _smallest_code_dtype(size):
+    """Наименьший знаковый тип для словарных кодов (-1 - нет тега)."""
+    for dtype in (np.int8, np.int16, np.int32):
+        if size < np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+class ColumnarResults:
+    """
+    Колоночное представление одного файла результатов k6.
+    Атрибуты:
+        metric_names (list): Словарь метрик; код метрики - индекс.
+        metric_types (dict): Тип метрики из объявлений Metric.
+        offsets (ndarray): Строки метрики i - [offsets[i], offsets[i + 1]).
+        time (ndarray int64): Время точки, нс UTC.
+        value (ndarray float64): Значение точки.
+        tag_values (dict): Тег -> список значений (словарь).
+        tags (dict): Тег -> массив кодов значений, -1 если тега нет.
+    """
+
+    def __init__(self, metric_names, metric_types, offsets, time, value, tag_values, tags):
+        self.metric_names = list(metric_names)
+        self.metric_types = dict(metric_types)
+        self.offsets = offsets
+        self.time = time
+        self.value = value
+        self.tag_values = tag_values
+        self.tags = tags
+        self._metric_codes = {name: code for code, name in enumerate(self.metric_names)}
+
+    def __len__(self):
+        return len(self.value)
+
+    def metric_slice(self, metric):
+        """Срез строк метрики; пустой срез, если метрики нет в файле."""
+        code = self._metric_codes.get(metric)
+        if code is None:
+            return slice(0, 0)
+        return slice(int(self.offsets[code]), int(self.offsets[code + 1]))
+
+    def values(self, metric):
+        return self.value[self.metric_slice(metric)]
+
+    def times(self, metric):
+        return self.time[self.metric_slice(metric)]
+
+    def aggregates(self, metrics=None, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+        """Агрегаты метрик (как parallel.aggregate_file), без чтения исходного файла."""
+        names = self.metric_names if metrics is None else [m for m in metrics if m in self._metric_codes]
+        return {name: aggregate_arrays(self.values(name), self.times(name), relative_accuracy)
+                for name in names}
+
+    def save(self, path):
+        arrays = _header_arrays(self.metric_names, self.metric_types, self.offsets, self.tag_values)
+        arrays['time'] = self.time
+        arrays['value'] = self.value
+        for i, key in enumerate(self.tag_values):
+            arrays[f'tag_codes_{i}'] = self.tags[key]
+
+        _write_npz(path, arrays)
+
+    @classmethod
+    def load(cls, path, mmap=False):
+        data = read_npz(path, mmap)
+        if int(data['version']) != CACHE_VERSION:
+            raise ValueError(f"Версия кеша {int(data['version'])} != {CACHE_VERSION}")
+        tag_keys = data['tag_keys'].tolist()
+        return cls(
+            metric_names=data['metric_names'].tolist(),
+            metric_types=dict(zip(data['metric_type_names'].tolist(),
+                                  data['metric_type_values'].tolist())),
+            offsets=np.asarray(data['offsets']),
+            time=data['time'],
+            value=data['value'],
+            tag_values={key: data[f'tag_values_{i}'].tolist() for i, key in enumerate(tag_keys)},
+            tags={key: data[f'tag_codes_{i}'] for i, key in enumerate(tag_keys)},
+        )
+
+
+class _ChunkBuilder:
+    """Строки одного куска разбора: столбцы в array, теги - по словарям куска."""
+
+    def __init__(self):
+        self.metric_codes = {}
+        self.metric_types = {}
+        self.tag_dictionaries = {}
+        self.tag_columns = {}
+        self.metric_column = array('i')
+        self.time_column = array('q')
+        self.value_column = array('d')
+        self.pending_times = []
+        self.rows = 0
+
+    def consume(self, lines, loads, decode_error, max_rows):
+        """
+        Добавляет строки итератора lines, пока в куске меньше max_rows точек.
+        Returns:
+            bool: True, если строки кончились.
+        """
+        metric_codes = self.metric_codes
+        tag_dictionaries = self.tag_dictionaries
+        tag_columns = self.tag_columns
+        metric_column = self.metric_column
+        value_column = self.value_column
+        pending_times = self.pending_times
+        rows = self.rows
+
+        for line in lines:
+            # предфильтр по байтам: JSON разбирают только точки и объявления метрик
+            if b'"Point"' not in line and b'"Metric"' not in line:
+                continue
+            try:
+                data = loads(line)
+            except decode_error:
+                continue
+            kind = data.get('type')
+            if kind == 'Metric':
+                self.metric_types[data.get('metric')] = data.get('data', {}).get('type')
+                continue
+            if kind != 'Point':
+                continue
+
+            name = data.get('metric')
+            code = metric_codes.get(name)
+            if code is None:
+                code = metric_codes[name] = len(metric_codes)
+            point = data['data']
+            metric_column.append(code)
+            pending_times.append(point['time'])
+            if len(pending_times) >= TIME_BATCH_SIZE:
+                self._flush_times()
+            value_column.append(float(point['value']))
+
+            for key, tag_value in (point.get('tags') or {}).items():
+                column = tag_columns.get(key)
+                if column is None:
+                    column = tag_columns[key] = array('i')
+                    tag_dictionaries[key] = {}
+                if len(column) < rows:
+                    # тег появился не во всех строках - дополняем пропуски
+                    column.extend([-1] * (rows - len(column)))
+                dictionary = tag_dictionaries[key]
+                tag_value = str(tag_value)
+                value_code = dictionary.get(tag_value)
+                if value_code is None:
+                    value_code = dictionary[tag_value] = len(dictionary)
+                column.append(value_code)
+            rows += 1
+            if rows >= max_rows:
+                self.rows = rows
+                return False
+        self.rows = rows
+        return True
+
+    def _flush_times(self):
+        self.time_column.frombytes(parse_rfc3339_batch(self.pending_times).tobytes())
+        self.pending_times.clear()
+
+    def columns(self):
+        """Кусок как ColumnarResults, отсортированный по (метрика, время)."""
+        self._flush_times()
+        metric = np.frombuffer(self.metric_column, dtype=np.int32)
+        time = np.frombuffer(self.time_column, dtype=np.int64)
+        value = np.frombuffer(self.value_column, dtype=np.float64)
+        order = np.lexsort((time, metric))
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(metric, minlength=len(self.metric_codes)))))
+
+        tags = {}
+        for key, column in self.tag_columns.items():
+            if len(column) < self.rows:
+                column.extend([-1] * (self.rows - len(column)))
+            codes = np.frombuffer(column, dtype=np.int32)[order]
+            tags[key] = codes.astype(_smallest_code_dtype(len(self.tag_dictionaries[key])))
+
+        return ColumnarResults(
+            metric_names=list(self.metric_codes),
+            metric_types=self.metric_types,
+            offsets=offsets.astype(np.int64),
+            time=time[order],
+            value=value[order],
+            tag_values={key: list(dictionary) for key, dictionary in self.tag_dictionaries.items()},
+            tags=tags,
+        )
+
+
+def _parse_range(filepath, start, end, part_prefix, backend=None, chunk_rows=CHUNK_ROWS):
+    """
+    Разбирает диапазон байт [start, end) файла (end=None - до конца) и
+    сбрасывает каждые chunk_rows строк отсортированной частью на диск.
+    Returns:
+        list: Пути частей в порядке строк файла.
+    """
+    _, loads, decode_error = get_backend(backend)
+    parts = []
+
+    try:
+        lines = iter_range(filepath, start, end)
+        while True:
+            builder = _ChunkBuilder()
+            exhausted = builder.consume(lines, loads, decode_error, chunk_rows)
+            if builder.rows or builder.metric_types or not parts:
+                path = f"{part_prefix}-{len(parts)}{PART_SUFFIX}"
+                builder.columns().save(path)
+                parts.append(path)
+            if exhausted:
+                break
+    except BaseException:
+        _remove_files(parts)
+        raise
+    return parts
+
+
+def _remove_files(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _remap_codes(part, key, rows, lookup):
+    """Коды тега key строк rows части в кодах общего словаря (-1 - тега нет)."""
+    if key not in part.tags:
+        return np.full(rows.stop - rows.start, -1, dtype=np.int64)
+    return lookup[part.tags[key][rows].astype(np.int64)]
+
+
+def _write_rows(parts, lookups, tag_keys, columns, ranges, position, merge):
+    """
+    Пишет строки ranges [(часть, начало, конец)] одной метрики в столбцы
+    columns с позиции position; merge=True - stable-сортировка по времени
+    (части идут в порядке файла, поэтому равное время сохраняет его).
+    Returns:
+        int: Позиция после записанных строк.
+    """
+    times = np.concatenate([parts[i].time[start:stop] for i, start, stop in ranges])
+    order = np.argsort(times, kind='stable') if merge else slice(None)
+    target = slice(position, position + len(times))
+    columns['time'][target] = times[order]
+    columns['value'][target] = np.concatenate([parts[i].value[start:stop] for i, start, stop in ranges])[order]
+    for j, key in enumerate(tag_keys):
+        columns[f'tag_codes_{j}'][target] = np.concatenate(
+            [_remap_codes(parts[i], key, slice(start, stop), lookups[i].get(key)) for i, start, stop in ranges])[order]
+    return target.stop
+
+
+def _merge_metric(parts, slices, lookups, tag_keys, columns, position, max_rows=CHUNK_ROWS):
+    """
+    k-путевое слияние отсортированных по времени срезов slices одной метрики
+    частей кусками не больше max_rows строк. Граница шага - наименьшее время
+    конца блока среди частей: строки раньше нее сливаются сортировкой, строки
+    с этим временем дописываются подряд в порядке частей.
+    """
+    block = max(1, max_rows // len(parts))
+    cursors = [rows.start for rows in slices]
+    while True:
+        active = [i for i, rows in enumerate(slices) if cursors[i] < rows.stop]
+        if not active:
+            return position
+        stops = {i: min(cursors[i] + block, slices[i].stop) for i in active}
+        bound = min(parts[i].time[stops[i] - 1] for i in active)
+        ranges = []
+        for i in active:
+            stop = cursors[i] + int(np.searchsorted(parts[i].time[cursors[i]:stops[i]], bound, side='left'))
+            ranges.append((i, cursors[i], stop))
+            cursors[i] = stop
+        position = _write_rows(parts, lookups, tag_keys, columns, ranges, position, merge=True)
+        for i in active:
+            stop = cursors[i] + int(np.searchsorted(parts[i].time[cursors[i]:slices[i].stop], bound, side='right'))
+            for start in range(cursors[i], stop, max_rows):
+                position = _write_rows(parts, lookups, tag_keys, columns, [(i, start, min(start + max_rows, stop))],
+                                       position, merge=False)
+            cursors[i] = stop
+
+
+def _merge_parts(part_paths, path, max_rows=CHUNK_ROWS):
+    """
+    Сливает отсортированные части файла в запись кеша path. Метрики
+    сливаются по одной k-путевым слиянием кусками (не больше max_rows строк
+    в памяти) во временные .npy (memmap), которые затем копируются в
+    несжатый .npz.
+    """
+    try:
+        if len(part_paths) == 1:
+            # единственная часть уже отсортирована и ее словари - общие
+            os.replace(part_paths[0], path)
+            return path
+        parts = [ColumnarResults.load(part_path, mmap=True) for part_path in part_paths]
+        metric_names = list(dict.fromkeys(name for part in parts for name in part.metric_names))
+        metric_types = {}
+        for part in parts:
+            metric_types.update(part.metric_types)
+        tag_keys = list(dict.fromkeys(key for part in parts for key in part.tags))
+        tag_values = {key: list(dict.fromkeys(value for part in parts for value in part.tag_values.get(key, ())))
+                      for key in tag_keys}
+        # код части -> общий код; последний элемент - для -1 (тега нет)
+        lookups = []
+        for part in parts:
+            lookup = {}
+            for key in part.tags:
+                index = {value: code for code, value in enumerate(tag_values[key])}
+                lookup[key] = np.array([index[value] for value in part.tag_values[key]] + [-1], dtype=np.int64)
+            lookups.append(lookup)
+        counts = [sum(part.metric_slice(name).stop - part.metric_slice(name).start for part in parts)
+                  for name in metric_names]
+        offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        arrays = _header_arrays(metric_names, metric_types, offsets, tag_values)
+        tmp_dir = tempfile.mkdtemp(prefix='merge-', dir=os.path.dirname(path))
+        try:
+            dtypes = {'time': np.int64, 'value': np.float64}
+            dtypes.update({f'tag_codes_{i}': _smallest_code_dtype(len(tag_values[key]))
+                           for i, key in enumerate(tag_keys)})
+            columns = {name: np.lib.format.open_memmap(os.path.join(tmp_dir, f'{name}.npy'), mode='w+',
+                                                       dtype=dtype, shape=(int(offsets[-1]),))
+                       for name, dtype in dtypes.items()}
+            for code, name in enumerate(metric_names):
+                slices = [part.metric_slice(name) for part in parts]
+                _merge_metric(parts, slices, lookups, tag_keys, columns, int(offsets[code]), max_rows)
+            for column in columns.values():
+                column.flush()
+            columns.clear()
+            _write_npz(path, arrays, {name: os.path.join(tmp_dir, f'{name}.npy') for name in dtypes})
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        return path
+    finally:
+        _remove_files(part_paths)
+
+
+def _aligned_member(archive, name):
+    """
+    ZipInfo члена .npz, данные которого выровнены на NPY_ALIGN байт от
+    начала файла (для memmap): отступ добирается полем extra локального
+    заголовка. Заголовок .npy сам кратен NPY_ALIGN.
+    """
+    info = zipfile.ZipInfo(name, date_time=(1980, 1, 1, 0, 0, 0))
+    # 30 байт заголовка, имя, запись zip64 (20 байт, добавит zipfile) и 4 байта своей записи extra
+    padding = -(archive.fp.tell() + 30 + len(name.encode()) + 20 + 4) % NPY_ALIGN
+    info.extra = struct.pack('<HH', PADDING_EXTRA_ID, padding) + bytes(padding)
+    return info
+
+
+def _write_npz(path, arrays, npy_files=None):
+    """
+    Несжатый .npz с выровненными данными из массивов и готовых .npy-файлов
+    (копируются потоком). Пишется во временный файл и переименовывается,
+    чтобы параллельные читатели не увидели недописанный кеш.
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for name, value in arrays.items():
+            with archive.open(_aligned_member(archive, f'{name}.npy'), 'w', force_zip64=True) as f:
+                np.lib.format.write_array(f, np.asanyarray(value), allow_pickle=False)
+        for name, npy_path in (npy_files or {}).items():
+            with archive.open(_aligned_member(archive, f'{name}.npy'), 'w', force_zip64=True) as f, \
+                    open(npy_path, 'rb') as source:
+                shutil.copyfileobj(source, f, COPY_BUFFER_SIZE)
+    os.replace(tmp_path, path)
+
+
+def build_cache(targets, workers=1, backend=None):
+    """
+    Собирает записи кеша targets (файл результатов -> путь записи).
+    Несжатые файлы делятся на диапазоны байт по числу процессов, диапазоны
+    всех файлов разбираются в одном пуле, затем части сливаются по файлам.
+    Returns:
+        dict: файл -> исключение для файлов, запись которых не собралась.
+    """
+    jobs = []
+    errors = {}
+    for filepath, path in targets.items():
+        try:
+            ranges = split_ranges(filepath, workers, MIN_RANGE_SIZE) if workers > 1 else [(0, None)]
+        except OSError as e:
+            errors[filepath] = e
+            continue
+        for start, end in ranges:
+            jobs.append((filepath, start, end, f"{path[:-len('.npz')]}.{os.getpid()}-{len(jobs)}"))
+
+    parts = {filepath: [] for filepath in targets if filepath not in errors}
+    pool = ProcessPoolExecutor(max_workers=min(workers, len(jobs))) if workers > 1 and len(jobs) > 1 else None
+    try:
+        run = pool.submit if pool else _completed
+        futures = [(filepath, run(_parse_range, filepath, start, end, prefix, backend))
+                   for filepath, start, end, prefix in jobs]
+        for filepath, future in futures:
+            try:
+                parts[filepath].extend(future.result())
+            except Exception as e:
+                errors.setdefault(filepath, e)
+        for filepath in errors:
+            _remove_files(parts.pop(filepath, []))
+        merges = [(filepath, run(_merge_parts, file_parts, targets[filepath]))
+                  for filepath, file_parts in parts.items()]
+        for filepath, future in merges:
+            try:
+                future.result()
+            except Exception as e:
+                errors[filepath] = e
+    finally:
+        if pool:
+            pool.shutdown()
+    return errors
+
+
+def _completed(function, *args):
+    """Уже выполненный Future вызова (сборка без пула)."""
+    future = Future()
+    try:
+        future.set_result(function(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def build_columns(filepath, backend=None, workers=1):
+    """
+    Разбор NDJSON-файла k6 (в т.ч. .json.gz/.json.zst) -> ColumnarResults
+    без записи кеша: части собираются во временном каталоге.
+    """
+    tmp_dir = tempfile.mkdtemp(prefix='k6cache-')
+    try:
+        path = os.path.join(tmp_dir, os.path.basename(filepath) + '.npz')
+        errors = build_cache({filepath: path}, workers, backend)
+        if errors:
+            raise errors[filepath]
+        return ColumnarResults.load(path)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def _content_digest(filepath, stat):
+    """Хеш содержимого файла; считается один раз на версию файла (путь, размер, mtime)."""
+    version = (os.path.abspath(filepath), stat.st_size, stat.st_mtime_ns)
+    if version not in _content_digests:
+        digest = hashlib.blake2b(digest_size=10)
+        with open(filepath, 'rb') as f:
+            for chunk in iter(lambda: f.read(4 * 2**20), b''):
+                digest.update(chunk)
+        _content_digests[version] = digest.digest()
+    return _content_digests[version]
+
+
+def fingerprint(filepath, key=None):
+    """Ключ записи кеша для файла (см. CACHE_KEY_ENV)."""
+    key = key or os.environ.get(CACHE_KEY_ENV, 'stat')
+    digest = hashlib.blake2b(digest_size=10)
+    stat = os.stat(filepath)
+    if key == 'content':
+        digest.update(_content_digest(filepath, stat))
+    elif key == 'stat':
+        digest.update(f"{os.path.abspath(filepath)}|{stat.st_size}|{stat.st_mtime_ns}".encode())
+    else:
+        raise ValueError(f"Неизвестный ключ кеша: {key}")
+    digest.update(str(CACHE_VERSION).encode())
+    return digest.hexdigest()
+
+
+def cache_path(filepath, cache_dir=None, key=None):
+    cache_dir = cache_dir or os.environ.get(CACHE_DIR_ENV) or \
+        os.path.join(os.path.dirname(os.path.abspath(filepath)), DEFAULT_CACHE_DIRNAME)
+    return os.path.join(cache_dir, f"{os.path.basename(filepath)}.{fingerprint(filepath, key)}.npz")
+
+
+def index_path(filepath, cache_dir=None, key=None):
+    return cache_path(filepath, cache_dir, key)[:-len('.npz')] + INDEX_SUFFIX
+
+
+def _remove_stale_entries(path):
+    """Удаляет записи кеша (и их индексы) того же файла с другим ключом."""
+    cache_dir, entry = os.path.split(path)
+    prefix = entry.rsplit('.', 2)[0] + '.'
+    current = entry[len(prefix):-len('.npz')]
+    for name in os.listdir(cache_dir):
+        rest = name[len(prefix):]
+        if name.startswith(prefix) and rest.split('.', 1)[0] != current \
+                and ((rest.endswith('.npz') and rest.count('.') == 1)
+                     or (rest.endswith(INDEX_SUFFIX) and rest.count('.') == 2)):
+            try:
+                os.remove(os.path.join(cache_dir, name))
+            except OSError:
+                pass
+
+
+def load_columns(filepath, cache_dir=None, use_cache=True, key=None, mmap=False, workers=1):
+    """
+    Колоночные данные файла через кеш: при совпадении ключа читается .npz
+    (mmap=True - отображается в память), иначе запись собирается заново
+    (build_cache, workers процессов).
+    """
+    if not use_cache:
+        return build_columns(filepath, workers=workers)
+
+    path = cache_path(filepath, cache_dir, key)
+    if os.path.exists(path):
+        try:
+            return ColumnarResults.load(path, mmap)
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile) as e:
+            print(f"Кеш {path} поврежден, пересобираем: {e}")
+
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    except OSError as e:
+        print(f"Не удалось сохранить кеш {path}: {e}")
+        return build_columns(filepath, workers=workers)
+    errors = build_cache({filepath: path}, workers)
+    if errors:
+        raise errors[filepath]
+    _remove_stale_entries(path)
+    return ColumnarResults.load(path, mmap)
+
+
+def warm_cache(filepaths, workers=1, cache_dir=None, key=None):
+    """
+    Собирает недостающие записи кеша в пуле из workers процессов. Файлы с
+    ошибкой пропускаются: ошибка повторится при их чтении (load_columns).
+    """
+    paths = {filepath: cache_path(filepath, cache_dir, key) for filepath in filepaths}
+    missing = [filepath for filepath in filepaths if not os.path.exists(paths[filepath])]
+    if workers <= 1 or not missing:
+        return missing
+    targets = {}
+    for filepath in missing:
+        path = paths[filepath]
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        except OSError:
+            continue
+        targets[filepath] = path
+    errors = build_cache(targets, workers)
+    for filepath, path in targets.items():
+        if filepath not in errors:
+            _remove_stale_entries(path)
+    return missing
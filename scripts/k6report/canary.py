@@ -0,0 +1,231 @@
+# Канареечный анализ одного прогона k6 (tests/scenarios/canary-test.js).
+# Точки делятся по тегу (по умолчанию version: control / canary), и
+# сравниваются распределения задержек целиком, а не средние:
+# - разница квантилей p50..p99 в определении k6;
+# - двухвыборочный критерий Колмогорова-Смирнова и Манна-Уитни;
+# - bootstrap-интервалы для относительной разницы квантилей.
+# Bootstrap не пересэмплирует значения: k-я порядковая статистика выборки
+# с возвращением из отсортированного x равна x[floor(n * U(k))], где U(k) -
+# k-я порядковая статистика n равномерных, U(k) ~ Beta(k, n - k + 1).
+# Поэтому B повторов квантиля - это B чисел из бета-распределения, O(B), а
+# не O(B * n), и все повторы считаются одним векторным вызовом.
+# Вердикт fail, если интервал хотя бы одного квантиля целиком выше допуска
+# (регрессия только на p99 тоже ловится) или доля ошибок canary значимо выше.
+
+import math
+
+import numpy as np
+
+from k6report.percentiles import exact_quantiles, k6_ranks
+
+DEFAULT_TAG = 'version'
+DEFAULT_CONTROL = 'control'
+DEFAULT_CANARY = 'canary'
+DEFAULT_QUANTILES = (0.5, 0.9, 0.95, 0.99)
+
+# Допустимый относительный рост квантиля задержки (0.1 = +10%)
+DEFAULT_TOLERANCE = 0.1
+# Допустимый абсолютный рост доли ошибок (0.01 = +1 п.п.)
+DEFAULT_MAX_ERROR_INCREASE = 0.01
+DEFAULT_ALPHA = 0.05
+DEFAULT_ITERATIONS = 2000
+
+# Меньше точек в группе - вердикт inconclusive
+MIN_SAMPLES = 20
+
+
+def tag_values(columns, metric, tag, value):
+    """Значения метрики в точках с тегом tag=value."""
+    rows = columns.metric_slice(metric)
+    if tag not in columns.tags or value not in columns.tag_values[tag]:
+        return np.empty(0, dtype=np.float64)
+    code = columns.tag_values[tag].index(value)
+    return columns.value[rows][columns.tags[tag][rows] == code]
+
+
+def ks_test(a, b):
+    """
+    Двухвыборочный критерий Колмогорова-Смирнова.
+    Returns:
+        tuple: (статистика D, асимптотическое p-value).
+    """
+    a = np.sort(a)
+    b = np.sort(b)
+    grid = np.concatenate([a, b])
+    cdf_a = np.searchsorted(a, grid, side='right') / len(a)
+    cdf_b = np.searchsorted(b, grid, side='right') / len(b)
+    statistic = float(np.abs(cdf_a - cdf_b).max())
+
+    en = math.sqrt(len(a) * len(b) / (len(a) + len(b)))
+    lam = (en + 0.12 + 0.11 / en) * statistic
+    if lam < 1e-3:
+        return statistic, 1.0
+    terms = [2 * (-1) ** (k - 1) * math.exp(-2 * k * k * lam * lam) for k in range(1, 101)]
+    return statistic, float(min(max(sum(terms), 0.0), 1.0))
+
+
+def mann_whitney(control, canary):
+    """
+    Критерий Манна-Уитни (нормальное приближение с поправкой на связки).
+    Returns:
+        tuple: (U canary, p-value, P(canary > control) + P(=)/2).
+    """
+    n1, n2 = len(canary), len(control)
+    values, inverse, counts = np.unique(np.concatenate([canary, control]), return_inverse=True,
+                                        return_counts=True)
+    # средний ранг группы одинаковых значений
+    ranks = np.cumsum(counts) - (counts - 1) / 2
+    u = float(ranks[inverse[:n1]].sum()) - n1 * (n1 + 1) / 2
+
+    n = n1 + n2
+    ties = float((counts.astype(np.float64) ** 3 - counts).sum())
+    variance = n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1)))
+    if variance <= 0:
+        return u, 1.0, 0.5
+    z = (u - n1 * n2 / 2) / math.sqrt(variance)
+    return u, math.erfc(abs(z) / math.sqrt(2)), u / (n1 * n2)
+
+
+def bootstrap_quantiles(sorted_values, quantiles, iterations=DEFAULT_ITERATIONS, rng=None):
+    """
+    Bootstrap-повторы квантилей k6 без пересэмплирования (см. заголовок модуля).
+    Returns:
+        dict: {q: ndarray из iterations значений}.
+    """
+    rng = rng or np.random.default_rng()
+    n = len(sorted_values)
+    samples = {}
+    for q, (lower, upper, fraction) in k6_ranks(n, quantiles).items():
+        # U(lower+1) ~ Beta(lower+1, n-lower); следующая статистика - минимум
+        # оставшихся n-lower-1 равномерных на [U, 1]
+        u_lower = rng.beta(lower + 1, n - lower, iterations)
+        if upper > lower:
+            u_upper = u_lower + (1 - u_lower) * rng.beta(1, n - lower - 1, iterations)
+        else:
+            u_upper = u_lower
+        lower_values = sorted_values[np.minimum((u_lower * n).astype(np.int64), n - 1)]
+        upper_values = sorted_values[np.minimum((u_upper * n).astype(np.int64), n - 1)]
+        samples[q] = lower_values + (upper_values - lower_values) * fraction
+    return samples
+
+
+def _relative(canary, control):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(control > 0, canary / control - 1, np.nan)
+
+
+def error_rate_test(control, canary):
+    """Доли ненулевых точек rate-метрики и p-value z-критерия для двух долей."""
+    n1, n2 = len(control), len(canary)
+    p1 = float(np.count_nonzero(control)) / n1 if n1 else 0.0
+    p2 = float(np.count_nonzero(canary)) / n2 if n2 else 0.0
+    if not n1 or not n2:
+        return p1, p2, 1.0
+    pooled = (p1 * n1 + p2 * n2) / (n1 + n2)
+    variance = pooled * (1 - pooled) * (1 / n1 + 1 / n2)
+    if variance <= 0:
+        return p1, p2, 1.0
+    z = (p2 - p1) / math.sqrt(variance)
+    return p1, p2, math.erfc(abs(z) / math.sqrt(2))
+
+
+def compare_distributions(control, canary, quantiles=DEFAULT_QUANTILES, tolerance=DEFAULT_TOLERANCE,
+                          alpha=DEFAULT_ALPHA, iterations=DEFAULT_ITERATIONS, seed=None):
+    """
+    Квантиль-в-квантиль сравнение двух выборок задержек.
+    Returns:
+        dict: quantiles (значения, разница, интервал, регрессия), ks, mann_whitney.
+    """
+    rng = np.random.default_rng(seed)
+    control = np.sort(np.asarray(control, dtype=np.float64))
+    canary = np.sort(np.asarray(canary, dtype=np.float64))
+    control_q = exact_quantiles(control, quantiles)
+    canary_q = exact_quantiles(canary, quantiles)
+    control_boot = bootstrap_quantiles(control, quantiles, iterations, rng)
+    canary_boot = bootstrap_quantiles(canary, quantiles, iterations, rng)
+
+    result = {}
+    for q in quantiles:
+        deltas = _relative(canary_boot[q], control_boot[q])
+        deltas = deltas[~np.isnan(deltas)]
+        relative = float(_relative(np.float64(canary_q[q]), np.float64(control_q[q])))
+        # квантиль control = 0: относительная разница не определена, интервал тоже не строим
+        low, high = (np.quantile(deltas, [alpha / 2, 1 - alpha / 2]).tolist()
+                     if len(deltas) and not math.isnan(relative) else (None, None))
+        result[f"p({q * 100:g})"] = {
+            'control': control_q[q],
+            'canary': canary_q[q],
+            'delta': canary_q[q] - control_q[q],
+            'relative_delta': None if math.isnan(relative) else relative,
+            'ci': [low, high],
+            # регрессия - весь интервал выше допуска, а не только точечная оценка
+            'regression': low is not None and low > tolerance,
+        }
+
+    ks_statistic, ks_p = ks_test(control, canary)
+    u, mw_p, superiority = mann_whitney(control, canary)
+    return {
+        'quantiles': result,
+        'ks': {'statistic': ks_statistic, 'p_value': ks_p},
+        'mann_whitney': {'u': u, 'p_value': mw_p, 'canary_slower_probability': superiority},
+    }
+
+
+def analyze_canary(columns, tag=DEFAULT_TAG, control=DEFAULT_CONTROL, canary=DEFAULT_CANARY,
+                   metric='http_req_duration', error_metric='http_req_failed', quantiles=DEFAULT_QUANTILES,
+                   tolerance=DEFAULT_TOLERANCE, max_error_increase=DEFAULT_MAX_ERROR_INCREASE,
+                   alpha=DEFAULT_ALPHA, iterations=DEFAULT_ITERATIONS, seed=None):
+    """
+    Канареечный анализ колоночных данных одного прогона.
+    Returns:
+        dict: отчет с verdict 'pass' | 'fail' | 'inconclusive' и reasons.
+    """
+    control_values = tag_values(columns, metric, tag, control)
+    canary_values = tag_values(columns, metric, tag, canary)
+    report = {
+        'tag': tag,
+        'control': control,
+        'canary': canary,
+        'metric': metric,
+        'samples': {'control': len(control_values), 'canary': len(canary_values)},
+        'tolerance': tolerance,
+        'alpha': alpha,
+        'reasons': [],
+    }
+    if min(len(control_values), len(canary_values)) < MIN_SAMPLES:
+        report['verdict'] = 'inconclusive'
+        report['reasons'].append(f"Мало точек {metric}: нужно не меньше {MIN_SAMPLES} в каждой группе")
+        return report
+
+    report.update(compare_distributions(control_values, canary_values, quantiles, tolerance, alpha,
+                                        iterations, seed))
+    for name, stats in report['quantiles'].items():
+        if stats['regression']:
+            report['reasons'].append(
+                f"{metric} {name}: {stats['control']:.2f} → {stats['canary']:.2f} "
+                f"(+{stats['relative_delta'] * 100:.1f}%, интервал от +{stats['ci'][0] * 100:.1f}%)")
+
+    control_errors = tag_values(columns, error_metric, tag, control)
+    canary_errors = tag_values(columns, error_metric, tag, canary)
+    if len(control_errors) and len(canary_errors):
+        control_rate, canary_rate, p_value = error_rate_test(control_errors, canary_errors)
+        report['errors'] = {'metric': error_metric, 'control': control_rate, 'canary': canary_rate,
+                            'p_value': p_value}
+        if canary_rate - control_rate > max_error_increase and p_value < alpha:
+            report['reasons'].append(f"{error_metric}: {control_rate * 100:.2f}% → {canary_rate * 100:.2f}%")
+
+    # canary_performance_delta - парные замеры canary - control из самого сценария
+    paired = columns.values('canary_performance_delta')
+    if len(paired):
+        report['paired_delta'] = {f"p({q * 100:g})": value for q, value in exact_quantiles(paired, quantiles).items()}
+
+    undefined = [name for name, stats in report['quantiles'].items() if stats['relative_delta'] is None]
+    if report['reasons']:
+        report['verdict'] = 'fail'
+    elif undefined:
+        report['verdict'] = 'inconclusive'
+        report['reasons'].append(f"{metric} {', '.join(undefined)}: квантиль {control} равен 0, "
+                                 f"относительную разницу не оценить")
+    else:
+        report['verdict'] = 'pass'
+    return report
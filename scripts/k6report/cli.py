@@ -0,0 +1,50 @@
+# Единая точка входа отчетности:
+#   python scripts/k6report <команда> [аргументы команды]
+# Команда - скрипт из scripts/: аргументы разбирает сам скрипт, а
+# запускается он через runpy только после выбора команды. Поэтому
+# `--help` не импортирует ничего, кроме argparse, а plotly, matplotlib и
+# pandas подгружаются только внутри команды, которая рисует.
+
+import argparse
+import os
+import runpy
+import sys
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Команда -> (скрипт в scripts/, описание)
+COMMANDS = {
+    'ingest': ('ingest-results.py', "Разбор результатов в сводку k6-summary.json"),
+    'summary': ('generate-report.py', "Сводный отчет summary_report.json"),
+    'html': ('generate-html-report.py', "HTML-отчет (в том числе --follow)"),
+    'telegram': ('generate_telegram_report.py', "PNG-отчет для Telegram"),
+    'compare': ('compare-results.py', "Сравнение с baseline или историей прогонов"),
+    'canary': ('canary-analysis.py', "Канареечный анализ control/canary"),
+    'thresholds': ('check-thresholds.py', "Проверка порогов k6 и бюджетов по сводке (CI gate)"),
+    'degradation': ('detect-degradation.py', "Поиск медленной деградации в длинных прогонах"),
+    'compact': ('compact-results.py', "Сжатие сырых результатов в ряды 1 с / 10 с / 1 мин (rollup)"),
+    'query': ('query-results.py', "Ad-hoc запрос: метрика, фильтры по тегам, диапазон, агрегации"),
+    'exporter': ('prometheus-exporter.py', "Экспортер метрик для Prometheus"),
+    'replay': ('replay-to-influx.py', "Загрузка результатов в InfluxDB"),
+}
+
+
+def build_parser():
+    commands = "\n".join(f"  {name:<12} {text}" for name, (_, text) in COMMANDS.items())
+    parser = argparse.ArgumentParser(
+        prog='k6report',
+        description=f"Отчеты по результатам k6\n\nкоманды:\n{commands}",
+        epilog="Аргументы команды: k6report <команда> --help",
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=COMMANDS, metavar='command', help="Команда (см. выше)")
+    parser.add_argument('args', nargs=argparse.REMAINDER, help=argparse.SUPPRESS)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    script = os.path.join(SCRIPTS_DIR, COMMANDS[args.command][0])
+    if SCRIPTS_DIR not in sys.path:
+        sys.path.insert(0, SCRIPTS_DIR)
+    sys.argv = [script, *args.args]
+    runpy.run_path(script, run_name='__main__')
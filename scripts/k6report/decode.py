@@ -0,0 +1,302 @@
+# Быстрое чтение NDJSON-вывода k6 (--out json).
+# Строки читаются как bytes; до полного разбора JSON по сырым байтам
+# проверяется имя метрики, и декодируются только нужные отчету строки.
+# JSON-парсер выбирается автоматически: orjson / pysimdjson, если
+# установлены, иначе стандартный json. Сжатые файлы (.json.gz, .json.zst)
+# распаковываются в фоновом потоке параллельно с разбором.
+
+import gzip
+import json
+import os
+import queue
+import threading
+
+# Переменная окружения для принудительного выбора парсера
+BACKEND_ENV = 'K6REPORT_JSON'
+
+# Так k6 начинает каждую строку точки: {"metric":"http_reqs","type":"Point",...}
+POINT_PREFIX = b'{"metric":"'
+
+# Расширения файлов результатов k6 (--out json=...); сжатые читаются прозрачно
+RESULT_SUFFIXES = ('.json', '.json.gz', '.json.zst')
+COMPRESSED_SUFFIXES = ('.gz', '.zst')
+
+# Сжатые ряды артефакта (k6report.rollup), остающиеся после удаления сырого NDJSON
+ROLLUP_SUFFIX = '.rollup.npz'
+
+# Фоновая распаковка: размер читаемого куска и число пачек строк в очереди
+DECOMPRESS_CHUNK_SIZE = 4 * 2**20
+DECOMPRESS_QUEUE_SIZE = 8
+
+
+def _load_orjson():
+    import orjson
+    return orjson.loads, orjson.JSONDecodeError
+
+
+def _load_simdjson():
+    import simdjson
+    parser = simdjson.Parser()
+
+    def loads(raw):
+        return parser.parse(raw).as_dict()
+
+    return loads, ValueError
+
+
+def _load_stdlib():
+    return json.loads, json.JSONDecodeError
+
+
+# Порядок важен: первый доступный backend используется по умолчанию
+BACKENDS = {
+    'orjson': _load_orjson,
+    'simdjson': _load_simdjson,
+    'json': _load_stdlib,
+}
+
+_backend_cache = {}
+
+
+def get_backend(name=None):
+    """
+    Возвращает (имя, loads, тип ошибки) для JSON-парсера.
+    Без имени берется K6REPORT_JSON или первый установленный backend.
+    """
+    name = name or os.environ.get(BACKEND_ENV)
+    if name in _backend_cache:
+        return _backend_cache[name]
+    candidates = [name] if name else list(BACKENDS)
+    for candidate in candidates:
+        if candidate not in BACKENDS:
+            raise ValueError(f"Неизвестный JSON backend: {candidate}")
+        try:
+            loads, error = BACKENDS[candidate]()
+        except ImportError:
+            if name:
+                raise
+            continue
+        _backend_cache[name] = (candidate, loads, error)
+        return _backend_cache[name]
+    raise ImportError("Нет доступного JSON backend")
+
+
+def line_metric(line):
+    """
+    Имя метрики строки-точки по сырым байтам без разбора JSON.
+    None - строка не в каноническом формате k6 (другой порядок ключей,
+    пробелы), ее нужно проверять полным разбором.
+    """
+    if line.startswith(POINT_PREFIX):
+        end = line.find(b'"', len(POINT_PREFIX))
+        if end > 0:
+            return line[len(POINT_PREFIX):end]
+    return None
+
+
+def make_line_filter(metrics):
+    """
+    Предфильтр строк по сырым байтам.
+    Возвращает функцию line -> bool: False только когда строка точно
+    не относится к нужным метрикам (или является объявлением Metric).
+    """
+    if metrics is None:
+        return lambda line: b'"Point"' in line
+    wanted = {name.encode() for name in metrics}
+    needles = [b'"' + name + b'"' for name in wanted]
+
+    def accept(line):
+        name = line_metric(line)
+        if name is not None:
+            return name in wanted
+        if b'"Point"' not in line:
+            return False
+        return any(needle in line for needle in needles)
+
+    return accept
+
+
+def is_result_file(filename):
+    return filename.endswith(RESULT_SUFFIXES)
+
+
+def strip_result_suffix(filename):
+    """load-abc.json.gz -> load-abc (и load-abc.rollup.npz -> load-abc)."""
+    for suffix in sorted(RESULT_SUFFIXES + (ROLLUP_SUFFIX,), key=len, reverse=True):
+        if filename.endswith(suffix):
+            return filename[:-len(suffix)]
+    return filename
+
+
+def is_compressed(filepath):
+    return filepath.endswith(COMPRESSED_SUFFIXES)
+
+
+def open_results(filepath):
+    """Открывает файл результатов в бинарном режиме, распаковывая .gz/.zst."""
+    if filepath.endswith('.gz'):
+        return gzip.open(filepath, 'rb')
+    if filepath.endswith('.zst'):
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError(f"Для чтения {filepath} нужен пакет zstandard (pip install zstandard)")
+        return zstandard.ZstdDecompressor().stream_reader(open(filepath, 'rb'), read_across_frames=True,
+                                                          closefd=True)
+    return open(filepath, 'rb')
+
+
+def _decompress_batches(filepath, batches, stop, chunk_size):
+    """Фоновый поток: распаковывает файл и кладет в очередь пачки целых строк."""
+    def put(item):
+        while not stop.is_set():
+            try:
+                batches.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    try:
+        with open_results(filepath) as f:
+            tail = b''
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                chunk = tail + chunk
+                cut = chunk.rfind(b'\n') + 1
+                tail = chunk[cut:]
+                if cut and not put(chunk[:cut].splitlines()):
+                    return
+            if tail:
+                put([tail])
+    except BaseException as e:
+        put(e)
+    finally:
+        put(None)
+
+
+def iter_lines(filepath, chunk_size=DECOMPRESS_CHUNK_SIZE, queue_size=DECOMPRESS_QUEUE_SIZE):
+    """
+    Строки файла результатов (bytes).
+    Для .gz/.zst распаковка идет в фоновом потоке через ограниченную
+    очередь пачек строк, поэтому zlib/zstd (отпускают GIL) работают
+    одновременно с разбором JSON, а память ограничена queue_size пачками.
+    """
+    if not is_compressed(filepath):
+        with open(filepath, 'rb') as f:
+            yield from f
+        return
+
+    batches = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    reader = threading.Thread(target=_decompress_batches, args=(filepath, batches, stop, chunk_size),
+                              name=f"decompress-{os.path.basename(filepath)}", daemon=True)
+    reader.start()
+    try:
+        while True:
+            batch = batches.get()
+            if batch is None:
+                break
+            if isinstance(batch, BaseException):
+                raise batch
+            yield from batch
+    finally:
+        stop.set()
+        reader.join()
+
+
+def iter_points(filepath, metrics=None, backend=None, on_error=None, start=0, end=None):
+    """
+    Генератор (имя метрики, data) по точкам файла.
+    Args:
+        filepath (str): Путь к NDJSON-файлу k6 (.json, .json.gz, .json.zst).
+        metrics (iterable): Имена нужных метрик; None - все точки.
+        backend (str): Имя JSON backend ('orjson', 'simdjson', 'json').
+        on_error (callable): Вызывается как on_error(line, exc) для битых строк.
+        start, end (int): Диапазон байт [start, end); start должен быть
+            началом строки. Читаются строки, начинающиеся в диапазоне.
+            Только для несжатых файлов.
+    """
+    _, loads, decode_error = get_backend(backend)
+    wanted = set(metrics) if metrics is not None else None
+    accept = make_line_filter(wanted)
+
+    for line in iter_range(filepath, start, end):
+        if not accept(line):
+            continue
+        try:
+            data = loads(line)
+        except decode_error as e:
+            if on_error:
+                on_error(line, e)
+            continue
+        if data.get('type') != 'Point':
+            continue
+        metric_name = data.get('metric')
+        if wanted is not None and metric_name not in wanted:
+            continue
+        yield metric_name, data['data']
+
+
+def iter_range(filepath, start, end):
+    """Строки, начинающиеся в диапазоне байт [start, end) несжатого файла."""
+    if not start and end is None:
+        yield from iter_lines(filepath)
+        return
+    if is_compressed(filepath):
+        raise ValueError(f"Диапазоны байт не поддерживаются для сжатого файла {filepath}")
+    with open(filepath, 'rb') as f:
+        f.seek(start)
+        position = start
+        for line in f:
+            if position >= end:
+                break
+            position += len(line)
+            yield line
+
+
+def split_ranges(filepath, parts, min_size=0):
+    """
+    Делит файл на не более чем parts диапазонов байт [start, end),
+    границы которых совпадают с началом строк. Диапазоны меньше
+    min_size не создаются.
+    """
+    size = os.path.getsize(filepath)
+    if is_compressed(filepath):
+        return [(0, None)]  # сжатый поток нельзя читать с середины
+    if min_size:
+        parts = min(parts, max(1, size // min_size))
+    if parts <= 1 or size == 0:
+        return [(0, size)]
+
+    boundaries = [0]
+    with open(filepath, 'rb') as f:
+        for i in range(1, parts):
+            f.seek(size * i // parts)
+            f.readline()  # дочитываем строку, на середину которой попали
+            boundary = f.tell()
+            if boundaries[-1] < boundary < size:
+                boundaries.append(boundary)
+    boundaries.append(size)
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def is_ndjson(filepath):
+    """
+    True, если файл - потоковый вывод k6 (--out json), а не summary-export
+    (--summary-export): первая строка - отдельный объект Metric/Point.
+    """
+    _, loads, decode_error = get_backend()
+    with open_results(filepath) as f:
+        head = f.read(2**20)
+    for line in head.split(b'\n'):
+        if not line.strip():
+            continue
+        try:
+            data = loads(line)
+        except decode_error:
+            return False
+        return isinstance(data, dict) and data.get('type') in ('Metric', 'Point')
+    return False
@@ -0,0 +1,296 @@
+# Детектор медленной деградации и утечек в длинных (soak) прогонах.
+# Ряд по интервалам (по умолчанию минута): p95 http_req_duration и доля
+# ошибок http_req_failed. Интервалы подаются по одному, по мере закрытия,
+# и проверяются онлайн-тестами с постоянной памятью:
+# - CUSUM: накопление превышений над baseline (ступенька вверх);
+# - Page-Hinkley: накопленное отклонение от текущего среднего;
+# - робастный наклон Тейла-Сена по скользящему окну последних интервалов
+#   (медленный монотонный рост - типичный след утечки).
+# Baseline - медиана и MAD первых warmup интервалов, значения нормируются
+# на него. Ряд деградировал, если сработали не менее min_votes детекторов;
+# начало (onset) - самая ранняя оценка начала среди сработавших.
+# Точки можно подавать и потоком: IntervalStream держит открытыми только
+# интервалы в пределах допуска опоздания точек, поэтому память не зависит
+# от длины прогона.
+
+from collections import deque
+
+import numpy as np
+
+from k6report.aggregate import DEFAULT_RELATIVE_ACCURACY, QuantileSketch
+from k6report.timeseries import build_series
+from k6report.timestamps import NS_PER_SECOND
+
+DEFAULT_INTERVAL_S = 60
+# Интервалов на baseline; детекторы начинают работу после них
+DEFAULT_WARMUP = 10
+DEFAULT_CUSUM_K = 0.5
+DEFAULT_CUSUM_H = 5.0
+DEFAULT_PH_DELTA = 0.5
+DEFAULT_PH_THRESHOLD = 10.0
+DEFAULT_SLOPE_WINDOW = 30
+# Допустимый рост за час относительно baseline (0.2 = +20% в час)
+DEFAULT_SLOPE_TOLERANCE = 0.2
+# Доля положительных попарных наклонов окна, при которой рост считается монотонным
+SLOPE_AGREEMENT = 0.7
+DEFAULT_MIN_VOTES = 2
+
+# Насколько поздно (относительно самой поздней точки) может прийти точка интервала
+DEFAULT_LATENESS_S = 5
+
+# Ряд -> (минимальный масштаб, доля baseline): нижняя граница разброса при
+# нормировке, чтобы почти постоянный ряд не давал тревог на шуме
+SERIES_SCALES = {
+    'p95': (1.0, 0.05),          # мс
+    'error_rate': (0.01, 0.05),  # доля
+}
+
+
+class Cusum:
+    """Односторонний CUSUM по нормированным значениям z."""
+
+    def __init__(self, k=DEFAULT_CUSUM_K, h=DEFAULT_CUSUM_H):
+        self.k = k
+        self.h = h
+        self.statistic = 0.0
+        self.started = None
+        self.alarm = None
+
+    def update(self, z, time):
+        if self.statistic == 0:
+            self.started = time  # возможное начало сдвига
+        self.statistic = max(0.0, self.statistic + z - self.k)
+        if self.alarm is None and self.statistic > self.h:
+            self.alarm = {'onset': self.started, 'detected_at': time}
+
+
+class PageHinkley:
+    """Тест Page-Hinkley на рост среднего нормированных значений z."""
+
+    def __init__(self, delta=DEFAULT_PH_DELTA, threshold=DEFAULT_PH_THRESHOLD):
+        self.delta = delta
+        self.threshold = threshold
+        self.count = 0
+        self.mean = 0.0
+        self.statistic = 0.0
+        self.minimum = 0.0
+        self.onset = None
+        self.alarm = None
+
+    def update(self, z, time):
+        self.count += 1
+        self.mean += (z - self.mean) / self.count
+        self.statistic += z - self.mean - self.delta
+        if self.statistic < self.minimum:
+            self.minimum = self.statistic
+            self.onset = None  # начало - первый интервал после минимума
+        elif self.onset is None:
+            self.onset = time
+        if self.alarm is None and self.statistic - self.minimum > self.threshold:
+            self.alarm = {'onset': self.onset, 'detected_at': time}
+
+
+class TheilSenSlope:
+    """
+    Наклон Тейла-Сена (медиана попарных наклонов) по окну последних
+    window значений, относительных к baseline; окно фиксированной длины.
+    """
+
+    def __init__(self, intervals_per_hour, window=DEFAULT_SLOPE_WINDOW, tolerance=DEFAULT_SLOPE_TOLERANCE):
+        self.intervals_per_hour = intervals_per_hour
+        self.tolerance = tolerance
+        self.values = deque(maxlen=window)
+        self.times = deque(maxlen=window)
+        self._first, self._second = np.triu_indices(window, 1)
+        self.growth_per_hour = None
+        self.alarm = None
+
+    def update(self, relative, time):
+        self.values.append(relative)
+        self.times.append(time)
+        if len(self.values) < self.values.maxlen:
+            return
+        values = np.fromiter(self.values, dtype=np.float64, count=len(self.values))
+        slopes = (values[self._second] - values[self._first]) / (self._second - self._first)
+        slope = float(np.median(slopes))
+        self.growth_per_hour = slope * self.intervals_per_hour
+        if self.alarm is None and self.growth_per_hour > self.tolerance \
+                and np.count_nonzero(slopes > 0) >= SLOPE_AGREEMENT * len(slopes):
+            # начало - где прямая Тейла-Сена пересекает baseline (в пределах окна)
+            positions = np.arange(len(values))
+            intercept = float(np.median(values - slope * positions))
+            crossing = int(np.clip(round(-intercept / slope), 0, len(values) - 1))
+            self.alarm = {'onset': self.times[crossing], 'detected_at': time,
+                          'growth_per_hour': round(self.growth_per_hour, 4)}
+
+
+class SeriesDetector:
+    """Детекторы одного ряда (p95 или доли ошибок) с общим baseline."""
+
+    def __init__(self, name, interval_s=DEFAULT_INTERVAL_S, warmup=DEFAULT_WARMUP, cusum_k=DEFAULT_CUSUM_K,
+                 cusum_h=DEFAULT_CUSUM_H, ph_delta=DEFAULT_PH_DELTA, ph_threshold=DEFAULT_PH_THRESHOLD,
+                 slope_window=DEFAULT_SLOPE_WINDOW, slope_tolerance=DEFAULT_SLOPE_TOLERANCE,
+                 min_votes=DEFAULT_MIN_VOTES):
+        self.name = name
+        self.warmup = warmup
+        self.min_votes = min_votes
+        self.absolute_scale, self.relative_scale = SERIES_SCALES.get(name, (0.0, 0.05))
+        self.baseline = None
+        self.intervals = 0
+        self._warmup_values = []
+        self.detectors = {
+            'cusum': Cusum(cusum_k, cusum_h),
+            'page_hinkley': PageHinkley(ph_delta, ph_threshold),
+            'slope': TheilSenSlope(3600 / interval_s, slope_window, slope_tolerance),
+        }
+
+    def update(self, time, value):
+        if value is None or value != value:  # пустой интервал (NaN)
+            return
+        self.intervals += 1
+        if self.baseline is None:
+            self._warmup_values.append(value)
+            if len(self._warmup_values) == self.warmup:
+                values = np.array(self._warmup_values)
+                median = float(np.median(values))
+                mad = float(np.median(np.abs(values - median)))
+                self.baseline = {
+                    'median': median,
+                    'sigma': max(1.4826 * mad, self.relative_scale * abs(median), self.absolute_scale),
+                    'level': max(abs(median), self.absolute_scale),
+                }
+                self._warmup_values = None
+            return
+        z = (value - self.baseline['median']) / self.baseline['sigma']
+        self.detectors['cusum'].update(z, time)
+        self.detectors['page_hinkley'].update(z, time)
+        self.detectors['slope'].update((value - self.baseline['median']) / self.baseline['level'], time)
+
+    def result(self):
+        alarms = {name: detector.alarm for name, detector in self.detectors.items() if detector.alarm}
+        degraded = len(alarms) >= self.min_votes
+        return {
+            'intervals': self.intervals,
+            'baseline': self.baseline,
+            'detectors': {name: {'alarm': name in alarms, **(alarms.get(name) or {})}
+                          for name in self.detectors},
+            'growth_per_hour': self.detectors['slope'].growth_per_hour,
+            'degraded': degraded,
+            'onset': min(alarm['onset'] for alarm in alarms.values()) if degraded else None,
+        }
+
+
+class DegradationDetector:
+    """
+    Онлайн-детектор по рядам p95 и доли ошибок. Память постоянна:
+    baseline, состояние CUSUM/Page-Hinkley и окно наклона.
+    """
+
+    def __init__(self, interval_s=DEFAULT_INTERVAL_S, **options):
+        self.interval_s = interval_s
+        self.series = {name: SeriesDetector(name, interval_s, **options) for name in SERIES_SCALES}
+
+    def update(self, time, p95, error_rate):
+        """Закрытый интервал: время начала (нс), p95 (мс), доля ошибок (0..1)."""
+        self.series['p95'].update(time, p95)
+        self.series['error_rate'].update(time, error_rate)
+
+    def result(self):
+        series = {name: detector.result() for name, detector in self.series.items()}
+        onsets = [result['onset'] for result in series.values() if result['degraded']]
+        return {
+            'interval_s': self.interval_s,
+            'series': series,
+            'degraded': bool(onsets),
+            'onset': min(onsets) if onsets else None,
+        }
+
+
+class IntervalStream:
+    """
+    Агрегаты интервалов из потока точек k6 (http_req_duration, http_req_failed);
+    интервалы выровнены по эпохе (первый интервал прогона обычно неполный).
+    Интервал закрывается, когда самая поздняя точка ушла вперед больше,
+    чем на lateness; опоздавшие точки закрытых интервалов отбрасываются.
+    """
+
+    def __init__(self, interval_s=DEFAULT_INTERVAL_S, lateness_s=DEFAULT_LATENESS_S,
+                 relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+        self.interval_ns = int(interval_s * NS_PER_SECOND)
+        self.lateness_ns = int(lateness_s * NS_PER_SECOND)
+        self.relative_accuracy = relative_accuracy
+        self.open = {}
+        self.closed = None
+        self.latest = None
+        self.dropped = 0
+
+    def add(self, metric, value, time):
+        """Учитывает точку; возвращает список закрытых интервалов (время, p95, доля ошибок)."""
+        index = time // self.interval_ns
+        if self.closed is not None and index <= self.closed:
+            self.dropped += 1
+            return []
+        bucket = self.open.get(index)
+        if bucket is None:
+            bucket = self.open[index] = [QuantileSketch(self.relative_accuracy), 0, 0]
+        if metric == 'http_req_duration':
+            bucket[0].add(value)
+        elif metric == 'http_req_failed':
+            bucket[1] += 1
+            bucket[2] += value != 0
+        if self.latest is None or time > self.latest:
+            self.latest = time
+        return self._close((self.latest - self.lateness_ns) // self.interval_ns)
+
+    def flush(self):
+        """Закрывает все открытые интервалы (конец потока)."""
+        return self._close(max(self.open) + 1) if self.open else []
+
+    def _close(self, before):
+        closed = []
+        for index in sorted(index for index in self.open if index < before):
+            sketch, checked, errors = self.open.pop(index)
+            closed.append((index * self.interval_ns,
+                           sketch.quantile(0.95) if sketch.count else None,
+                           errors / checked if checked else None))
+            self.closed = index
+        return closed
+
+
+def detect_points(points, interval_s=DEFAULT_INTERVAL_S, lateness_s=DEFAULT_LATENESS_S, **options):
+    """
+    Детектор по потоку точек (метрика, значение, время нс) за один проход
+    с постоянной памятью.
+    """
+    stream = IntervalStream(interval_s, lateness_s)
+    detector = DegradationDetector(interval_s, **options)
+    for metric, value, time in points:
+        for interval in stream.add(metric, value, time):
+            detector.update(*interval)
+    for interval in stream.flush():
+        detector.update(*interval)
+    result = detector.result()
+    result['dropped_points'] = stream.dropped
+    return result
+
+
+def detect_series(series, interval_s=DEFAULT_INTERVAL_S, **options):
+    """Детектор по готовому ряду интервалов в формате build_series (p95, error_rate в %)."""
+    detector = DegradationDetector(interval_s, **options)
+    for time, p95, error_rate in zip(series['time'].tolist(), series['p95'].tolist(),
+                                     (series['error_rate'] / 100).tolist()):
+        detector.update(time, p95, error_rate)
+    return detector.result()
+
+
+def detect_columns(columns, start_time, end_time, interval_s=DEFAULT_INTERVAL_S, **options):
+    """
+    Детектор по колоночным данным файла: ряд интервалов строится векторно
+    (timeseries.build_series) и подается детектору по одному интервалу.
+    Интервалы выровнены по эпохе, как в IntervalStream и rollup, поэтому
+    baseline и onset не зависят от того, каким путем прочитан прогон.
+    """
+    interval_ns = int(interval_s * NS_PER_SECOND)
+    series = build_series(columns, start_time // interval_ns * interval_ns, end_time, interval_ns,
+                          quantiles=(0.95,))
+    return detect_series(series, interval_s, **options)
@@ -0,0 +1,210 @@
+# Экспортер метрик k6 в формате Prometheus / OpenMetrics.
+# Следит за NDJSON-файлами k6 (как режим --follow) и держит в памяти уже
+# агрегированные ряды: счетчики, гистограммы с настраиваемыми границами,
+# gauge. Набор меток ограничен списком тегов, а число рядов на метрику -
+# лимитом кардинальности (лишние значения сворачиваются в "__other__").
+# Ответ на scrape строится из этого состояния за O(рядов), а не O(точек).
+
+import bisect
+import math
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from k6report.follow import FollowState
+from k6report.ingest import test_name
+
+# Границы гистограмм по умолчанию, мс (метрики времени k6)
+DEFAULT_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Теги k6, которые становятся метками
+DEFAULT_LABEL_TAGS = ('endpoint', 'method', 'status', 'scenario', 'group')
+
+# Максимум рядов на метрику; сверх него значения меток -> OVERFLOW_VALUE
+DEFAULT_MAX_SERIES = 200
+OVERFLOW_VALUE = '__other__'
+
+METRIC_PREFIX = 'k6_'
+TEXT_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+OPENMETRICS_CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
+_INVALID_NAME_CHARS = re.compile(r'[^a-zA-Z0-9_]')
+
+
+def metric_name(name):
+    """Имя метрики k6 -> допустимое имя Prometheus с префиксом k6_."""
+    return METRIC_PREFIX + _INVALID_NAME_CHARS.sub('_', name)
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if value == -math.inf:
+        return '-Inf'
+    if value != value:
+        return 'NaN'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values) if value]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class MetricFamily:
+    """Ряды одной метрики k6: метки -> состояние ряда."""
+
+    def __init__(self, name, kind, buckets):
+        self.name = name
+        self.kind = kind  # trend | counter | rate | gauge
+        self.buckets = buckets
+        self.series = {}
+
+    def observe(self, labels, value):
+        state = self.series.get(labels)
+        if state is None:
+            if self.kind == 'trend':
+                state = [[0] * (len(self.buckets) + 1), 0.0, 0]  # корзины, sum, count
+            else:
+                state = [0.0, 0]  # counter: sum | rate: count, nonzero | gauge: last
+            self.series[labels] = state
+        if self.kind == 'trend':
+            state[0][bisect.bisect_left(self.buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+        elif self.kind == 'counter':
+            state[0] += value
+        elif self.kind == 'rate':
+            state[0] += 1
+            state[1] += value != 0
+        else:
+            state[0] = value
+
+
+class PrometheusRegistry:
+    """
+    Агрегированное состояние всех метрик и его отрисовка в текстовом
+    формате. lock защищает состояние от одновременного scrape и записи.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, label_tags=DEFAULT_LABEL_TAGS, max_series=DEFAULT_MAX_SERIES):
+        self.buckets = tuple(sorted(float(bound) for bound in buckets))
+        self.label_tags = tuple(label_tags)
+        self.label_names = ('test',) + tuple(_INVALID_NAME_CHARS.sub('_', tag) for tag in self.label_tags)
+        self.max_series = max_series
+        self.families = {}
+        self.points = 0
+        self.overflow_points = 0
+        self.lock = threading.Lock()
+
+    def observe(self, test, name, kind, value, tags):
+        family = self.families.get(name)
+        if family is None:
+            family = self.families[name] = MetricFamily(name, kind or 'trend', self.buckets)
+        tags = tags or {}
+        labels = (test,) + tuple(str(tags.get(tag, '')) for tag in self.label_tags)
+        if labels not in family.series and len(family.series) >= self.max_series:
+            # лимит кардинальности: теговые метки схлопываются, test остается
+            labels = (test,) + (OVERFLOW_VALUE,) * len(self.label_tags)
+            self.overflow_points += 1
+        family.observe(labels, value)
+        self.points += 1
+
+    def render(self, openmetrics=False):
+        """Текст ответа /metrics; время O(рядов x корзин)."""
+        lines = []
+        names = self.label_names
+        for name in sorted(self.families):
+            family = self.families[name]
+            base = metric_name(name)
+            if family.kind == 'trend':
+                lines.append(f"# HELP {base} k6 trend {name}")
+                lines.append(f"# TYPE {base} histogram")
+                for labels, (counts, total, count) in family.series.items():
+                    cumulative = 0
+                    for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                        cumulative += bucket_count
+                        le = 'le="' + _format_value(bound) + '"'
+                        lines.append(f"{base}_bucket{_labels(names, labels, le)} {cumulative}")
+                    lines.append(f"{base}_sum{_labels(names, labels)} {_format_value(total)}")
+                    lines.append(f"{base}_count{_labels(names, labels)} {count}")
+            elif family.kind == 'counter':
+                family_name = base if openmetrics else f"{base}_total"
+                lines.append(f"# HELP {family_name} k6 counter {name}")
+                lines.append(f"# TYPE {family_name} counter")
+                for labels, (total, _) in family.series.items():
+                    lines.append(f"{base}_total{_labels(names, labels)} {_format_value(total)}")
+            elif family.kind == 'rate':
+                for suffix, index, help_text in (('samples', 0, 'samples'), ('true', 1, 'non-zero samples')):
+                    family_name = f"{base}_{suffix}" if openmetrics else f"{base}_{suffix}_total"
+                    lines.append(f"# HELP {family_name} k6 rate {name}: {help_text}")
+                    lines.append(f"# TYPE {family_name} counter")
+                    for labels, state in family.series.items():
+                        lines.append(f"{base}_{suffix}_total{_labels(names, labels)} {_format_value(state[index])}")
+            else:
+                lines.append(f"# HELP {base} k6 gauge {name}")
+                lines.append(f"# TYPE {base} gauge")
+                for labels, (last, _) in family.series.items():
+                    lines.append(f"{base}{_labels(names, labels)} {_format_value(last)}")
+
+        for family_name, value, help_text in (
+                ('k6_exporter_points', self.points, 'Points read from k6 output'),
+                ('k6_exporter_overflow_points', self.overflow_points, 'Points folded into __other__ by the series cap')):
+            lines.append(f"# HELP {family_name if openmetrics else family_name + '_total'} {help_text}")
+            lines.append(f"# TYPE {family_name if openmetrics else family_name + '_total'} counter")
+            lines.append(f"{family_name}_total {value}")
+        if openmetrics:
+            lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+
+class ExporterTail(FollowState):
+    """Слежение за файлом, точки которого идут в PrometheusRegistry."""
+
+    def __init__(self, filepath, registry, metrics=None):
+        super().__init__(filepath, metrics)
+        self.registry = registry
+        self.test = test_name(filepath)
+
+    def _consume(self, data, loads, decode_error):
+        # блокируем на пачку строк, а не на точку: scrape ждет не дольше одной пачки
+        with self.registry.lock:
+            super()._consume(data, loads, decode_error)
+
+    def add_point(self, name, point, parse_time):
+        self.registry.observe(self.test, name, self.metric_types.get(name), point['value'], point.get('tags'))
+
+
+def make_handler(registry):
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/metrics', '/'):
+                self.send_error(404)
+                return
+            openmetrics = 'application/openmetrics-text' in self.headers.get('Accept', '')
+            with registry.lock:
+                body = registry.render(openmetrics).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', OPENMETRICS_CONTENT_TYPE if openmetrics else TEXT_CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # scrape каждые 10-15 с не засоряет вывод
+
+    return MetricsHandler
+
+
+def serve(registry, host='0.0.0.0', port=9565):
+    """Запускает HTTP-сервер /metrics в фоновом потоке."""
+    server = ThreadingHTTPServer((host, port), make_handler(registry))
+    thread = threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True)
+    thread.start()
+    return server
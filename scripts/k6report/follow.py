@@ -0,0 +1,218 @@
+# Режим слежения за растущим NDJSON-файлом k6 (длинные soak-тесты).
+# На каждом опросе читаются только байты, дописанные после прошлого
+# смещения; недописанная последняя строка остается до следующего опроса.
+# Смещение и состояние агрегатов сохраняются в checkpoint, поэтому после
+# перезапуска разбор продолжается с места остановки, а не с начала файла.
+
+import json
+import os
+import time
+
+from k6report.aggregate import DEFAULT_RELATIVE_ACCURACY, MetricAggregator
+from k6report.cache import CACHE_DIR_ENV, DEFAULT_CACHE_DIRNAME
+from k6report.decode import get_backend, is_compressed, line_metric, make_line_filter
+from k6report.timestamps import TimestampParser
+
+# Меняется при изменении формата checkpoint
+CHECKPOINT_VERSION = 1
+
+# Период опроса по умолчанию, с
+DEFAULT_INTERVAL = 30
+
+# Сколько байт читать за раз при догоне большого прироста
+FOLLOW_READ_SIZE = 16 * 2**20
+
+
+class FollowState:
+    """
+    Инкрементальные агрегаты одного файла.
+    Атрибуты:
+        offset (int): Смещение после последней целиком обработанной строки.
+        inode (int): Inode файла; смена или усечение файла сбрасывают состояние.
+        aggregates (dict): Имя метрики -> MetricAggregator.
+        metric_types (dict): Тип метрики из объявлений Metric.
+        lines (int): Обработано строк.
+    """
+
+    def __init__(self, filepath, metrics=None, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+        if is_compressed(filepath):
+            raise ValueError(f"Сжатый файл {filepath} нельзя читать по мере записи")
+        self.filepath = filepath
+        self.metrics = sorted(metrics) if metrics is not None else None
+        self.relative_accuracy = relative_accuracy
+        self.reset()
+
+    def reset(self):
+        self.offset = 0
+        self.inode = None
+        self.aggregates = {}
+        self.metric_types = {}
+        self.lines = 0
+
+    def poll(self, backend=None):
+        """
+        Обрабатывает дописанные строки.
+        Returns:
+            int: Число обработанных байт (0 - файл не вырос).
+        """
+        try:
+            stat = os.stat(self.filepath)
+        except FileNotFoundError:
+            return 0
+        if self.inode is not None and (stat.st_ino != self.inode or stat.st_size < self.offset):
+            print(f"Файл {self.filepath} перезаписан, начинаем сначала")
+            self.reset()
+        self.inode = stat.st_ino
+        if stat.st_size <= self.offset:
+            return 0
+
+        _, loads, decode_error = get_backend(backend)
+        start = self.offset
+        with open(self.filepath, 'rb') as f:
+            f.seek(self.offset)
+            tail = b''
+            while True:
+                chunk = f.read(FOLLOW_READ_SIZE)
+                if not chunk:
+                    break
+                chunk = tail + chunk
+                cut = chunk.rfind(b'\n') + 1
+                if cut:
+                    self._consume(chunk[:cut], loads, decode_error)
+                    self.offset += cut
+                tail = chunk[cut:]
+        return self.offset - start
+
+    def _consume(self, data, loads, decode_error):
+        wanted = set(self.metrics) if self.metrics is not None else None
+        accept = make_line_filter(wanted)
+        parse_time = TimestampParser()
+        for line in data.splitlines():
+            self.lines += 1
+            if not accept(line) and (line_metric(line) is not None or b'"Metric"' not in line):
+                continue  # чужая точка; объявления Metric нужны ради типов
+            try:
+                record = loads(line)
+            except decode_error:
+                continue
+            name = record.get('metric')
+            if wanted is not None and name not in wanted:
+                continue
+            kind = record.get('type')
+            if kind == 'Metric':
+                self.metric_types[name] = record.get('data', {}).get('type')
+            elif kind == 'Point':
+                self.add_point(name, record['data'], parse_time)
+
+    def add_point(self, name, point, parse_time):
+        """Учитывает одну точку; наследники переопределяют (см. exporter)."""
+        aggregator = self.aggregates.get(name)
+        if aggregator is None:
+            aggregator = self.aggregates[name] = MetricAggregator(self.relative_accuracy)
+        aggregator.add(point['value'], parse_time(point['time']))
+
+    def to_dict(self):
+        return {
+            'version': CHECKPOINT_VERSION,
+            'file': os.path.basename(self.filepath),
+            'metrics': self.metrics,
+            'offset': self.offset,
+            'inode': self.inode,
+            'lines': self.lines,
+            'metric_types': self.metric_types,
+            'aggregates': {name: aggregator.to_dict() for name, aggregator in self.aggregates.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, filepath, data, metrics=None, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+        """Состояние из checkpoint; ValueError, если checkpoint от другого файла/набора метрик."""
+        state = cls(filepath, metrics, relative_accuracy)
+        if data.get('version') != CHECKPOINT_VERSION:
+            raise ValueError(f"Версия checkpoint {data.get('version')} != {CHECKPOINT_VERSION}")
+        if data.get('file') != os.path.basename(filepath) or data.get('metrics') != state.metrics:
+            raise ValueError("checkpoint относится к другому файлу или набору метрик")
+        state.offset = data['offset']
+        state.inode = data['inode']
+        state.lines = data['lines']
+        state.metric_types = data['metric_types']
+        state.aggregates = {name: MetricAggregator.from_dict(aggregator)
+                            for name, aggregator in data['aggregates'].items()}
+        return state
+
+
+def checkpoint_path(filepath, cache_dir=None):
+    """Checkpoint хранится в каталоге колоночного кеша: <file>.follow.json."""
+    cache_dir = cache_dir or os.environ.get(CACHE_DIR_ENV) or \
+        os.path.join(os.path.dirname(os.path.abspath(filepath)), DEFAULT_CACHE_DIRNAME)
+    return os.path.join(cache_dir, f"{os.path.basename(filepath)}.follow.json")
+
+
+def load_state(filepath, metrics=None, cache_dir=None):
+    """Состояние из checkpoint, если он подходит, иначе пустое."""
+    path = checkpoint_path(filepath, cache_dir)
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                state = FollowState.from_dict(filepath, json.load(f), metrics)
+            print(f"Продолжаем {os.path.basename(filepath)} с байта {state.offset:,}")
+            return state
+        except (OSError, ValueError, KeyError) as e:
+            print(f"checkpoint {path} не подходит, читаем файл сначала: {e}")
+    return FollowState(filepath, metrics)
+
+
+def save_state(state, cache_dir=None):
+    path = checkpoint_path(state.filepath, cache_dir)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state.to_dict(), f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Не удалось сохранить checkpoint {path}: {e}")
+
+
+def follow_files(list_files, refresh, interval=DEFAULT_INTERVAL, idle_timeout=None, metrics=None,
+                 cache_dir=None, sleep=time.sleep):
+    """
+    Цикл слежения: раз в interval секунд опрашивает файлы и, если данные
+    прибавились, вызывает refresh(states) и сохраняет checkpoint.
+    Args:
+        list_files (callable): Возвращает текущий список файлов (новые подхватываются).
+        refresh (callable): Получает словарь путь -> FollowState.
+        idle_timeout (float): Завершиться, если файлы не растут столько секунд;
+            None - до Ctrl+C.
+    Returns:
+        dict: Итоговые состояния по файлам.
+    """
+    states = {}
+    last_growth = time.monotonic()
+    refreshed = False
+    try:
+        while True:
+            started = time.monotonic()
+            grown = 0
+            for filepath in list_files():
+                if filepath not in states:
+                    states[filepath] = load_state(filepath, metrics, cache_dir)
+                grown += states[filepath].poll()
+
+            if grown or not refreshed:
+                refresh(states)
+                refreshed = True
+                for state in states.values():
+                    save_state(state, cache_dir)
+            if grown:
+                last_growth = time.monotonic()
+            elif idle_timeout is not None and time.monotonic() - last_growth >= idle_timeout:
+                break
+            sleep(max(0.0, interval - (time.monotonic() - started)))
+    except KeyboardInterrupt:
+        print("Слежение остановлено")
+        for state in states.values():
+            state.poll()
+        refresh(states)
+        for state in states.values():
+            save_state(state, cache_dir)
+    return states
@@ -0,0 +1,150 @@
+# Группировка точек k6 по тегам (endpoint, status, method, scenario, group,
+# check, ...). Значения тегов уже закодированы словарем в колоночном кеше,
+# поэтому ключ группы - одно целое число (смешанная система счисления по
+# кодам тегов), а агрегаты всех групп считаются одним проходом NumPy:
+# сортировка по ключу + reduceat, скетчи - одним np.unique по (группа, корзина).
+# Разбивка по тегу стоит примерно как глобальный агрегат метрики.
+
+import math
+
+import numpy as np
+
+from k6report.aggregate import DEFAULT_RELATIVE_ACCURACY, MIN_INDEXABLE_VALUE, MetricAggregator, QuantileSketch
+
+# Наибольший ключ группы (int64)
+MAX_KEY = 2**63 - 1
+
+
+def group_keys(columns, rows, tags, reserve=1):
+    """
+    Целочисленный ключ группы для строк rows по набору тегов.
+    Код -1 (тега нет) становится цифрой 0, остальные сдвигаются на 1.
+    Если произведение оснований (и множителя reserve, на который вызывающий
+    еще умножит ключ) не помещается в int64, ключ - номер уникальной
+    комбинации кодов (np.unique по строкам).
+    Returns:
+        tuple: (ndarray int64 ключей, список оснований по тегам или
+        таблица цифр уникальных комбинаций) - раскладка для decode_key.
+    """
+    radixes = [len(columns.tag_values.get(tag, ())) + 1 for tag in tags]
+    if math.prod(radixes) * reserve > MAX_KEY:
+        digits = np.zeros((rows.stop - rows.start, len(tags)), dtype=np.int64)
+        for i, tag in enumerate(tags):
+            if tag in columns.tags:
+                digits[:, i] = columns.tags[tag][rows].astype(np.int64) + 1
+        table, keys = np.unique(digits, axis=0, return_inverse=True)
+        return keys.reshape(-1).astype(np.int64), table
+
+    keys = np.zeros(rows.stop - rows.start, dtype=np.int64)
+    for tag, radix in zip(tags, radixes):
+        if tag in columns.tags:
+            keys = keys * radix + (columns.tags[tag][rows].astype(np.int64) + 1)
+        else:
+            keys = keys * radix
+    return keys, radixes
+
+
+def decode_key(columns, key, tags, radixes):
+    """Ключ группы -> кортеж значений тегов (None, если тега нет)."""
+    if isinstance(radixes, np.ndarray):
+        digits = radixes[key].tolist()
+    else:
+        digits = []
+        for radix in reversed(radixes):
+            key, digit = divmod(key, radix)
+            digits.append(digit)
+        digits.reverse()
+    return tuple(columns.tag_values[tag][digit - 1] if digit else None
+                 for tag, digit in zip(tags, digits))
+
+
+def _group_sketches(values, group_index, n_groups, relative_accuracy):
+    """Скетчи всех групп: одна уникализация пар (группа, знак, корзина)."""
+    sketches = [QuantileSketch(relative_accuracy) for _ in range(n_groups)]
+    log_gamma = sketches[0]._log_gamma if sketches else 1.0
+    for sign, mask in ((1, values > MIN_INDEXABLE_VALUE), (-1, values < -MIN_INDEXABLE_VALUE)):
+        if not mask.any():
+            continue
+        bins = np.ceil(np.log(sign * values[mask]) / log_gamma).astype(np.int64)
+        lowest = int(bins.min())
+        span = int(bins.max()) - lowest + 1
+        pairs, counts = np.unique(group_index[mask] * span + (bins - lowest), return_counts=True)
+        groups, indexes = np.divmod(pairs, span)
+        for group, index, count in zip(groups.tolist(), (indexes + lowest).tolist(), counts.tolist()):
+            store = sketches[group].positive if sign > 0 else sketches[group].negative
+            store[index] = count
+    zero = np.abs(values) <= MIN_INDEXABLE_VALUE
+    totals = np.bincount(group_index, minlength=n_groups)
+    zeros = np.bincount(group_index[zero], minlength=n_groups)
+    for sketch, total, zero_count in zip(sketches, totals.tolist(), zeros.tolist()):
+        sketch.count = total
+        sketch.zero_count = zero_count
+    return sketches
+
+
+def aggregate_groups(values, times, keys, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+    """
+    MetricAggregator на каждое значение ключа.
+    times должны быть отсортированы; stable-сортировка по ключу сохраняет
+    этот порядок внутри группы (нужен для start/end/last).
+    Returns:
+        dict: ключ -> MetricAggregator.
+    """
+    if not len(values):
+        return {}
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    values = values[order]
+    times = times[order]
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(sorted_keys)) + 1))
+    ends = np.concatenate((starts[1:], [len(sorted_keys)]))
+
+    counts = ends - starts
+    sums = np.add.reduceat(values, starts)
+    minimums = np.minimum.reduceat(values, starts)
+    maximums = np.maximum.reduceat(values, starts)
+    nonzero = np.add.reduceat((values != 0).astype(np.int64), starts)
+    group_index = np.repeat(np.arange(len(starts)), counts)
+    sketches = _group_sketches(values, group_index, len(starts), relative_accuracy)
+
+    result = {}
+    for i, (start, end) in enumerate(zip(starts.tolist(), ends.tolist())):
+        aggregator = MetricAggregator(relative_accuracy)
+        aggregator.count = int(counts[i])
+        aggregator.sum = float(sums[i])
+        aggregator.min = float(minimums[i])
+        aggregator.max = float(maximums[i])
+        aggregator.nonzero = int(nonzero[i])
+        aggregator.start_time = int(times[start])
+        aggregator.end_time = int(times[end - 1])
+        aggregator.last = float(values[end - 1])
+        aggregator.sketch = sketches[i]
+        result[int(sorted_keys[start])] = aggregator
+    return result
+
+
+def group_by(columns, metric, tags, relative_accuracy=DEFAULT_RELATIVE_ACCURACY, include_missing=False):
+    """
+    Агрегаты метрики по комбинациям значений тегов.
+    Args:
+        columns (ColumnarResults): Колоночные данные файла.
+        metric (str): Имя метрики.
+        tags (str | tuple): Тег или набор тегов группировки.
+        include_missing (bool): Оставлять группы, где какого-то тега нет.
+    Returns:
+        dict: значение тега (или кортеж значений) -> MetricAggregator,
+        по убыванию числа точек.
+    """
+    single = isinstance(tags, str)
+    tags = (tags,) if single else tuple(tags)
+    rows = columns.metric_slice(metric)
+    keys, radixes = group_keys(columns, rows, tags)
+    groups = aggregate_groups(columns.value[rows], columns.time[rows], keys, relative_accuracy)
+
+    result = {}
+    for key, aggregator in sorted(groups.items(), key=lambda item: item[1].count, reverse=True):
+        values = decode_key(columns, key, tags, radixes)
+        if not include_missing and None in values:
+            continue
+        result[values[0] if single else values] = aggregator
+    return result
@@ -0,0 +1,235 @@
+# История прогонов k6 во встроенной SQLite-базе.
+# Одна строка runs на прогон (тип теста, git sha, время, окружение) и
+# строки metrics с агрегатами по метрике и по значениям тегов, включая
+# сериализованный скетч квантилей. Индекс (test, metric, tag, started_at)
+# отвечает на запросы вида "p95 load-теста за последние 200 прогонов" и
+# "скользящая медиана как baseline" без чтения старых артефактов.
+
+import json
+import os
+import sqlite3
+import statistics
+import time
+import zlib
+
+from k6report.aggregate import MetricAggregator, QuantileSketch
+from k6report.decode import strip_result_suffix
+from k6report.ingest import AGGREGATE_SOURCES, test_name
+
+# Путь базы по умолчанию (рядом с baseline-results.json в корне проекта)
+HISTORY_DB_ENV = 'K6REPORT_HISTORY_DB'
+DEFAULT_HISTORY_DB = 'k6-history.sqlite'
+
+# Меняется при несовместимом изменении схемы
+SCHEMA_VERSION = 1
+
+# Статистики, которые хранятся столбцами и доступны в запросах
+STATS = ('count', 'sum', 'min', 'max', 'avg', 'rate', 'p50', 'p90', 'p95', 'p99')
+
+# Размер окна скользящего baseline по умолчанию (прогонов)
+DEFAULT_BASELINE_WINDOW = 20
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    test TEXT NOT NULL,
+    file TEXT NOT NULL,
+    git_sha TEXT,
+    environment TEXT,
+    started_at INTEGER NOT NULL,
+    recorded_at INTEGER NOT NULL,
+    duration_ms REAL,
+    UNIQUE (test, file, started_at)
+);
+CREATE TABLE IF NOT EXISTS metrics (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    test TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    tag TEXT NOT NULL DEFAULT '',
+    tag_value TEXT NOT NULL DEFAULT '',
+    started_at INTEGER NOT NULL,
+    {', '.join(f'{stat} REAL' for stat in STATS)},
+    sketch BLOB,
+    PRIMARY KEY (run_id, metric, tag, tag_value)
+);
+CREATE INDEX IF NOT EXISTS metrics_trend ON metrics (test, metric, tag, tag_value, started_at);
+CREATE INDEX IF NOT EXISTS runs_test_time ON runs (test, started_at);
+PRAGMA user_version = {SCHEMA_VERSION};
+"""
+
+
+def default_history_path():
+    return os.environ.get(HISTORY_DB_ENV) or DEFAULT_HISTORY_DB
+
+
+def pack_sketch(aggregator):
+    """Скетч агрегатора -> сжатый JSON (BLOB)."""
+    return zlib.compress(json.dumps(aggregator.sketch.to_dict(), separators=(',', ':')).encode())
+
+
+def unpack_sketch(blob):
+    return QuantileSketch.from_dict(json.loads(zlib.decompress(blob)))
+
+
+def aggregator_stats(aggregator, metric_type, duration_s):
+    """Статистики STATS по потоковому агрегату."""
+    stats = {'count': aggregator.count, 'sum': aggregator.sum, 'min': aggregator.min,
+             'max': aggregator.max, 'avg': aggregator.avg}
+    if metric_type == 'counter':
+        stats['rate'] = aggregator.sum / duration_s if duration_s > 0 else None
+    elif metric_type == 'rate':
+        stats['rate'] = aggregator.rate
+    for q, value in aggregator.quantiles((0.5, 0.9, 0.95, 0.99)).items():
+        stats[f"p{q * 100:g}"] = value
+    return stats
+
+
+def summary_export_stats(values):
+    """Статистики STATS из values summary-export k6 (скетча там нет)."""
+    count = values.get('count')
+    if count is None and 'passes' in values:
+        count = values['passes'] + values.get('fails', 0)
+    return {
+        'count': count,
+        'min': values.get('min'),
+        'max': values.get('max'),
+        'avg': values.get('avg'),
+        'rate': values.get('rate'),
+        'p50': values.get('med'),
+        'p90': values.get('p(90)'),
+        'p95': values.get('p(95)'),
+        'p99': values.get('p(99)'),
+    }
+
+
+def git_sha_from_file(filename):
+    """load-<sha>.json -> <sha> (так называет артефакты CI)."""
+    stem = strip_result_suffix(os.path.basename(filename))
+    return stem.split('-', 1)[1] if '-' in stem else None
+
+
+class RunStore:
+    """SQLite-хранилище прогонов; безопасно открывать повторно (схема создается при первом открытии)."""
+
+    def __init__(self, path=None):
+        self.path = path or default_history_path()
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute('PRAGMA foreign_keys = ON')
+        version = self.connection.execute('PRAGMA user_version').fetchone()[0]
+        if version not in (0, SCHEMA_VERSION):
+            raise ValueError(f"Схема истории {version} != {SCHEMA_VERSION}: {self.path}")
+        self.connection.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def record_entry(self, entry, git_sha=None, environment=None, recorded_at=None):
+        """
+        Сохраняет запись сводки k6-summary.json как прогон.
+        Повторная запись того же прогона (тест, файл, время начала) игнорируется.
+        Returns:
+            tuple: (run_id, True если прогон добавлен).
+        """
+        recorded_at = recorded_at or time.time_ns()
+        started_at = entry.get('start_time') or recorded_at
+        duration_ms = entry.get('k6_summary', {}).get('state', {}).get('testRunDurationMs')
+        test = entry.get('name') or test_name(entry['file'])
+        with self.connection:
+            cursor = self.connection.execute(
+                "INSERT OR IGNORE INTO runs (test, file, git_sha, environment, started_at, recorded_at, duration_ms)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (test, entry['file'], git_sha or git_sha_from_file(entry['file']), environment,
+                 started_at, recorded_at, duration_ms))
+            if not cursor.rowcount:
+                run_id = self.connection.execute(
+                    "SELECT id FROM runs WHERE test = ? AND file = ? AND started_at = ?",
+                    (test, entry['file'], started_at)).fetchone()[0]
+                return run_id, False
+            run_id = cursor.lastrowid
+            self.connection.executemany(
+                f"INSERT INTO metrics (run_id, test, metric, tag, tag_value, started_at, {', '.join(STATS)}, sketch)"
+                f" VALUES ({', '.join('?' * (len(STATS) + 7))})",
+                self._metric_rows(run_id, test, started_at, entry, duration_ms))
+        return run_id, True
+
+    def _metric_rows(self, run_id, test, started_at, entry, duration_ms):
+        def row(metric, tag, tag_value, stats, sketch):
+            return (run_id, test, metric, tag, tag_value, started_at,
+                    *(stats.get(stat) for stat in STATS), sketch)
+
+        if entry.get('source') not in AGGREGATE_SOURCES:
+            for metric, data in entry.get('k6_summary', {}).get('metrics', {}).items():
+                yield row(metric, '', '', summary_export_stats(data.get('values', data)), None)
+            return
+
+        duration_s = (duration_ms or 0) / 1000
+        metric_types = entry.get('metric_types', {})
+        for metric, data in entry.get('metrics', {}).items():
+            aggregator = MetricAggregator.from_dict(data)
+            metric_type = metric_types.get(metric, 'trend')
+            yield row(metric, '', '', aggregator_stats(aggregator, metric_type, duration_s), pack_sketch(aggregator))
+            for tag, groups in entry.get('tags', {}).get(metric, {}).items():
+                for tag_value, group in groups.items():
+                    group_aggregator = MetricAggregator.from_dict(group)
+                    yield row(metric, tag, tag_value,
+                              aggregator_stats(group_aggregator, metric_type, duration_s),
+                              pack_sketch(group_aggregator))
+
+    def record_summary(self, summary, git_sha=None, environment=None):
+        """Сохраняет все прогоны сводки; возвращает {файл: (run_id, добавлен)}."""
+        return {entry['file']: self.record_entry(entry, git_sha, environment) for entry in summary['tests']}
+
+    def metric_history(self, test, metric, stat='p95', limit=200, tag='', tag_value='', before=None,
+                       environment=None):
+        """
+        Значения статистики метрики по последним прогонам теста (по индексу).
+        Returns:
+            list: [(started_at нс, значение)] от новых к старым.
+        """
+        if stat not in STATS:
+            raise ValueError(f"Неизвестная статистика: {stat}")
+        query = (f"SELECT m.started_at, m.{stat} FROM metrics m"
+                 + (" JOIN runs r ON r.id = m.run_id" if environment else "")
+                 + " WHERE m.test = ? AND m.metric = ? AND m.tag = ? AND m.tag_value = ?")
+        params = [test, metric, tag, tag_value]
+        if before is not None:
+            query += " AND m.started_at < ?"
+            params.append(before)
+        if environment:
+            query += " AND r.environment = ?"
+            params.append(environment)
+        query += " ORDER BY m.started_at DESC LIMIT ?"
+        params.append(limit)
+        return [(started_at, value) for started_at, value in self.connection.execute(query, params)
+                if value is not None]
+
+    def rolling_baseline(self, test, metric, stat, window=DEFAULT_BASELINE_WINDOW, before=None, **filters):
+        """Медиана статистики по последним window прогонам до before; None без истории."""
+        values = [value for _, value in self.metric_history(test, metric, stat, window, before=before, **filters)]
+        return statistics.median(values) if values else None
+
+    def merged_sketch(self, test, metric, limit=DEFAULT_BASELINE_WINDOW, before=None):
+        """Скетч метрики, слитый по последним limit прогонам (распределение baseline)."""
+        query = "SELECT sketch FROM metrics WHERE test = ? AND metric = ? AND tag = '' AND tag_value = ''"
+        params = [test, metric]
+        if before is not None:
+            query += " AND started_at < ?"
+            params.append(before)
+        query += " AND sketch IS NOT NULL ORDER BY started_at DESC LIMIT ?"
+        params.append(limit)
+        merged = None
+        for (blob,) in self.connection.execute(query, params):
+            sketch = unpack_sketch(blob)
+            merged = sketch if merged is None else merged.merge(sketch)
+        return merged
+
+    def run(self, run_id):
+        row = self.connection.execute(
+            "SELECT id, test, file, git_sha, environment, started_at FROM runs WHERE id = ?", (run_id,)).fetchone()
+        return dict(zip(('id', 'test', 'file', 'git_sha', 'environment', 'started_at'), row)) if row else None
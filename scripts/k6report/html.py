@@ -0,0 +1,96 @@
+# Общие части HTML-отчета: встраивание plotly.js и ленивые графики.
+# Отчет самодостаточен: в него встраивается одна копия plotly.min.js из
+# установленного пакета plotly (версия закреплена версией пакета), поэтому
+# файл открывается без сети. Данные графиков - base64 типизированных
+# массивов в формате {dtype, bdata}, который plotly.js декодирует сам, а
+# не JSON-списки чисел. Спецификация графика лежит в <script type=
+# "application/json"> и строится, только когда график попадает в область
+# видимости (IntersectionObserver), так что страница с 20 тестами
+# открывается сразу, а не после отрисовки всех графиков.
+
+import base64
+import importlib.util
+import json
+import os
+import re
+
+import numpy as np
+
+# Размер куска при копировании plotly.min.js в отчет
+PLOTLY_JS_CHUNK_SIZE = 2**20
+
+# Отрисовка заранее, за столько пикселей до появления графика на экране
+LAZY_ROOT_MARGIN = '300px'
+
+LAZY_RENDER_SCRIPT = f"""
+<script>
+(function () {{
+    function render(element) {{
+        var spec = JSON.parse(document.getElementById(element.dataset.spec).textContent);
+        Plotly.newPlot(element, spec.data, spec.layout, {{responsive: true}});
+    }}
+    var charts = Array.prototype.slice.call(document.querySelectorAll('.lazy-chart'));
+    if (!('IntersectionObserver' in window)) {{
+        charts.forEach(render);
+        return;
+    }}
+    var observer = new IntersectionObserver(function (entries) {{
+        entries.forEach(function (entry) {{
+            if (entry.isIntersecting) {{
+                observer.unobserve(entry.target);
+                render(entry.target);
+            }}
+        }});
+    }}, {{rootMargin: '{LAZY_ROOT_MARGIN}'}});
+    charts.forEach(function (element) {{ observer.observe(element); }});
+}})();
+</script>
+"""
+
+
+def _plotly_package_dir():
+    # find_spec не импортирует plotly (импорт пакета заметно медленнее)
+    spec = importlib.util.find_spec('plotly')
+    if spec is None or spec.origin is None:
+        raise ImportError("Для HTML-отчета нужен пакет plotly: pip install plotly")
+    return os.path.dirname(spec.origin)
+
+
+def plotly_js_path():
+    return os.path.join(_plotly_package_dir(), 'package_data', 'plotly.min.js')
+
+
+def plotly_js_version():
+    """Версия plotly.js, которую поставляет установленный пакет plotly."""
+    with open(os.path.join(_plotly_package_dir(), 'offline', '_plotlyjs_version.py'), encoding='utf-8') as f:
+        return re.search(r'__plotlyjs_version__\s*=\s*"([^"]+)"', f.read()).group(1)
+
+
+def iter_plotly_script(inline=True):
+    """Тег <script> с plotly.js: содержимое файла кусками или закрепленная версия на CDN."""
+    if not inline:
+        yield f'<script src="https://cdn.plot.ly/plotly-{plotly_js_version()}.min.js"></script>\n'
+        return
+    yield '<script>\n'
+    with open(plotly_js_path(), encoding='utf-8') as f:
+        while chunk := f.read(PLOTLY_JS_CHUNK_SIZE):
+            yield chunk
+    yield '\n</script>\n'
+
+
+def typed_array(values, dtype='f4'):
+    """Массив -> {dtype, bdata} (little-endian, base64) для трасс plotly.js."""
+    array = np.asarray(values, dtype=np.dtype(dtype).newbyteorder('<'))
+    return {'dtype': dtype, 'bdata': base64.b64encode(array.tobytes()).decode('ascii')}
+
+
+def script_json(value):
+    """JSON для вставки внутрь <script>: компактный и без '</'."""
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False).replace('</', '<\\/')
+
+
+def lazy_chart(element_id, data, layout):
+    """Контейнер графика и его спецификация; строится LAZY_RENDER_SCRIPT."""
+    return (f'<div id="{element_id}" class="lazy-chart" data-spec="{element_id}-spec"></div>\n'
+            f'<script type="application/json" id="{element_id}-spec">'
+            f'{script_json({"data": data, "layout": layout})}</script>\n')
@@ -0,0 +1,243 @@
+# Загрузка NDJSON-результатов k6 в InfluxDB (line protocol).
+# Схема совпадает с выводом k6 --out influxdb: measurement - имя метрики,
+# теги точки - теги Influx (vu, iter, url - поля, как K6_INFLUXDB_TAGS_AS_FIELDS
+# по умолчанию), значение - поле value, время в нс. Поэтому прогоны из CI
+# видны в тех же дашбордах Grafana, что и локальные запуски.
+# Точки копятся в пачки и отправляются несколькими потоками, у каждого -
+# своё keep-alive соединение. Очередь пачек ограничена: если InfluxDB не
+# успевает, чтение файла ждет (backpressure), память не растет.
+
+import gzip
+import http.client
+import queue
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+from k6report.decode import iter_points
+from k6report.timestamps import TimestampParser
+
+DEFAULT_BATCH_SIZE = 5000
+DEFAULT_CONCURRENCY = 4
+DEFAULT_MAX_IN_FLIGHT = 8
+DEFAULT_RETRIES = 5
+DEFAULT_TIMEOUT = 30
+
+# Теги k6, которые k6 по умолчанию пишет в Influx полями (высокая кардинальность)
+DEFAULT_TAGS_AS_FIELDS = ('vu', 'iter', 'url')
+
+# Ответы, после которых пачку имеет смысл повторить
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Как часто submit() при полной очереди проверяет, живы ли отправители, с
+SUBMIT_POLL_INTERVAL = 1.0
+
+_TAG_ESCAPES = str.maketrans({',': r'\,', '=': r'\=', ' ': r'\ ', '\n': r'\n'})
+_MEASUREMENT_ESCAPES = str.maketrans({',': r'\,', ' ': r'\ ', '\n': r'\n'})
+
+
+def _escape_field_string(value):
+    return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def _format_field(value):
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, int):
+        return f"{value}i"
+    if isinstance(value, float):
+        return repr(value)
+    return _escape_field_string(str(value))
+
+
+def point_line(metric, point, timestamp_ns, extra_tags='', tags_as_fields=DEFAULT_TAGS_AS_FIELDS):
+    """
+    Одна точка k6 -> строка line protocol.
+    extra_tags - уже экранированный хвост ',k=v,...' общих тегов.
+    """
+    tags = []
+    fields = ['value=' + repr(float(point['value']))]
+    for key, value in sorted((point.get('tags') or {}).items()):
+        if value is None or value == '':
+            continue
+        if key in tags_as_fields:
+            fields.append(f"{key.translate(_TAG_ESCAPES)}={_format_field(value)}")
+        else:
+            tags.append(f"{key.translate(_TAG_ESCAPES)}={str(value).translate(_TAG_ESCAPES)}")
+    tag_part = (',' + ','.join(tags) if tags else '') + extra_tags
+    return f"{metric.translate(_MEASUREMENT_ESCAPES)}{tag_part} {','.join(fields)} {timestamp_ns}"
+
+
+def format_tags(tags):
+    """Общие теги {k: v} -> экранированный хвост для point_line."""
+    return ''.join(f",{key.translate(_TAG_ESCAPES)}={str(value).translate(_TAG_ESCAPES)}"
+                   for key, value in sorted(tags.items()))
+
+
+def iter_batches(filepath, batch_size=DEFAULT_BATCH_SIZE, tags=None, metrics=None,
+                 tags_as_fields=DEFAULT_TAGS_AS_FIELDS):
+    """Пачки строк line protocol (bytes) и число точек в каждой."""
+    extra_tags = format_tags(tags or {})
+    parse_time = TimestampParser()
+    lines = []
+    for metric, point in iter_points(filepath, metrics):
+        lines.append(point_line(metric, point, parse_time(point['time']), extra_tags, tags_as_fields))
+        if len(lines) >= batch_size:
+            yield ('\n'.join(lines) + '\n').encode(), len(lines)
+            lines = []
+    if lines:
+        yield ('\n'.join(lines) + '\n').encode(), len(lines)
+
+
+class WriteStats:
+    def __init__(self):
+        self.points = 0
+        self.batches = 0
+        self.bytes = 0
+        self.retries = 0
+        self.failed_batches = 0
+        self.failed_points = 0
+        self.started = time.monotonic()
+        self.finished = None
+        self.lock = threading.Lock()
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def points_per_second(self):
+        return self.points / self.elapsed if self.elapsed > 0 else 0.0
+
+
+class InfluxWriter:
+    """
+    Пул потоков-отправителей с keep-alive соединениями и ограниченной
+    очередью пачек. submit() блокируется, когда в очереди max_in_flight пачек;
+    если отправитель упал, submit() и close() поднимают его исключение.
+    Args:
+        url (str): Как у k6: http://host:8086/<database>.
+    """
+
+    def __init__(self, url, concurrency=DEFAULT_CONCURRENCY, max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+                 retries=DEFAULT_RETRIES, timeout=DEFAULT_TIMEOUT, compress=False, token=None):
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.path.strip('/'):
+            raise ValueError(f"Ожидался URL вида http://host:8086/<database>, получено {url}")
+        self.scheme = parts.scheme
+        self.netloc = parts.netloc
+        self.path = '/write?' + urlencode({'db': parts.path.strip('/'), 'precision': 'ns'})
+        self.retries = retries
+        self.timeout = timeout
+        self.compress = compress
+        self.token = token
+        self.stats = WriteStats()
+        self._error = None
+        self._batches = queue.Queue(maxsize=max_in_flight)
+        self._senders = [threading.Thread(target=self._send_loop, name=f"influx-writer-{i}", daemon=True)
+                         for i in range(concurrency)]
+        for sender in self._senders:
+            sender.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _connect(self):
+        connection_class = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+        return connection_class(self.netloc, timeout=self.timeout)
+
+    def submit(self, body, points):
+        if self._error is None and self._put((body, points)):
+            return
+        raise self._error or RuntimeError("Потоки отправки в InfluxDB завершились")
+
+    def _put(self, item):
+        """Кладет в очередь, пока жив хоть один отправитель (иначе очередь не разберут)."""
+        while any(sender.is_alive() for sender in self._senders):
+            try:
+                self._batches.put(item, timeout=SUBMIT_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _send_loop(self):
+        try:
+            connection = self._connect()
+            while True:
+                batch = self._batches.get()
+                if batch is None:
+                    break
+                body, points = batch
+                connection = self._send(connection, body, points)
+            connection.close()
+        except BaseException as e:
+            # первая ошибка отправителя всплывет в submit()/close() основного потока
+            if self._error is None:
+                self._error = e
+
+    def _send(self, connection, body, points):
+        headers = {'Content-Type': 'text/plain; charset=utf-8'}
+        if self.compress:
+            body = gzip.compress(body, compresslevel=1)
+            headers['Content-Encoding'] = 'gzip'
+        if self.token:
+            headers['Authorization'] = f"Token {self.token}"
+
+        delay = 0.5
+        for attempt in range(self.retries + 1):
+            error = None
+            try:
+                connection.request('POST', self.path, body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()  # дочитываем, чтобы соединение можно было переиспользовать
+                if response.status < 300:
+                    with self.stats.lock:
+                        self.stats.points += points
+                        self.stats.batches += 1
+                        self.stats.bytes += len(body)
+                    return connection
+                error = f"HTTP {response.status}"
+                if response.status not in RETRY_STATUSES:
+                    break
+                retry_after = response.getheader('Retry-After')
+                if retry_after and retry_after.isdigit():
+                    delay = max(delay, float(retry_after))
+            except (OSError, http.client.HTTPException) as e:
+                error = str(e) or type(e).__name__
+                connection.close()
+                connection = self._connect()
+            if attempt < self.retries:
+                with self.stats.lock:
+                    self.stats.retries += 1
+                time.sleep(delay)
+                delay = min(delay * 2, 30)
+
+        print(f"Пачка из {points} точек не записана: {error}")
+        with self.stats.lock:
+            self.stats.failed_batches += 1
+            self.stats.failed_points += points
+        return connection
+
+    def close(self):
+        """Дожидается отправки всех пачек; поднимает ошибку упавшего отправителя."""
+        for _ in self._senders:
+            if not self._put(None):
+                break
+        for sender in self._senders:
+            sender.join()
+        self.stats.finished = time.monotonic()
+        if self._error is not None:
+            raise self._error
+
+
+def replay_file(writer, filepath, batch_size=DEFAULT_BATCH_SIZE, tags=None, metrics=None):
+    """Отправляет все точки файла через writer; возвращает число точек."""
+    points = 0
+    for body, count in iter_batches(filepath, batch_size, tags, metrics):
+        writer.submit(body, count)
+        points += count
+    return points
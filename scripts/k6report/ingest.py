@@ -0,0 +1,328 @@
+# Единый проход по каталогу результатов k6 -> сводный артефакт k6-summary.json.
+# Каждый сырой файл читается один раз (через колоночный кеш), а все
+# генераторы отчетов (HTML, Telegram, compare-results, generate-report)
+# берут данные из сводки: агрегаты и скетчи по метрикам, разбивки по
+# тегам, прореженный временной ряд и поминутную проверку деградации.
+# Шарды распределенного прогона (<тест>-<run>-shard<N>.json, по файлу на
+# экземпляр k6) сводятся в одну запись логического прогона (k6report.merge).
+# Если сырой файл сжат в rollup (<артефакт>.rollup.npz) и удален, запись
+# строится по rollup: агрегаты те же, ряд - по уровню нужного разрешения.
+
+import hashlib
+import json
+import os
+from datetime import datetime
+
+from k6report.aggregate import MetricAggregator, to_k6_summary
+from k6report.cache import load_columns, warm_cache
+from k6report.degradation import DEFAULT_INTERVAL_S, detect_columns, detect_series
+from k6report.decode import ROLLUP_SUFFIX, is_ndjson, is_result_file, open_results, strip_result_suffix
+from k6report.groupby import group_by
+from k6report.merge import group_shards, merge_entries, merged_timeseries, shard_run
+from k6report.parallel import resolve_workers
+from k6report.profiling import NULL_PROFILER, PIPELINE_TIMINGS_FILENAME
+from k6report.rollup import Rollup
+from k6report.timeseries import build_series, downsample
+
+# Формат сводки; потребители отвергают сводку другой версии
+SUMMARY_VERSION = 3
+SUMMARY_FILENAME = 'k6-summary.json'
+
+# Снимок агрегатов, который обновляет режим --follow HTML-отчета
+LIVE_SNAPSHOT_FILENAME = 'k6-live.json'
+
+# Источники записей с агрегатами и скетчами (а не summary-export k6)
+AGGREGATE_SOURCES = ('ndjson', 'rollup')
+
+# Результат проверки порогов check-thresholds.py
+THRESHOLD_RESULTS_FILENAME = 'threshold-results.json'
+
+# JSON-файлы, которые пишут сами скрипты отчетов, а не k6
+GENERATED_FILES = (SUMMARY_FILENAME, LIVE_SNAPSHOT_FILENAME, 'summary_report.json', PIPELINE_TIMINGS_FILENAME,
+                   THRESHOLD_RESULTS_FILENAME)
+GENERATED_PREFIXES = ('baseline-comparison-', 'cross-test-comparison-', 'canary-analysis-', 'degradation-')
+
+# Теги, по которым строятся разбивки, и ограничение числа их значений
+BREAKDOWN_TAGS = ('endpoint', 'status', 'method', 'scenario', 'group', 'check', 'version', 'expected_response')
+MAX_TAG_VALUES = 100
+
+# Бюджет точек на ряд графика после прореживания LTTB
+TIMESERIES_POINTS = 1000
+
+# Сколько байт с начала и с конца файла входит в отпечаток содержимого
+DIGEST_SAMPLE_SIZE = 2**20
+
+
+def test_name(filename):
+    """Короткое имя теста из имени файла: load-<sha>.json(.gz) -> load."""
+    return strip_result_suffix(os.path.basename(filename)).split('-')[0]
+
+
+def list_result_files(results_dir):
+    """Файлы результатов k6 в каталоге (без сводок, созданных скриптами)."""
+    return [filename for filename in sorted(os.listdir(results_dir))
+            if is_result_file(filename) and filename not in GENERATED_FILES
+            and not filename.startswith(GENERATED_PREFIXES)]
+
+
+def list_rollup_files(results_dir):
+    """Файлы rollup каталога, сырых файлов (или шардов) которых уже нет."""
+    raw = set()
+    for filename in list_result_files(results_dir):
+        raw.update((strip_result_suffix(filename), shard_run(filename)))
+    return [filename for filename in sorted(os.listdir(results_dir))
+            if filename.endswith(ROLLUP_SUFFIX) and strip_result_suffix(filename) not in raw]
+
+
+def _tag_breakdowns(columns, metric):
+    """Агрегаты метрики по значениям каждого тега из BREAKDOWN_TAGS."""
+    breakdowns = {}
+    for tag in BREAKDOWN_TAGS:
+        if tag not in columns.tags:
+            continue
+        groups = group_by(columns, metric, tag)
+        if groups:
+            breakdowns[tag] = {value: aggregator.to_dict()
+                               for value, aggregator in list(groups.items())[:MAX_TAG_VALUES]}
+    return breakdowns
+
+
+def file_digest(filepath):
+    """
+    Отпечаток содержимого по началу и концу файла (вместе с размером).
+    Нужен, когда mtime сменился без изменения данных: артефакты CI при
+    скачивании и копировании получают новое время.
+    """
+    digest = hashlib.blake2b(digest_size=10)
+    with open(filepath, 'rb') as f:
+        digest.update(f.read(DIGEST_SAMPLE_SIZE))
+        size = f.seek(0, os.SEEK_END)
+        f.seek(max(DIGEST_SAMPLE_SIZE, size - DIGEST_SAMPLE_SIZE))
+        digest.update(f.read())
+    return digest.hexdigest()
+
+
+def ingest_file(filepath, profiler=NULL_PROFILER, timeseries=True):
+    """
+    Запись сводки для одного файла результатов; timeseries=False - без
+    временного ряда и деградации (шард: ряд строится по всему прогону).
+    """
+    entry = {
+        'name': test_name(filepath),
+        'file': os.path.basename(filepath),
+        'size': os.path.getsize(filepath),
+        'mtime': os.path.getmtime(filepath),
+        'digest': file_digest(filepath),
+    }
+    if filepath.endswith(ROLLUP_SUFFIX):
+        entry.update(ingest_rollup(filepath, profiler))
+        return entry
+    if not is_ndjson(filepath):
+        # summary-export k6 (--summary-export) переносится как есть
+        with open_results(filepath) as f:
+            entry['source'] = 'summary-export'
+            entry['k6_summary'] = json.load(f)
+        return entry
+
+    with profiler.stage('parse') as stage:
+        # memmap: в памяти только страницы, которые читают агрегаты и разбивки
+        columns = load_columns(filepath, mmap=True)
+        stage.lines = len(columns)
+    with profiler.stage('aggregate') as stage:
+        aggregates = columns.aggregates()
+        stage.lines = len(columns)
+    starts = [a.start_time for a in aggregates.values() if a.start_time is not None]
+    ends = [a.end_time for a in aggregates.values() if a.end_time is not None]
+
+    entry.update({
+        'source': 'ndjson',
+        'points': len(columns),
+        'start_time': min(starts) if starts else None,
+        'end_time': max(ends) if ends else None,
+        'metric_types': columns.metric_types,
+        'metrics': {name: aggregator.to_dict() for name, aggregator in aggregates.items()},
+        'k6_summary': to_k6_summary(aggregates, columns.metric_types),
+    })
+    with profiler.stage('breakdowns') as stage:
+        entry['tags'] = {name: _tag_breakdowns(columns, name) for name in columns.metric_names}
+        stage.lines = len(columns)
+    if starts and timeseries:
+        with profiler.stage('timeseries') as stage:
+            series = build_series(columns, entry['start_time'], entry['end_time'])
+            entry['timeseries'] = downsample(series, TIMESERIES_POINTS)
+            stage.lines = len(columns)
+        with profiler.stage('degradation') as stage:
+            # поминутные CUSUM / Page-Hinkley / наклон: начало деградации для HTML-отчета
+            entry['degradation'] = detect_columns(columns, entry['start_time'], entry['end_time'])
+            stage.lines = len(columns)
+    return entry
+
+
+def ingest_rollup(filepath, profiler=NULL_PROFILER):
+    """Поля записи сводки по rollup сжатого артефакта (k6report.rollup)."""
+    with profiler.stage('parse'):
+        rollup = Rollup.load(filepath)
+    with profiler.stage('aggregate') as stage:
+        aggregates = rollup.aggregates()
+        stage.lines = sum(len(level['time']) for level in rollup.levels.values())
+    starts = [a.start_time for a in aggregates.values() if a.start_time is not None]
+    ends = [a.end_time for a in aggregates.values() if a.end_time is not None]
+    entry = {
+        'source': 'rollup',
+        'rollup': {'resolutions': rollup.resolutions, 'sources': rollup.sources},
+        'points': sum(aggregator.count for aggregator in aggregates.values()),
+        'start_time': min(starts) if starts else None,
+        'end_time': max(ends) if ends else None,
+        'metric_types': rollup.metric_types,
+        'metrics': {name: aggregator.to_dict() for name, aggregator in aggregates.items()},
+        'k6_summary': to_k6_summary(aggregates, rollup.metric_types),
+    }
+    with profiler.stage('breakdowns'):
+        entry['tags'] = {name: rollup.breakdowns(name, MAX_TAG_VALUES) for name in rollup.metric_names}
+    if starts:
+        with profiler.stage('timeseries'):
+            # разрешение выбирается по бюджету точек графика
+            series = rollup.series(entry['start_time'], entry['end_time'], TIMESERIES_POINTS)
+            entry['timeseries'] = downsample(series, TIMESERIES_POINTS)
+        if DEFAULT_INTERVAL_S in rollup.levels:
+            with profiler.stage('degradation'):
+                entry['degradation'] = detect_series(
+                    rollup.series(entry['start_time'], entry['end_time'], resolution=DEFAULT_INTERVAL_S,
+                                  quantiles=(0.95,)), DEFAULT_INTERVAL_S)
+    return entry
+
+
+def ingest_run(results_dir, run_id, filenames, profiler=NULL_PROFILER):
+    """Запись сводки логического прогона из шардов filenames."""
+    filepaths = [os.path.join(results_dir, filename) for filename in filenames]
+    entry = merge_entries(run_id, [ingest_file(filepath, profiler, timeseries=False) for filepath in filepaths])
+    if entry['start_time'] is not None:
+        with profiler.stage('merge') as stage:
+            # k-way слияние шардов по времени: ряд и деградация по всему парку
+            series, entry['degradation'], stage.lines = merged_timeseries(
+                filepaths, entry['start_time'], entry['end_time'])
+            entry['timeseries'] = downsample(series, TIMESERIES_POINTS)
+    return entry
+
+
+def _is_ndjson(filepath):
+    """
+    is_ndjson без исключения: нечитаемый файл (.zst без zstandard, битый
+    архив) пропускается при прогреве кеша, ошибку сообщит ingest_file.
+    """
+    try:
+        return is_ndjson(filepath)
+    except Exception:
+        return False
+
+
+def ingest_results(results_dir, workers=None, output=None, profiler=NULL_PROFILER, merge_shards=True):
+    """
+    Читает все результаты каталога и пишет сводку (по умолчанию
+    <results_dir>/k6-summary.json). Шарды одного прогона сливаются в одну
+    запись (merge_shards=False - каждый файл отдельно). Возвращает словарь сводки.
+    """
+    filenames = list_result_files(results_dir)
+    filepaths = [os.path.join(results_dir, filename) for filename in filenames]
+    rollups = list_rollup_files(results_dir)
+    with profiler.stage('parse'):
+        # параллельный разбор в дочерних процессах; строки учитывает ingest_file
+        warm_cache([path for path in filepaths if _is_ndjson(path)], resolve_workers(workers))
+
+    runs = group_shards(filenames) if merge_shards else [(filename, [filename]) for filename in filenames]
+    groups = []
+    for run_id, group in runs:
+        exports = [filename for filename in group
+                   if len(group) > 1 and not _is_ndjson(os.path.join(results_dir, filename))]
+        if exports:
+            # summary-export (или нечитаемый файл) не сливается с потоками точек: отдельная запись
+            print(f"⚠️ {run_id}: {', '.join(exports)} - не поток точек k6, в слитый прогон не входит")
+            group = [filename for filename in group if filename not in exports]
+        if len(group) == 1:
+            groups.append((group[0], group))
+        elif group:
+            groups.append((run_id, group))
+        groups += [(filename, [filename]) for filename in exports]
+    groups += [(filename, [filename]) for filename in rollups]
+    tests = []
+    for run_id, group in groups:
+        try:
+            if group == [run_id]:
+                tests.append(ingest_file(os.path.join(results_dir, run_id), profiler))
+            else:
+                tests.append(ingest_run(results_dir, run_id, group, profiler))
+        except Exception as e:
+            print(f"Ошибка обработки {run_id}: {e}")
+
+    summary = {
+        'version': SUMMARY_VERSION,
+        'generated_at': datetime.now().isoformat(),
+        'results_dir': os.path.abspath(results_dir),
+        'tests': tests,
+    }
+    output = output or os.path.join(results_dir, SUMMARY_FILENAME)
+    tmp_path = f"{output}.tmp"
+    with profiler.stage('write'):
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, output)
+    return summary
+
+
+def load_summary(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        summary = json.load(f)
+    if summary.get('version') != SUMMARY_VERSION:
+        raise ValueError(f"Версия сводки {summary.get('version')} != {SUMMARY_VERSION}")
+    return summary
+
+
+def _is_current(summary, results_dir):
+    """
+    Сводка описывает ровно текущие файлы каталога: те же имена и размеры,
+    и у каждого файла тот же mtime или, если mtime другой (копия, артефакт
+    CI), тот же отпечаток содержимого.
+    """
+    recorded = {}
+    for test in summary['tests']:
+        for shard in test.get('shards', [test]):
+            recorded[shard['file']] = shard
+    filenames = list_result_files(results_dir) + list_rollup_files(results_dir)
+    if set(filenames) != set(recorded):
+        return False
+    for filename in filenames:
+        filepath = os.path.join(results_dir, filename)
+        stat = os.stat(filepath)
+        shard = recorded[filename]
+        if stat.st_size != shard['size']:
+            return False
+        # сводки без mtime и отпечатка (до их записи) считаются устаревшими
+        if stat.st_mtime != shard.get('mtime') and file_digest(filepath) != shard.get('digest'):
+            return False
+    return True
+
+
+def current_summary(results_dir):
+    """Готовый k6-summary.json каталога, если он соответствует файлам, иначе None."""
+    path = os.path.join(results_dir, SUMMARY_FILENAME)
+    if os.path.exists(path):
+        try:
+            summary = load_summary(path)
+            if _is_current(summary, results_dir):
+                return summary
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Сводка {path} не подходит, пересобираем: {e}")
+    return None
+
+
+def ensure_summary(results_dir, workers=None, profiler=NULL_PROFILER):
+    """
+    Сводка каталога: готовый k6-summary.json, если он соответствует
+    файлам, иначе ingest заново.
+    """
+    return current_summary(results_dir) or ingest_results(results_dir, workers, profiler=profiler)
+
+
+def entry_aggregates(entry):
+    """Агрегаты метрик записи сводки как MetricAggregator."""
+    return {name: MetricAggregator.from_dict(data) for name, data in entry.get('metrics', {}).items()}
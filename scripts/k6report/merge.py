@@ -0,0 +1,186 @@
+# Слияние шардов распределенного прогона: несколько экземпляров k6 (по
+# одному на узел/контейнер) пишут каждый свой NDJSON с именем
+# <тест>-<run>-shard<N>.json (также -node<N>, -instance<N>). Шарды одного
+# run ID сводятся в один логический прогон:
+# - агрегаты и скетчи метрик и разбивок по тегам сливаются (merge), так
+#   что итоги, процентили и доли считаются по всему парку, а rate
+#   счетчиков - по общему окну прогона; значения VU-метрик (vus, vus_max)
+#   суммируются по экземплярам;
+# - временной ряд и проверка деградации строятся по колоночному кешу
+#   шардов: точки метрик ряда сводятся по времени в одни колонки, сырой
+#   NDJSON повторно не разбирается;
+# - для потоковой проверки (detect-degradation.py --stream) есть k-way
+#   слияние потоков точек шардов по времени (heapq.merge): в памяти по
+#   одной точке на шард. Точки внутри файла k6 упорядочены по времени лишь
+#   приблизительно, поэтому и слитый поток упорядочен с тем же допуском.
+# Слить можно только потоки точек: summary-export k6 среди шардов
+# (merge_entries отвергает его) остается отдельной записью.
+
+import heapq
+import os
+import re
+
+import numpy as np
+
+from k6report.aggregate import DEFAULT_QUANTILES, MetricAggregator, to_k6_summary
+from k6report.cache import ColumnarResults, load_columns
+from k6report.decode import iter_points, strip_result_suffix
+from k6report.degradation import DEFAULT_INTERVAL_S, detect_columns
+from k6report.percentiles import DEFAULT_MEMORY_LIMIT, array_chunks, chunked_quantiles
+from k6report.timeseries import build_series
+from k6report.timestamps import TimestampParser
+
+# load-abc123-shard2.json -> run load-abc123, шард 2; номер шарда только числовой,
+# чтобы chaos-nodes.json или api-instances.json не принимались за шарды
+SHARD_PATTERN = re.compile(r'^(?P<run>.+?)[-_.](?:shard|node|instance)-?(?P<shard>[0-9]+)$')
+
+# Gauge-метрики, значение которых у парка - сумма значений экземпляров
+FLEET_SUM_GAUGES = ('vus', 'vus_max')
+
+# Метрики, по которым строится временной ряд и проверка деградации
+SERIES_METRICS = ('http_reqs', 'http_req_failed', 'http_req_duration')
+
+
+def shard_run(filename):
+    """run ID шарда (load-abc123-shard2.json -> load-abc123) или None, если файл не шард."""
+    match = SHARD_PATTERN.match(strip_result_suffix(os.path.basename(filename)))
+    return match.group('run') if match else None
+
+
+def group_shards(filenames):
+    """
+    Группирует файлы по прогонам: [(run ID или имя файла, [файлы])] в
+    порядке первого файла группы. Сливаются только группы из нескольких
+    файлов; не-шарды и одиночный шард остаются по одному под своим именем.
+    """
+    groups = {}
+    for filename in filenames:
+        groups.setdefault(shard_run(filename) or filename, []).append(filename)
+    return [(run_id, files) if len(files) > 1 else (files[0], files) for run_id, files in groups.items()]
+
+
+def entry_files(entry):
+    """Файлы результатов записи сводки: шарды слитого прогона или один файл."""
+    return [shard['file'] for shard in entry['shards']] if 'shards' in entry else [entry['file']]
+
+
+def shard_quantiles(results_dir, entry, metric, quantiles=DEFAULT_QUANTILES, memory_limit=DEFAULT_MEMORY_LIMIT):
+    """
+    Точные квантили метрики слитого прогона по колоночному кешу его шардов
+    (memmap; сверх memory_limit значений - внешний выбор по кускам).
+    """
+    values = [load_columns(os.path.join(results_dir, filename), mmap=True).values(metric)
+              for filename in entry_files(entry)]
+    return chunked_quantiles(array_chunks(values), quantiles, memory_limit)
+
+
+def _merge_aggregators(dicts):
+    merged = MetricAggregator()
+    for data in dicts:
+        merged.merge(MetricAggregator.from_dict(data))
+    return merged
+
+
+def merge_entries(run_id, entries):
+    """
+    Запись сводки логического прогона из записей сводки его шардов
+    (ingest_file). Временной ряд добавляет merged_timeseries.
+    Raises:
+        ValueError: Среди шардов есть не поток точек (summary-export):
+            его итоги не сливаются с агрегатами остальных.
+    """
+    unmerged = [entry['file'] for entry in entries if entry.get('source') != 'ndjson']
+    if unmerged:
+        raise ValueError(f"Шарды {', '.join(unmerged)} прогона {run_id} - не поток точек k6, слить нельзя")
+    metric_types = {}
+    for entry in entries:
+        metric_types.update(entry.get('metric_types', {}))
+    names = list(dict.fromkeys(name for entry in entries for name in entry.get('metrics', {})))
+    aggregates = {}
+    for name in names:
+        shards = [entry['metrics'][name] for entry in entries if name in entry.get('metrics', {})]
+        aggregates[name] = _merge_aggregators(shards)
+        if name in FLEET_SUM_GAUGES:
+            # сумма экстремумов экземпляров - граница для парка (VU растут синхронно по сценарию)
+            for field in ('last', 'min', 'max'):
+                setattr(aggregates[name], field, sum(shard[field] for shard in shards if shard.get(field) is not None))
+
+    tags = {}
+    for entry in entries:
+        for name, breakdowns in entry.get('tags', {}).items():
+            for tag, values in breakdowns.items():
+                for value, data in values.items():
+                    tags.setdefault(name, {}).setdefault(tag, {}).setdefault(value, []).append(data)
+
+    starts = [entry['start_time'] for entry in entries if entry.get('start_time') is not None]
+    ends = [entry['end_time'] for entry in entries if entry.get('end_time') is not None]
+    return {
+        'name': entries[0]['name'],
+        'file': run_id,
+        'size': sum(entry['size'] for entry in entries),
+        'source': 'ndjson',
+        'points': sum(entry.get('points', 0) for entry in entries),
+        'start_time': min(starts) if starts else None,
+        'end_time': max(ends) if ends else None,
+        'metric_types': metric_types,
+        'metrics': {name: aggregator.to_dict() for name, aggregator in aggregates.items()},
+        'k6_summary': to_k6_summary(aggregates, metric_types),
+        'tags': {name: {tag: {value: _merge_aggregators(shards).to_dict() for value, shards in values.items()}
+                        for tag, values in breakdowns.items()}
+                 for name, breakdowns in tags.items()},
+        'shards': [{'file': entry['file'], 'size': entry['size'], 'mtime': entry['mtime'],
+                    'digest': entry['digest'], 'points': entry.get('points', 0),
+                    'start_time': entry.get('start_time'), 'end_time': entry.get('end_time')}
+                   for entry in entries],
+    }
+
+
+def _shard_points(filepath, metrics):
+    parse_time = TimestampParser()
+    for name, point in iter_points(filepath, metrics):
+        yield parse_time(point['time']), name, point['value']
+
+
+def merged_points(filepaths, metrics=SERIES_METRICS):
+    """
+    k-way слияние потоков точек шардов по времени: (метрика, значение, время нс).
+    Каждый файл читается потоково, в куче - по одной точке на шард.
+    """
+    streams = [_shard_points(filepath, metrics) for filepath in filepaths]
+    for time, name, value in heapq.merge(*streams, key=lambda point: point[0]):
+        yield name, value, time
+
+
+def merged_columns(columns_list, metrics=SERIES_METRICS):
+    """
+    Колонки метрик metrics слитого прогона из колоночных данных шардов:
+    точки каждой метрики сводятся по времени (stable-сортировка, равное
+    время - в порядке шардов). Теги не переносятся.
+    """
+    names = [name for name in metrics if any(name in columns.metric_names for columns in columns_list)]
+    metric_types = {}
+    for columns in columns_list:
+        metric_types.update(columns.metric_types)
+    times, values = [], []
+    for name in names:
+        metric_times = np.concatenate([columns.times(name) for columns in columns_list])
+        order = np.argsort(metric_times, kind='stable')
+        times.append(metric_times[order])
+        values.append(np.concatenate([columns.values(name) for columns in columns_list])[order])
+    offsets = np.concatenate(([0], np.cumsum([len(part) for part in times]))).astype(np.int64)
+    return ColumnarResults(names, {name: metric_types.get(name) for name in names}, offsets,
+                           np.concatenate(times) if times else np.empty(0, dtype=np.int64),
+                           np.concatenate(values) if values else np.empty(0), {}, {})
+
+
+def merged_timeseries(filepaths, start_time, end_time, interval_s=DEFAULT_INTERVAL_S, **options):
+    """
+    Посекундный ряд (в формате build_series) и поминутная проверка
+    деградации слитого прогона по колоночному кешу шардов (memmap).
+    Returns:
+        tuple: (ряд, результат detect_columns, число точек метрик ряда).
+    """
+    columns = merged_columns([load_columns(filepath, mmap=True) for filepath in filepaths])
+    series = build_series(columns, start_time, end_time)
+    degradation = detect_columns(columns, start_time, end_time, interval_s, **options)
+    return series, degradation, len(columns)
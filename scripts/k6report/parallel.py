@@ -0,0 +1,95 @@
+# Параллельное чтение результатов k6 в пуле процессов.
+# Файлы обрабатываются одновременно, а большой файл делится на диапазоны
+# байт по границам строк; каждый диапазон агрегируется в отдельном процессе,
+# частичные агрегаты сливаются в конце. Слияние скетчей точное, поэтому
+# счетчики, min/max и процентили совпадают с последовательным проходом.
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from k6report.aggregate import DEFAULT_RELATIVE_ACCURACY, aggregate_points, merge_aggregates
+from k6report.decode import iter_points, split_ranges
+
+# Переменная окружения с числом процессов по умолчанию
+WORKERS_ENV = 'K6REPORT_WORKERS'
+
+# Меньшие куски не выгодно отдавать отдельному процессу
+MIN_RANGE_SIZE = 32 * 2**20
+
+
+def resolve_workers(workers=None):
+    """
+    Число процессов: явное значение, K6REPORT_WORKERS или 1.
+    0 означает "по числу ядер".
+    """
+    if workers is None:
+        workers = int(os.environ.get(WORKERS_ENV, 1))
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    return workers
+
+
+def _report_bad_line(line, e):
+    print(f"Ошибка парсинга JSON: {line[:200]}... {e}")
+
+
+def aggregate_range(filepath, metrics=None, start=0, end=None,
+                    relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+    """
+    Агрегаты метрик по диапазону байт файла (выполняется в процессе пула).
+    Ошибка чтения файла не перехватывается: aggregate_files записывает ее в errors.
+    """
+    points = iter_points(filepath, metrics, on_error=_report_bad_line, start=start, end=end)
+    return aggregate_points(points, relative_accuracy)
+
+
+def aggregate_files(filepaths, metrics=None, workers=None,
+                    relative_accuracy=DEFAULT_RELATIVE_ACCURACY, min_range_size=MIN_RANGE_SIZE, errors=None):
+    """
+    Агрегирует несколько файлов.
+    Args:
+        filepaths (list): Пути к NDJSON-файлам k6.
+        metrics (iterable): Нужные метрики; None - все.
+        workers (int): Число процессов (см. resolve_workers); 1 - без пула.
+        errors (dict): Если передан, ошибка файла записывается сюда
+            (путь -> исключение), а файл пропускается; иначе она пробрасывается.
+    Returns:
+        dict: путь -> {имя метрики: MetricAggregator}.
+    """
+    def failed(path, e):
+        if errors is None:
+            raise e
+        errors.setdefault(path, e)
+
+    workers = resolve_workers(workers)
+    results = {path: {} for path in filepaths}
+    if workers == 1:
+        for path in filepaths:
+            try:
+                results[path] = aggregate_range(path, metrics, relative_accuracy=relative_accuracy)
+            except Exception as e:
+                failed(path, e)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = []
+            for path in filepaths:
+                try:
+                    ranges = split_ranges(path, workers, min_range_size)
+                except Exception as e:
+                    failed(path, e)
+                    continue
+                for start, end in ranges:
+                    futures.append((path, pool.submit(aggregate_range, path, metrics, start, end,
+                                                      relative_accuracy)))
+            for path, future in futures:
+                try:
+                    merge_aggregates(results[path], future.result())
+                except Exception as e:
+                    failed(path, e)
+    return {path: aggregates for path, aggregates in results.items() if path not in (errors or {})}
+
+
+def aggregate_file(filepath, metrics=None, workers=None,
+                   relative_accuracy=DEFAULT_RELATIVE_ACCURACY, min_range_size=MIN_RANGE_SIZE):
+    """Агрегаты одного файла; при workers > 1 файл читается кусками параллельно."""
+    return aggregate_files([filepath], metrics, workers, relative_accuracy, min_range_size)[filepath]
@@ -0,0 +1,243 @@
+# Точные процентили в определении k6 (для аудиторских отчетов).
+# k6 считает p(x) линейной интерполяцией между соседними порядковыми
+# статистиками: i = x * (n - 1), p = v[floor(i)] + (v[ceil(i)] - v[floor(i)]) * frac(i).
+# Вместо полной сортировки используется выбор (np.partition) сразу по всем
+# нужным рангам. Если ряд не помещается в память, значения сбрасываются
+# на диск кусками (или читаются кусками из memmap колоночного кеша),
+# а ранги ищутся внешним поразрядным выбором: за проход
+# по кускам уточняются очередные 16 бит ключа, пока кандидатов не станет
+# достаточно мало, чтобы добрать их в память.
+
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from k6report.decode import iter_points
+
+# Сколько значений держать в памяти (8 байт каждое) до сброса на диск
+DEFAULT_MEMORY_LIMIT = 64 * 2**20
+
+# Поразрядный выбор: бит ключа за проход
+RADIX_BITS = 16
+
+# Размер куска при чтении memmap кеша для внешнего выбора, значений
+CHUNK_VALUES = 2**20
+
+_SIGN_BIT = np.uint64(1 << 63)
+
+
+def k6_ranks(count, quantiles):
+    """Ранги (floor, ceil, доля) для каждого квантиля по формуле k6."""
+    ranks = {}
+    for q in quantiles:
+        position = q * (count - 1)
+        lower = int(np.floor(position))
+        ranks[q] = (lower, min(lower + 1, count - 1), position - lower)
+    return ranks
+
+
+def _interpolate(ranks, order_statistics):
+    return {q: order_statistics[lower] + (order_statistics[upper] - order_statistics[lower]) * fraction
+            for q, (lower, upper, fraction) in ranks.items()}
+
+
+def exact_quantiles(values, quantiles):
+    """
+    Точные квантили массива float64 одним np.partition по всем рангам.
+    Returns:
+        dict: q -> значение; None для пустого массива.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if not len(values):
+        return {q: None for q in quantiles}
+    ranks = k6_ranks(len(values), quantiles)
+    kth = sorted({rank for lower, upper, _ in ranks.values() for rank in (lower, upper)})
+    partitioned = np.partition(values, kth)
+    return _interpolate(ranks, {rank: float(partitioned[rank]) for rank in kth})
+
+
+def _sortable_keys(values):
+    """float64 -> uint64 с тем же порядком (для поразрядного выбора)."""
+    bits = np.ascontiguousarray(values, dtype=np.float64).view(np.uint64)
+    return np.where(bits & _SIGN_BIT, ~bits, bits | _SIGN_BIT)
+
+
+def _key_value(key):
+    key = np.uint64(key)
+    bits = key & ~_SIGN_BIT if key & _SIGN_BIT else ~key
+    return float(np.array([bits], dtype=np.uint64).view(np.float64)[0])
+
+
+def external_quantiles(chunks, count, quantiles, memory_limit=DEFAULT_MEMORY_LIMIT):
+    """
+    Точные квантили ряда, который читается кусками.
+    Args:
+        chunks (callable): Возвращает новый итератор по кускам (массивам float64);
+            вызывается на каждый проход.
+        count (int): Общее число значений.
+        memory_limit (int): Сколько кандидатов можно собрать в память.
+    """
+    if not count:
+        return {q: None for q in quantiles}
+    ranks = k6_ranks(count, quantiles)
+    # ранг -> [префикс ключа, длина префикса в битах, число значений меньше префикса]
+    pending = {rank: [0, 0, 0] for lower, upper, _ in ranks.values() for rank in (lower, upper)}
+    found = {}
+
+    while pending:
+        # Один проход: гистограммы следующих 16 бит для каждого различного префикса
+        prefixes = {(prefix, bits) for prefix, bits, _ in pending.values()}
+        histograms = {prefix: np.zeros(2**RADIX_BITS, dtype=np.int64) for prefix in prefixes}
+        for chunk in chunks():
+            keys = _sortable_keys(chunk)
+            for (prefix, bits), histogram in histograms.items():
+                selected = keys[(keys >> np.uint64(64 - bits)) == np.uint64(prefix)] if bits else keys
+                digits = (selected >> np.uint64(64 - bits - RADIX_BITS)) & np.uint64(2**RADIX_BITS - 1)
+                histogram += np.bincount(digits.astype(np.int64), minlength=2**RADIX_BITS)
+
+        collect = {}
+        for rank, state in list(pending.items()):
+            prefix, bits, below = state
+            cumulative = histograms[(prefix, bits)].cumsum()
+            digit = int(np.searchsorted(cumulative, rank - below, side='right'))
+            below += int(cumulative[digit - 1]) if digit else 0
+            candidates = int(histograms[(prefix, bits)][digit])
+            prefix, bits = (prefix << RADIX_BITS) | digit, bits + RADIX_BITS
+            if bits == 64:
+                found[rank] = _key_value(prefix)  # все кандидаты равны
+                del pending[rank]
+            elif candidates <= memory_limit:
+                collect[rank] = (prefix, bits, below)
+                del pending[rank]
+            else:
+                pending[rank] = [prefix, bits, below]
+
+        # Кандидаты помещаются в память - добираем их и выбираем точно
+        if collect:
+            groups = {}
+            for rank, (prefix, bits, below) in collect.items():
+                groups.setdefault((prefix, bits), []).append((rank, below))
+            gathered = {prefix: [] for prefix in groups}
+            for chunk in chunks():
+                keys = _sortable_keys(chunk)
+                for prefix, bits in groups:
+                    gathered[(prefix, bits)].append(chunk[(keys >> np.uint64(64 - bits)) == np.uint64(prefix)])
+            for prefix, members in groups.items():
+                candidates = np.concatenate(gathered[prefix])
+                kth = sorted({rank - below for rank, below in members})
+                partitioned = np.partition(candidates, kth)
+                for rank, below in members:
+                    found[rank] = float(partitioned[rank - below])
+
+    return _interpolate(ranks, found)
+
+
+def array_chunks(arrays, chunk_size=CHUNK_VALUES):
+    """
+    Функция-источник кусков для external_quantiles: срезы массивов
+    (memmap кеша) по chunk_size значений; читается только текущий срез.
+    """
+    def chunks():
+        for array in arrays:
+            for start in range(0, len(array), chunk_size):
+                yield array[start:start + chunk_size]
+    return chunks
+
+
+def chunked_quantiles(chunks, quantiles, memory_limit=DEFAULT_MEMORY_LIMIT):
+    """
+    Точные квантили ряда из кусков: в памяти, если ряд не длиннее
+    memory_limit значений, иначе внешний выбор по кускам.
+    Args:
+        chunks (callable): Возвращает новый итератор по кускам (см. array_chunks).
+    """
+    count = sum(len(chunk) for chunk in chunks())
+    if count <= memory_limit:
+        return exact_quantiles(np.concatenate(list(chunks())) if count else [], quantiles)
+    return external_quantiles(chunks, count, quantiles, memory_limit)
+
+
+class SpillBuffer:
+    """
+    Накопитель значений с ограничением памяти: при переполнении буфер
+    сбрасывается на диск (.npy), куски читаются обратно через memmap.
+    """
+
+    def __init__(self, memory_limit=DEFAULT_MEMORY_LIMIT, spill_dir=None):
+        self.memory_limit = memory_limit
+        self.spill_dir = spill_dir
+        self.count = 0
+        self._buffer = []
+        self._buffered = 0
+        self._directory = None
+        self._spilled = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        self._buffer.append(values)
+        self._buffered += len(values)
+        self.count += len(values)
+        if self._buffered >= self.memory_limit:
+            self._spill()
+
+    def _spill(self):
+        if self._directory is None:
+            self._directory = tempfile.mkdtemp(prefix='k6report-spill-', dir=self.spill_dir)
+        path = os.path.join(self._directory, f"chunk-{len(self._spilled)}.npy")
+        np.save(path, np.concatenate(self._buffer))
+        self._spilled.append(path)
+        self._buffer = []
+        self._buffered = 0
+
+    @property
+    def spilled(self):
+        return bool(self._spilled)
+
+    def chunks(self):
+        for path in self._spilled:
+            yield np.load(path, mmap_mode='r')
+        yield from self._buffer
+
+    def quantiles(self, quantiles):
+        """Точные квантили: в памяти, если ничего не сброшено, иначе внешний выбор."""
+        if not self.spilled:
+            return exact_quantiles(np.concatenate(self._buffer) if self._buffer else [], quantiles)
+        return external_quantiles(self.chunks, self.count, quantiles, self.memory_limit)
+
+    def close(self):
+        if self._directory is not None:
+            shutil.rmtree(self._directory, ignore_errors=True)
+            self._directory = None
+        self._spilled = []
+        self._buffer = []
+
+
+def file_quantiles(filepath, metric, quantiles, columns=None, memory_limit=DEFAULT_MEMORY_LIMIT,
+                   batch_size=2**16):
+    """
+    Точные квантили метрики файла результатов с ограничением памяти
+    memory_limit значений. С колоночными данными (кеш, лучше открытый
+    с mmap=True) срез метрики читается кусками, иначе файл читается
+    потоково через SpillBuffer.
+    """
+    if columns is not None:
+        return chunked_quantiles(array_chunks([columns.values(metric)]), quantiles, memory_limit)
+
+    with SpillBuffer(memory_limit) as buffer:
+        batch = []
+        for _, data in iter_points(filepath, (metric,)):
+            batch.append(data['value'])
+            if len(batch) >= batch_size:
+                buffer.add(batch)
+                batch = []
+        if batch:
+            buffer.add(batch)
+        return buffer.quantiles(quantiles)
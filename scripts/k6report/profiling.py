@@ -0,0 +1,207 @@
+# Профилирование стадий конвейера отчетов (--profile в скриптах).
+# По каждой стадии (разбор, агрегация, отрисовка, ...) копятся время
+# (wall и CPU, включая дочерние процессы --workers), число обработанных
+# строк и пик RSS процесса. Пик берется из VmHWM и сбрасывается перед
+# стадией через /proc/self/clear_refs (Linux), поэтому замер почти
+# бесплатен, в отличие от tracemalloc, который замедляет разбор в разы;
+# без /proc пишется пик процесса с его начала (ru_maxrss).
+# Вложенные стадии получают имя "внешняя/внутренняя", пик внешней стадии
+# включает пики вложенных. Опционально по каждой верхней стадии
+# снимается cProfile (.prof для pstats/snakeviz).
+# Итог пишется в pipeline-timings.json рядом с отчетом: у каждого скрипта
+# своя запись, поэтому файл собирает стоимость всего конвейера.
+
+import cProfile
+import json
+import os
+import platform
+import re
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+PIPELINE_TIMINGS_FILENAME = 'pipeline-timings.json'
+
+
+class Stage:
+    """Накопленная статистика стадии; lines задает сама стадия."""
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.children_cpu = 0.0
+        self.lines = 0
+        self.peak = 0
+        self._started = None
+
+    def to_dict(self):
+        return {
+            'calls': self.calls,
+            'wall_s': round(self.wall, 4),
+            'cpu_s': round(self.cpu, 4),
+            'children_cpu_s': round(self.children_cpu, 4),
+            'lines': self.lines,
+            'lines_per_s': round(self.lines / self.wall) if self.lines and self.wall > 0 else None,
+            'peak_rss_mb': round(self.peak / 2**20, 2),
+        }
+
+
+def _cpu_times():
+    times = os.times()
+    return times.user + times.system, times.children_user + times.children_system
+
+
+def _peak_rss():
+    """Пик RSS процесса в байтах с последнего сброса."""
+    try:
+        with open('/proc/self/status', encoding='ascii') as f:
+            return int(re.search(r'VmHWM:\s+(\d+) kB', f.read()).group(1)) * 1024
+    except (OSError, AttributeError):
+        import resource
+        # ru_maxrss: КБ в Linux, байты в macOS
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+
+
+def _reset_peak_rss():
+    try:
+        with open('/proc/self/clear_refs', 'w', encoding='ascii') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+class Profiler:
+    """
+    Таймер стадий одного скрипта. Выключенный профайлер (по умолчанию в
+    функциях библиотеки) ничего не измеряет, stage() почти бесплатен.
+    """
+
+    def __init__(self, command, enabled=True, cprofile_dir=None):
+        self.command = command
+        self.enabled = enabled or bool(cprofile_dir)
+        self.cprofile_dir = cprofile_dir
+        self.stages = {}
+        self.started_at = datetime.now().isoformat()
+        self._started = time.perf_counter()
+        self._stack = []
+        self._profiles = {}
+        if cprofile_dir:
+            os.makedirs(cprofile_dir, exist_ok=True)
+
+    @contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield Stage(name)
+            return
+
+        if self._stack:
+            # пик внешней стадии до входа во вложенную
+            parent = self._stack[-1]
+            parent.peak = max(parent.peak, _peak_rss())
+            name = f"{parent.name}/{name}"
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = Stage(name)
+        current = Stage(name)  # измерение этого вызова
+        self._stack.append(current)
+        _reset_peak_rss()
+
+        profile = None
+        if self.cprofile_dir and len(self._stack) == 1:
+            profile = self._profiles.setdefault(name, cProfile.Profile())
+            profile.enable()
+        cpu, children_cpu = _cpu_times()
+        started = time.perf_counter()
+        current._started = started
+        try:
+            yield current
+        finally:
+            elapsed = time.perf_counter() - started
+            cpu_end, children_cpu_end = _cpu_times()
+            if profile:
+                profile.disable()
+            current.peak = max(current.peak, _peak_rss())
+            self._stack.pop()
+            if self._stack:
+                self._stack[-1].peak = max(self._stack[-1].peak, current.peak)
+                _reset_peak_rss()
+
+            stage.calls += 1
+            stage.wall += elapsed
+            stage.cpu += cpu_end - cpu
+            stage.children_cpu += children_cpu_end - children_cpu
+            stage.lines += current.lines
+            stage.peak = max(stage.peak, current.peak)
+
+    def to_dict(self):
+        """Итог скрипта; незавершенные стадии учитываются по текущему моменту."""
+        stages = {name: stage.to_dict() for name, stage in self.stages.items()}
+        for stage in self._stack:
+            running = stages.setdefault(stage.name, Stage(stage.name).to_dict())
+            running['wall_s'] = round(running['wall_s'] + time.perf_counter() - stage._started, 4)
+            running['peak_rss_mb'] = max(running['peak_rss_mb'],
+                                            round(_peak_rss() / 2**20, 2))
+            running['running'] = True
+        top_level = [stage for name, stage in stages.items() if '/' not in name]
+        return {
+            'started_at': self.started_at,
+            'wall_s': round(time.perf_counter() - self._started, 4),
+            'stages_wall_s': round(sum(stage['wall_s'] for stage in top_level), 4),
+            'peak_rss_mb': max((stage['peak_rss_mb'] for stage in stages.values()), default=0.0),
+            'python': platform.python_version(),
+            'stages': stages,
+        }
+
+    def pipeline_timings(self, results_dir):
+        """Содержимое pipeline-timings.json с текущим скриптом (для подвала отчета)."""
+        timings = load_timings(results_dir)
+        timings['commands'][self.command] = self.to_dict()
+        return timings
+
+    def write(self, results_dir):
+        """Дописывает запись скрипта в pipeline-timings.json и сбрасывает cProfile."""
+        if not self.enabled:
+            return None
+        for name, profile in self._profiles.items():
+            profile.dump_stats(os.path.join(self.cprofile_dir, f"{self.command}-{name}.prof"))
+        timings = self.pipeline_timings(results_dir)
+        timings['updated_at'] = datetime.now().isoformat()
+        path = os.path.join(results_dir, PIPELINE_TIMINGS_FILENAME)
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(timings, f, indent=2, ensure_ascii=False)
+        os.replace(f"{path}.tmp", path)
+        return path
+
+    def print_summary(self):
+        if not self.enabled:
+            return
+        print(f"⏱️  Стадии {self.command}:")
+        for name, stage in self.to_dict()['stages'].items():
+            rate = f", {stage['lines_per_s']:,} строк/с" if stage['lines_per_s'] else ""
+            print(f"   {name:<28} {stage['wall_s']:8.3f} s (CPU {stage['cpu_s'] + stage['children_cpu_s']:.3f} s"
+                  f"{rate}, пик {stage['peak_rss_mb']:.1f} МБ)")
+
+
+# Для функций библиотеки, которые вызывают без профилирования
+NULL_PROFILER = Profiler(None, enabled=False)
+
+
+def load_timings(results_dir):
+    path = os.path.join(results_dir, PIPELINE_TIMINGS_FILENAME)
+    try:
+        with open(path, encoding='utf-8') as f:
+            timings = json.load(f)
+        timings.setdefault('commands', {})
+        return timings
+    except (OSError, ValueError):
+        return {'commands': {}}
+
+
+def add_profile_arguments(parser):
+    parser.add_argument('--profile', action='store_true',
+                        help=f"Замерить стадии (время, CPU, строки, пик RSS) и записать {PIPELINE_TIMINGS_FILENAME}")
+    parser.add_argument('--cprofile', default=None, metavar='DIR',
+                        help="Сохранить cProfile каждой стадии в DIR (включает --profile)")
@@ -0,0 +1,332 @@
+# Ad-hoc запросы к одному прогону: метрика, фильтры по тегам, диапазон
+# времени, агрегации и группировка по тегам и интервалам времени.
+# Источник - колоночный кеш сырого файла или rollup сжатого артефакта.
+# Кеш открывается через memmap, и запрос читает только нужные строки:
+# - строки метрики отсортированы по времени, поэтому диапазон времени -
+#   два бинарных поиска по срезу метрики (индекс времени);
+# - фильтры тег=значение - битовые карты значений тегов (бит на строку,
+#   np.packbits) из индекса рядом с записью кеша (.index.npz, строится при
+#   первом запросе); карты фильтров пересекаются побайтно и только на
+#   диапазоне строк, распаковывается один результат.
+# По rollup берется наименьший набор тегов, покрывающий фильтры и
+# группировку, и самое грубое разрешение, кратное границам и интервалу;
+# квантили там - по скетчам (приблизительные).
+
+import os
+import re
+from collections import namedtuple
+
+import numpy as np
+
+from k6report.cache import index_path, load_columns, read_npz
+from k6report.groupby import aggregate_groups, decode_key, group_keys
+from k6report.percentiles import exact_quantiles
+from k6report.thresholds import aggregation_value
+from k6report.timestamps import NS_PER_SECOND, parse_rfc3339_ns
+
+INDEX_VERSION = 1
+
+# Битовые карты строятся для тегов с числом значений не больше этого;
+# остальные теги фильтруются сравнением кодов на диапазоне строк
+MAX_BITMAP_VALUES = 64
+
+# Агрегация: подпись в выводе, агрегация k6 (как в порогах) и квантиль
+Aggregation = namedtuple('Aggregation', 'label aggregation quantile')
+
+_PERCENTILE = re.compile(r'^p\(?(?P<percentile>\d+(?:\.\d+)?)\)?$')
+_FILTER = re.compile(r'^\s*(?P<tag>[^=!\s]+)\s*(?P<operator>!=|==|=)\s*(?P<value>.*?)\s*$')
+_DURATION = re.compile(r'(?P<amount>\d+(?:\.\d+)?)(?P<unit>ms|h|m|s)')
+_UNITS_NS = {'h': 3600 * NS_PER_SECOND, 'm': 60 * NS_PER_SECOND, 's': NS_PER_SECOND, 'ms': NS_PER_SECOND // 1000}
+
+
+def parse_aggregation(text):
+    """'p95', 'p(99.9)', 'med', 'avg', 'count', 'sum', 'rate', ... -> Aggregation."""
+    text = text.strip()
+    match = _PERCENTILE.match(text)
+    if match:
+        return Aggregation(text, f"p({match.group('percentile')})", float(match.group('percentile')) / 100)
+    if text == 'med':
+        return Aggregation(text, text, 0.5)
+    if text in ('count', 'sum', 'avg', 'min', 'max', 'rate', 'value'):
+        return Aggregation(text, text, None)
+    raise ValueError(f"Неизвестная агрегация: {text}")
+
+
+def parse_filter(text):
+    """'endpoint=create_post' / 'status!=200' -> (тег, '=' или '!=', значение)."""
+    match = _FILTER.match(text)
+    if not match:
+        raise ValueError(f"Ожидался фильтр тег=значение или тег!=значение: {text}")
+    operator = '!=' if match.group('operator') == '!=' else '='
+    return match.group('tag'), operator, match.group('value').strip('\'"')
+
+
+def parse_duration(text):
+    """'90s', '30m', '1h30m', '250ms' -> наносекунды."""
+    text = text.strip()
+    if not text or ''.join(match.group(0) for match in _DURATION.finditer(text)) != text:
+        raise ValueError(f"Некорректная длительность: {text}")
+    return int(sum(float(match.group('amount')) * _UNITS_NS[match.group('unit')]
+                   for match in _DURATION.finditer(text)))
+
+
+def parse_time(text, run_start):
+    """
+    Граница диапазона: метка RFC3339 или смещение ('30m') от начала прогона,
+    округленного вниз до секунды (границы совпадают с корзинами rollup).
+    """
+    if re.match(r'^\d{4}-\d{2}-\d{2}', text.strip()):
+        return parse_rfc3339_ns(text.strip())
+    return run_start // NS_PER_SECOND * NS_PER_SECOND + parse_duration(text)
+
+
+class Query:
+    """Запрос: метрика, фильтры, [start_time, end_time) в нс, агрегации, группировка и интервал."""
+
+    def __init__(self, metric, filters=(), start_time=None, end_time=None, aggregations=(),
+                 group_by=(), interval_ns=None):
+        self.metric = metric
+        self.filters = list(filters)
+        self.start_time = start_time
+        self.end_time = end_time
+        self.aggregations = list(aggregations) or [parse_aggregation(text) for text in ('count', 'avg', 'p95')]
+        self.group_by = list(group_by)
+        self.interval_ns = interval_ns
+
+    @property
+    def quantiles(self):
+        return [aggregation.quantile for aggregation in self.aggregations if aggregation.quantile is not None]
+
+    def origin(self, run_start):
+        """Начало первого интервала: start_time или начало прогона, выровненное по интервалу."""
+        if self.start_time is not None:
+            return self.start_time
+        return run_start // self.interval_ns * self.interval_ns
+
+    def window(self, run_start, run_end):
+        start = run_start if self.start_time is None else self.start_time
+        end = run_end if self.end_time is None else self.end_time
+        return start, end
+
+
+class TagIndex:
+    """
+    Битовые карты значений тегов записи кеша: тег -> матрица uint8
+    (значение x байты строк), бит строки = тег строки равен значению.
+    """
+
+    def __init__(self, bitmaps):
+        self.bitmaps = bitmaps
+
+    @classmethod
+    def build(cls, columns, max_values=MAX_BITMAP_VALUES):
+        bitmaps = {}
+        for tag, codes in columns.tags.items():
+            n_values = len(columns.tag_values[tag])
+            if n_values > max_values:
+                continue
+            bitmap = np.empty((n_values, (len(codes) + 7) // 8), dtype=np.uint8)
+            for code in range(n_values):
+                bitmap[code] = np.packbits(codes == code)
+            bitmaps[tag] = bitmap
+        return cls(bitmaps)
+
+    def save(self, path):
+        # без сжатия: при чтении карты отображаются в память
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        tags = list(self.bitmaps)
+        np.savez(tmp_path, version=np.int64(INDEX_VERSION), tags=np.array(tags, dtype=str),
+                 shapes=np.array([self.bitmaps[tag].shape for tag in tags], dtype=np.int64).reshape(-1, 2),
+                 **{f'bitmap_{i}': self.bitmaps[tag].ravel() for i, tag in enumerate(tags)})
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        data = read_npz(path, mmap=True)
+        if int(data['version']) != INDEX_VERSION:
+            raise ValueError(f"Версия индекса {int(data['version'])} != {INDEX_VERSION}")
+        return cls({tag: data[f'bitmap_{i}'].reshape(tuple(shape))
+                    for i, (tag, shape) in enumerate(zip(data['tags'].tolist(), data['shapes'].tolist()))})
+
+    def mask(self, columns, first, last, filters):
+        """
+        Маска строк [first, last) по фильтрам [(тег, оператор, значение)];
+        None - фильтров нет. Строки без тега не проходят ни '=', ни '!='
+        (как в rollup: у таких точек нет рядов с этим тегом).
+        """
+        if not filters:
+            return None
+        low, high = first // 8, (last + 7) // 8
+        packed = None
+        mask = None
+        for tag, operator, value in filters:
+            values = columns.tag_values.get(tag, [])
+            code = values.index(value) if value in values else None
+            if tag in self.bitmaps:
+                bitmap = self.bitmaps[tag][:, low:high]
+                bits = bitmap[code] if code is not None else np.zeros(high - low, np.uint8)
+                if operator == '!=':
+                    # строки с любым значением тега, кроме value
+                    bits = np.bitwise_or.reduce(bitmap, axis=0) & ~bits
+                packed = bits if packed is None else packed & bits
+                continue
+            codes = columns.tags[tag][first:last] if tag in columns.tags else np.full(last - first, -1)
+            matches = codes == code if code is not None else np.zeros(last - first, dtype=bool)
+            if operator == '!=':
+                matches = ~matches & (codes >= 0)
+            mask = matches if mask is None else mask & matches
+        if packed is not None:
+            bits = np.unpackbits(packed)[first - low * 8:last - low * 8].view(bool)
+            mask = bits if mask is None else mask & bits
+        return mask
+
+
+def load_index(filepath, columns):
+    """Индекс тегов записи кеша файла; при отсутствии строится и сохраняется."""
+    path = index_path(filepath)
+    if os.path.exists(path):
+        try:
+            return TagIndex.load(path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Индекс {path} поврежден, пересобираем: {e}")
+    index = TagIndex.build(columns)
+    index.save(path)
+    return index
+
+
+def run_bounds(columns):
+    """Время первой и последней точки прогона (строки метрики отсортированы по времени)."""
+    offsets = np.asarray(columns.offsets)
+    present = offsets[:-1] < offsets[1:]
+    if not present.any():
+        raise ValueError("В прогоне нет точек")
+    return int(columns.time[offsets[:-1][present]].min()), int(columns.time[offsets[1:][present] - 1].max())
+
+
+def _row(values, query, aggregator, metric_type, duration_s, exact=None):
+    result = {}
+    for aggregation in query.aggregations:
+        if exact is not None and aggregation.quantile is not None:
+            result[aggregation.label] = exact[aggregation.quantile]
+        elif aggregation.aggregation == 'sum':
+            result[aggregation.label] = aggregator.sum
+        else:
+            result[aggregation.label] = aggregation_value(aggregator, aggregation, metric_type, duration_s)
+    return {**values, 'count': aggregator.count, 'values': result}
+
+
+def query_columns(columns, query, index=None, exact=True):
+    """
+    Запрос по колоночным данным. index - TagIndex (None - фильтры
+    сравнением кодов); exact - точные квантили по значениям групп.
+    Returns:
+        list: {'group': {тег: значение}, 'time': начало интервала нс или None,
+        'count', 'values': {подпись: значение}} по группам.
+    """
+    if query.metric not in columns.metric_names:
+        raise ValueError(f"Метрики {query.metric} нет в прогоне ({', '.join(columns.metric_names)})")
+    run_start, run_end = run_bounds(columns)
+    rows = columns.metric_slice(query.metric)
+    times = columns.time[rows]
+    first = rows.start + (int(np.searchsorted(times, query.start_time)) if query.start_time is not None else 0)
+    last = rows.start + (int(np.searchsorted(times, query.end_time)) if query.end_time is not None else len(times))
+    last = max(first, last)
+
+    selected = slice(first, last)
+    values, times = columns.value[selected], columns.time[selected]
+    n_buckets = 1
+    if query.interval_ns and last > first:
+        # время отсортировано: последний интервал - у последней точки
+        n_buckets = int((times[-1] - query.origin(run_start)) // query.interval_ns) + 1
+    keys, radixes = group_keys(columns, selected, query.group_by, reserve=n_buckets)
+    mask = (index or TagIndex({})).mask(columns, first, last, query.filters)
+    if mask is not None:
+        values, times, keys = values[mask], times[mask], keys[mask]
+    values, times = np.asarray(values), np.asarray(times)
+
+    if query.interval_ns:
+        keys = keys * n_buckets + (times - query.origin(run_start)) // query.interval_ns
+
+    groups = aggregate_groups(values, times, keys)
+    exact_values = {}
+    if exact and query.quantiles and len(keys):
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        unique, starts = np.unique(sorted_keys, return_index=True)
+        ends = np.append(starts[1:], len(sorted_keys))
+        for key, start, end in zip(unique.tolist(), starts.tolist(), ends.tolist()):
+            exact_values[key] = exact_quantiles(values[order[start:end]], query.quantiles)
+
+    metric_type = columns.metric_types.get(query.metric)
+    window_start, window_end = query.window(run_start, run_end)
+    result = []
+    for key in sorted(groups):
+        group_key, bucket = divmod(key, n_buckets)
+        group = dict(zip(query.group_by, decode_key(columns, group_key, query.group_by, radixes)))
+        if query.interval_ns:
+            time = query.origin(run_start) + bucket * query.interval_ns
+            duration_s = query.interval_ns / NS_PER_SECOND
+        else:
+            time = None
+            duration_s = (window_end - window_start) / NS_PER_SECOND
+        result.append(_row({'group': group, 'time': time}, query, groups[key], metric_type, duration_s,
+                           exact_values.get(key) if exact else None))
+    return result
+
+
+def query_file(filepath, query, exact=True):
+    """Запрос по сырому файлу через колоночный кеш (memmap) и индекс тегов."""
+    columns = load_columns(filepath, mmap=True)
+    index = load_index(filepath, columns) if query.filters else None
+    return query_columns(columns, query, index, exact)
+
+
+def _rollup_resolution(rollup, query):
+    """Самое грубое разрешение, кратное границам запроса и интервалу; иначе самое мелкое."""
+    bounds = [time for time in (query.start_time, query.end_time, query.interval_ns) if time is not None]
+    for resolution in reversed(rollup.resolutions):
+        if all(time % (resolution * NS_PER_SECOND) == 0 for time in bounds):
+            return resolution
+    return rollup.resolutions[0]
+
+
+def query_rollup(rollup, query):
+    """Запрос по rollup (формат результата - как у query_columns, квантили по скетчам)."""
+    needed = {tag for tag, _, _ in query.filters} | set(query.group_by)
+    candidates = [i for i, (name, tags) in enumerate(zip(rollup.series_metric, rollup.series_tags))
+                  if name == query.metric and needed <= set(tags)]
+    if not candidates:
+        raise ValueError(f"В rollup нет рядов {query.metric} с тегами {', '.join(sorted(needed)) or '-'}")
+    smallest = min(len(rollup.series_tags[i]) for i in candidates)
+    tag_set = next(set(rollup.series_tags[i]) for i in candidates if len(rollup.series_tags[i]) == smallest)
+    series_ids = [i for i in candidates if set(rollup.series_tags[i]) == tag_set
+                  and all((rollup.series_tags[i][tag] == value) == (operator == '=')
+                          for tag, operator, value in query.filters)]
+
+    run_start, run_end = int(rollup.start.min()), int(rollup.end.max())
+    window_start, window_end = query.window(run_start, run_end + 1)
+    resolution = _rollup_resolution(rollup, query)
+    if query.interval_ns:
+        origin = query.origin(run_start)
+        buckets = [(time, time + query.interval_ns) for time in range(origin, window_end, query.interval_ns)]
+    else:
+        buckets = [(query.start_time, query.end_time)]
+
+    groups = {}
+    for i in series_ids:
+        group = tuple(rollup.series_tags[i].get(tag) for tag in query.group_by)
+        for start, end in buckets:
+            part = rollup.rows_aggregator(resolution, *rollup.row_range(i, resolution, start, end))
+            if not part.count:
+                continue
+            key = (group, start if query.interval_ns else None)
+            if key not in groups:
+                groups[key] = part
+            else:
+                groups[key].merge(part)
+
+    metric_type = rollup.metric_types.get(query.metric)
+    duration_s = (query.interval_ns or window_end - window_start) / NS_PER_SECOND
+    return [_row({'group': dict(zip(query.group_by, group)), 'time': time}, query, groups[(group, time)],
+                 metric_type, duration_s)
+            for group, time in sorted(groups, key=lambda key: ([str(value) for value in key[0]], key[1] or 0))]
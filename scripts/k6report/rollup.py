@@ -0,0 +1,469 @@
+# Сжатие (compaction) сырых артефактов k6 в многоуровневые ряды (rollup).
+# По каждой метрике и каждому набору тегов (без тегов, по одному тегу,
+# заданные пары) хранятся корзины 1 с / 10 с / 1 мин: count, sum, min,
+# max, число ненулевых значений (для http_req_failed и других Rate - число
+# ошибок) и корзины скетча квантилей QuantileSketch (CSR-массивы). Файл
+# <артефакт>.rollup.npz (сжатый .npz) во много раз меньше NDJSON, а сырой
+# файл после сжатия можно удалить.
+# Корзины выровнены по эпохе, поэтому каждый уровень сворачивается из
+# предыдущего, шарды одного прогона сливаются сложением строк, а слияние
+# скетчей без потерь: агрегаты прогона по rollup те же, что по сырому файлу.
+# Читатели выбирают разрешение по диапазону времени и бюджету точек.
+
+import json
+import os
+
+import numpy as np
+
+from k6report.aggregate import DEFAULT_RELATIVE_ACCURACY, MIN_INDEXABLE_VALUE, MetricAggregator, QuantileSketch
+from k6report.merge import FLEET_SUM_GAUGES
+from k6report.timestamps import NS_PER_SECOND
+
+# Меняется при изменении формата файла rollup
+ROLLUP_VERSION = 1
+
+# Разрешения, с; каждое кратно предыдущему
+DEFAULT_RESOLUTIONS = (1, 10, 60)
+
+# Ограничение числа рядов (комбинаций значений) на набор тегов
+MAX_SERIES_PER_SET = 100
+
+# Корзины скетча для отрицательных значений хранятся со сдвигом ключа
+NEGATIVE_BIN_OFFSET = 1 << 20
+
+LEVEL_FIELDS = ('series_offsets', 'time', 'count', 'sum', 'min', 'max', 'nonzero',
+                'sketch_offsets', 'bins', 'bin_counts')
+
+
+def _value_bins(values, log_gamma):
+    """Ключ корзины скетча для каждого значения и маска значений, попадающих в корзины (не нулей)."""
+    bins = np.zeros(len(values), dtype=np.int64)
+    positive = values > MIN_INDEXABLE_VALUE
+    negative = values < -MIN_INDEXABLE_VALUE
+    bins[positive] = np.ceil(np.log(values[positive]) / log_gamma)
+    bins[negative] = NEGATIVE_BIN_OFFSET + np.ceil(np.log(-values[negative]) / log_gamma)
+    return bins, positive | negative
+
+
+def _reduce(cells, sketch, n_series, additive=None):
+    """
+    Сворачивает ячейки с одинаковыми (ряд, время корзины) в строки уровня.
+    cells: ряд, время, count, sum, min, max, nonzero - массивы по ячейкам;
+    sketch: (ячейка, корзина, счетчик) - массивы по записям скетча.
+    additive: маска рядов, у которых min/max складываются (VU парка при слиянии шардов).
+    """
+    series, time, count, total, low, high, nonzero = cells
+    order = np.lexsort((time, series))
+    series, time = series[order], time[order]
+    new = np.ones(len(order), dtype=bool)
+    new[1:] = (series[1:] != series[:-1]) | (time[1:] != time[:-1])
+    starts = np.flatnonzero(new)
+    row = np.empty(len(order), dtype=np.int64)
+    row[order] = np.cumsum(new) - 1
+
+    level = {
+        'series_offsets': np.searchsorted(series[starts], np.arange(n_series + 1)),
+        'time': time[starts],
+    }
+    if not len(starts):
+        level.update({name: np.empty(0) for name in ('count', 'sum', 'min', 'max', 'nonzero')})
+        level.update(sketch_offsets=np.zeros(1, dtype=np.int64), bins=np.empty(0, dtype=np.int32),
+                     bin_counts=np.empty(0, dtype=np.uint32))
+        return level
+    level['count'] = np.add.reduceat(count[order], starts).astype(np.uint32)
+    level['sum'] = np.add.reduceat(total[order], starts)
+    level['min'] = np.minimum.reduceat(low[order], starts)
+    level['max'] = np.maximum.reduceat(high[order], starts)
+    if additive is not None and additive.any():
+        summed = additive[series[starts]]
+        level['min'][summed] = np.add.reduceat(low[order], starts)[summed]
+        level['max'][summed] = np.add.reduceat(high[order], starts)[summed]
+    level['nonzero'] = np.add.reduceat(nonzero[order], starts).astype(np.uint32)
+
+    sketch_cell, sketch_bin, sketch_count = sketch
+    rows = row[sketch_cell]
+    order = np.lexsort((sketch_bin, rows))
+    rows, bins = rows[order], sketch_bin[order]
+    new = np.ones(len(order), dtype=bool)
+    new[1:] = (rows[1:] != rows[:-1]) | (bins[1:] != bins[:-1])
+    starts = np.flatnonzero(new)
+    level['sketch_offsets'] = np.searchsorted(rows[starts], np.arange(len(level['time']) + 1))
+    level['bins'] = bins[starts].astype(np.int32)
+    level['bin_counts'] = (np.add.reduceat(sketch_count[order], starts) if len(starts)
+                           else np.empty(0)).astype(np.uint32)
+    return level
+
+
+def _level_cells(level, series_map=None, resolution_ns=None):
+    """Строки уровня как ячейки для _reduce (с переносом номеров рядов и огрублением времени)."""
+    offsets = level['series_offsets']
+    series = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    if series_map is not None:
+        series = series_map[series]
+    time = level['time'] if resolution_ns is None else level['time'] // resolution_ns * resolution_ns
+    cells = (series, time, level['count'].astype(np.int64), level['sum'], level['min'], level['max'],
+             level['nonzero'].astype(np.int64))
+    sketch = (np.repeat(np.arange(len(level['time'])), np.diff(level['sketch_offsets'])),
+              level['bins'].astype(np.int64), level['bin_counts'].astype(np.int64))
+    return cells, sketch
+
+
+def _concat(parts):
+    """Склейка списка (cells, sketch) со сдвигом номеров ячеек в записях скетча."""
+    cells = [np.concatenate([part[0][i] for part in parts]) for i in range(7)]
+    shifts = np.cumsum([0] + [len(part[0][0]) for part in parts[:-1]])
+    sketch = [np.concatenate([part[1][0] + shift for part, shift in zip(parts, shifts)]),
+              np.concatenate([part[1][1] for part in parts]),
+              np.concatenate([part[1][2] for part in parts])]
+    return cells, sketch
+
+
+def _tag_groups(columns, rows, tag_set):
+    """
+    Ряды набора тегов среди строк метрики: (номер ряда по строкам или -1,
+    значения тегов каждого ряда). Строки без какого-либо тега набора - -1.
+    """
+    n = rows.stop - rows.start
+    if not tag_set:
+        return np.zeros(n, dtype=np.int64), [{}]
+    group = np.zeros(n, dtype=np.int64)
+    valid = np.ones(n, dtype=bool)
+    for tag in tag_set:
+        codes = columns.tags[tag][rows].astype(np.int64)
+        valid &= codes >= 0
+        group = group * (len(columns.tag_values[tag]) + 1) + codes
+    keys, inverse = np.unique(group[valid], return_inverse=True)
+    if len(keys) > MAX_SERIES_PER_SET:
+        # самые частые комбинации значений
+        keep = np.sort(np.argsort(-np.bincount(inverse), kind='stable')[:MAX_SERIES_PER_SET])
+        remap = np.full(len(keys), -1, dtype=np.int64)
+        remap[keep] = np.arange(len(keep))
+        keys, inverse = keys[keep], remap[inverse]
+    series = np.full(n, -1, dtype=np.int64)
+    series[valid] = inverse
+    tags = []
+    for key in keys.tolist():
+        values = {}
+        for tag in reversed(tag_set):
+            key, code = divmod(key, len(columns.tag_values[tag]) + 1)
+            values[tag] = columns.tag_values[tag][code]
+        tags.append({tag: values[tag] for tag in tag_set})
+    return series, tags
+
+
+class Rollup:
+    """
+    Многоуровневые ряды одного прогона.
+    Атрибуты:
+        metric_types (dict): Тип метрики из объявлений Metric.
+        series_metric (list): Метрика каждого ряда.
+        series_tags (list): Теги каждого ряда ({} - ряд метрики без тегов).
+        start, end (ndarray int64), last (ndarray float64): Время первой и
+            последней точки ряда и последнее значение (для агрегата прогона).
+        levels (dict): Разрешение, с -> массивы LEVEL_FIELDS; строки уровня
+            отсортированы по (ряд, время), строки ряда i -
+            [series_offsets[i], series_offsets[i + 1]).
+        sources (list): Сырые файлы, из которых собран rollup.
+    """
+
+    def __init__(self, metric_types, series_metric, series_tags, start, end, last, levels, sources=(),
+                 relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+        self.metric_types = dict(metric_types)
+        self.series_metric = list(series_metric)
+        self.series_tags = list(series_tags)
+        self.start = start
+        self.end = end
+        self.last = last
+        self.levels = levels
+        self.sources = list(sources)
+        self.relative_accuracy = relative_accuracy
+        self._series_ids = {(metric, json.dumps(tags, sort_keys=True)): i
+                            for i, (metric, tags) in enumerate(zip(self.series_metric, self.series_tags))}
+
+    @property
+    def resolutions(self):
+        return sorted(self.levels)
+
+    @property
+    def metric_names(self):
+        return list(dict.fromkeys(self.series_metric))
+
+    @classmethod
+    def from_columns(cls, columns, tag_sets=((),), resolutions=DEFAULT_RESOLUTIONS, source=None,
+                     relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+        """Rollup по колоночным данным файла (cache.ColumnarResults)."""
+        resolutions = sorted(resolutions)
+        if any(coarse % fine for fine, coarse in zip(resolutions, resolutions[1:])):
+            raise ValueError(f"Каждое разрешение должно быть кратно предыдущему: {resolutions}")
+        log_gamma = QuantileSketch(relative_accuracy)._log_gamma
+        resolution_ns = resolutions[0] * NS_PER_SECOND
+
+        series_metric, series_tags, start, end, last, parts = [], [], [], [], [], []
+        for metric in columns.metric_names:
+            rows = columns.metric_slice(metric)
+            times, values = columns.time[rows], columns.value[rows]
+            bins, indexable = _value_bins(values, log_gamma)
+            buckets = times // resolution_ns * resolution_ns
+            for tag_set in tag_sets:
+                if any(tag not in columns.tags for tag in tag_set):
+                    continue
+                groups, tags = _tag_groups(columns, rows, tag_set)
+                selected = np.flatnonzero(groups >= 0)
+                if not len(selected):
+                    continue
+                first = len(series_metric)
+                series_metric.extend([metric] * len(tags))
+                series_tags.extend(tags)
+                # строки метрики отсортированы по времени: первая и последняя точка ряда
+                local = groups[selected]
+                _, first_index = np.unique(local, return_index=True)
+                _, last_index = np.unique(local[::-1], return_index=True)
+                last_index = selected[len(selected) - 1 - last_index]
+                start.append(times[selected[first_index]])
+                end.append(times[last_index])
+                last.append(values[last_index])
+
+                point_values = values[selected]
+                cells = (local + first, buckets[selected], np.ones(len(selected), dtype=np.int64),
+                         point_values, point_values, point_values, (point_values != 0).astype(np.int64))
+                in_sketch = np.flatnonzero(indexable[selected])
+                sketch = (in_sketch, bins[selected][in_sketch], np.ones(len(in_sketch), dtype=np.int64))
+                # сворачиваем сразу, чтобы в памяти не копились ячейки всех точек
+                parts.append(_level_cells(_reduce(cells, sketch, len(series_metric))))
+
+        n_series = len(series_metric)
+        levels = {}
+        if parts:
+            levels[resolutions[0]] = _reduce(*_concat(parts), n_series)
+        for fine, coarse in zip(resolutions, resolutions[1:]):
+            if fine in levels:
+                levels[coarse] = _reduce(*_level_cells(levels[fine], resolution_ns=coarse * NS_PER_SECOND),
+                                         n_series)
+        return cls(columns.metric_types, series_metric, series_tags,
+                   np.concatenate(start) if start else np.empty(0, dtype=np.int64),
+                   np.concatenate(end) if end else np.empty(0, dtype=np.int64),
+                   np.concatenate(last) if last else np.empty(0),
+                   levels, [source] if source else [], relative_accuracy)
+
+    @classmethod
+    def merge(cls, rollups):
+        """
+        Слияние rollup шардов одного прогона (ряды сопоставляются по метрике
+        и тегам). Значения VU-метрик (FLEET_SUM_GAUGES) суммируются по шардам.
+        """
+        first = rollups[0]
+        if any(rollup.resolutions != first.resolutions for rollup in rollups):
+            raise ValueError("Нельзя слить rollup с разными разрешениями")
+        keys = {}
+        for rollup in rollups:
+            for key in rollup._series_ids:
+                keys.setdefault(key, len(keys))
+        n_series = len(keys)
+        start = np.full(n_series, np.iinfo(np.int64).max, dtype=np.int64)
+        end = np.full(n_series, np.iinfo(np.int64).min, dtype=np.int64)
+        last = np.zeros(n_series)
+        maps = []
+        metric_types = {}
+        for rollup in rollups:
+            metric_types.update(rollup.metric_types)
+            series_map = np.array([keys[key] for key in rollup._series_ids], dtype=np.int64)
+            maps.append(series_map)
+            np.minimum.at(start, series_map, rollup.start)
+            later = rollup.end >= end[series_map]
+            end[series_map[later]] = rollup.end[later]
+            last[series_map[later]] = rollup.last[later]
+        additive = np.array([metric in FLEET_SUM_GAUGES for metric, _ in keys], dtype=bool)
+        if additive.any():
+            last[additive] = 0
+            for rollup, series_map in zip(rollups, maps):
+                summed = additive[series_map]
+                last[series_map[summed]] += rollup.last[summed]
+        levels = {resolution: _reduce(*_concat([_level_cells(rollup.levels[resolution], series_map)
+                                                for rollup, series_map in zip(rollups, maps)]),
+                                      n_series, additive)
+                  for resolution in first.resolutions}
+        return cls(metric_types, [metric for metric, _ in keys], [json.loads(tags) for _, tags in keys],
+                   start, end, last, levels, [source for rollup in rollups for source in rollup.sources],
+                   first.relative_accuracy)
+
+    def save(self, path):
+        arrays = {
+            'version': np.array(ROLLUP_VERSION),
+            'relative_accuracy': np.array(self.relative_accuracy),
+            'resolutions': np.array(self.resolutions, dtype=np.int64),
+            'metric_type_names': np.array(list(self.metric_types), dtype=str),
+            'metric_type_values': np.array([t or '' for t in self.metric_types.values()], dtype=str),
+            'series_metric': np.array(self.series_metric, dtype=str),
+            'series_tags': np.array([json.dumps(tags, sort_keys=True) for tags in self.series_tags], dtype=str),
+            'series_start': self.start,
+            'series_end': self.end,
+            'series_last': self.last,
+            'sources': np.array(self.sources, dtype=str),
+        }
+        for resolution, level in self.levels.items():
+            for field in LEVEL_FIELDS:
+                arrays[f'r{resolution}_{field}'] = level[field]
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            if int(data['version']) != ROLLUP_VERSION:
+                raise ValueError(f"Версия rollup {int(data['version'])} != {ROLLUP_VERSION}")
+            levels = {resolution: {field: data[f'r{resolution}_{field}'] for field in LEVEL_FIELDS}
+                      for resolution in data['resolutions'].tolist()}
+            return cls(
+                metric_types=dict(zip(data['metric_type_names'].tolist(), data['metric_type_values'].tolist())),
+                series_metric=data['series_metric'].tolist(),
+                series_tags=[json.loads(tags) for tags in data['series_tags'].tolist()],
+                start=data['series_start'], end=data['series_end'], last=data['series_last'],
+                levels=levels, sources=data['sources'].tolist(),
+                relative_accuracy=float(data['relative_accuracy']))
+
+    def series_id(self, metric, tags=None):
+        """Номер ряда метрики с ровно такими тегами (None - ряда нет)."""
+        return self._series_ids.get((metric, json.dumps(tags or {}, sort_keys=True)))
+
+    def choose_resolution(self, start_time, end_time, points=None):
+        """
+        Самое мелкое разрешение, при котором диапазон укладывается в бюджет
+        точек (None - без бюджета, самое мелкое); иначе самое грубое.
+        """
+        for resolution in self.resolutions:
+            if points is None or (end_time - start_time) // (resolution * NS_PER_SECOND) + 1 <= points:
+                return resolution
+        return self.resolutions[-1]
+
+    def _sketch(self, level, first_row, last_row, count):
+        sketch = QuantileSketch(self.relative_accuracy)
+        entries = slice(int(level['sketch_offsets'][first_row]), int(level['sketch_offsets'][last_row]))
+        bins, counts = level['bins'][entries], level['bin_counts'][entries]
+        if len(bins):
+            keys, inverse = np.unique(bins, return_inverse=True)
+            totals = np.bincount(inverse, weights=counts).astype(np.int64)
+            negative = keys >= NEGATIVE_BIN_OFFSET // 2
+            sketch.positive = dict(zip(keys[~negative].tolist(), totals[~negative].tolist()))
+            sketch.negative = dict(zip((keys[negative] - NEGATIVE_BIN_OFFSET).tolist(), totals[negative].tolist()))
+        sketch.zero_count = int(count - counts.sum())
+        sketch.count = int(count)
+        return sketch
+
+    def row_range(self, series_id, resolution, start_time=None, end_time=None):
+        """
+        Строки [first, last) ряда на уровне resolution с корзинами, начало
+        которых в [start_time, end_time): бинарный поиск по времени строк ряда.
+        """
+        level = self.levels[resolution]
+        first, last = int(level['series_offsets'][series_id]), int(level['series_offsets'][series_id + 1])
+        if start_time is not None:
+            first += int(np.searchsorted(level['time'][first:last], start_time))
+        if end_time is not None:
+            last = first + int(np.searchsorted(level['time'][first:last], end_time))
+        return first, last
+
+    def rows_aggregator(self, resolution, first, last):
+        """MetricAggregator по строкам [first, last) уровня (одного ряда); время - по корзинам."""
+        level = self.levels[resolution]
+        aggregator = MetricAggregator(self.relative_accuracy)
+        if first >= last:
+            return aggregator
+        aggregator.count = int(level['count'][first:last].sum())
+        aggregator.sum = float(level['sum'][first:last].sum())
+        aggregator.min = float(level['min'][first:last].min())
+        aggregator.max = float(level['max'][first:last].max())
+        aggregator.nonzero = int(level['nonzero'][first:last].sum())
+        aggregator.start_time = int(level['time'][first])
+        aggregator.end_time = int(level['time'][last - 1]) + resolution * NS_PER_SECOND - 1
+        aggregator.sketch = self._sketch(level, first, last, aggregator.count)
+        return aggregator
+
+    def aggregator(self, series_ids, resolution=None):
+        """MetricAggregator прогона по рядам series_ids (одной метрики)."""
+        resolution = resolution or self.resolutions[-1]
+        aggregator = MetricAggregator(self.relative_accuracy)
+        for i in series_ids:
+            part = self.rows_aggregator(resolution, *self.row_range(i, resolution))
+            if not part.count:
+                continue
+            part.start_time, part.end_time = int(self.start[i]), int(self.end[i])
+            part.last = float(self.last[i])
+            aggregator.merge(part)
+        return aggregator
+
+    def aggregates(self):
+        """Агрегаты прогона по метрикам (ряды без тегов)."""
+        return {metric: self.aggregator([self.series_id(metric)]) for metric in self.metric_names
+                if self.series_id(metric) is not None}
+
+    def aggregate(self, metric, tags):
+        """
+        Агрегат подметрики с тегами [(тег, значение)] по наименьшему набору
+        тегов, который их содержит; None, если такого набора нет.
+        """
+        keys = {tag for tag, _ in tags}
+        candidates = [i for i, (name, series_tags) in enumerate(zip(self.series_metric, self.series_tags))
+                      if name == metric and keys <= set(series_tags)]
+        if not candidates:
+            return None
+        smallest = min(len(self.series_tags[i]) for i in candidates)
+        tag_set = next(set(self.series_tags[i]) for i in candidates if len(self.series_tags[i]) == smallest)
+        return self.aggregator([i for i in candidates if set(self.series_tags[i]) == tag_set
+                                and all(self.series_tags[i][tag] == value for tag, value in tags)])
+
+    def breakdowns(self, metric, max_values=MAX_SERIES_PER_SET):
+        """Агрегаты метрики по значениям каждого тега (наборы из одного тега), как to_dict."""
+        result = {}
+        for i, (name, tags) in enumerate(zip(self.series_metric, self.series_tags)):
+            if name == metric and len(tags) == 1:
+                (tag, value), = tags.items()
+                values = result.setdefault(tag, {})
+                if len(values) < max_values:
+                    values[value] = self.aggregator([i]).to_dict()
+        return result
+
+    def series(self, start_time=None, end_time=None, points=None, resolution=None,
+               quantiles=(0.5, 0.95, 0.99)):
+        """
+        Ряды в формате timeseries.build_series ('time', 'rps', 'error_rate' %,
+        'p50'/'p95'/'p99' мс) за [start_time, end_time] с разрешением
+        resolution или выбранным по бюджету points.
+        """
+        overall = [self.series_id(metric) for metric in ('http_reqs', 'http_req_failed', 'http_req_duration')]
+        known = [i for i in overall if i is not None] or slice(None)
+        start_time = int(self.start[known].min()) if start_time is None else start_time
+        end_time = int(self.end[known].max()) if end_time is None else end_time
+        resolution = resolution or self.choose_resolution(start_time, end_time, points)
+        resolution_ns = int(resolution * NS_PER_SECOND)
+        level = self.levels[resolution]
+        first_time = start_time // resolution_ns * resolution_ns
+        n_buckets = int((end_time - first_time) // resolution_ns) + 1
+        series = {'time': first_time + np.arange(n_buckets, dtype=np.int64) * resolution_ns}
+
+        def rows(series_id):
+            if series_id is None:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+            first, last = int(level['series_offsets'][series_id]), int(level['series_offsets'][series_id + 1])
+            index = (level['time'][first:last] - first_time) // resolution_ns
+            inside = np.flatnonzero((index >= 0) & (index < n_buckets))
+            return first + inside, index[inside]
+
+        requests, failed, durations = overall
+        row, index = rows(requests)
+        series['rps'] = np.bincount(index, weights=level['count'][row], minlength=n_buckets) / resolution
+        row, index = rows(failed)
+        checked = np.bincount(index, weights=level['count'][row], minlength=n_buckets)
+        errors = np.bincount(index, weights=level['nonzero'][row], minlength=n_buckets)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            series['error_rate'] = np.where(checked > 0, errors / checked * 100, np.nan)
+        latency = {q: np.full(n_buckets, np.nan) for q in quantiles}
+        row, index = rows(durations)
+        for r, i in zip(row.tolist(), index.tolist()):
+            sketch = self._sketch(level, r, r + 1, int(level['count'][r]))
+            for q, estimate in sketch.quantiles(quantiles).items():
+                latency[q][i] = estimate
+        for q, values in latency.items():
+            series[f"p{q * 100:g}"] = values
+        return series
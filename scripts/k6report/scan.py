@@ -0,0 +1,103 @@
+# Подсчет точек без разбора строк: файл отображается в память (mmap), а
+# строки нужных метрик ищутся поиском байтовой подстроки
+# '\n{"metric":"<имя>","type":"Point"' прямо в отображенном буфере.
+# Между совпадениями Python не выполняет ни одной операции, строки не
+# копируются и не декодируются; из строки читается только срез значения
+# (для подсчета ненулевых точек rate-метрики). Поэтому подсчет запросов и
+# ошибок для Telegram-отчета идет со скоростью, близкой к чтению файла.
+# k6 пишет все строки одним кодировщиком ({"metric":...,"type":...,"data":...}),
+# так что формат проверяется по первой точке файла; сжатые файлы и файлы
+# в другом формате считаются обычным потоковым разбором.
+
+import mmap
+import os
+
+from k6report.decode import POINT_PREFIX, is_compressed, iter_points, line_metric
+
+# Поле значения в строке точки k6
+VALUE_KEY = b'"value":'
+
+# Сколько байт от начала файла смотреть в поисках первой точки
+HEAD_SIZE = 2**20
+
+
+def _canonical_point(line):
+    """Строка точки в каноническом формате k6, на который рассчитан поиск."""
+    name = line_metric(line)
+    return name is not None and line.startswith(POINT_PREFIX + name + b'","type":"Point","data":{')
+
+
+def _first_point_line(buffer):
+    """Первая строка-точка в начале буфера или None."""
+    position = 0
+    limit = min(len(buffer), HEAD_SIZE)
+    while position < limit:
+        end = buffer.find(b'\n', position, limit)
+        if end < 0:
+            end = limit
+        line = buffer[position:end]
+        if b'"Point"' in line:
+            return line
+        position = end + 1
+    return None
+
+
+def _nonzero(value):
+    """Байты JSON-значения точки: число или true/false (rate-метрики)."""
+    if value in (b'true', b'false'):
+        return value == b'true'
+    return float(value) != 0
+
+
+def _line_starts(buffer, prefix):
+    """Смещения строк буфера, начинающихся с prefix (поиск в C, без обхода строк)."""
+    if buffer[:len(prefix)] == prefix:
+        yield 0
+    needle = b'\n' + prefix
+    position = buffer.find(needle)
+    while position != -1:
+        yield position + 1
+        position = buffer.find(needle, position + 1)
+
+
+def _value_slice(buffer, start):
+    """Байты значения точки, строка которой начинается в start."""
+    value_start = buffer.find(VALUE_KEY, start) + len(VALUE_KEY)
+    ends = [end for end in (buffer.find(b',', value_start), buffer.find(b'}', value_start)) if end != -1]
+    return buffer[value_start:min(ends)]
+
+
+def _scan_mapped(buffer, metrics, count_nonzero):
+    counts = {}
+    for name in metrics:
+        prefix = POINT_PREFIX + name.encode() + b'","type":"Point","data":{'
+        count = 0
+        nonzero = 0
+        if name in count_nonzero:
+            for start in _line_starts(buffer, prefix):
+                count += 1
+                nonzero += _nonzero(_value_slice(buffer, start))
+        else:
+            for _ in _line_starts(buffer, prefix):
+                count += 1
+        counts[name] = (count, nonzero)
+    return counts
+
+
+def scan_counts(filepath, metrics=('http_reqs', 'http_req_failed'), count_nonzero=('http_req_failed',)):
+    """
+    Число точек метрик и число ненулевых точек (для метрик из count_nonzero).
+    Returns:
+        dict: метрика -> (точек, ненулевых).
+    """
+    if not is_compressed(filepath) and os.path.getsize(filepath):
+        with open(filepath, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            first = _first_point_line(buffer)
+            if first is None or _canonical_point(first):
+                return _scan_mapped(buffer, metrics, set(count_nonzero))
+
+    counts = {name: [0, 0] for name in metrics}
+    for name, point in iter_points(filepath, metrics):
+        counts[name][0] += 1
+        counts[name][1] += name in count_nonzero and point['value'] != 0
+    return {name: tuple(value) for name, value in counts.items()}
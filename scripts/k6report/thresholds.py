@@ -0,0 +1,384 @@
+# Офлайн-проверка порогов k6 (options.thresholds) по сводке k6-summary.json.
+# Выражения 'p(95)<2000', 'rate<0.05', 'count<100', ... для метрик и
+# подметрик с фильтром тегов ('request_duration{endpoint:get_posts}')
+# считаются по готовым агрегатам и скетчам сводки, без k6 и без разбора
+# сырых точек. Подметрика с одним тегом из разбивок сводки берется прямо
+# из нее, остальные - срезом колоночного кеша .k6cache.
+# Пороги собираются из сценария теста (tests/scenarios/<тест>-test.js,
+# уровень critical - как в k6), по запросу - из бюджетов PerformanceBudget
+# (tests/libs/performance-budget.js, уровни warning и critical; сценарии их
+# не подключают, поэтому по умолчанию они не действуют) и JSON с новыми
+# бюджетами, поэтому старые артефакты можно перепроверить по новым
+# порогам за миллисекунды. Квантили скетча приближенные (относительная
+# точность 1%); с exact=True квантили считаются точно по кешу, как в k6.
+
+import json
+import operator
+import os
+import re
+
+import numpy as np
+
+from k6report.aggregate import MetricAggregator
+from k6report.cache import aggregate_arrays, load_columns
+from k6report.ingest import AGGREGATE_SOURCES, test_name
+from k6report.merge import entry_files
+from k6report.percentiles import CHUNK_VALUES, DEFAULT_MEMORY_LIMIT, chunked_quantiles
+from k6report.rollup import Rollup
+from k6report.timestamps import NS_PER_SECOND
+
+# Уровни порога: critical - порог k6 (тест не прошел), warning - предупреждение
+CRITICAL = 'critical'
+WARNING = 'warning'
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_SCENARIOS_DIR = os.path.join(REPO_DIR, 'tests', 'scenarios')
+DEFAULT_BUDGET_FILE = os.path.join(REPO_DIR, 'tests', 'libs', 'performance-budget.js')
+
+# Бюджет PerformanceBudget -> (метрика k6, агрегация). Время загрузки
+# страницы в API-сценариях ближе всего к длительности итерации.
+BUDGET_METRICS = {
+    'API_RESPONSE_TIME': ('http_req_duration', 'p(95)'),
+    'PAGE_LOAD_TIME': ('iteration_duration', 'p(95)'),
+    'ERROR_RATE': ('http_req_failed', 'rate'),
+    'THROUGHPUT': ('http_reqs', 'rate'),
+}
+
+OPERATORS = {
+    '<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge,
+    '==': operator.eq, '===': operator.eq, '!=': operator.ne,
+}
+
+_EXPRESSION = re.compile(
+    r'^\s*(?P<aggregation>avg|min|max|med|count|rate|value|p\(\s*(?P<percentile>\d+(?:\.\d+)?)\s*\))'
+    r'\s*(?P<operator>===|==|!=|>=|<=|>|<)\s*(?P<limit>[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)\s*$')
+_SELECTOR = re.compile(r'^\s*(?P<metric>[^{}\s]+)\s*(?:\{(?P<tags>[^{}]*)\})?\s*$')
+
+
+def parse_selector(key):
+    """
+    Имя метрики порога -> (метрика, теги подметрики).
+    'request_duration{endpoint:get_posts}' -> ('request_duration', (('endpoint', 'get_posts'),))
+    """
+    match = _SELECTOR.match(key)
+    if not match:
+        raise ValueError(f"Некорректное имя метрики порога: {key}")
+    tags = []
+    for pair in (match.group('tags') or '').split(','):
+        if not pair.strip():
+            continue
+        tag, separator, value = pair.partition(':')
+        if not separator:
+            raise ValueError(f"Ожидался фильтр тег:значение в {key}")
+        tags.append((tag.strip(), value.strip().strip('\'"')))
+    return match.group('metric'), tuple(tags)
+
+
+class Threshold:
+    """Один порог: метрика (подметрика), агрегация, оператор, граница и уровень."""
+
+    def __init__(self, key, expression, level=CRITICAL, budget=None):
+        match = _EXPRESSION.match(expression)
+        if not match:
+            raise ValueError(f"Некорректное выражение порога {key}: {expression}")
+        self.key = key.strip()
+        self.metric, self.tags = parse_selector(key)
+        self.expression = expression.strip()
+        self.aggregation = match.group('aggregation').replace(' ', '')
+        percentile = match.group('percentile')
+        self.quantile = float(percentile) / 100 if percentile else (0.5 if self.aggregation == 'med' else None)
+        self.operator = match.group('operator')
+        self.limit = float(match.group('limit'))
+        self.level = level
+        self.budget = budget
+
+    def passes(self, value):
+        return OPERATORS[self.operator](value, self.limit)
+
+    def __repr__(self):
+        return f"Threshold({self.key!r}, {self.expression!r}, {self.level!r})"
+
+
+def parse_thresholds(thresholds, level=CRITICAL):
+    """
+    Пороги в форме options.thresholds k6: метрика -> список выражений
+    или объектов {threshold, abortOnFail}; объект может задать level.
+    Returns:
+        list: Threshold.
+    """
+    result = []
+    for key, expressions in thresholds.items():
+        if isinstance(expressions, (str, dict)):
+            expressions = [expressions]
+        for expression in expressions:
+            if isinstance(expression, dict):
+                result.append(Threshold(key, expression['threshold'], expression.get('level', level),
+                                        expression.get('budget')))
+            else:
+                result.append(Threshold(key, expression, level))
+    return result
+
+
+def _strip_js_comments(text):
+    text = re.sub(r'/\*.*?\*/', '', text, flags=re.S)
+    # '//' после пробела или в начале строки - комментарий, 'https://' - нет
+    return re.sub(r'(^|\s)//[^\n]*', r'\1', text)
+
+
+def _js_block(text, start):
+    """Содержимое блока {...}, открытого в позиции start."""
+    depth = 0
+    for position in range(start, len(text)):
+        if text[position] == '{':
+            depth += 1
+        elif text[position] == '}':
+            depth -= 1
+            if depth == 0:
+                return text[start + 1:position]
+    return text[start + 1:]
+
+
+def scenario_thresholds(path):
+    """Объект thresholds из options сценария k6 (без выполнения JS)."""
+    with open(path, encoding='utf-8') as f:
+        text = _strip_js_comments(f.read())
+    match = re.search(r'\bthresholds\s*:\s*\{', text)
+    if not match:
+        return {}
+    body = _js_block(text, match.end() - 1)
+    thresholds = {}
+    for entry in re.finditer(r'''(?:'([^']*)'|"([^"]*)"|([\w.]+))\s*:\s*\[([^\]]*)\]''', body):
+        key = next(group for group in entry.groups()[:3] if group is not None)
+        thresholds[key] = re.findall(r'''['"]([^'"]+)['"]''', entry.group(4))
+    return thresholds
+
+
+def budget_thresholds(path):
+    """
+    Бюджеты PerformanceBudget.budgets как пороги с уровнями warning/critical.
+    Если warning > critical (пропускная способность), хуже - меньшее значение.
+    """
+    with open(path, encoding='utf-8') as f:
+        text = _strip_js_comments(f.read())
+    number = r'([-+]?[\d.]+(?:[eE][-+]?\d+)?)'
+    thresholds = {}
+    for name, warning, critical in re.findall(
+            r'''['"]?(\w+)['"]?\s*:\s*\{\s*warning\s*:\s*''' + number + r'''\s*,\s*critical\s*:\s*''' + number,
+            text):
+        if name not in BUDGET_METRICS:
+            continue
+        metric, aggregation = BUDGET_METRICS[name]
+        comparison = '<' if float(warning) <= float(critical) else '>'
+        thresholds.setdefault(metric, []).extend(
+            {'threshold': f"{aggregation}{comparison}{limit}", 'level': level, 'budget': name}
+            for level, limit in ((WARNING, warning), (CRITICAL, critical)))
+    return thresholds
+
+
+def load_budgets(path):
+    """
+    JSON с бюджетами: объект thresholds k6 для всех тестов или
+    {"thresholds": {...}, "tests": {"<тест>": {...}}}.
+    """
+    with open(path, encoding='utf-8') as f:
+        budgets = json.load(f)
+    if 'thresholds' in budgets or 'tests' in budgets:
+        return {'thresholds': budgets.get('thresholds', {}), 'tests': budgets.get('tests', {})}
+    return {'thresholds': budgets, 'tests': {}}
+
+
+def collect_thresholds(name, scenarios_dir=DEFAULT_SCENARIOS_DIR, budget_file=None, budgets=None):
+    """
+    Пороги теста name: сценарий <name>-test.js, PerformanceBudget из
+    budget_file и budgets (из load_budgets). Отсутствующие источники пропускаются.
+    """
+    thresholds = []
+    if scenarios_dir:
+        for filename in (f"{name}-test.js", f"{name}.js"):
+            path = os.path.join(scenarios_dir, filename)
+            if os.path.exists(path):
+                thresholds += parse_thresholds(scenario_thresholds(path))
+                break
+    if budget_file and os.path.exists(budget_file):
+        thresholds += parse_thresholds(budget_thresholds(budget_file))
+    if budgets:
+        thresholds += parse_thresholds(budgets['thresholds'])
+        thresholds += parse_thresholds(budgets['tests'].get(name, {}))
+    return thresholds
+
+
+def _submetric_mask(columns, rows, tags):
+    """Маска строк rows со всеми тегами подметрики; None, если таких строк нет."""
+    mask = np.ones(rows.stop - rows.start, dtype=bool)
+    for tag, value in tags:
+        if tag not in columns.tags or value not in columns.tag_values[tag]:
+            return None
+        mask &= columns.tags[tag][rows] == columns.tag_values[tag].index(value)
+    return mask
+
+
+def _submetric_arrays(columns, metric, tags):
+    """Значения и время точек метрики со всеми тегами подметрики."""
+    rows = columns.metric_slice(metric)
+    mask = _submetric_mask(columns, rows, tags)
+    if mask is None:
+        return np.empty(0), np.empty(0, dtype=np.int64)
+    return columns.value[rows][mask], columns.time[rows][mask]
+
+
+def _submetric_chunks(columns_list, metric, tags, chunk_size=CHUNK_VALUES):
+    """Источник кусков значений подметрики для chunked_quantiles (по chunk_size строк кеша)."""
+    def chunks():
+        for columns in columns_list:
+            if metric not in columns.metric_names:
+                continue
+            rows = columns.metric_slice(metric)
+            for start in range(rows.start, rows.stop, chunk_size):
+                chunk = slice(start, min(start + chunk_size, rows.stop))
+                mask = _submetric_mask(columns, chunk, tags) if tags else None
+                if tags and mask is None:
+                    break
+                yield columns.value[chunk][mask] if tags else columns.value[chunk]
+    return chunks
+
+
+def aggregation_value(aggregator, threshold, metric_type, duration_s):
+    """Значение агрегации порога по MetricAggregator, как его считает k6."""
+    aggregation = threshold.aggregation
+    if threshold.quantile is not None:
+        return aggregator.quantile(threshold.quantile)
+    if aggregation == 'avg':
+        return aggregator.avg
+    if aggregation in ('min', 'max'):
+        return getattr(aggregator, aggregation)
+    if aggregation == 'count':
+        return aggregator.sum if metric_type == 'counter' else aggregator.count
+    if aggregation == 'rate':
+        if metric_type == 'counter':
+            return aggregator.sum / duration_s if duration_s > 0 else 0
+        return aggregator.rate
+    return aggregator.last  # value
+
+
+class _EntrySource:
+    """Данные одной записи сводки для порогов; кеш колонок читается при первой нужде."""
+
+    def __init__(self, entry, results_dir=None, exact=False, memory_limit=DEFAULT_MEMORY_LIMIT):
+        self.entry = entry
+        self.results_dir = results_dir
+        self.exact = exact
+        self.memory_limit = memory_limit
+        self._columns = None
+        self._columns_loaded = False
+        start, end = entry.get('start_time'), entry.get('end_time')
+        self.duration_s = (end - start) / NS_PER_SECOND if start is not None and end is not None else 0
+
+    def columns(self):
+        """Колоночные данные файлов записи (шардов слитого прогона) или None."""
+        if not self._columns_loaded and self.entry['source'] == 'rollup':
+            self._columns_loaded = True  # сырой файл сжат: колонок нет, подметрики - по rollup
+        if not self._columns_loaded:
+            self._columns_loaded = True
+            paths = [os.path.join(self.results_dir, filename) for filename in entry_files(self.entry)] \
+                if self.results_dir else []
+            if paths and all(os.path.exists(path) for path in paths):
+                # memmap: в память читаются только срезы нужных подметрик
+                self._columns = [load_columns(path, mmap=True) for path in paths]
+        return self._columns
+
+    def arrays(self, threshold):
+        """Значения и время точек подметрики порога по всем файлам записи; None без кеша."""
+        parts = [_submetric_arrays(columns, threshold.metric, threshold.tags) for columns in self.columns() or []
+                 if threshold.metric in columns.metric_names]
+        if not parts:
+            return None
+        return np.concatenate([values for values, _ in parts]), np.concatenate([times for _, times in parts])
+
+    def value(self, threshold):
+        """(значение, источник) или (None, None), если данных нет."""
+        if self.entry['source'] not in AGGREGATE_SOURCES:
+            return self._export_value(threshold)
+        metric_type = self.entry.get('metric_types', {}).get(threshold.metric, 'trend')
+        if self.exact and threshold.quantile is not None and self.columns() is not None:
+            chunks = _submetric_chunks(self.columns(), threshold.metric, threshold.tags)
+            value = chunked_quantiles(chunks, [threshold.quantile], self.memory_limit)[threshold.quantile]
+            return (value, 'cache') if value is not None else (None, None)
+        aggregator, source = self._aggregator(threshold)
+        if aggregator is None or not aggregator.count:
+            return None, None
+        return aggregation_value(aggregator, threshold, metric_type, self.duration_s), source
+
+    def _aggregator(self, threshold):
+        if not threshold.tags:
+            data = self.entry.get('metrics', {}).get(threshold.metric)
+            return (MetricAggregator.from_dict(data), 'summary') if data else (None, None)
+        if len(threshold.tags) == 1:
+            tag, value = threshold.tags[0]
+            data = self.entry.get('tags', {}).get(threshold.metric, {}).get(tag, {}).get(value)
+            if data:
+                return MetricAggregator.from_dict(data), 'summary'
+        if self.entry['source'] == 'rollup':
+            path = os.path.join(self.results_dir, self.entry['file']) if self.results_dir else None
+            aggregator = Rollup.load(path).aggregate(threshold.metric, threshold.tags) \
+                if path and os.path.exists(path) else None
+            return (aggregator, 'rollup') if aggregator is not None else (None, None)
+        arrays = self.arrays(threshold)
+        if arrays is None:
+            return None, None
+        return aggregate_arrays(*arrays), 'cache'
+
+    def _export_value(self, threshold):
+        """Значение из summary-export k6 (подметрики там под ключом порога)."""
+        metrics = self.entry.get('k6_summary', {}).get('metrics', {})
+        metric = metrics.get(threshold.key) or (metrics.get(threshold.metric) if not threshold.tags else None)
+        if not metric:
+            return None, None
+        values = metric.get('values', metric)
+        value = values.get(threshold.aggregation)
+        if value is None and threshold.aggregation == 'rate':
+            value = values.get('value')  # старый формат --summary-export для Rate
+        return (value, 'export') if value is not None else (None, None)
+
+
+def evaluate_entry(entry, thresholds, results_dir=None, exact=False, memory_limit=DEFAULT_MEMORY_LIMIT):
+    """
+    Проверка порогов для записи сводки; memory_limit - сколько значений
+    точного квантиля держать в памяти (сверх - внешний выбор по кешу).
+    Returns:
+        dict: тест, вердикт (pass / warn / fail) и результаты порогов;
+        порог без данных - ok None, на вердикт не влияет.
+    """
+    source = _EntrySource(entry, results_dir, exact, memory_limit)
+    results = []
+    for threshold in thresholds:
+        value, origin = source.value(threshold)
+        results.append({
+            'metric': threshold.key,
+            'threshold': threshold.expression,
+            'level': threshold.level,
+            'budget': threshold.budget,
+            'value': value,
+            'ok': threshold.passes(value) if value is not None else None,
+            'source': origin,
+            'approximate': origin in ('summary', 'rollup') and threshold.quantile is not None,
+        })
+
+    failed = {result['level'] for result in results if result['ok'] is False}
+    verdict = 'fail' if CRITICAL in failed else 'warn' if WARNING in failed else 'pass'
+    return {'test': test_name(entry['file']), 'file': entry['file'], 'verdict': verdict, 'thresholds': results}
+
+
+def evaluate_summary(summary, results_dir=None, exact=False, tests=None, **sources):
+    """
+    Проверка порогов всех тестов сводки; sources передаются в collect_thresholds.
+    tests ограничивает проверку тестами с этими именами.
+    """
+    reports = []
+    for entry in summary['tests']:
+        name = test_name(entry['file'])
+        if tests and name not in tests:
+            continue
+        reports.append(evaluate_entry(entry, collect_thresholds(name, **sources), results_dir, exact))
+    verdicts = {report['verdict'] for report in reports}
+    verdict = 'fail' if 'fail' in verdicts else 'warn' if 'warn' in verdicts else 'pass'
+    return {'verdict': verdict, 'tests': reports}
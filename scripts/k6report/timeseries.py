@@ -0,0 +1,226 @@
+# Временные ряды по результатам k6: точки раскладываются по интервалам
+# фиксированной длины векторно (NumPy), без сортировки исходного потока.
+# На интервал считаются пропускная способность, доля ошибок и процентили
+# задержки; перед графиком ряд прореживается алгоритмом LTTB
+# (largest-triangle-three-buckets) до заданного бюджета точек.
+
+import numpy as np
+
+from k6report.aggregate import DEFAULT_RELATIVE_ACCURACY, MIN_INDEXABLE_VALUE, QuantileSketch
+from k6report.timestamps import NS_PER_SECOND
+
+DEFAULT_INTERVAL_NS = NS_PER_SECOND
+SERIES_QUANTILES = (0.5, 0.95, 0.99)
+
+# Максимум ячеек гистограммы (интервалы x корзины скетча) за один bincount
+MAX_HISTOGRAM_CELLS = 8_000_000
+
+
+def bucket_index(times, start_time, interval_ns=DEFAULT_INTERVAL_NS):
+    """Номер интервала для каждой точки."""
+    return ((times - start_time) // interval_ns).astype(np.int64)
+
+
+def bucket_quantiles(buckets, values, n_buckets, quantiles=SERIES_QUANTILES,
+                     relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+    """
+    Процентили неотрицательной метрики по интервалам.
+    Значения переводятся в индексы логарифмических корзин скетча, и по паре
+    (интервал, корзина) строится гистограмма одним np.bincount; процентиль
+    интервала ищется по накопленной сумме строки. Погрешность та же, что
+    у QuantileSketch. Пустые интервалы - NaN.
+    Returns:
+        dict: q -> массив float64 длины n_buckets.
+    """
+    result = {q: np.full(n_buckets, np.nan) for q in quantiles}
+    if not len(values):
+        return result
+
+    sketch = QuantileSketch(relative_accuracy)
+    positive = values > MIN_INDEXABLE_VALUE
+    bins = np.zeros(len(values), dtype=np.int64)
+    bins[positive] = np.ceil(np.log(values[positive]) / sketch._log_gamma).astype(np.int64)
+    lowest = bins[positive].min() - 1 if positive.any() else 0
+    bins = np.where(positive, bins - lowest, 0)  # 0 - корзина нулей
+    n_bins = int(bins.max()) + 1
+    representatives = np.array([0.0] + [sketch._value(i + lowest) for i in range(1, n_bins)])
+
+    rows_per_chunk = max(1, MAX_HISTOGRAM_CELLS // n_bins)
+    is_sorted = bool(np.all(buckets[1:] >= buckets[:-1]))
+    for first in range(0, n_buckets, rows_per_chunk):
+        last = min(first + rows_per_chunk, n_buckets)
+        if is_sorted:
+            a, b = np.searchsorted(buckets, [first, last])
+            chunk_buckets, chunk_bins = buckets[a:b], bins[a:b]
+        else:
+            mask = (buckets >= first) & (buckets < last)
+            chunk_buckets, chunk_bins = buckets[mask], bins[mask]
+        if not len(chunk_buckets):
+            continue
+        rows = last - first
+        histogram = np.bincount((chunk_buckets - first) * n_bins + chunk_bins,
+                                minlength=rows * n_bins).reshape(rows, n_bins)
+        cumulative = histogram.cumsum(axis=1)
+        counts = cumulative[:, -1]
+        filled = counts > 0
+        for q in quantiles:
+            rank = q * (counts - 1)
+            position = (cumulative > rank[:, None]).argmax(axis=1)
+            result[q][first:last] = np.where(filled, representatives[position], np.nan)
+    return result
+
+
+def build_series(columns, start_time, end_time, interval_ns=DEFAULT_INTERVAL_NS,
+                 quantiles=SERIES_QUANTILES):
+    """
+    Ряды по интервалам из колоночных данных (cache.ColumnarResults).
+    Returns:
+        dict: 'time' (нс начала интервала), 'rps', 'error_rate' (%),
+        'p50'/'p95'/'p99' (мс, задержка http_req_duration).
+    """
+    n_buckets = int((end_time - start_time) // interval_ns) + 1
+    interval_s = interval_ns / NS_PER_SECOND
+    series = {'time': start_time + np.arange(n_buckets, dtype=np.int64) * interval_ns}
+
+    requests = bucket_index(columns.times('http_reqs'), start_time, interval_ns)
+    series['rps'] = np.bincount(requests, minlength=n_buckets)[:n_buckets] / interval_s
+
+    failed_values = columns.values('http_req_failed')
+    failed = bucket_index(columns.times('http_req_failed'), start_time, interval_ns)
+    checked = np.bincount(failed, minlength=n_buckets)[:n_buckets]
+    errors = np.bincount(failed, weights=(failed_values != 0), minlength=n_buckets)[:n_buckets]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        series['error_rate'] = np.where(checked > 0, errors / checked * 100, np.nan)
+
+    durations = columns.values('http_req_duration')
+    duration_buckets = bucket_index(columns.times('http_req_duration'), start_time, interval_ns)
+    for q, values in bucket_quantiles(duration_buckets, durations, n_buckets, quantiles).items():
+        series[f"p{q * 100:g}"] = values
+    return series
+
+
+def lttb(x, y, threshold):
+    """
+    Прореживание ряда до threshold точек (largest-triangle-three-buckets).
+    Сохраняет визуальную форму: из каждой корзины берется точка,
+    образующая наибольший треугольник с соседями. NaN отбрасываются.
+    Returns:
+        ndarray: индексы выбранных точек.
+    """
+    valid = np.flatnonzero(~np.isnan(y))
+    n = len(valid)
+    if threshold >= n or threshold < 3:
+        return valid
+    xs = x[valid].astype(np.float64)
+    ys = y[valid].astype(np.float64)
+
+    every = (n - 2) / (threshold - 2)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        # среднее следующей корзины - третья вершина треугольника
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = xs[next_start:next_end].mean()
+        avg_y = ys[next_start:next_end].mean()
+
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        areas = np.abs((xs[previous] - avg_x) * (ys[start:end] - ys[previous])
+                       - (xs[previous] - xs[start:end]) * (avg_y - ys[previous]))
+        previous = start + int(areas.argmax())
+        selected[i + 1] = previous
+    return valid[selected]
+
+
+def downsample(series, points):
+    """
+    Каждый ряд (кроме 'time') прореживается LTTB независимо.
+    Returns:
+        dict: имя -> {'t': [мс эпохи], 'y': [значения]}.
+    """
+    time = series['time']
+    result = {}
+    for name, values in series.items():
+        if name == 'time':
+            continue
+        index = lttb(time, values, points)
+        result[name] = {
+            't': (time[index] // 1_000_000).tolist(),
+            'y': np.round(values[index], 3).tolist(),
+        }
+    return result
+
+
+class SeriesStream:
+    """
+    Те же ряды, что build_series, но из потока точек (метрика, значение,
+    время нс), упорядоченного по времени с допуском опоздания lateness_ns.
+    Счетчики интервалов - массивы на весь прогон (по числу интервалов, а не
+    точек), скетчи задержки держатся только для интервалов в пределах
+    допуска: интервал закрывается, когда самая поздняя точка ушла вперед
+    дальше lateness_ns. Опоздавшие значения задержки закрытых интервалов
+    отбрасываются (dropped), счетчики учитываются всегда.
+    """
+
+    def __init__(self, start_time, end_time, interval_ns=DEFAULT_INTERVAL_NS, quantiles=SERIES_QUANTILES,
+                 lateness_ns=5 * NS_PER_SECOND, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+        self.start_time = start_time
+        self.interval_ns = interval_ns
+        self.lateness_ns = lateness_ns
+        self.quantiles = quantiles
+        self.relative_accuracy = relative_accuracy
+        self.n_buckets = int((end_time - start_time) // interval_ns) + 1
+        self.requests = np.zeros(self.n_buckets, dtype=np.int64)
+        self.checked = np.zeros(self.n_buckets, dtype=np.int64)
+        self.errors = np.zeros(self.n_buckets, dtype=np.int64)
+        self.latency = {q: np.full(self.n_buckets, np.nan) for q in quantiles}
+        self.open = {}
+        self.closed = -1
+        self.latest = None
+        self.dropped = 0
+
+    def add(self, metric, value, time):
+        index = (time - self.start_time) // self.interval_ns
+        if not 0 <= index < self.n_buckets:
+            return
+        if metric == 'http_reqs':
+            self.requests[index] += 1
+        elif metric == 'http_req_failed':
+            self.checked[index] += 1
+            self.errors[index] += value != 0
+        elif metric == 'http_req_duration':
+            if index <= self.closed:
+                self.dropped += 1
+                return
+            sketch = self.open.get(index)
+            if sketch is None:
+                sketch = self.open[index] = QuantileSketch(self.relative_accuracy)
+            sketch.add(value)
+        if self.latest is None or time > self.latest:
+            self.latest = time
+            before = (time - self.lateness_ns - self.start_time) // self.interval_ns
+            if before > self.closed + 1:
+                self._close(before)
+
+    def _close(self, before):
+        for index in sorted(index for index in self.open if index < before):
+            for q, estimate in self.open.pop(index).quantiles(self.quantiles).items():
+                self.latency[q][index] = estimate
+        self.closed = max(self.closed, before - 1)
+
+    def result(self):
+        """Ряды в формате build_series; закрывает оставшиеся интервалы."""
+        self._close(self.n_buckets)
+        interval_s = self.interval_ns / NS_PER_SECOND
+        series = {
+            'time': self.start_time + np.arange(self.n_buckets, dtype=np.int64) * self.interval_ns,
+            'rps': self.requests / interval_s,
+        }
+        with np.errstate(invalid='ignore', divide='ignore'):
+            series['error_rate'] = np.where(self.checked > 0, self.errors / self.checked * 100, np.nan)
+        for q, values in self.latency.items():
+            series[f"p{q * 100:g}"] = values
+        return series
@@ -0,0 +1,168 @@
+# Временные метки k6 в виде int64 наносекунд от эпохи (UTC).
+# k6 пишет RFC3339 с наносекундами и смещением таймзоны:
+#   2024-05-01T12:00:00.123456789+03:00
+# Сравнивать такие строки как текст нельзя - смещения бывают разными.
+# Формат фиксированный, поэтому поля читаются по позициям: для потока -
+# с кешем префикса даты/часа (соседние строки почти всегда совпадают
+# до часа), для пачек - векторно в NumPy сразу по всем строкам.
+
+from datetime import datetime, timezone
+
+import numpy as np
+
+NS_PER_SECOND = 1_000_000_000
+
+# Длина префикса YYYY-MM-DDTHH, общего у соседних строк
+_PREFIX_LENGTH = 13
+
+# Ширина строки, до которой дополняется пачка (дата 19 + '.' + 9 знаков + зона 6)
+_MIN_BATCH_WIDTH = 36
+
+
+def _days_from_civil(year, month, day):
+    """Число дней от 1970-01-01 (алгоритм Howard Hinnant)."""
+    year -= month <= 2
+    era = (year if year >= 0 else year - 399) // 400
+    yoe = year - era * 400
+    doy = (153 * (month + (-3 if month > 2 else 9)) + 2) // 5 + day - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    return era * 146097 + doe - 719468
+
+
+def parse_rfc3339_ns(timestamp):
+    """
+    Парсит RFC3339-метку в int64 наносекунд UTC.
+    Дробная часть - от 0 до 9 знаков, зона - 'Z' или ±HH:MM.
+    """
+    days = _days_from_civil(int(timestamp[0:4]), int(timestamp[5:7]), int(timestamp[8:10]))
+    seconds = days * 86400 + int(timestamp[11:13]) * 3600 + int(timestamp[14:16]) * 60 + int(timestamp[17:19])
+
+    fraction = 0
+    position = 19
+    if len(timestamp) > 19 and timestamp[19] == '.':
+        end = 20
+        while end < len(timestamp) and timestamp[end].isdigit():
+            end += 1
+        digits = timestamp[20:end][:9]
+        fraction = int(digits.ljust(9, '0')) if digits else 0
+        position = end
+
+    return (seconds - _zone_offset(timestamp[position:])) * NS_PER_SECOND + fraction
+
+
+def _zone_offset(zone):
+    """Смещение зоны 'Z' / ±HH:MM в секундах."""
+    if not zone or zone in ('Z', 'z'):
+        return 0
+    offset = int(zone[1:3]) * 3600 + int(zone[4:6]) * 60
+    return offset if zone[0] == '+' else -offset
+
+
+class TimestampParser:
+    """
+    Потоковый парсер RFC3339 -> int64 нс с кешем префикса даты/часа
+    и смещений зон: для соседних строк одного часа пересчитываются
+    только минуты, секунды и дробная часть.
+    """
+
+    def __init__(self):
+        self._prefix = None
+        self._prefix_seconds = 0
+        self._zones = {}
+
+    def __call__(self, timestamp):
+        prefix = timestamp[:_PREFIX_LENGTH]
+        if prefix != self._prefix:
+            days = _days_from_civil(int(timestamp[0:4]), int(timestamp[5:7]), int(timestamp[8:10]))
+            self._prefix_seconds = days * 86400 + int(timestamp[11:13]) * 3600
+            self._prefix = prefix
+        seconds = self._prefix_seconds + int(timestamp[14:16]) * 60 + int(timestamp[17:19])
+
+        fraction = 0
+        position = 19
+        if len(timestamp) > 19 and timestamp[19] == '.':
+            end = 20
+            while end < len(timestamp) and timestamp[end].isdigit():
+                end += 1
+            digits = timestamp[20:end][:9]
+            fraction = int(digits.ljust(9, '0')) if digits else 0
+            position = end
+
+        zone = timestamp[position:]
+        offset = self._zones.get(zone)
+        if offset is None:
+            offset = self._zones[zone] = _zone_offset(zone)
+        return (seconds - offset) * NS_PER_SECOND + fraction
+
+
+def _days_from_civil_array(year, month, day):
+    """Векторный _days_from_civil для массивов int64."""
+    year = year - (month <= 2)
+    era = np.where(year >= 0, year, year - 399) // 400
+    yoe = year - era * 400
+    doy = (153 * (month + np.where(month > 2, -3, 9)) + 2) // 5 + day - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    return era * 146097 + doe - 719468
+
+
+def parse_rfc3339_batch(timestamps):
+    """
+    Пачка RFC3339-меток (str или bytes) -> ndarray int64 нс UTC.
+    Строки раскладываются в матрицу символов фиксированной ширины, и все
+    поля (включая дробную часть переменной длины и зону) читаются
+    векторно по столбцам.
+    """
+    text = np.asarray(timestamps)
+    if not len(text):
+        return np.empty(0, dtype=np.int64)
+    if text.dtype.kind == 'U':
+        chars = text.view(np.uint32).reshape(len(text), -1)
+    elif text.dtype.kind == 'S':
+        chars = text.view(np.uint8).reshape(len(text), -1)
+    else:
+        raise TypeError(f"Ожидались строки, получено {text.dtype}")
+    chars = chars.astype(np.int64)
+    if chars.shape[1] < _MIN_BATCH_WIDTH:
+        chars = np.pad(chars, ((0, 0), (0, _MIN_BATCH_WIDTH - chars.shape[1])))
+    digits = chars - ord('0')
+
+    def number(start, end):
+        value = digits[:, start]
+        for column in range(start + 1, end):
+            value = value * 10 + digits[:, column]
+        return value
+
+    days = _days_from_civil_array(number(0, 4), number(5, 7), number(8, 10))
+    seconds = days * 86400 + number(11, 13) * 3600 + number(14, 16) * 60 + number(17, 19)
+
+    # Дробная часть: непрерывный ряд цифр после точки, учитываются первые 9
+    has_fraction = chars[:, 19] == ord('.')
+    is_digit = (digits[:, 20:] >= 0) & (digits[:, 20:] <= 9)
+    run = np.logical_and.accumulate(is_digit, axis=1) & has_fraction[:, None]
+    fraction = np.zeros(len(chars), dtype=np.int64)
+    for column in range(min(9, run.shape[1])):
+        fraction += np.where(run[:, column], digits[:, 20 + column], 0) * 10 ** (8 - column)
+
+    zone_start = np.where(has_fraction, 20 + run.sum(axis=1), 19)
+    width = chars.shape[1]
+
+    def at(offset):
+        index = np.minimum(zone_start + offset, width - 1)[:, None]
+        return np.take_along_axis(digits, index, axis=1)[:, 0]
+
+    zone = at(0) + ord('0')
+    sign = np.where(zone == ord('+'), 1, np.where(zone == ord('-'), -1, 0))
+    offset = sign * ((at(1) * 10 + at(2)) * 3600 + (at(4) * 10 + at(5)) * 60)
+    return (seconds - offset) * NS_PER_SECOND + fraction
+
+
+def to_datetime64(timestamps_ns):
+    """int64 нс UTC -> datetime64[ns] без копирования."""
+    return np.asarray(timestamps_ns, dtype=np.int64).view('datetime64[ns]')
+
+
+def format_ns(timestamp_ns):
+    """int64 наносекунд UTC -> ISO-строка (с микросекундами) для вывода."""
+    seconds, nanoseconds = divmod(timestamp_ns, NS_PER_SECOND)
+    moment = datetime.fromtimestamp(seconds, tz=timezone.utc).replace(microsecond=nanoseconds // 1000)
+    return moment.isoformat()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# Sidecar-экспортер метрик k6 для Prometheus: следит за NDJSON-выводом k6
+# (--out json=...) и отдает агрегированные ряды на /metrics.
+# Работает только с локальными файлами, внешние сервисы не нужны.
+
+import argparse
+import os
+import time
+
+from k6report.decode import is_compressed
+from k6report.exporter import (
+    DEFAULT_BUCKETS,
+    DEFAULT_LABEL_TAGS,
+    DEFAULT_MAX_SERIES,
+    ExporterTail,
+    PrometheusRegistry,
+    serve,
+)
+from k6report.ingest import list_result_files
+
+
+def list_files(paths):
+    """Файлы результатов из путей (каталоги просматриваются на каждом опросе)."""
+    filepaths = []
+    for path in paths:
+        if os.path.isdir(path):
+            filepaths.extend(os.path.join(path, filename) for filename in list_result_files(path)
+                             if not is_compressed(filename))
+        elif os.path.exists(path):
+            filepaths.append(path)
+    return filepaths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Экспорт метрик k6 из NDJSON-файлов в формате Prometheus",
+        epilog="Example: python prometheus-exporter.py results/ --port 9565")
+    parser.add_argument('paths', nargs='+', help="Файлы k6 (--out json) или каталоги с ними")
+    parser.add_argument('--host', default='0.0.0.0', help="Адрес HTTP-сервера")
+    parser.add_argument('--port', type=int, default=9565, help="Порт /metrics (по умолчанию 9565)")
+    parser.add_argument('--interval', type=float, default=1.0, help="Период опроса файлов, с")
+    parser.add_argument('--buckets', default=','.join(str(bound) for bound in DEFAULT_BUCKETS),
+                        help="Границы гистограмм через запятую, мс")
+    parser.add_argument('--tags', default=','.join(DEFAULT_LABEL_TAGS),
+                        help="Теги k6, которые становятся метками")
+    parser.add_argument('--max-series', type=int, default=DEFAULT_MAX_SERIES,
+                        help="Лимит рядов на метрику; остальные значения меток -> __other__")
+    parser.add_argument('--metrics', default=None, help="Экспортировать только эти метрики (через запятую)")
+    args = parser.parse_args()
+
+    registry = PrometheusRegistry(
+        buckets=[float(bound) for bound in args.buckets.split(',') if bound],
+        label_tags=[tag for tag in args.tags.split(',') if tag],
+        max_series=args.max_series,
+    )
+    metrics = args.metrics.split(',') if args.metrics else None
+    server = serve(registry, args.host, args.port)
+    print(f"📡 /metrics на http://{args.host}:{args.port}/metrics")
+
+    tails = {}
+    try:
+        while True:
+            started = time.monotonic()
+            for filepath in list_files(args.paths):
+                if filepath not in tails:
+                    print(f"Следим за {filepath}")
+                    tails[filepath] = ExporterTail(filepath, registry, metrics)
+                tails[filepath].poll()
+            time.sleep(max(0.0, args.interval - (time.monotonic() - started)))
+    except KeyboardInterrupt:
+        print("Экспортер остановлен")
+    finally:
+        server.shutdown()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# Ad-hoc запрос к одному прогону k6 (k6report.query): метрика, фильтры по
+# тегам, диапазон времени, агрегации и группировка. Сырой файл читается
+# через колоночный кеш (memmap) и индекс тегов, поэтому повторный запрос по
+# многогигабайтному прогону занимает доли секунды; если сырой файл сжат,
+# запрос идет по его rollup (<артефакт>.rollup.npz).
+
+import argparse
+import json
+import os
+import sys
+
+from k6report.cache import load_columns
+from k6report.decode import ROLLUP_SUFFIX, is_ndjson, strip_result_suffix
+from k6report.query import (
+    Query,
+    load_index,
+    parse_aggregation,
+    parse_duration,
+    parse_filter,
+    parse_time,
+    query_columns,
+    query_rollup,
+    run_bounds,
+)
+from k6report.rollup import Rollup
+from k6report.timestamps import format_ns
+
+
+def format_value(value):
+    if value is None:
+        return "-"
+    if float(value).is_integer():
+        return f"{int(value):,}"
+    return f"{value:,.4g}" if abs(value) < 1 else f"{value:,.2f}"
+
+
+def print_table(query, rows, approximate):
+    headers = (['time'] if query.interval_ns else []) + query.group_by \
+        + [("≈" if approximate and aggregation.quantile is not None else "") + aggregation.label
+           for aggregation in query.aggregations]
+    lines = [[format_ns(row['time']) for _ in [0] if query.interval_ns]
+             + ["-" if row['group'][tag] is None else str(row['group'][tag]) for tag in query.group_by]
+             + [format_value(row['values'][aggregation.label]) for aggregation in query.aggregations]
+             for row in rows]
+    widths = [max([len(header)] + [len(line[i]) for line in lines]) for i, header in enumerate(headers)]
+    print("  ".join(header.ljust(width) for header, width in zip(headers, widths)))
+    for line in lines:
+        print("  ".join(cell.ljust(width) for cell, width in zip(line, widths)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Ad-hoc запрос к результатам прогона k6 по колоночному кешу или rollup",
+        epilog="Example: python query-results.py results/soak-test.json --where endpoint=create_post "
+               "--from 30m --to 45m --agg p99")
+    parser.add_argument('source', help="NDJSON-результат k6 или его rollup (.rollup.npz)")
+    parser.add_argument('--metric', default='http_req_duration', help="Метрика (по умолчанию http_req_duration)")
+    parser.add_argument('--where', action='append', default=[], metavar='TAG=VALUE',
+                        help="Фильтр тег=значение или тег!=значение (точки без тега не подходят); можно повторять")
+    parser.add_argument('--from', dest='start', default=None,
+                        help="Начало: смещение от начала прогона (30m, 1h30m, 90s) или RFC3339")
+    parser.add_argument('--to', dest='end', default=None, help="Конец (не включая), в том же формате")
+    parser.add_argument('--agg', default='count,avg,p95,p99',
+                        help="Агрегации через запятую: count, sum, avg, min, max, rate, value, med, pNN")
+    parser.add_argument('--group-by', default=None, help="Группировка по тегам через запятую (endpoint,status)")
+    parser.add_argument('--interval', default=None, help="Группировка по интервалам времени (1m, 10s)")
+    parser.add_argument('--approximate', action='store_true',
+                        help="Квантили по скетчам вместо точных по значениям")
+    parser.add_argument('--json', action='store_true', help="Вывод в JSON")
+    args = parser.parse_args()
+
+    source = args.source
+    rollup_path = strip_result_suffix(source) + ROLLUP_SUFFIX
+    if not os.path.exists(source) and os.path.exists(rollup_path):
+        source = rollup_path  # сырой файл удален после compact-results.py
+    if not os.path.exists(source):
+        print(f"❌ Нет файла {args.source}")
+        sys.exit(1)
+    if not source.endswith(ROLLUP_SUFFIX) and not is_ndjson(source):
+        print(f"❌ {source}: не NDJSON-результат k6 и не rollup")
+        sys.exit(1)
+
+    try:
+        query = Query(args.metric, [parse_filter(text) for text in args.where],
+                      aggregations=[parse_aggregation(text) for text in args.agg.split(',')],
+                      group_by=args.group_by.split(',') if args.group_by else (),
+                      interval_ns=parse_duration(args.interval) if args.interval else None)
+        if source.endswith(ROLLUP_SUFFIX):
+            data = Rollup.load(source)
+            run_start = int(data.start.min())
+        else:
+            data = load_columns(source, mmap=True)
+            run_start = run_bounds(data)[0]
+        query.start_time = parse_time(args.start, run_start) if args.start else None
+        query.end_time = parse_time(args.end, run_start) if args.end else None
+        approximate = isinstance(data, Rollup) or args.approximate
+        if isinstance(data, Rollup):
+            rows = query_rollup(data, query)
+        else:
+            rows = query_columns(data, query, load_index(source, data) if query.filters else None,
+                                 exact=not args.approximate)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    if args.json:
+        print(json.dumps({'source': os.path.basename(source), 'metric': query.metric, 'approximate': approximate,
+                          'rows': [{**row, 'time': format_ns(row['time']) if row['time'] is not None else None}
+                                   for row in rows]}, indent=2, ensure_ascii=False))
+    elif not rows:
+        print("Нет точек, подходящих под запрос")
+    else:
+        print_table(query, rows, approximate)
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# Загрузка артефактов CI (k6 --out json=results/<test>-<sha>.json) в InfluxDB,
+# чтобы прогоны из CI были видны в Grafana рядом с запусками --out influxdb.
+
+import argparse
+import os
+import sys
+
+from k6report.decode import is_result_file, strip_result_suffix
+from k6report.influx import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_CONCURRENCY,
+    DEFAULT_MAX_IN_FLIGHT,
+    DEFAULT_RETRIES,
+    InfluxWriter,
+    replay_file,
+)
+from k6report.ingest import list_result_files, test_name
+
+
+def list_files(paths):
+    filepaths = []
+    for path in paths:
+        if os.path.isdir(path):
+            filepaths.extend(os.path.join(path, filename) for filename in list_result_files(path))
+        elif is_result_file(path):
+            filepaths.append(path)
+    return filepaths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Загрузка NDJSON-результатов k6 в InfluxDB (line protocol)",
+        epilog="Example: python replay-to-influx.py results/ --url http://localhost:8086/k6 --tag source=ci")
+    parser.add_argument('paths', nargs='+', help="Файлы k6 (--out json) или каталоги с ними")
+    parser.add_argument('--url', default='http://localhost:8086/k6', help="InfluxDB в формате k6: http://host:8086/<db>")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="Точек в пачке")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help="Параллельных соединений")
+    parser.add_argument('--max-in-flight', type=int, default=DEFAULT_MAX_IN_FLIGHT,
+                        help="Максимум пачек в очереди на отправку (backpressure)")
+    parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES, help="Повторов пачки при ошибке")
+    parser.add_argument('--gzip', action='store_true', help="Сжимать тела запросов")
+    parser.add_argument('--token', default=os.environ.get('INFLUXDB_TOKEN'), help="Токен (InfluxDB 2.x, режим v1)")
+    parser.add_argument('--tag', action='append', default=[], help="Общий тег k=v для всех точек (можно несколько)")
+    args = parser.parse_args()
+
+    common_tags = dict(tag.split('=', 1) for tag in args.tag)
+    filepaths = list_files(args.paths)
+    if not filepaths:
+        parser.error("Нет файлов результатов k6")
+
+    with InfluxWriter(args.url, args.concurrency, args.max_in_flight, args.retries,
+                      compress=args.gzip, token=args.token) as writer:
+        for filepath in filepaths:
+            # run - имя артефакта (тест и sha коммита), testid - как тег k6 для фильтра в Grafana
+            tags = {'run': strip_result_suffix(os.path.basename(filepath)), 'testid': test_name(filepath),
+                    **common_tags}
+            print(f"Загружаем {filepath}")
+            replay_file(writer, filepath, args.batch_size, tags)
+
+    stats = writer.stats
+    print(f"✅ Записано точек: {stats.points:,} ({stats.batches:,} пачек, {stats.bytes / 2**20:.1f} МБ) "
+          f"за {stats.elapsed:.1f} с - {stats.points_per_second:,.0f} точек/с")
+    if stats.retries:
+        print(f"   Повторов: {stats.retries}")
+    if stats.failed_points:
+        print(f"❌ Не записано точек: {stats.failed_points:,} ({stats.failed_batches} пачек)")
+        sys.exit(1)
@@ -52,6 +52,10 @@ docker exec $K6_CONTAINER k6 run --out influxdb=http://influxdb:8086/k6 --out js
 # Генерация расширенного отчета
 Write-Host "Generating advanced test report..."
 if (Get-Command python -ErrorAction SilentlyContinue) {
+    # Один проход по сырым результатам -> k6-summary.json для всех отчетов
+    if (Test-Path "scripts/ingest-results.py") {
+        python scripts/ingest-results.py $FULL_RESULTS_PATH --workers 0
+    }
     if (Test-Path "scripts/generate-report.py") {
         python scripts/generate-report.py $FULL_RESULTS_PATH
     }
@@ -0,0 +1,7 @@
+# Тесты скриптов отчетов: запуск из корня репозитория - python -m pytest scripts/tests.
+# Скрипты импортируют k6report как пакет каталога scripts/.
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+from k6report.aggregate import MetricAggregator, QuantileSketch, aggregate_points, to_k6_summary
+
+QUANTILES = (0.0, 0.1, 0.5, 0.9, 0.95, 0.99, 0.999, 1.0)
+SECOND_NS = 10**9
+
+
+def sketch_of(values, relative_accuracy=0.01):
+    sketch = QuantileSketch(relative_accuracy)
+    for value in values:
+        sketch.add(float(value))
+    return sketch
+
+
+def assert_relative_error(sketch, values, relative_accuracy):
+    # скетч оценивает порядковую статистику floor(q * (n - 1))
+    for q, estimate in sketch.quantiles(QUANTILES).items():
+        exact = float(np.quantile(values, q, method='lower'))
+        assert abs(estimate - exact) <= relative_accuracy * abs(exact) + 1e-12, (q, estimate, exact)
+
+
+@pytest.mark.parametrize('relative_accuracy', [0.01, 0.05])
+def test_relative_error_bound(relative_accuracy):
+    values = np.random.default_rng(0).lognormal(4, 1.5, 20_000)
+    assert_relative_error(sketch_of(values, relative_accuracy), values, relative_accuracy)
+
+
+def test_negative_and_zero_values():
+    rng = np.random.default_rng(1)
+    values = np.concatenate([-rng.lognormal(2, 1, 3_000), np.zeros(1_000), rng.lognormal(2, 1, 3_000)])
+    sketch = sketch_of(rng.permutation(values))
+    assert sketch.count == len(values)
+    assert sketch.zero_count == 1_000
+    assert sketch.quantile(0.5) == 0.0
+    assert_relative_error(sketch, values, 0.01)
+
+
+def test_merge_order_does_not_matter():
+    values = np.random.default_rng(2).lognormal(3, 1, 9_000)
+    parts = [sketch_of(part) for part in np.array_split(values, 3)]
+    forward = QuantileSketch().merge(parts[0]).merge(parts[1]).merge(parts[2])
+    backward = QuantileSketch().merge(parts[2]).merge(parts[0]).merge(parts[1])
+    whole = sketch_of(values)
+    assert forward.to_dict() == backward.to_dict() == whole.to_dict()
+    assert forward.quantiles(QUANTILES) == whole.quantiles(QUANTILES)
+
+
+def test_merge_rejects_other_accuracy():
+    with pytest.raises(ValueError):
+        QuantileSketch(0.01).merge(QuantileSketch(0.02))
+
+
+def test_aggregator_merge_matches_single_pass():
+    values = [5.0, -1.0, 0.0, 12.5, 3.0, 0.0, 7.0]
+    whole, first, second = MetricAggregator(), MetricAggregator(), MetricAggregator()
+    for i, value in enumerate(values):
+        whole.add(value, i * SECOND_NS)
+        (first if i % 2 else second).add(value, i * SECOND_NS)
+    merged = MetricAggregator().merge(second).merge(first)
+    assert merged.to_dict() == whole.to_dict()
+    assert (merged.count, merged.min, merged.max, merged.nonzero) == (7, -1.0, 12.5, 5)
+    # last - значение самой поздней точки, а не последней слитой
+    assert merged.last == 7.0
+    assert MetricAggregator.from_dict(merged.to_dict()).to_dict() == merged.to_dict()
+
+
+def test_to_k6_summary_shape():
+    points = [('http_req_duration', {'time': f'2026-01-01T00:00:{second:02d}Z', 'value': value})
+              for second, value in enumerate([100, 200, 300, 400])]
+    points += [('http_reqs', {'time': f'2026-01-01T00:00:{second:02d}Z', 'value': 1}) for second in (0, 10)]
+    points += [('http_req_failed', {'time': '2026-01-01T00:00:05Z', 'value': value}) for value in (0, 1, 0, 0)]
+    points += [('vus', {'time': f'2026-01-01T00:00:{second:02d}Z', 'value': value})
+               for second, value in ((0, 5), (4, 10), (8, 2))]
+    summary = to_k6_summary(aggregate_points(points),
+                            {'http_reqs': 'counter', 'http_req_failed': 'rate', 'vus': 'gauge'})
+
+    assert summary['state'] == {'testRunDurationMs': 10_000}
+    metrics = summary['metrics']
+    assert metrics['http_reqs'] == {'type': 'counter', 'values': {'count': 2, 'rate': 0.2}}
+    assert metrics['http_req_failed'] == {'type': 'rate', 'values': {'rate': 0.25, 'passes': 1, 'fails': 3}}
+    assert metrics['vus'] == {'type': 'gauge', 'values': {'value': 2, 'min': 2, 'max': 10}}
+    trend = metrics['http_req_duration']
+    assert trend['type'] == 'trend'
+    assert set(trend['values']) == {'avg', 'min', 'max', 'med', 'p(90)', 'p(95)'}
+    assert (trend['values']['avg'], trend['values']['min'], trend['values']['max']) == (250, 100, 400)
+    assert trend['values']['med'] == pytest.approx(200, rel=0.01)
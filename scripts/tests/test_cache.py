@@ -0,0 +1,60 @@
+import json
+import os
+
+import numpy as np
+
+from k6report import cache
+from k6report.cache import ColumnarResults, _merge_parts, _parse_range, build_columns, load_columns, warm_cache
+
+
+def write_results(path, rows):
+    """NDJSON k6: rows - (метрика, секунда, значение, теги)."""
+    with open(path, 'w') as f:
+        for metric, second, value, tags in rows:
+            f.write(json.dumps({"type": "Point", "metric": metric,
+                                "data": {"time": f"2026-01-01T00:00:{second:02d}Z", "value": value,
+                                         "tags": tags}}) + "\n")
+    return str(path)
+
+
+def assert_same_columns(actual, expected):
+    assert actual.metric_names == expected.metric_names
+    assert np.array_equal(actual.offsets, expected.offsets)
+    assert np.array_equal(actual.time, expected.time)
+    assert np.array_equal(actual.value, expected.value)
+    for key in expected.tags:
+        decode = {code: value for code, value in enumerate(expected.tag_values[key])}
+        decoded = [decode.get(code) for code in expected.tags[key]]
+        assert [dict(enumerate(actual.tag_values[key])).get(code) for code in actual.tags[key]] == decoded
+
+
+def test_merge_of_parts_matches_single_part(tmp_path):
+    rng = np.random.default_rng(0)
+    # время в пределах нескольких секунд: много равных меток, порядок файла должен сохраниться
+    rows = [(str(rng.choice(['http_req_duration', 'http_reqs'])), int(rng.integers(0, 5)), i,
+             {'status': str(rng.choice(['200', '500']))} if i % 3 else {'endpoint': f'e{i % 7}'})
+            for i in range(3_000)]
+    filepath = write_results(tmp_path / 'load-abc123.json', rows)
+    expected = build_columns(filepath)
+    parts = _parse_range(filepath, 0, None, str(tmp_path / 'part'), chunk_rows=400)
+    assert len(parts) > 1
+    # меньше строки на часть за шаг: слияние идет мелкими кусками
+    _merge_parts(parts, str(tmp_path / 'merged.npz'), max_rows=5)
+    assert_same_columns(ColumnarResults.load(str(tmp_path / 'merged.npz')), expected)
+    assert not any(os.path.exists(path) for path in parts)
+
+
+def test_content_key_hashes_file_once(tmp_path, monkeypatch):
+    filepath = write_results(tmp_path / 'smoke-abc123.json', [('http_reqs', 0, 1, {})] * 10)
+    opened = []
+
+    def counting_open(path, *args, **kwargs):
+        opened.append(path)
+        return open(path, *args, **kwargs)
+
+    monkeypatch.setattr(cache, 'open', counting_open, raising=False)
+    cache_dir = str(tmp_path / 'cache')
+    warm_cache([filepath], cache_dir=cache_dir, key='content')
+    load_columns(filepath, cache_dir=cache_dir, key='content')
+    load_columns(filepath, cache_dir=cache_dir, key='content')
+    assert opened.count(filepath) == 1
@@ -0,0 +1,71 @@
+import numpy as np
+
+from k6report.cache import ColumnarResults
+from k6report.canary import analyze_canary
+
+
+def run_columns(control, canary, control_failed=None, canary_failed=None):
+    """Колоночные данные прогона: http_req_duration (и http_req_failed) с тегом version."""
+    metrics = [('http_req_duration', control, canary)]
+    if control_failed is not None:
+        metrics.append(('http_req_failed', control_failed, canary_failed))
+    values, codes, offsets = [], [], [0]
+    for _, control_values, canary_values in metrics:
+        values += list(control_values) + list(canary_values)
+        codes += [0] * len(control_values) + [1] * len(canary_values)
+        offsets.append(len(values))
+    return ColumnarResults(
+        [name for name, _, _ in metrics],
+        {'http_req_duration': 'trend', 'http_req_failed': 'rate'},
+        np.array(offsets, dtype=np.int64),
+        np.arange(len(values), dtype=np.int64),
+        np.array(values, dtype=np.float64),
+        {'version': ['control', 'canary']},
+        {'version': np.array(codes, dtype=np.int32)},
+    )
+
+
+def latencies(scale, size=2000, seed=0):
+    return np.random.default_rng(seed).lognormal(np.log(scale), 0.3, size)
+
+
+def test_pass_when_distributions_match():
+    report = analyze_canary(run_columns(latencies(100, seed=1), latencies(100, seed=2)), seed=0)
+    assert report['verdict'] == 'pass'
+    assert report['reasons'] == []
+    assert not any(stats['regression'] for stats in report['quantiles'].values())
+
+
+def test_fail_on_latency_regression():
+    report = analyze_canary(run_columns(latencies(100, seed=1), latencies(130, seed=2)), seed=0)
+    assert report['verdict'] == 'fail'
+    assert report['quantiles']['p(50)']['regression']
+    assert report['quantiles']['p(50)']['ci'][0] > 0.1
+
+
+def test_fail_on_error_rate_increase():
+    control_failed = [0] * 1000
+    canary_failed = [1] * 100 + [0] * 900
+    report = analyze_canary(run_columns(latencies(100, seed=1), latencies(100, seed=2),
+                                        control_failed, canary_failed), seed=0)
+    assert report['verdict'] == 'fail'
+    assert report['errors']['canary'] == 0.1
+    assert any('http_req_failed' in reason for reason in report['reasons'])
+
+
+def test_inconclusive_when_control_quantile_is_zero():
+    # больше половины ответов control мгновенные (из кеша): p50 control = 0
+    control = np.concatenate([np.zeros(1001), latencies(100, 999, seed=1)])
+    report = analyze_canary(run_columns(control, latencies(100, seed=2)), quantiles=(0.5,), seed=0)
+    assert report['verdict'] == 'inconclusive'
+    assert report['quantiles']['p(50)']['control'] == 0
+    assert report['quantiles']['p(50)']['relative_delta'] is None
+    assert report['quantiles']['p(50)']['ci'] == [None, None]
+    assert not report['quantiles']['p(50)']['regression']
+    assert 'p(50)' in report['reasons'][0]
+
+
+def test_inconclusive_with_few_samples():
+    report = analyze_canary(run_columns(latencies(100, 10), latencies(100, 10)))
+    assert report['verdict'] == 'inconclusive'
+    assert 'quantiles' not in report
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from k6report.cache import ColumnarResults
+from k6report.degradation import IntervalStream, detect_columns, detect_points
+
+SECOND_NS = 10**9
+# начало не на границе минуты: первый интервал неполный
+START = 1_700_000_000 * SECOND_NS + 23 * SECOND_NS
+DURATION_S = 3 * 3600
+DRIFT_START_S = 5400
+
+
+def soak_points(drift, seed=0):
+    """(метрика, значение, время нс) soak-прогона: 2 запроса в секунду; drift - +60% в час после 1.5 ч."""
+    rng = np.random.default_rng(seed)
+    times = START + np.arange(DURATION_S * 2) * (SECOND_NS // 2)
+    elapsed_h = np.maximum(0, (times - START) / SECOND_NS - DRIFT_START_S) / 3600
+    durations = np.round(rng.lognormal(np.log(200), 0.2, len(times)) * (1 + (0.6 * elapsed_h if drift else 0)), 1)
+    failed = rng.random(len(times)) < 0.01
+    points = []
+    for time, duration, error in zip(times.tolist(), durations.tolist(), failed.tolist()):
+        points.append(('http_req_duration', duration, time))
+        points.append(('http_req_failed', float(error), time))
+    return points
+
+
+def to_columns(points):
+    names = ['http_req_duration', 'http_req_failed']
+    rows = sorted(points, key=lambda point: (names.index(point[0]), point[2]))
+    counts = [sum(1 for point in rows if point[0] == name) for name in names]
+    return ColumnarResults(names, {}, np.concatenate(([0], np.cumsum(counts))).astype(np.int64),
+                           np.array([point[2] for point in rows], dtype=np.int64),
+                           np.array([point[1] for point in rows]), {}, {})
+
+
+def test_drift_is_flagged_with_plausible_onset():
+    report = detect_points(soak_points(drift=True))
+    assert report['degraded']
+    assert report['series']['p95']['degraded']
+    assert not report['series']['error_rate']['degraded']
+    onset_s = (report['onset'] - START) / SECOND_NS
+    # рост начинается в 1.5 ч; медленный дрейф замечается с запаздыванием, но не раньше начала
+    assert DRIFT_START_S - 600 <= onset_s <= DRIFT_START_S + 3600
+    assert report['series']['p95']['growth_per_hour'] > 0.2
+    assert report['dropped_points'] == 0
+
+
+def test_flat_run_is_not_flagged():
+    report = detect_points(soak_points(drift=False, seed=1))
+    assert not report['degraded']
+    assert report['onset'] is None
+
+
+@pytest.mark.parametrize('drift', [False, True])
+def test_stream_and_columns_share_intervals(drift):
+    points = soak_points(drift, seed=2)
+    streamed = detect_points(points)
+    columns = to_columns(points)
+    times = columns.times('http_req_duration')
+    vectorized = detect_columns(columns, int(times.min()), int(times.max()))
+    for name in ('p95', 'error_rate'):
+        stream_series, column_series = streamed['series'][name], vectorized['series'][name]
+        assert stream_series['intervals'] == column_series['intervals'] == DURATION_S // 60 + 1
+        assert stream_series['baseline'] == pytest.approx(column_series['baseline'])
+    assert streamed['degraded'] == vectorized['degraded'] == drift
+    assert streamed['onset'] == vectorized['onset']
+
+
+def test_interval_stream_is_epoch_aligned():
+    stream = IntervalStream(interval_s=60, lateness_s=0)
+    assert stream.add('http_req_duration', 100.0, START) == []
+    closed = stream.add('http_req_duration', 100.0, START + 60 * SECOND_NS)
+    assert [time for time, _, _ in closed] == [START // (60 * SECOND_NS) * 60 * SECOND_NS]
+    # опоздавшая точка закрытого интервала
+    assert stream.add('http_req_failed', 1.0, START) == []
+    assert stream.dropped == 1
@@ -0,0 +1,100 @@
+import json
+
+from k6report.exporter import ExporterTail, PrometheusRegistry
+
+TIME = "2026-01-01T00:00:00.000000000Z"
+
+
+def metric(name, kind):
+    return {"type": "Metric", "metric": name, "data": {"name": name, "type": kind, "contains": "default"}}
+
+
+def point(name, value, **tags):
+    return {"type": "Point", "metric": name, "data": {"time": TIME, "value": value, "tags": tags}}
+
+
+def write_lines(path, records, mode='a'):
+    with open(path, mode) as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+
+def samples(text):
+    """Строки отсчетов: 'имя{метки}' -> значение."""
+    result = {}
+    for line in text.splitlines():
+        if line and not line.startswith('#'):
+            series, value = line.rsplit(' ', 1)
+            result[series] = value
+    return result
+
+
+def test_tail_feeds_histograms_and_counters(tmp_path):
+    path = tmp_path / "smoke-abc123.json"
+    write_lines(path, [
+        metric("http_req_duration", "trend"),
+        metric("http_reqs", "counter"),
+        metric("checks", "rate"),
+        metric("vus", "gauge"),
+        point("http_req_duration", 7, endpoint="login", method="POST", status="200"),
+        point("http_req_duration", 10, endpoint="login", method="POST", status="200"),
+        point("http_req_duration", 300, endpoint="login", method="POST", status="200"),
+        point("http_reqs", 1, endpoint="login", method="POST", status="200"),
+        point("http_reqs", 1, endpoint="login", method="POST", status="200"),
+        point("checks", 1, check="ok"),
+        point("checks", 0, check="ok"),
+        point("vus", 5),
+    ], mode='w')
+    registry = PrometheusRegistry(buckets=(10, 100, 1000))
+    tail = ExporterTail(str(path), registry)
+    assert tail.poll() > 0
+
+    text = registry.render()
+    values = samples(text)
+    labels = 'test="smoke",endpoint="login",method="POST",status="200"'
+    # границы включительные (le), корзины накопительные
+    assert values[f'k6_http_req_duration_bucket{{{labels},le="10"}}'] == '2'
+    assert values[f'k6_http_req_duration_bucket{{{labels},le="100"}}'] == '2'
+    assert values[f'k6_http_req_duration_bucket{{{labels},le="1000"}}'] == '3'
+    assert values[f'k6_http_req_duration_bucket{{{labels},le="+Inf"}}'] == '3'
+    assert values[f'k6_http_req_duration_sum{{{labels}}}'] == '317'
+    assert values[f'k6_http_req_duration_count{{{labels}}}'] == '3'
+    assert values[f'k6_http_reqs_total{{{labels}}}'] == '2'
+    assert values['k6_checks_samples_total{test="smoke"}'] == '2'
+    assert values['k6_checks_true_total{test="smoke"}'] == '1'
+    assert values['k6_vus{test="smoke"}'] == '5'
+    assert values['k6_exporter_points_total'] == '8'
+    assert '# TYPE k6_http_req_duration histogram' in text
+    assert '# TYPE k6_http_reqs_total counter' in text
+
+    # дописанные строки учитываются при следующем опросе, неполная строка ждет конца
+    write_lines(path, [point("http_reqs", 3, endpoint="login", method="POST", status="200")])
+    with open(path, 'a') as f:
+        f.write(json.dumps(point("http_reqs", 100))[:20])
+    tail.poll()
+    assert samples(registry.render())[f'k6_http_reqs_total{{{labels}}}'] == '5'
+    assert tail.poll() == 0
+
+
+def test_label_escaping():
+    registry = PrometheusRegistry(label_tags=('endpoint',))
+    registry.observe('smoke', 'http_reqs', 'counter', 1, {'endpoint': 'a"b\\c\nd'})
+    assert 'k6_http_reqs_total{test="smoke",endpoint="a\\"b\\\\c\\nd"} 1' in registry.render().splitlines()
+
+
+def test_series_cap_folds_into_other():
+    registry = PrometheusRegistry(label_tags=('endpoint',), max_series=2)
+    for endpoint in ('a', 'b', 'c', 'd'):
+        registry.observe('smoke', 'http_reqs', 'counter', 1, {'endpoint': endpoint})
+    values = samples(registry.render())
+    assert values['k6_http_reqs_total{test="smoke",endpoint="__other__"}'] == '2'
+    assert values['k6_exporter_overflow_points_total'] == '2'
+
+
+def test_openmetrics_counter_family_and_eof():
+    registry = PrometheusRegistry()
+    registry.observe('smoke', 'http_reqs', 'counter', 1, {})
+    lines = registry.render(openmetrics=True).splitlines()
+    assert '# TYPE k6_http_reqs counter' in lines
+    assert 'k6_http_reqs_total{test="smoke"} 1' in lines
+    assert lines[-1] == '# EOF'
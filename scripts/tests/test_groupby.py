@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from k6report import groupby
+from k6report.aggregate import MetricAggregator
+from k6report.cache import ColumnarResults
+from k6report.groupby import group_by
+
+TAG_VALUES = {'endpoint': ['login', 'feed', 'post'], 'status': ['200', '404', '500'], 'method': ['GET', 'POST']}
+
+
+@pytest.fixture(scope='module')
+def columns():
+    """Одна метрика; у части строк нет тегов, есть нули и отрицательные значения."""
+    rng = np.random.default_rng(0)
+    n = 5000
+    values = np.round(rng.normal(50, 40, n), 1)
+    values[::17] = 0.0
+    return ColumnarResults(
+        ['http_req_duration'], {'http_req_duration': 'trend'}, np.array([0, n], dtype=np.int64),
+        np.sort(rng.integers(0, 10**12, n)), values, TAG_VALUES,
+        {tag: rng.integers(-1, len(names), n).astype(np.int8) for tag, names in TAG_VALUES.items()},
+    )
+
+
+def naive_groups(columns, tags, include_missing):
+    """Группировка по строкам: значения тегов -> MetricAggregator."""
+    groups = {}
+    for row in range(len(columns)):
+        key = tuple(columns.tag_values[tag][columns.tags[tag][row]] if columns.tags[tag][row] >= 0 else None
+                    for tag in tags)
+        if not include_missing and None in key:
+            continue
+        groups.setdefault(key, MetricAggregator()).add(float(columns.value[row]), int(columns.time[row]))
+    return groups
+
+
+def assert_same_groups(actual, expected):
+    assert actual.keys() == expected.keys()
+    for key, aggregator in expected.items():
+        data, reference = actual[key].to_dict(), aggregator.to_dict()
+        assert data.pop('sum') == pytest.approx(reference.pop('sum'), rel=1e-9), key
+        assert data == reference, key
+
+
+@pytest.mark.parametrize('tags', [('endpoint',), ('endpoint', 'status'), ('status', 'method', 'endpoint')])
+@pytest.mark.parametrize('include_missing', [False, True])
+def test_group_by_matches_naive_grouping(columns, tags, include_missing):
+    actual = group_by(columns, 'http_req_duration', tags, include_missing=include_missing)
+    assert_same_groups(actual, naive_groups(columns, tags, include_missing))
+    counts = [aggregator.count for aggregator in actual.values()]
+    assert counts == sorted(counts, reverse=True)
+
+
+def test_single_tag_keys_are_values(columns):
+    actual = group_by(columns, 'http_req_duration', 'method')
+    assert set(actual) == {'GET', 'POST'}
+    assert_same_groups({(key,): value for key, value in actual.items()}, naive_groups(columns, ('method',), False))
+
+
+def test_unique_table_when_key_overflows(columns, monkeypatch):
+    # произведение оснований не помещается в ключ: номера уникальных комбинаций
+    monkeypatch.setattr(groupby, 'MAX_KEY', 10)
+    tags = ('endpoint', 'status', 'method')
+    assert_same_groups(group_by(columns, 'http_req_duration', tags, include_missing=True),
+                       naive_groups(columns, tags, True))
@@ -0,0 +1,82 @@
+import pytest
+
+from k6report.aggregate import MetricAggregator
+from k6report.history import RunStore
+
+SECOND_NS = 10**9
+
+
+def aggregate(values):
+    aggregator = MetricAggregator()
+    for i, value in enumerate(values):
+        aggregator.add(value, i * SECOND_NS)
+    return aggregator
+
+
+def entry(filename, start_s, durations, by_endpoint=None):
+    """Запись k6-summary.json прогона с http_req_duration и http_reqs."""
+    return {
+        'name': filename.split('-')[0],
+        'file': filename,
+        'source': 'ndjson',
+        'start_time': start_s * SECOND_NS,
+        'metric_types': {'http_req_duration': 'trend', 'http_reqs': 'counter'},
+        'metrics': {'http_req_duration': aggregate(durations).to_dict(),
+                    'http_reqs': aggregate([1] * len(durations)).to_dict()},
+        'tags': {'http_req_duration': {'endpoint': {name: aggregate(values).to_dict()
+                                                    for name, values in (by_endpoint or {}).items()}}},
+        'k6_summary': {'state': {'testRunDurationMs': 10_000}},
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    with RunStore(str(tmp_path / 'history.sqlite')) as store:
+        yield store
+
+
+def test_record_summary_is_idempotent(store):
+    summary = {'tests': [entry('load-aaa111.json', 100, [10, 20, 30], {'login': [10, 30]}),
+                         entry('smoke-aaa111.json', 100, [5])]}
+    recorded = store.record_summary(summary, environment='staging')
+    assert sorted(recorded) == ['load-aaa111.json', 'smoke-aaa111.json']
+    assert all(added for _, added in recorded.values())
+
+    run = store.run(recorded['load-aaa111.json'][0])
+    assert (run['test'], run['git_sha'], run['environment'], run['started_at']) == \
+        ('load', 'aaa111', 'staging', 100 * SECOND_NS)
+    assert store.metric_history('load', 'http_req_duration', 'avg') == [(100 * SECOND_NS, 20.0)]
+    assert store.metric_history('load', 'http_req_duration', 'max', tag='endpoint', tag_value='login') == \
+        [(100 * SECOND_NS, 30.0)]
+    # counter: rate = сумма / длительность прогона
+    assert store.metric_history('load', 'http_reqs', 'rate') == [(100 * SECOND_NS, 0.3)]
+
+    # повторная запись той же сводки не дублирует прогоны
+    again = store.record_summary(summary)
+    assert {file: run_id for file, (run_id, _) in again.items()} == \
+        {file: run_id for file, (run_id, _) in recorded.items()}
+    assert not any(added for _, added in again.values())
+    assert len(store.metric_history('load', 'http_req_duration', 'avg')) == 1
+
+
+def test_rolling_baseline_is_median_of_previous_window(store):
+    for i, avg in enumerate([10, 50, 20, 30, 1000]):
+        store.record_summary({'tests': [entry(f'load-{i:06x}.json', 100 + i, [avg])]})
+
+    latest = 104 * SECOND_NS
+    # медиана 4 предыдущих прогонов (10, 50, 20, 30); выброс текущего прогона не входит
+    assert store.rolling_baseline('load', 'http_req_duration', 'avg', before=latest) == 25
+    # окно - последние прогоны до before: 20, 30
+    assert store.rolling_baseline('load', 'http_req_duration', 'avg', window=2, before=latest) == 25
+    assert store.rolling_baseline('load', 'http_req_duration', 'avg', window=3) == 30
+    assert store.rolling_baseline('load', 'http_req_duration', 'avg', before=100 * SECOND_NS) is None
+    assert store.rolling_baseline('stress', 'http_req_duration', 'avg') is None
+    with pytest.raises(ValueError):
+        store.rolling_baseline('load', 'http_req_duration', 'p42')
+
+
+def test_environment_filter(store):
+    store.record_summary({'tests': [entry('load-000001.json', 100, [10])]}, environment='staging')
+    store.record_summary({'tests': [entry('load-000002.json', 101, [90])]}, environment='production')
+    assert store.rolling_baseline('load', 'http_req_duration', 'avg', environment='staging') == 10
+    assert store.rolling_baseline('load', 'http_req_duration', 'avg') == 50
@@ -0,0 +1,116 @@
+import gzip
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from k6report import influx
+from k6report.influx import InfluxWriter, replay_file
+
+
+class StubInflux:
+    """HTTP-заглушка /write: запоминает запросы, первые ответы берет из statuses."""
+
+    def __init__(self, statuses=()):
+        self.statuses = list(statuses)
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive, как у InfluxDB
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length']))
+                if self.headers.get('Content-Encoding') == 'gzip':
+                    body = gzip.decompress(body)
+                stub.requests.append({'path': self.path, 'headers': dict(self.headers), 'body': body.decode()})
+                status = stub.statuses.pop(0) if stub.statuses else 204
+                self.send_response(status)
+                if status == 503:
+                    self.send_header('Retry-After', '0')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/k6"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(statuses=()):
+        servers.append(StubInflux(statuses))
+        return servers[-1]
+
+    yield start
+    for server in servers:
+        server.close()
+
+
+@pytest.fixture
+def results(tmp_path):
+    path = tmp_path / "load-abc123.json"
+    with open(path, 'w') as f:
+        f.write(json.dumps({"type": "Metric", "metric": "http_reqs", "data": {"type": "counter"}}) + "\n")
+        for i in range(12):
+            f.write(json.dumps({"type": "Point", "metric": "http_reqs", "data": {
+                "time": f"2026-01-01T00:00:{i:02d}Z", "value": 1, "tags": {"status": "200", "vu": "3"}}}) + "\n")
+    return str(path)
+
+
+def test_batches_are_gzipped_and_complete(stub, results):
+    server = stub()
+    with InfluxWriter(server.url, concurrency=2, compress=True) as writer:
+        assert replay_file(writer, results, batch_size=5, tags={'run': 'load-abc123'}) == 12
+
+    assert sorted(len(request['body'].splitlines()) for request in server.requests) == [2, 5, 5]
+    assert all(request['headers']['Content-Encoding'] == 'gzip' for request in server.requests)
+    assert all(request['path'] == '/write?db=k6&precision=ns' for request in server.requests)
+    lines = sorted(line for request in server.requests for line in request['body'].splitlines())
+    assert lines[0] == 'http_reqs,status=200,run=load-abc123 value=1.0,vu="3" 1767225600000000000'
+    assert (writer.stats.points, writer.stats.batches, writer.stats.failed_points) == (12, 3, 0)
+
+
+def test_503_is_retried(stub, results):
+    server = stub(statuses=[503])
+    with InfluxWriter(server.url, concurrency=1, retries=2) as writer:
+        replay_file(writer, results, batch_size=100)
+
+    assert len(server.requests) == 2
+    assert server.requests[0]['body'] == server.requests[1]['body']
+    assert (writer.stats.points, writer.stats.retries, writer.stats.failed_batches) == (12, 1, 0)
+
+
+def test_client_error_is_not_retried(stub, results):
+    server = stub(statuses=[400])
+    with InfluxWriter(server.url, concurrency=1, retries=2) as writer:
+        replay_file(writer, results, batch_size=100)
+
+    assert len(server.requests) == 1
+    assert (writer.stats.points, writer.stats.failed_points, writer.stats.retries) == (0, 12, 0)
+
+
+def test_dead_sender_fails_submit_instead_of_blocking(stub, monkeypatch):
+    server = stub()
+    monkeypatch.setattr(influx, 'SUBMIT_POLL_INTERVAL', 0.05)
+
+    def broken_send(self, connection, body, points):
+        raise ValueError("сломанный отправитель")
+
+    monkeypatch.setattr(InfluxWriter, '_send', broken_send)
+    writer = InfluxWriter(server.url, concurrency=1, max_in_flight=1)
+    with pytest.raises(ValueError, match="сломанный отправитель"):
+        for _ in range(10):
+            writer.submit(b'm value=1 1\n', 1)
+    with pytest.raises(ValueError, match="сломанный отправитель"):
+        writer.close()
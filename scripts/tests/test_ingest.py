@@ -0,0 +1,53 @@
+import json
+import os
+import shutil
+
+from k6report.ingest import SUMMARY_FILENAME, current_summary, ingest_results
+
+
+def write_run(path, values):
+    with open(path, 'w') as f:
+        f.write(json.dumps({"type": "Metric", "metric": "http_req_duration", "data": {"type": "trend"}}) + "\n")
+        for i, value in enumerate(values):
+            f.write(json.dumps({"type": "Point", "metric": "http_req_duration",
+                                "data": {"time": f"2026-01-01T00:00:{i:02d}Z", "value": value}}) + "\n")
+
+
+def copy_results(source, target):
+    """Копия каталога без сохранения mtime (как cp без -p и скачивание артефактов CI)."""
+    os.makedirs(target)
+    for filename in os.listdir(source):
+        if os.path.isfile(os.path.join(source, filename)):
+            shutil.copy(os.path.join(source, filename), os.path.join(target, filename))
+            os.utime(os.path.join(target, filename), (1, 1))
+
+
+def test_copied_results_keep_summary_current(tmp_path):
+    source = tmp_path / 'results'
+    source.mkdir()
+    write_run(source / 'smoke-abc123.json', [10, 20, 30])
+    write_run(source / 'load-abc123.json', [100, 200])
+    ingest_results(str(source), workers=1)
+    assert current_summary(str(source)) is not None
+
+    copy = str(tmp_path / 'results_clean')
+    copy_results(str(source), copy)
+    summary = current_summary(copy)
+    assert summary is not None
+    assert sorted(test['file'] for test in summary['tests']) == ['load-abc123.json', 'smoke-abc123.json']
+
+
+def test_changed_content_makes_summary_stale(tmp_path):
+    write_run(tmp_path / 'smoke-abc123.json', [10, 20, 30])
+    ingest_results(str(tmp_path), workers=1)
+    # тот же размер, другое значение
+    write_run(tmp_path / 'smoke-abc123.json', [10, 20, 31])
+    assert current_summary(str(tmp_path)) is None
+
+
+def test_new_file_makes_summary_stale(tmp_path):
+    write_run(tmp_path / 'smoke-abc123.json', [10])
+    ingest_results(str(tmp_path), workers=1)
+    assert os.path.exists(tmp_path / SUMMARY_FILENAME)
+    write_run(tmp_path / 'load-abc123.json', [10])
+    assert current_summary(str(tmp_path)) is None
@@ -0,0 +1,63 @@
+import json
+
+import numpy as np
+import pytest
+
+from k6report.cache import build_columns
+from k6report.ingest import ingest_results
+from k6report.merge import group_shards, merge_entries, merged_columns, shard_run
+
+
+def test_shard_run_requires_numeric_shard_id():
+    assert shard_run('load-abc123-shard2.json') == 'load-abc123'
+    assert shard_run('load-abc123-node-10.json.gz') == 'load-abc123'
+    assert shard_run('load-abc123_instance3.json.zst') == 'load-abc123'
+    assert shard_run('chaos-nodes.json') is None
+    assert shard_run('api-instances.json') is None
+    assert shard_run('load-abc123-shardA.json') is None
+
+
+def test_group_shards_merges_only_multi_file_groups():
+    filenames = ['chaos-nodes.json', 'load-abc123-shard1.json', 'load-abc123-shard2.json',
+                 'smoke-abc123.json', 'stress-abc123-node1.json']
+    assert group_shards(filenames) == [
+        ('chaos-nodes.json', ['chaos-nodes.json']),
+        ('load-abc123', ['load-abc123-shard1.json', 'load-abc123-shard2.json']),
+        ('smoke-abc123.json', ['smoke-abc123.json']),
+        # единственный шард - обычный файл под своим именем
+        ('stress-abc123-node1.json', ['stress-abc123-node1.json']),
+    ]
+
+
+def write_shard(path, seconds):
+    with open(path, 'w') as f:
+        for second in seconds:
+            for metric, value in (('http_reqs', 1), ('http_req_duration', 100 + second), ('http_req_failed', 0)):
+                f.write(json.dumps({"type": "Point", "metric": metric,
+                                    "data": {"time": f"2026-01-01T00:00:{second:02d}Z", "value": value}}) + "\n")
+    return str(path)
+
+
+def test_merged_columns_from_shard_caches(tmp_path):
+    shards = [write_shard(tmp_path / 'load-abc123-shard1.json', [0, 2, 4, 5]),
+              write_shard(tmp_path / 'load-abc123-shard2.json', [1, 2, 3])]
+    merged = merged_columns([build_columns(path) for path in shards])
+    assert merged.metric_names == ['http_reqs', 'http_req_failed', 'http_req_duration']
+    times = merged.times('http_req_duration')
+    assert np.all(np.diff(times) >= 0)
+    assert merged.values('http_req_duration').tolist() == [100, 101, 102, 102, 103, 104, 105]
+
+
+def test_summary_export_shard_is_kept_apart(tmp_path, capsys):
+    write_shard(tmp_path / 'load-abc123-shard1.json', [0, 1, 2])
+    write_shard(tmp_path / 'load-abc123-shard2.json', [1, 2, 3])
+    (tmp_path / 'load-abc123-shard3.json').write_text('{"metrics": {"http_reqs": {"values": {"count": 5}}}}')
+    tests = {test['file']: test for test in ingest_results(str(tmp_path), workers=1)['tests']}
+    assert 'load-abc123-shard3.json' in capsys.readouterr().out
+    assert tests['load-abc123-shard3.json']['source'] == 'summary-export'
+    run = tests['load-abc123']
+    assert [shard['file'] for shard in run['shards']] == ['load-abc123-shard1.json', 'load-abc123-shard2.json']
+    assert run['metrics']['http_reqs']['count'] == 6
+    assert run['timeseries']['rps']['y'] == [1, 2, 2, 1]
+    with pytest.raises(ValueError, match='load-abc123-shard3.json'):
+        merge_entries('load-abc123', [run, tests['load-abc123-shard3.json']])
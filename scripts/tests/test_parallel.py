@@ -0,0 +1,31 @@
+import json
+
+import pytest
+
+from k6report.parallel import aggregate_file, aggregate_files
+
+
+def write_results(path, values):
+    path.write_text(''.join(json.dumps({"type": "Point", "metric": "http_req_duration",
+                                        "data": {"time": "2026-01-01T00:00:00Z", "value": value}}) + '\n'
+                            for value in values))
+    return str(path)
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_read_error_goes_to_errors(tmp_path, workers):
+    good = write_results(tmp_path / 'smoke-abc123.json', [1, 2, 3])
+    # сигнатура gzip с битым заголовком: OSError при чтении
+    broken = tmp_path / 'load-abc123.json.gz'
+    broken.write_bytes(b'\x1f\x8b\x09' + bytes(100))
+    errors = {}
+    results = aggregate_files([good, str(broken)], workers=workers, min_range_size=1, errors=errors)
+    assert list(results) == [good]
+    assert results[good]['http_req_duration'].count == 3
+    assert list(errors) == [str(broken)]
+    assert isinstance(errors[str(broken)], OSError)
+
+
+def test_read_error_raises_without_errors(tmp_path):
+    with pytest.raises(OSError):
+        aggregate_file(str(tmp_path / 'missing.json'), workers=1)
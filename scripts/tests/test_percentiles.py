@@ -0,0 +1,94 @@
+import json
+
+import numpy as np
+import pytest
+
+from k6report.cache import load_columns
+from k6report.percentiles import (SpillBuffer, array_chunks, chunked_quantiles, exact_quantiles, external_quantiles,
+                                  file_quantiles)
+
+QUANTILES = (0.0, 0.01, 0.5, 0.9, 0.95, 0.99, 0.999, 1.0)
+
+
+def sample(size, seed=0):
+    """Отрицательные значения, нули и много повторов (как округленные длительности)."""
+    rng = np.random.default_rng(seed)
+    values = np.round(rng.lognormal(3, 1.5, size), 1)
+    values[::7] = -values[::7]
+    values[::11] = 0.0
+    values[::13] = 42.0
+    return values
+
+
+def expected(values):
+    return {q: float(np.quantile(values, q)) for q in QUANTILES}
+
+
+def assert_quantiles(actual, values):
+    for q, value in expected(values).items():
+        assert actual[q] == pytest.approx(value, rel=1e-12, abs=1e-12), q
+
+
+def test_exact_quantiles_match_numpy():
+    values = sample(10_001)
+    assert_quantiles(exact_quantiles(values, QUANTILES), values)
+
+
+@pytest.mark.parametrize('memory_limit', [1, 50, 1_000])
+def test_external_quantiles_match_numpy(memory_limit):
+    values = sample(20_000)
+    chunks = np.array_split(values, 9)
+    assert_quantiles(external_quantiles(lambda: iter(chunks), len(values), QUANTILES, memory_limit), values)
+
+
+def test_external_quantiles_all_equal():
+    values = np.full(5_000, -3.5)
+    assert external_quantiles(lambda: iter([values]), len(values), QUANTILES, memory_limit=10) == \
+        {q: -3.5 for q in QUANTILES}
+
+
+def test_spill_buffer_spills_and_matches_numpy(tmp_path):
+    values = sample(30_000, seed=1)
+    with SpillBuffer(memory_limit=4_000, spill_dir=str(tmp_path)) as buffer:
+        for batch in np.array_split(values, 17):
+            buffer.add(batch)
+        assert buffer.spilled
+        assert buffer.count == len(values)
+        assert_quantiles(buffer.quantiles(QUANTILES), values)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_spill_buffer_in_memory():
+    values = sample(1_000)
+    with SpillBuffer(memory_limit=10_000) as buffer:
+        buffer.add(values)
+        assert not buffer.spilled
+        assert_quantiles(buffer.quantiles(QUANTILES), values)
+
+
+def test_empty():
+    assert external_quantiles(lambda: iter([]), 0, (0.5,)) == {0.5: None}
+    with SpillBuffer() as buffer:
+        assert buffer.quantiles((0.5,)) == {0.5: None}
+
+
+@pytest.mark.parametrize('memory_limit', [100, 10**6])
+def test_chunked_quantiles_match_numpy(memory_limit):
+    values = sample(20_000, seed=2)
+    chunks = array_chunks(np.array_split(values, 3), chunk_size=1_000)
+    assert_quantiles(chunked_quantiles(chunks, QUANTILES, memory_limit), values)
+
+
+def test_file_quantiles_from_memmap_cache(tmp_path):
+    values = sample(5_000, seed=3)
+    filepath = tmp_path / 'load-abc123.json'
+    with open(filepath, 'w') as f:
+        for i, value in enumerate(values):
+            f.write(json.dumps({"type": "Point", "metric": "http_req_duration",
+                                "data": {"time": f"2026-01-01T00:{i // 60 % 60:02d}:{i % 60:02d}Z",
+                                         "value": float(value)}}) + "\n")
+    columns = load_columns(str(filepath), cache_dir=str(tmp_path / 'cache'), mmap=True)
+    assert isinstance(columns.value, np.memmap)
+    # значений больше memory_limit: внешний выбор по кускам memmap
+    assert_quantiles(file_quantiles(str(filepath), 'http_req_duration', QUANTILES, columns, memory_limit=500),
+                     values)
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from k6report.cache import ColumnarResults
+from k6report.query import Query, TagIndex, parse_aggregation, parse_filter, query_columns, query_rollup
+from k6report.rollup import Rollup
+
+SECOND_NS = 10**9
+AGGREGATIONS = [parse_aggregation(text) for text in ('count', 'sum', 'min', 'max')]
+
+
+@pytest.fixture(scope='module')
+def columns():
+    """http_req_duration за 60 с; у части точек нет тега endpoint или status."""
+    rng = np.random.default_rng(0)
+    n = 3000
+    endpoint = rng.integers(-1, 3, n).astype(np.int32)  # -1: тега нет
+    status = rng.choice(np.array([-1, 0, 1], dtype=np.int32), n, p=[0.1, 0.8, 0.1])
+    return ColumnarResults(
+        ['http_req_duration'], {'http_req_duration': 'trend'}, np.array([0, n], dtype=np.int64),
+        np.sort(rng.integers(0, 60, n)) * SECOND_NS + 1_700_000_000 * SECOND_NS,
+        np.round(rng.lognormal(4, 0.5, n), 1),
+        {'endpoint': ['login', 'feed', 'post'], 'status': ['200', '500']},
+        {'endpoint': endpoint, 'status': status},
+    )
+
+
+@pytest.fixture(scope='module')
+def rollup(columns):
+    return Rollup.from_columns(columns, tag_sets=((), ('endpoint',), ('status',), ('endpoint', 'status')),
+                               resolutions=(1, 10))
+
+
+def rows_by_key(rows):
+    return {(tuple(sorted(row['group'].items())), row['time']): row['values'] for row in rows}
+
+
+@pytest.mark.parametrize('filters, group_by, interval', [
+    (['endpoint!=login'], [], None),
+    (['endpoint!=login', 'status=200'], [], None),
+    (['status!=500'], ['endpoint'], None),
+    (['endpoint=feed'], [], 10 * SECOND_NS),
+    (['endpoint!=missing'], [], None),
+])
+def test_columns_and_rollup_agree(columns, rollup, filters, group_by, interval):
+    query = Query('http_req_duration', [parse_filter(text) for text in filters], aggregations=AGGREGATIONS,
+                  group_by=group_by, interval_ns=interval)
+    from_rollup = rows_by_key(query_rollup(rollup, query))
+    assert from_rollup
+    for index in (None, TagIndex.build(columns)):
+        from_columns = rows_by_key(query_columns(columns, query, index))
+        # строки columns без тега группировки (группа None) в rollup не попадают
+        from_columns = {key: values for key, values in from_columns.items()
+                        if all(value is not None for _, value in key[0])}
+        assert from_columns.keys() == from_rollup.keys()
+        for key, values in from_columns.items():
+            assert values == pytest.approx(from_rollup[key]), key
+
+
+def test_not_equal_skips_rows_without_tag(columns):
+    query = Query('http_req_duration', [parse_filter('endpoint!=login')], aggregations=AGGREGATIONS[:1])
+    expected = int(np.count_nonzero(columns.tags['endpoint'] > 0))
+    for index in (None, TagIndex.build(columns)):
+        assert query_columns(columns, query, index)[0]['count'] == expected
@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from k6report.cache import ColumnarResults
+from k6report.rollup import Rollup
+from k6report.timeseries import build_series
+
+SECOND_NS = 10**9
+START = 1_700_000_000 * SECOND_NS
+METRIC_TYPES = {'http_req_duration': 'trend', 'http_req_failed': 'rate', 'http_reqs': 'counter',
+                'clock_skew': 'trend'}
+
+
+def make_columns(rows):
+    """ColumnarResults из строк (метрика, время нс, значение, endpoint или None), как в кеше."""
+    names = list(METRIC_TYPES)
+    rows = sorted(rows, key=lambda row: (names.index(row[0]), row[1]))
+    counts = [sum(1 for row in rows if row[0] == name) for name in names]
+    endpoints = ['login', 'feed']
+    return ColumnarResults(
+        names, METRIC_TYPES, np.concatenate(([0], np.cumsum(counts))).astype(np.int64),
+        np.array([row[1] for row in rows], dtype=np.int64),
+        np.array([row[2] for row in rows], dtype=np.float64),
+        {'endpoint': endpoints},
+        {'endpoint': np.array([endpoints.index(row[3]) if row[3] else -1 for row in rows], dtype=np.int32)},
+    )
+
+
+@pytest.fixture(scope='module')
+def rows():
+    """Прогон на 3 минуты; clock_skew - метрика с отрицательными значениями и нулями."""
+    rng = np.random.default_rng(0)
+    rows = []
+    for time in np.sort(rng.integers(START, START + 180 * SECOND_NS, 4000)).tolist():
+        endpoint = str(rng.choice(['login', 'feed']))
+        rows.append(('http_reqs', time, 1.0, endpoint))
+        rows.append(('http_req_duration', time, float(np.round(rng.lognormal(4, 0.5), 2)), endpoint))
+        rows.append(('http_req_failed', time, float(rng.random() < 0.05), endpoint))
+        rows.append(('clock_skew', time, float(rng.choice([0.0, -1.0, 1.0]) * rng.lognormal(0, 1)), None))
+    return rows
+
+
+def assert_same_aggregates(actual, expected):
+    assert sorted(actual) == sorted(expected)
+    for name, aggregator in expected.items():
+        data, reference = actual[name].to_dict(), aggregator.to_dict()
+        assert data.pop('sum') == pytest.approx(reference.pop('sum'), rel=1e-12), name
+        assert data == reference, name
+
+
+def test_aggregates_after_save_and_load(rows, tmp_path):
+    columns = make_columns(rows)
+    rollup = Rollup.from_columns(columns, tag_sets=((), ('endpoint',)), source='load-abc123.json')
+    rollup.save(str(tmp_path / 'load-abc123.rollup.npz'))
+    loaded = Rollup.load(str(tmp_path / 'load-abc123.rollup.npz'))
+    assert loaded.sources == ['load-abc123.json']
+    assert loaded.metric_types == METRIC_TYPES
+    assert_same_aggregates(loaded.aggregates(), columns.aggregates())
+    assert loaded.aggregates()['clock_skew'].min < 0
+    # разбивка по тегу - как агрегаты подмножества строк
+    feed = make_columns([row for row in rows if row[3] == 'feed' and row[0] != 'clock_skew'])
+    assert_same_aggregates({'http_req_duration': loaded.aggregate('http_req_duration', [('endpoint', 'feed')])},
+                           {'http_req_duration': feed.aggregates()['http_req_duration']})
+
+
+def test_merged_shards_match_single_file(rows):
+    whole = make_columns(rows)
+    shards = [make_columns(rows[i::3]) for i in range(3)]
+    merged = Rollup.merge([Rollup.from_columns(shard, tag_sets=((), ('endpoint',))) for shard in shards])
+    assert_same_aggregates(merged.aggregates(), whole.aggregates())
+    single = Rollup.from_columns(whole, tag_sets=((), ('endpoint',)))
+    for resolution in single.resolutions:
+        for field, values in single.levels[resolution].items():
+            assert np.allclose(merged.levels[resolution][field], values, rtol=1e-12), (resolution, field)
+
+
+@pytest.mark.parametrize('resolution', [1, 10, 60])
+def test_series_match_cache(rows, resolution):
+    columns = make_columns(rows)
+    rollup = Rollup.from_columns(columns)
+    start, end = int(columns.time.min()), int(columns.time.max())
+    resolution_ns = resolution * SECOND_NS
+    # корзины rollup выровнены по эпохе: ряд по кешу строится с той же границы
+    expected = build_series(columns, start // resolution_ns * resolution_ns, end, resolution_ns)
+    actual = rollup.series(resolution=resolution)
+    assert actual.keys() == expected.keys()
+    assert np.array_equal(actual['time'], expected['time'])
+    for name in ('rps', 'error_rate', 'p50', 'p95', 'p99'):
+        assert np.allclose(actual[name], expected[name], equal_nan=True), name
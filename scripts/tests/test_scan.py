@@ -0,0 +1,45 @@
+import json
+
+from generate_telegram_report import scan_tests
+from k6report.scan import scan_counts
+
+
+def point(metric, value):
+    # компактная запись, как у кодировщика k6
+    return json.dumps({"metric": metric, "type": "Point",
+                       "data": {"time": "2026-01-01T00:00:00Z", "value": value, "tags": {"status": "200"}}},
+                      separators=(',', ':'))
+
+
+def write_results(path, points):
+    lines = [json.dumps({"metric": "http_reqs", "type": "Metric", "data": {"type": "counter"}},
+                        separators=(',', ':'))]
+    lines += [point(metric, value) for metric, value in points]
+    path.write_text('\n'.join(lines) + '\n')
+    return str(path)
+
+
+def test_rate_values_as_booleans_and_numbers(tmp_path):
+    points = [('http_reqs', 1)] * 5 + [('http_req_failed', value) for value in (True, False, 1, 0, 0.0, 1.5, True)]
+    filepath = write_results(tmp_path / 'load-abc123.json', points)
+    assert scan_counts(filepath) == {'http_reqs': (5, 0), 'http_req_failed': (7, 4)}
+
+
+def test_mmap_scan_matches_streaming(tmp_path):
+    points = [('http_reqs', 1), ('http_req_failed', True), ('http_req_failed', False)]
+    mapped = write_results(tmp_path / 'load-abc123.json', points)
+    # другой порядок ключей: поиск по подстроке не подходит, файл читается разбором
+    streamed = tmp_path / 'load-def456.json'
+    streamed.write_text(''.join(json.dumps({"type": "Point", "metric": metric,
+                                            "data": {"time": "2026-01-01T00:00:00Z", "value": value}}) + '\n'
+                                for metric, value in points))
+    assert scan_counts(mapped) == scan_counts(str(streamed)) == {'http_reqs': (1, 0), 'http_req_failed': (2, 1)}
+
+
+def test_scan_tests_skips_broken_file(tmp_path, capsys):
+    write_results(tmp_path / 'smoke-abc123.json', [('http_reqs', 1), ('http_req_failed', True)])
+    (tmp_path / 'load-abc123.json').write_text('{"metrics": {')
+    tests = scan_tests(str(tmp_path))
+    assert [test['file'] for test in tests] == ['smoke-abc123.json']
+    assert tests[0]['metrics']['http_req_failed'] == {'nonzero': 1}
+    assert 'load-abc123.json' in capsys.readouterr().out
@@ -0,0 +1,151 @@
+import json
+
+import numpy as np
+import pytest
+
+from k6report.ingest import ingest_results
+from k6report.thresholds import (CRITICAL, WARNING, Threshold, evaluate_entry, parse_selector, parse_thresholds,
+                                 scenario_thresholds)
+
+SCENARIO = """
+import http from 'k6/http';
+
+export const options = {
+  // пороги k6; 'https://' в строке - не комментарий
+  thresholds: {
+    http_req_duration: ['p(95)<500', 'avg < 200'],
+    'http_req_duration{endpoint:login}': [{ threshold: 'max<=300', abortOnFail: true }],
+    "http_req_failed": ['rate<0.05'],
+    /* checks: ['rate>0.99'], */
+  },
+  url: 'https://example.com',
+};
+"""
+
+
+def test_parse_selector():
+    assert parse_selector('http_req_duration') == ('http_req_duration', ())
+    assert parse_selector('request_duration{endpoint:get_posts}') == \
+        ('request_duration', (('endpoint', 'get_posts'),))
+    assert parse_selector("http_req_duration{ status:'500', method : GET }") == \
+        ('http_req_duration', (('status', '500'), ('method', 'GET')))
+    with pytest.raises(ValueError):
+        parse_selector('http_req_duration{endpoint}')
+
+
+@pytest.mark.parametrize('expression, aggregation, quantile, operator, limit', [
+    ('p(95)<500', 'p(95)', 0.95, '<', 500),
+    ('p( 99.9 ) <= 1e3', 'p(99.9)', 0.999, '<=', 1000),
+    ('rate>0.95', 'rate', None, '>', 0.95),
+    ('med===100', 'med', 0.5, '===', 100),
+    ('count < -1.5', 'count', None, '<', -1.5),
+])
+def test_parse_expression(expression, aggregation, quantile, operator, limit):
+    threshold = Threshold('http_req_duration', expression)
+    assert (threshold.aggregation, threshold.quantile, threshold.operator, threshold.limit) == \
+        (aggregation, pytest.approx(quantile) if quantile else None, operator, limit)
+
+
+@pytest.mark.parametrize('expression', ['p95<500', 'rate>', 'avg ~ 1', 'total<1'])
+def test_invalid_expression(expression):
+    with pytest.raises(ValueError):
+        Threshold('http_req_duration', expression)
+
+
+def test_scenario_thresholds_and_objects(tmp_path):
+    path = tmp_path / 'load-test.js'
+    path.write_text(SCENARIO)
+    thresholds = scenario_thresholds(str(path))
+    assert thresholds == {
+        'http_req_duration': ['p(95)<500', 'avg < 200'],
+        'http_req_duration{endpoint:login}': ['max<=300'],
+        'http_req_failed': ['rate<0.05'],
+    }
+    parsed = parse_thresholds({'http_req_duration': {'threshold': 'p(99)<900', 'abortOnFail': True},
+                               'http_reqs': [{'threshold': 'rate>10', 'level': WARNING, 'budget': 'THROUGHPUT'},
+                                             'count>100']})
+    assert [(t.key, t.expression, t.level, t.budget) for t in parsed] == [
+        ('http_req_duration', 'p(99)<900', CRITICAL, None),
+        ('http_reqs', 'rate>10', WARNING, 'THROUGHPUT'),
+        ('http_reqs', 'count>100', CRITICAL, None),
+    ]
+
+
+@pytest.fixture(scope='module')
+def run(tmp_path_factory):
+    """Прогон: 2000 запросов с тегами endpoint и status, 40 с."""
+    results_dir = tmp_path_factory.mktemp('results')
+    rng = np.random.default_rng(0)
+    rows = []
+    with open(results_dir / 'load-abc123.json', 'w') as f:
+        for metric, metric_type in (('http_req_duration', 'trend'), ('http_req_failed', 'rate'),
+                                    ('http_reqs', 'counter')):
+            f.write(json.dumps({"type": "Metric", "metric": metric, "data": {"type": metric_type}}) + "\n")
+        for i in range(2000):
+            endpoint = ['login', 'feed'][i % 2]
+            status = '500' if i % 25 == 0 else '200'
+            duration = float(np.round(rng.lognormal(4 if endpoint == 'feed' else 5, 0.4), 2))
+            time = f"2026-01-01T00:00:{i // 50:02d}.{i % 50 * 2:02d}Z"
+            rows.append((endpoint, status, duration))
+            tags = {'endpoint': endpoint, 'status': status}
+            f.write(json.dumps({"type": "Point", "metric": "http_req_duration",
+                                "data": {"time": time, "value": duration, "tags": tags}}) + "\n")
+            f.write(json.dumps({"type": "Point", "metric": "http_req_failed",
+                                "data": {"time": time, "value": status == '500', "tags": tags}}) + "\n")
+            f.write(json.dumps({"type": "Point", "metric": "http_reqs",
+                                "data": {"time": time, "value": 1, "tags": tags}}) + "\n")
+    summary = ingest_results(str(results_dir), workers=1)
+    return str(results_dir), summary['tests'][0], rows
+
+
+def durations(rows, endpoint=None, status=None):
+    return np.array([duration for row_endpoint, row_status, duration in rows
+                     if endpoint in (None, row_endpoint) and status in (None, row_status)])
+
+
+def by_key(report):
+    return {(result['metric'], result['threshold']): result for result in report['thresholds']}
+
+
+def test_evaluate_against_aggregates(run):
+    results_dir, entry, rows = run
+    all_durations = durations(rows)
+    thresholds = parse_thresholds({
+        'http_req_duration': [f'avg<{all_durations.mean() + 1}', f'max<{all_durations.max()}'],
+        'http_req_duration{endpoint:login}': [f'min>={durations(rows, "login").min()}'],
+        'http_req_duration{endpoint:feed,status:500}': [f'count=={len(durations(rows, "feed", "500"))}'],
+        'http_req_failed': ['rate<0.05'],
+        'http_reqs': ['count==2000', 'rate>100'],
+        'http_req_waiting': ['p(95)<1'],
+    })
+    report = evaluate_entry(entry, thresholds, results_dir)
+    results = by_key(report)
+    assert [result['ok'] for result in report['thresholds']] == [True, False, True, True, True, True, False, None]
+    assert results[('http_req_failed', 'rate<0.05')]['value'] == pytest.approx(0.04)
+    # подметрика с двумя тегами - срез кеша
+    assert results[('http_req_duration{endpoint:feed,status:500}', 'count==40')]['source'] == 'cache'
+    # http_reqs: 2000 за 39.98 с
+    assert results[('http_reqs', 'rate>100')]['value'] == pytest.approx(2000 / 39.98)
+    assert report['verdict'] == 'fail'
+
+
+@pytest.mark.parametrize('memory_limit', [10**6, 50])
+def test_exact_quantiles_from_cache(run, memory_limit):
+    results_dir, entry, rows = run
+    thresholds = parse_thresholds({'http_req_duration': ['p(95)<1000'],
+                                   'http_req_duration{endpoint:login}': ['p(50)<1000'],
+                                   'http_req_duration{endpoint:feed,status:500}': ['p(99)<1000'],
+                                   'http_req_duration{endpoint:missing}': ['p(99)<1000']})
+    approximate = by_key(evaluate_entry(entry, thresholds, results_dir))
+    exact = by_key(evaluate_entry(entry, thresholds, results_dir, exact=True, memory_limit=memory_limit))
+    for (key, expression), selected in [(('http_req_duration', 'p(95)<1000'), durations(rows)),
+                                        (('http_req_duration{endpoint:login}', 'p(50)<1000'),
+                                         durations(rows, 'login')),
+                                        (('http_req_duration{endpoint:feed,status:500}', 'p(99)<1000'),
+                                         durations(rows, 'feed', '500'))]:
+        quantile = float(expression[2:4]) / 100
+        result = exact[(key, expression)]
+        assert (result['source'], result['approximate']) == ('cache', False)
+        assert result['value'] == pytest.approx(np.quantile(selected, quantile), rel=1e-12)
+        assert approximate[(key, expression)]['value'] == pytest.approx(result['value'], rel=0.02)
+    assert exact[('http_req_duration{endpoint:missing}', 'p(99)<1000')]['value'] is None
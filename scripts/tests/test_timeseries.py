@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from k6report.cache import ColumnarResults
+from k6report.timeseries import SeriesStream, build_series, downsample, lttb
+
+SECOND_NS = 10**9
+START = 1_700_000_000 * SECOND_NS
+NAMES = ['http_reqs', 'http_req_failed', 'http_req_duration']
+
+
+@pytest.fixture(scope='module')
+def points():
+    """(метрика, значение, время нс) за 120 с, по времени."""
+    rng = np.random.default_rng(0)
+    result = []
+    for time in np.sort(rng.integers(START, START + 120 * SECOND_NS, 5000)).tolist():
+        result.append(('http_reqs', 1.0, time))
+        result.append(('http_req_failed', float(rng.random() < 0.1), time))
+        result.append(('http_req_duration', float(np.round(rng.lognormal(4, 0.6), 1)), time))
+    return result
+
+
+def make_columns(points):
+    rows = sorted(points, key=lambda point: (NAMES.index(point[0]), point[2]))
+    counts = [sum(1 for point in rows if point[0] == name) for name in NAMES]
+    return ColumnarResults(NAMES, {}, np.concatenate(([0], np.cumsum(counts))).astype(np.int64),
+                           np.array([point[2] for point in rows], dtype=np.int64),
+                           np.array([point[1] for point in rows]), {}, {})
+
+
+def test_lttb_keeps_endpoints_and_extremes():
+    x = np.arange(1000, dtype=np.int64)
+    y = np.sin(x / 50.0)
+    y[300], y[700] = 25.0, -25.0
+    y[500] = np.nan
+    index = lttb(x, y, 50)
+    assert len(index) == 50
+    assert index[0] == 0 and index[-1] == 999
+    assert {300, 700} <= set(index.tolist())
+    assert 500 not in index
+    assert np.all(np.diff(index) > 0)
+    # бюджет не меньше числа точек: прореживания нет (кроме NaN)
+    assert len(lttb(x, y, 5000)) == 999
+
+
+def test_bucket_counts_match_raw_data(points):
+    columns = make_columns(points)
+    interval_ns = 10 * SECOND_NS
+    series = build_series(columns, START, START + 120 * SECOND_NS - 1, interval_ns)
+    index = [(time - START) // interval_ns for metric, _, time in points if metric == 'http_reqs']
+    assert np.allclose(series['rps'] * 10, np.bincount(index, minlength=12))
+    for bucket in (0, 5, 11):
+        inside = [(metric, value) for metric, value, time in points if (time - START) // interval_ns == bucket]
+        failed = [value for metric, value in inside if metric == 'http_req_failed']
+        durations = [value for metric, value in inside if metric == 'http_req_duration']
+        assert series['error_rate'][bucket] == pytest.approx(100 * np.mean(failed))
+        assert series['p95'][bucket] == pytest.approx(np.quantile(durations, 0.95, method='lower'), rel=0.01)
+    result = downsample(series, 5)
+    assert set(result) == {'rps', 'error_rate', 'p50', 'p95', 'p99'}
+    assert result['rps']['t'][0] == START // 10**6
+
+
+def test_stream_matches_columns(points):
+    stream = SeriesStream(START, START + 120 * SECOND_NS - 1)
+    for metric, value, time in points:
+        stream.add(metric, value, time)
+    series = stream.result()
+    expected = build_series(make_columns(points), START, START + 120 * SECOND_NS - 1)
+    assert stream.dropped == 0
+    for name, values in expected.items():
+        assert np.allclose(series[name], values, equal_nan=True), name
+
+
+def test_stream_drops_late_latency_points():
+    stream = SeriesStream(START, START + 60 * SECOND_NS, lateness_ns=5 * SECOND_NS)
+    stream.add('http_req_duration', 100.0, START)
+    stream.add('http_req_duration', 200.0, START + 30 * SECOND_NS)
+    # интервал 0 закрыт: опоздавшая задержка отбрасывается, счетчики учитываются
+    stream.add('http_req_duration', 900.0, START + 1)
+    stream.add('http_reqs', 1.0, START + 2)
+    stream.add('http_req_failed', 1.0, START + 3)
+    # в пределах допуска опоздания точка принимается
+    stream.add('http_req_duration', 300.0, START + 26 * SECOND_NS)
+    series = stream.result()
+    assert stream.dropped == 1
+    assert series['p99'][0] == pytest.approx(100.0, rel=0.01)
+    assert series['rps'][0] == 1 and series['error_rate'][0] == 100
+    assert series['p50'][26] == pytest.approx(300.0, rel=0.01)
@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from k6report.timestamps import NS_PER_SECOND, TimestampParser, parse_rfc3339_batch, parse_rfc3339_ns
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def expected_ns(moment, fraction_ns=0):
+    return (moment - EPOCH) // timedelta(seconds=1) * NS_PER_SECOND + fraction_ns
+
+
+CASES = [
+    ('2024-05-01T12:00:00Z', expected_ns(datetime(2024, 5, 1, 12, tzinfo=timezone.utc))),
+    ('2024-05-01T12:00:00.123456789+03:00', expected_ns(datetime(2024, 5, 1, 9, tzinfo=timezone.utc), 123456789)),
+    ('2024-05-01T02:30:00.5-05:30', expected_ns(datetime(2024, 5, 1, 8, tzinfo=timezone.utc), 500_000_000)),
+    ('2024-02-29T23:59:59.000000001Z', expected_ns(datetime(2024, 2, 29, 23, 59, 59, tzinfo=timezone.utc), 1)),
+    # переход даты из-за смещения
+    ('2024-01-01T01:00:00.25+02:00', expected_ns(datetime(2023, 12, 31, 23, tzinfo=timezone.utc), 250_000_000)),
+    ('1969-12-31T23:59:59.75Z', -250_000_000),
+    ('1900-03-01T00:00:00.123Z', expected_ns(datetime(1900, 3, 1, tzinfo=timezone.utc), 123_000_000)),
+    # больше 9 знаков дробной части: лишние отбрасываются
+    ('2024-05-01T12:00:00.1234567891Z', expected_ns(datetime(2024, 5, 1, 12, tzinfo=timezone.utc), 123456789)),
+    ('2024-05-01T12:00:00.12+00:00', expected_ns(datetime(2024, 5, 1, 12, tzinfo=timezone.utc), 120_000_000)),
+]
+
+
+@pytest.mark.parametrize('timestamp, expected', CASES)
+def test_scalar_parser(timestamp, expected):
+    assert parse_rfc3339_ns(timestamp) == expected
+
+
+def test_stream_scalar_and_batch_agree():
+    timestamps = [timestamp for timestamp, _ in CASES]
+    # поток: соседние строки одного часа берут префикс из кеша
+    rng = np.random.default_rng(0)
+    for second in rng.integers(0, 3600, 200):
+        fraction = str(rng.integers(0, 10**9)).zfill(9)[:rng.integers(0, 10)]
+        timestamps.append(f"2026-01-01T10:{second // 60:02d}:{second % 60:02d}"
+                          + (f".{fraction}" if fraction else '') + rng.choice(['Z', '+03:00', '-07:00']))
+    parser = TimestampParser()
+    stream = [parser(timestamp) for timestamp in timestamps]
+    scalar = [parse_rfc3339_ns(timestamp) for timestamp in timestamps]
+    assert stream == scalar
+    assert parse_rfc3339_batch(timestamps).tolist() == scalar
+    assert parse_rfc3339_batch([timestamp.encode() for timestamp in timestamps]).tolist() == scalar
+    assert stream[:len(CASES)] == [expected for _, expected in CASES]
+
+
+def test_empty_batch():
+    assert parse_rfc3339_batch([]).dtype == np.int64
+    assert len(parse_rfc3339_batch([])) == 0